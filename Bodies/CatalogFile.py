@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+
+"""A memory mapped binary format for star and deep sky catalogs
+
+A catalog read from CSV into python lists costs its whole size in each
+gunicorn worker and the time to parse it at start up. In this format
+the columns are stored as they are used, so open_catalog maps the file and
+hands out numpy views of it: nothing is read until it is used and the
+workers share the pages through the page cache. That includes the unit
+vectors and the Stars.SkyIndex of the stars, built once by write and
+not by every worker that loads the catalog.
+
+Format, little endian, each section aligned to 8 bytes:
+
+    header      magic 'AAICAT\\0\\0', version (uint16), reserved (uint16),
+                count N (uint32), index pixels P (uint32), index pixel
+                degrees (float64), then the offset (uint64) of each
+                section and the length of the strings
+    ra          N float64, hours
+    dec         N float64, degrees
+    magnitude   N float32
+    id offsets  N + 1 uint64 into the strings
+    name offsets N + 1 uint64 into the strings
+    strings     the utf-8 ids and names
+    units       N by 3 float64, equatorial unit vectors, see Stars.radec2units
+    order       N int64, the SkyIndex order of the stars by pixel
+    starts      P + 1 int64, where each pixel's stars start in order
+    centers     P by 3 float64, each pixel's mean direction
+    radii       P float64, degrees from each center to its farthest star
+
+to convert:
+
+    ./pylaunch.sh CatalogFile.py bright_stars.csv -o bright_stars.cat
+    ./pylaunch.sh CatalogFile.py --format bsc5 catalog -o bsc5.cat
+
+and to use, see Stars.load:
+
+    a_catalog = Stars.load('bsc5.cat')
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import argparse
+import mmap
+import struct
+
+import numpy
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+magic = b'AAICAT\0\0'
+version = 2
+header = struct.Struct('<8sHHIIdQQQQQQQQQQQQ')
+
+alignment = 8
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+class Strings(object):
+    """A column of strings decoded when asked for
+
+    Indexes like a list of str without building one.
+    """
+
+    def __init__(self, a_buffer, offsets, a_base=0):
+        self.buffer = a_buffer
+        self.offsets = offsets
+        self.base = a_base
+
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+    def __getitem__(self, i):
+
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        if i < 0:
+            i += len(self)
+
+        if not 0 <= i < len(self):
+            raise IndexError('catalog string index out of range')
+
+        return self.buffer[self.base + int(self.offsets[i]):self.base + int(self.offsets[i + 1])].decode('utf-8')
+
+
+class CatalogFile(object):
+    """A mapped catalog
+
+    Attributes:
+        path (str): the file
+        ras (numpy.ndarray): read only view, right ascension in hours
+        decs (numpy.ndarray): read only view, declination in degrees
+        magnitudes (numpy.ndarray): read only view, float32
+        ids, names (Strings): decoded when indexed
+        units (numpy.ndarray): read only view, N by 3 unit vectors
+        pixel_degrees (float): of the index
+        index (tuple): read only views of the SkyIndex order, starts, centers and radii
+    """
+
+    def __init__(self, a_path, a_map, ras, decs, magnitudes, ids, names, units, a_pixel_degrees, an_index):
+        self.path = a_path
+        self.map = a_map
+        self.ras = ras
+        self.decs = decs
+        self.magnitudes = magnitudes
+        self.ids = ids
+        self.names = names
+        self.units = units
+        self.pixel_degrees = a_pixel_degrees
+        self.index = an_index
+
+
+    def __len__(self):
+        return len(self.ras)
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def padding(an_offset):
+    """Bytes to the next alignment"""
+
+    return -an_offset % alignment
+
+
+def write(a_path, ids, names, ras, decs, magnitudes, a_pixel_degrees=None):
+    """Write a catalog with its unit vectors and sky index
+
+    Args:
+        a_path (str): the file
+        ids, names (sequence): of str
+        ras (sequence): right ascension in hours
+        decs (sequence): declination in degrees
+        magnitudes (sequence): visual magnitudes
+        a_pixel_degrees (float): of the index, Stars.default_pixel_degrees if None
+
+    Raises: Error if the columns are not the same length
+    """
+
+    import Bodies.Stars # deferred, it imports this module
+
+    if a_pixel_degrees is None:
+        a_pixel_degrees = Bodies.Stars.default_pixel_degrees
+
+    columns = [numpy.ascontiguousarray(ras, dtype='<f8'),
+               numpy.ascontiguousarray(decs, dtype='<f8'),
+               numpy.ascontiguousarray(magnitudes, dtype='<f4')]
+
+    n = len(columns[0])
+
+    if any(len(a_column) != n for a_column in columns + [ids, names]):
+        raise Error('the catalog columns are not the same length')
+
+    encoded_ids = [an_id.encode('utf-8') for an_id in ids]
+    encoded_names = [a_name.encode('utf-8') for a_name in names]
+
+    # the names follow the ids in the strings
+    id_offsets = numpy.cumsum([0] + [len(s) for s in encoded_ids]).astype('<u8')
+    name_offsets = (id_offsets[-1] + numpy.cumsum([0] + [len(s) for s in encoded_names])).astype('<u8')
+
+    units = Bodies.Stars.radec2units(columns[0], columns[1]).reshape(n, 3)
+    an_index = Bodies.Stars.SkyIndex(units, a_pixel_degrees)
+
+    strings = b''.join(encoded_ids + encoded_names)
+
+    sections = columns + [id_offsets, name_offsets, strings,
+                          numpy.ascontiguousarray(units, dtype='<f8'),
+                          numpy.ascontiguousarray(an_index.order, dtype='<i8'),
+                          numpy.ascontiguousarray(an_index.starts, dtype='<i8'),
+                          numpy.ascontiguousarray(an_index.centers, dtype='<f8'),
+                          numpy.ascontiguousarray(an_index.radii, dtype='<f8')]
+
+    offsets = list()
+    an_offset = header.size + padding(header.size)
+
+    for a_section in sections:
+        offsets.append(an_offset)
+        size = a_section.nbytes if hasattr(a_section, 'nbytes') else len(a_section)
+        an_offset += size + padding(size)
+
+    with open(a_path, 'wb') as a_file:
+
+        a_file.write(header.pack(magic, version, 0, n, len(an_index.radii), a_pixel_degrees,
+                                 *(offsets[:6] + [len(strings)] + offsets[6:])))
+
+        for an_offset, a_section in zip(offsets, sections):
+            a_file.write(b'\0'*(an_offset - a_file.tell()))
+            a_file.write(a_section.tobytes() if hasattr(a_section, 'tobytes') else a_section)
+
+    return
+
+
+def open_catalog(a_path):
+    """Map a catalog
+
+    Args:
+        a_path (str): the file
+
+    Returns: CatalogFile
+
+    Raises: Error if the file is not a catalog
+    """
+
+    with open(a_path, 'rb') as a_file:
+        try:
+            a_map = mmap.mmap(a_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # empty
+            raise Error('not an AAI catalog: {}'.format(a_path))
+
+    if len(a_map) < header.size:
+        raise Error('not an AAI catalog: {}'.format(a_path))
+
+    fields = header.unpack_from(a_map)
+    a_magic, a_version, reserved, n, pixels, a_pixel_degrees = fields[:6]
+    ra_offset, dec_offset, magnitude_offset, id_offset, name_offset, strings_offset, strings_length = fields[6:13]
+    units_offset, order_offset, starts_offset, centers_offset, radii_offset = fields[13:]
+
+    if a_magic != magic or a_version != version:
+        raise Error('not an AAI catalog version {}, convert it again: {}'.format(version, a_path))
+
+    ends = ((ra_offset, 8*n), (dec_offset, 8*n), (magnitude_offset, 4*n),
+            (id_offset, 8*(n + 1)), (name_offset, 8*(n + 1)), (strings_offset, strings_length),
+            (units_offset, 24*n), (order_offset, 8*n), (starts_offset, 8*(pixels + 1)),
+            (centers_offset, 24*pixels), (radii_offset, 8*pixels))
+
+    if any(an_offset % alignment or an_offset + size > len(a_map) for an_offset, size in ends):
+        raise Error('AAI catalog truncated: {}'.format(a_path))
+
+    id_offsets = numpy.frombuffer(a_map, dtype='<u8', count=n + 1, offset=id_offset)
+    name_offsets = numpy.frombuffer(a_map, dtype='<u8', count=n + 1, offset=name_offset)
+
+    if n and (id_offsets[-1] != name_offsets[0] or name_offsets[-1] > strings_length):
+        raise Error('AAI catalog strings truncated: {}'.format(a_path))
+
+    an_index = (numpy.frombuffer(a_map, dtype='<i8', count=n, offset=order_offset),
+                numpy.frombuffer(a_map, dtype='<i8', count=pixels + 1, offset=starts_offset),
+                numpy.frombuffer(a_map, dtype='<f8', count=3*pixels, offset=centers_offset).reshape(pixels, 3),
+                numpy.frombuffer(a_map, dtype='<f8', count=pixels, offset=radii_offset))
+
+    return CatalogFile(a_path, a_map,
+                       numpy.frombuffer(a_map, dtype='<f8', count=n, offset=ra_offset),
+                       numpy.frombuffer(a_map, dtype='<f8', count=n, offset=dec_offset),
+                       numpy.frombuffer(a_map, dtype='<f4', count=n, offset=magnitude_offset),
+                       Strings(a_map, id_offsets, strings_offset),
+                       Strings(a_map, name_offsets, strings_offset),
+                       numpy.frombuffer(a_map, dtype='<f8', count=3*n, offset=units_offset).reshape(n, 3),
+                       a_pixel_degrees, an_index)
+
+
+# ================
+# ===== main =====
+# ================
+
+
+if __name__ == '__main__':
+
+    import Bodies.Stars # the readers
+
+    parser = argparse.ArgumentParser(description='Convert a catalog to the AAI binary format')
+
+    parser.add_argument('catalog', help='the catalog to convert')
+    parser.add_argument('--format', default='csv', choices=('csv', 'bsc5'), help='its format, see Stars.read_csv and read_bsc5')
+    parser.add_argument('-o', '--output', required=True, help='binary catalog to write')
+
+    args = parser.parse_args()
+
+    columns = Bodies.Stars.read_csv(args.catalog) if args.format == 'csv' else Bodies.Stars.read_bsc5(args.catalog)
+
+    write(args.output, *columns)
+
+    print('wrote {}: {} objects'.format(args.output, len(columns[0])))
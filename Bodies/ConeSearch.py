@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+
+"""What is within some degrees of a target, or of the Sun or Moon
+
+A cone search over a catalog of equatorial positions, the bundled
+bright stars, a catalog file or a list of objects, see Stars.load and
+objects. The catalog is indexed by sky pixels smaller than those
+Stars uses for the wide cones around the zenith, so a cone of a few
+degrees looks at the stars of a few pixels and not every star.
+
+With a time the Sun and the Moon, SunPosition.EquatorialCoords and
+MoonPosition.EquatorialCoords, are searched with the catalog, and
+either can be the center:
+
+    near_the_moon = ConeSearch.ConeSearch('moon', 10.0, coords.datetime('2015-03-21T21:00:00-07'))
+
+The catalog positions are J2000. The Sun and Moon of the date are
+precessed to J2000, see solar_system, so that their separations from
+the stars are not off by the precession since then, 0.7 degrees in
+2050.
+
+to run:
+
+    ./pylaunch.sh ConeSearch.py -- 05:35:17 -05:23:28 --radius 5
+    ./pylaunch.sh ConeSearch.py --datetime 2015-03-21T21:00:00-07 --radius 10 -- moon
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import argparse
+import math
+
+import coords
+import numpy
+
+import Bodies.MoonPosition
+import Bodies.Stars
+import Bodies.SunPosition
+import Transforms.Precession
+import Transforms.utils
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+default_pixel_degrees = 5.0 # see Stars.SkyIndex
+
+bodies = ('sun', 'moon') # with a time, see solar_system
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+# ----------------------
+# ----- separation -----
+# ----------------------
+
+
+def separation_array(units, other_units):
+    """Angles between unit vectors
+
+    atan2 of the cross and dot products keeps its precision at small
+    and near 180 degree separations, where arccos of the dot does not.
+
+    Args:
+        units (numpy.ndarray): N by 3 unit vectors, or one
+        other_units (numpy.ndarray): N by 3 unit vectors, or one
+
+    Returns: numpy.ndarray of degrees, one per pair, or each of units
+        from the one of other_units
+    """
+
+    units = numpy.asarray(units, dtype=float)
+    other_units = numpy.asarray(other_units, dtype=float)
+
+    crosses = numpy.linalg.norm(numpy.cross(units, other_units), axis=-1)
+    dots = numpy.sum(units*other_units, axis=-1)
+
+    return numpy.degrees(numpy.arctan2(crosses, dots))
+
+
+def separation_matrix(units, other_units):
+    """Angles from each of some unit vectors to each of others
+
+    Args:
+        units (numpy.ndarray): N by 3 unit vectors
+        other_units (numpy.ndarray): M by 3 unit vectors
+
+    Returns: numpy.ndarray N by M of degrees
+    """
+
+    units = numpy.asarray(units, dtype=float)
+    other_units = numpy.asarray(other_units, dtype=float)
+
+    return separation_array(units[:, None, :], other_units[None, :, :])
+
+
+def spherical2unit(an_equatorial):
+    """The unit vector of a coords.spherical in equatorial coordinates
+
+    Args:
+        an_equatorial (coords.spherical): phi the RA, theta the complement of the declination
+
+    Returns: numpy.ndarray of 3
+    """
+
+    return Bodies.Stars.radec2units([an_equatorial.phi.degrees/15.0],
+                                    [an_equatorial.theta.complement().degrees])[0]
+
+
+# ---------------------
+# ----- the lists -----
+# ---------------------
+
+
+def load(a_path=None, a_format=None):
+    """A catalog indexed for cone searches, read on first use
+
+    See Stars.load.
+    """
+
+    return Bodies.Stars.load(a_path, a_format, default_pixel_degrees)
+
+
+def objects(ids, names, ras, decs, magnitudes=None):
+    """A catalog of a list of objects
+
+    Args:
+        ids, names (list): of str
+        ras (sequence): right ascension in hours
+        decs (sequence): declination in degrees
+        magnitudes (sequence): visual magnitudes, unknown if None
+
+    Returns: Stars.Catalog
+
+    Raises: Error if the lists are not the same length
+    """
+
+    if magnitudes is None:
+        magnitudes = [float('nan')]*len(ids)
+
+    if any(len(a_list) != len(ids) for a_list in (names, ras, decs, magnitudes)):
+        raise Error('the object lists are not the same length')
+
+    return Bodies.Stars.Catalog(ids, names, ras, decs, magnitudes, default_pixel_degrees)
+
+
+def solar_system(a_datetime):
+    """The Sun and Moon as a catalog, J2000 as the stars
+
+    Args:
+        a_datetime (coords.datetime): The time of the observation.
+
+    Returns: Stars.Catalog of sun and moon precessed from a_datetime
+        to J2000, magnitudes unknown
+    """
+
+    positions = (Bodies.SunPosition.EquatorialCoords(a_datetime),
+                 Bodies.MoonPosition.EquatorialCoords(a_datetime))
+
+    ras, decs = Transforms.Precession.precess_array([an_eq.phi.degrees/15.0 for an_eq in positions],
+                                                    [an_eq.theta.complement().degrees for an_eq in positions],
+                                                    Transforms.Precession.of_date(a_datetime.toJulianDate()),
+                                                    Transforms.Precession.J2000)
+
+    return objects(list(bodies), ['Sun', 'Moon'], ras, decs)
+
+
+# -----------------------
+# ----- the queries -----
+# -----------------------
+
+
+def cone_search_array(a_catalog, a_center, a_radius, a_max_magnitude=None):
+    """The objects of a catalog within a radius of a direction
+
+    Args:
+        a_catalog (Stars.Catalog): the objects
+        a_center (numpy.ndarray): equatorial unit vector of the cone's axis
+        a_radius (float): degrees
+        a_max_magnitude (float): the faintest object, None for all.
+            Objects of unknown magnitude are kept.
+
+    Returns: dict of id, name, ra, dec, magnitude and separation lists,
+        nearest first, magnitude None if unknown
+    """
+
+    candidates = a_catalog.index.query(a_center, a_radius)
+
+    if a_max_magnitude is not None:
+        candidates = candidates[~(a_catalog.magnitudes[candidates] > a_max_magnitude)]
+
+    separations = separation_array(a_catalog.units[candidates], a_center)
+
+    inside = separations <= a_radius
+    candidates, separations = candidates[inside], separations[inside]
+
+    order = numpy.argsort(separations, kind='stable')
+    candidates, separations = candidates[order], separations[order]
+
+    return {'id': [a_catalog.ids[i] for i in candidates],
+            'name': [a_catalog.names[i] for i in candidates],
+            'ra': a_catalog.ras[candidates].tolist(),
+            'dec': a_catalog.decs[candidates].tolist(),
+            'magnitude': [None if math.isnan(m) else round(m, 2) for m in a_catalog.magnitudes[candidates].tolist()],
+            'separation': separations.tolist()}
+
+
+def merge(some_results):
+    """Cone searches as one, nearest first
+
+    Args:
+        some_results (list): of cone_search_array dict
+
+    Returns: dict as cone_search_array
+    """
+
+    keys = ('id', 'name', 'ra', 'dec', 'magnitude', 'separation')
+
+    rows = sorted((a_row for a_result in some_results for a_row in zip(*[a_result[k] for k in keys])),
+                  key=lambda a_row: a_row[-1])
+
+    return {k: [a_row[i] for a_row in rows] for i, k in enumerate(keys)}
+
+
+def ConeSearch(a_center, a_radius, a_datetime=None, a_max_magnitude=None, a_catalog=None):
+    """The objects within a radius of a direction
+
+    Args:
+
+    a_center (coords.spherical or str): the direction in equatorial
+    coordinates, see utils.radec2spherical, or 'sun' or 'moon' with a
+    time.
+
+    a_radius (float): degrees
+
+    a_datetime (coords.datetime): The time of the observation, to
+    search the Sun and Moon too. None for the catalog only.
+
+    a_max_magnitude (float): the faintest object, None for all
+
+    a_catalog (Stars.Catalog): the objects, load() if None
+
+    Returns: see cone_search_array, the center itself included
+
+    Raises: Error if the center is a body and there is no time, or
+        not a body
+    """
+
+    a_catalog = a_catalog or load()
+
+    named = not isinstance(a_center, coords.spherical)
+
+    if named and a_center not in bodies:
+        raise Error('unknown center {}, not one of {}'.format(a_center, ', '.join(bodies)))
+
+    if a_datetime is None:
+
+        if named:
+            raise Error('the {} needs a time'.format(a_center))
+
+        return cone_search_array(a_catalog, spherical2unit(a_center), a_radius, a_max_magnitude)
+
+    a_solar_system = solar_system(a_datetime)
+
+    if named:
+        a_center = a_solar_system.units[bodies.index(a_center)]
+    else:
+        a_center = spherical2unit(a_center)
+
+    return merge([cone_search_array(a_catalog, a_center, a_radius, a_max_magnitude),
+                  cone_search_array(a_solar_system, a_center, a_radius, a_max_magnitude)])
+
+
+# ================
+# ===== main =====
+# ================
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='The objects within a radius of a direction')
+
+    parser.add_argument('center', nargs='+', help='ra (hours) and dec (degrees), or sun or moon')
+    parser.add_argument('--radius', type=float, default=5.0, help='degrees')
+    parser.add_argument('--datetime', default=None, help='ISO 8601 date and time, to search the sun and moon too')
+    parser.add_argument('--magnitude', type=float, default=None, help='faintest magnitude')
+    parser.add_argument('--catalog', default=None, help='catalog file, default {}'.format(Bodies.Stars.default_catalog))
+
+    args = parser.parse_args()
+
+    if len(args.center) == 2:
+        a_center = Transforms.utils.radec2spherical(
+            coords.angle(Transforms.utils.dms2degrees(args.center[0], Bodies.Stars.ra_limits, 'ra')),
+            Transforms.utils.parse_angle_arg(args.center[1], Transforms.utils.latitude_limits))
+    else:
+        a_center = args.center[0]
+
+    found = ConeSearch(a_center, args.radius, coords.datetime(args.datetime) if args.datetime else None,
+                       args.magnitude, load(args.catalog) if args.catalog else None)
+
+    for a_row in zip(found['name'], found['magnitude'], found['separation']):
+        print('{:<20} {:>5} sep {:7.3f}'.format(a_row[0], str(a_row[1]), a_row[2]))
@@ -0,0 +1,505 @@
+#!/usr/bin/env python
+
+"""The moon from ELP-2000/82 series in a binary table, truncated to a precision
+
+One lunar backend for quick look charts and for eclipse work: the
+terms are read from a binary table when first needed and those smaller
+than precision_arcsec are dropped as they are read, so a chart pays
+for a few dozen terms and an eclipse for all of them. The series are
+evaluated with numpy over arrays of Julian dates.
+
+Uses algorithms from:
+    Astronomical Algorithms 2ed, Jean Meeus 1998, chapter 47
+    ELP 2000-82B, Chapront-Touze and Chapront, the main problem files ELP1-3
+
+The table shipped, elp2000_meeus47.bin, holds tables 47.A and 47.B,
+Meeus's truncation of ELP-2000/82, so with every term this matches
+MoonPosition.LunarLongLatRange and is no more accurate than it, about
+10 arcseconds in longitude and 4 in latitude: what it adds is the
+precision cut and the evaluation over arrays. A table of the main
+problem is made from the ELP1, ELP2 and ELP3 files:
+
+    ./pylaunch.sh ELP2000.py --elp ELP1 ELP2 ELP3 -o elp2000_main.bin
+
+and used with a_table='elp2000_main.bin'. The main problem alone is not
+the full ELP-2000/82: the planetary, tidal and relativistic
+perturbations of files ELP4 to ELP36 are not read, and Meeus's
+additive terms for Venus, Jupiter and the flattening of the earth
+(p. 338), added to either table, stand in for the largest of them.
+
+Table format, little endian:
+
+    magic 'ELPT', version (uint16), longitude, latitude and distance
+    term counts (uint32), then the terms of each series, largest first:
+    the multipliers of D, M, M' and F (int8) and the amplitude (float64,
+    arcseconds for the longitude and latitude sine series, kilometers
+    for the distance cosine series)
+
+to run:
+
+    ./pylaunch.sh ELP2000.py -- 1992-04-12T00:00:00 --precision 1
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import argparse
+import math
+import os
+import struct
+
+import coords
+
+import Transforms.EclipticEquatorial
+import Transforms.EquatorialHorizon
+import Transforms.lazy
+
+numpy = Transforms.lazy.Module('numpy') # imported on first use, only the tables and series need it
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+default_table = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'elp2000_meeus47.bin')
+
+magic = b'ELPT'
+version = 1
+header = struct.Struct('<4sHIII')
+
+term_fields = (('D', '<i1'), ('M', '<i1'), ('Mp', '<i1'), ('F', '<i1'), ('A', '<f8')) # 12 bytes
+
+series_names = ('longitude', 'latitude', 'distance')
+
+mean_distance = 385000.56 # km, Meeus p. 342, the constant distance term
+
+arcsec_per_radian = 180*3600/math.pi
+
+chunk_elements = 1 << 20 # terms times instants evaluated at a time
+
+tables = dict() # (path, precision_arcsec) to Series, see load
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+class Series(object):
+    """The terms of a table kept at a precision
+
+    Attributes:
+        longitude, latitude, distance (tuple): of (multipliers, amplitudes)
+            numpy arrays, a row of D, M, M', F multipliers per term, the
+            amplitudes in degrees for the angles and km for the distance
+        precision_arcsec (float): the smallest term kept
+        counts (dict): series name to (terms kept, terms in the table)
+    """
+
+    def __init__(self, longitude, latitude, distance, precision_arcsec, counts):
+        self.longitude = longitude
+        self.latitude = latitude
+        self.distance = distance
+        self.precision_arcsec = precision_arcsec
+        self.counts = counts
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+# ----------------------
+# ----- the tables -----
+# ----------------------
+
+
+def term_dtype():
+    """numpy record of one term"""
+
+    return numpy.dtype(list(term_fields))
+
+
+def amplitude_arcsec(a_name, amplitudes):
+    """Amplitudes as arcseconds so the series can be truncated alike
+
+    A distance term in km is the angle it subtends at the mean
+    distance, about its parallax.
+    """
+
+    if a_name == 'distance':
+        return abs(amplitudes)/mean_distance*arcsec_per_radian
+
+    return abs(amplitudes)
+
+
+def write_table(a_path, some_series):
+    """Write a table
+
+    Args:
+        a_path (str): the file
+        some_series (dict): series name to list of (D, M, M', F, amplitude),
+            amplitudes in arcseconds or km
+    """
+
+    records = list()
+
+    for a_name in series_names:
+
+        terms = numpy.array([tuple(a_term) for a_term in some_series[a_name]], dtype=term_dtype())
+
+        # largest first so a truncation reads a prefix
+        order = numpy.argsort(-amplitude_arcsec(a_name, terms['A']), kind='stable')
+        records.append(terms[order])
+
+    with open(a_path, 'wb') as a_file:
+        a_file.write(header.pack(magic, version, *[len(terms) for terms in records]))
+        for terms in records:
+            a_file.write(terms.tobytes())
+
+    return
+
+
+def read_table(a_path, precision_arcsec=0.0):
+    """Read a table keeping the terms of at least precision_arcsec
+
+    Args:
+        a_path (str): the file
+        precision_arcsec (float): the smallest amplitude kept, see amplitude_arcsec
+
+    Returns: Series
+
+    Raises: Error if the file is not a table
+    """
+
+    with open(a_path, 'rb') as a_file:
+        data = a_file.read()
+
+    if len(data) < header.size:
+        raise Error('not an ELP table: {}'.format(a_path))
+
+    a_magic, a_version, n_longitude, n_latitude, n_distance = header.unpack_from(data)
+
+    if a_magic != magic or a_version != version:
+        raise Error('not an ELP table version {}: {}'.format(version, a_path))
+
+    dtype = term_dtype()
+
+    if len(data) != header.size + (n_longitude + n_latitude + n_distance)*dtype.itemsize:
+        raise Error('ELP table truncated: {}'.format(a_path))
+
+    kept = dict()
+    counts = dict()
+    offset = header.size
+
+    for a_name, a_count in zip(series_names, (n_longitude, n_latitude, n_distance)):
+
+        terms = numpy.frombuffer(data, dtype=dtype, count=a_count, offset=offset)
+        offset += a_count*dtype.itemsize
+
+        # the constant distance is always kept
+        terms = terms[(amplitude_arcsec(a_name, terms['A']) >= precision_arcsec)
+                      | ((terms['D'] == 0) & (terms['M'] == 0) & (terms['Mp'] == 0) & (terms['F'] == 0))]
+
+        multipliers = numpy.column_stack([terms[a_field] for a_field in ('D', 'M', 'Mp', 'F')]).astype(float)
+        amplitudes = terms['A'] if a_name == 'distance' else terms['A']/3600.0
+
+        kept[a_name] = (multipliers, numpy.ascontiguousarray(amplitudes))
+        counts[a_name] = (len(terms), a_count)
+
+    return Series(kept['longitude'], kept['latitude'], kept['distance'], precision_arcsec, counts)
+
+
+def load(precision_arcsec=0.0, a_table=None):
+    """The series of a table at a precision, read on first use
+
+    Args:
+        precision_arcsec (float): the smallest term kept
+        a_table (str): the table file, default_table if None
+
+    Returns: Series
+    """
+
+    key = (a_table or default_table, float(precision_arcsec))
+
+    a_series = tables.get(key)
+
+    if a_series is None:
+        a_series = tables[key] = read_table(key[0], key[1])
+
+    return a_series
+
+
+def meeus_series():
+    """Tables 47.A and 47.B as series for write_table
+
+    Returns: dict of series name to list of (D, M, M', F, amplitude)
+    """
+
+    import Bodies.MoonPosition # the tables, only the converter needs them
+
+    def terms(a_table, a_column, a_scale):
+        return [(r['D'], r['Msun'], r['Mmoon'], r['F'], r[a_column]*a_scale)
+                for r in a_table if r[a_column] != 0]
+
+    return {'longitude': terms(Bodies.MoonPosition.table_47a, 'Csin', 1e-6*3600),
+            'latitude': terms(Bodies.MoonPosition.table_47b, 'Csin', 1e-6*3600),
+            'distance': [(0, 0, 0, 0, mean_distance)] + terms(Bodies.MoonPosition.table_47a, 'Ccos', 1e-3)}
+
+
+def read_elp_main(a_path):
+    """The terms of an ELP 2000-82B main problem file, ELP1, ELP2 or ELP3
+
+    After a title line each record is (4i3, 2x, f13.5, 6f12.2): the
+    multipliers of D, l', l and F and the amplitude, in arcseconds for
+    ELP1 and ELP2 and km for ELP3. The derivatives are not used.
+
+    Returns: list of (D, M, M', F, amplitude)
+
+    Raises: Error on a malformed record
+    """
+
+    terms = list()
+
+    with open(a_path) as a_file:
+
+        for i, a_line in enumerate(a_file):
+
+            if i == 0 or not a_line.strip():
+                continue
+
+            try:
+                terms.append(tuple(int(a_line[j:j + 3]) for j in (0, 3, 6, 9)) + (float(a_line[14:27]),))
+            except ValueError:
+                raise Error('{} line {}: not an ELP main problem record: {}'.format(a_path, i + 1, a_line.strip()))
+
+    return terms
+
+
+# ----------------------
+# ----- the series -----
+# ----------------------
+
+
+def mean_arguments(T):
+    """L, D, M, M', F, E, A1, A2 and A3 of Meeus pp. 338-339
+
+    Args:
+        T (numpy.ndarray): Julian centuries from J2000
+
+    Returns: tuple of numpy.ndarray, the angles in radians
+    """
+
+    def angle(some_degrees):
+        return numpy.radians(numpy.mod(some_degrees, 360.0))
+
+    L = angle(218.3164477 + 481267.881234*T - 0.0015786*T*T + T*T*T/538841.0 - T*T*T*T/65194000.0)
+    D = angle(297.8501921 + 445267.1114034*T - 0.0018819*T*T + T*T*T/545868.0 - T*T*T*T/113065000.0)
+    Msun = angle(357.5291092 + 35999.0502909*T - 0.0001536*T*T + T*T*T/24490000.0)
+    Mmoon = angle(134.9633964 + 477198.8675055*T + 0.0087414*T*T + T*T*T/69699.0 - T*T*T*T/14712000.0)
+    F = angle(93.2720950 + 483202.0175233*T - 0.0036539*T*T - T*T*T/3526000.0 + T*T*T*T/863310000.0)
+
+    E = 1.0 - 0.002516*T - 0.0000074*T*T
+
+    A1 = angle(119.75 + 131.849*T)
+    A2 = angle(53.09 + 479264.290*T)
+    A3 = angle(313.45 + 481266.484*T)
+
+    return L, D, Msun, Mmoon, F, E, A1, A2, A3
+
+
+def evaluate(a_series, arguments, E, a_function):
+    """Sum a series over instants
+
+    Args:
+        a_series (tuple): (multipliers, amplitudes) of Series
+        arguments (numpy.ndarray): D, M, M' and F rows, an instant per column
+        E (numpy.ndarray): the eccentricity factor of each instant
+        a_function: numpy.sin or numpy.cos
+
+    Returns: numpy.ndarray, a sum per instant
+    """
+
+    multipliers, amplitudes = a_series
+
+    total = numpy.zeros(arguments.shape[1])
+
+    if not len(amplitudes):
+        return total
+
+    # terms in M are multiplied by E, those in 2M by E squared, in kM by E**k
+    powers = numpy.abs(multipliers[:, 1])
+    step = max(1, chunk_elements//len(amplitudes))
+
+    for start in range(0, arguments.shape[1], step):
+
+        some_arguments = arguments[:, start:start + step]
+        some_E = E[start:start + step]
+
+        factors = some_E[None, :]**powers[:, None]
+
+        total[start:start + step] = numpy.dot(amplitudes, factors*a_function(numpy.dot(multipliers, some_arguments)))
+
+    return total
+
+
+def LunarLongLatRange_array(julian_dates, precision_arcsec=0.0, a_table=None):
+    """The ecliptical longitude, latitude and distance of the moon at many instants
+
+    Meeus pp. 337-343 with the terms of a table.
+
+    Args:
+        julian_dates (numpy.ndarray or sequence): Julian dates
+        precision_arcsec (float): drop terms smaller than this, see load
+        a_table (str): the table file, default_table if None
+
+    Returns: (longitude degrees [0, 360), latitude degrees, distance km)
+        numpy.ndarray of the shape of julian_dates
+    """
+
+    a_series = load(precision_arcsec, a_table)
+
+    julian_dates = numpy.asarray(julian_dates, dtype=float)
+    T = (julian_dates.ravel() - 2451545.0)/36525.0
+
+    L, D, Msun, Mmoon, F, E, A1, A2, A3 = mean_arguments(T)
+    arguments = numpy.vstack((D, Msun, Mmoon, F))
+
+    # additive terms, Meeus p. 338
+    addL = 3958.0*numpy.sin(A1) + 1962.0*numpy.sin(L - F) + 318.0*numpy.sin(A2)
+    addB = -2235.0*numpy.sin(L) + 382.0*numpy.sin(A3) + 175.0*numpy.sin(A1 - F) + 175.0*numpy.sin(A1 + F) \
+        + 127.0*numpy.sin(L - Mmoon) - 115.0*numpy.sin(L + Mmoon)
+
+    longitudes = numpy.mod(numpy.degrees(L) + evaluate(a_series.longitude, arguments, E, numpy.sin) + addL/1e6, 360.0)
+    latitudes = evaluate(a_series.latitude, arguments, E, numpy.sin) + addB/1e6
+    distances = evaluate(a_series.distance, arguments, E, numpy.cos)
+
+    return (longitudes.reshape(julian_dates.shape),
+            latitudes.reshape(julian_dates.shape),
+            distances.reshape(julian_dates.shape))
+
+
+def LunarLongLatRange(a_datetime, precision_arcsec=0.0, a_table=None):
+    """Calculates the ecliptical longitude, latitude and distance to the moon
+
+    As MoonPosition.LunarLongLatRange, see LunarLongLatRange_array.
+
+    Args:
+        a_datetime (coords.datetime): The time of the observation.
+        precision_arcsec (float): drop terms smaller than this
+        a_table (str): the table file, default_table if None
+
+    Returns: the ecliptical longitude (coords.angle), latitude (coords.angle) and distance (in km)
+    """
+
+    longitudes, latitudes, distances = LunarLongLatRange_array([a_datetime.toJulianDate()], precision_arcsec, a_table)
+
+    return coords.angle(float(longitudes[0])), coords.angle(float(latitudes[0])), float(distances[0])
+
+
+def EclipticCoords(a_datetime, precision_arcsec=0.0, a_table=None):
+    """Calculate the location of the moon in ecliptic coordinates
+
+    Args:
+        a_datetime (coords.datetime): The time of the observation.
+        precision_arcsec (float): drop terms smaller than this
+        a_table (str): the table file, default_table if None
+
+    Returns (coords.spherical): the distance, the complement of the
+    ecliptic latitude and the ecliptic longitude of the moon.
+    """
+
+    elong, elat, distance = LunarLongLatRange(a_datetime, precision_arcsec, a_table)
+
+    return coords.spherical(distance, elat.complement(), elong)
+
+
+def EquatorialCoords(a_datetime, precision_arcsec=0.0, a_table=None):
+    """Calculate the location of the moon in equatorial coordinates
+
+    Args:
+        a_datetime (coords.datetime): The time of the observation.
+        precision_arcsec (float): drop terms smaller than this
+        a_table (str): the table file, default_table if None
+
+    Returns (coords.spherical): the position of the moon in equatorial coordinates.
+    """
+
+    moon_ec = EclipticCoords(a_datetime, precision_arcsec, a_table)
+
+    return Transforms.EclipticEquatorial.toEquatorial(moon_ec, a_datetime)
+
+
+def HorizontalCoords(an_observer, a_datetime, precision_arcsec=0.0, a_table=None):
+    """Calculate the location of the moon relative to an observer
+
+    Args:
+
+    an_observer (coords.spherical): the latitude (in degrees) and
+    longitude of an observer as a spherical coordinate where theta
+    is the complement of latitude and longitude is measured
+    positive east. See utils.latlon2spherical.
+
+    a_datetime (coords.datetime): The time of the observation.
+
+    precision_arcsec (float): drop terms smaller than this
+
+    a_table (str): the table file, default_table if None
+
+    Returns (coords.spherical): the position of the moon in horizon coordinates.
+    """
+
+    moon_eq = EquatorialCoords(a_datetime, precision_arcsec, a_table)
+
+    return Transforms.EquatorialHorizon.toHorizon(moon_eq, an_observer, a_datetime)
+
+
+# ================
+# ===== main =====
+# ================
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='ELP-2000/82 moon and its tables')
+
+    parser.add_argument('datetime', nargs='?', default='1992-04-12T00:00:00', help='ISO 8601 date and time')
+    parser.add_argument('--precision', type=float, default=0.0, help='smallest term in arcseconds')
+    parser.add_argument('--table', default=None, help='table file, default {}'.format(default_table))
+    parser.add_argument('--meeus', action='store_true', help='write tables 47.A and 47.B to -o')
+    parser.add_argument('--elp', nargs=3, metavar=('ELP1', 'ELP2', 'ELP3'), help='write the main problem files to -o')
+    parser.add_argument('-o', '--output', default=None, help='table file to write')
+
+    args = parser.parse_args()
+
+    if args.meeus or args.elp:
+
+        if args.output is None:
+            parser.error('-o is required to write a table')
+
+        if args.meeus:
+            some_series = meeus_series()
+        else:
+            some_series = dict(zip(series_names, [read_elp_main(a_path) for a_path in args.elp]))
+
+        write_table(args.output, some_series)
+
+        print('wrote {}: {}'.format(args.output, ', '.join('{} {} terms'.format(a_name, len(some_series[a_name]))
+                                                           for a_name in series_names)))
+
+    else:
+
+        a_datetime = coords.datetime(args.datetime)
+
+        elong, elat, distance = LunarLongLatRange(a_datetime, args.precision, args.table)
+
+        a_series = load(args.precision, args.table)
+
+        print('Test date: {}'.format(a_datetime))
+        print('terms {}'.format(', '.join('{} {} of {}'.format(a_name, *a_series.counts[a_name]) for a_name in series_names)))
+        print('ecLon {}'.format(elong.degrees))
+        print('ecLat {}'.format(elat.degrees))
+        print('distance {}'.format(distance))
@@ -0,0 +1,566 @@
+#!/usr/bin/env python
+
+"""The planets from VSOP87 series in a binary table, truncated to a precision
+
+VSOP87D gives the heliocentric ecliptic longitude, latitude and
+radius vector of the planets, referred to the ecliptic and equinox of
+date, as series of A*T**alpha*cos(B + C*T) in Julian millennia T from
+J2000. The terms are read from a binary table when first needed, those
+smaller than precision_arcsec are dropped as they are read, and the
+series are evaluated with numpy over arrays of Julian dates.
+
+Uses algorithms from:
+    Astronomical Algorithms 2ed, Jean Meeus 1998, chapters 32 and 33
+    VSOP87, Bretagnon and Francou 1988
+
+The geocentric positions need the earth at the same instants. It is
+kept for the last instants asked for, so the planets of a chart at one
+time share it. They are corrected for light time, not for aberration
+or nutation, and feed Transforms.EclipticEquatorial and
+Transforms.EquatorialHorizon like the sun and the moon.
+
+The table shipped, vsop87d_meeus.bin, has Mercury to Neptune as
+truncated in Meeus Appendix III, from vsop87d_meeus.txt: the largest
+VSOP87D terms of each series, in the numbers Meeus keeps, with the
+amplitudes rounded to 1e-8 as he prints them. Their positions are
+within 2 arcseconds of the full series from 1900 to 2100. A full
+table is made from the VSOP87D files:
+
+    ./pylaunch.sh Planets.py --vsop87 VSOP87D.mer VSOP87D.ven VSOP87D.ear VSOP87D.mar \\
+        VSOP87D.jup VSOP87D.sat VSOP87D.ura VSOP87D.nep -o vsop87d.bin
+
+and used with a_table='vsop87d.bin'.
+
+Table format, little endian:
+
+    magic 'VSOP', version (uint16), term count (uint32), then the terms:
+    body, variable (0 longitude, 1 latitude, 2 radius) and power of T
+    (uint8), A, B and C (float64, radians or AU, radians, radians per
+    millennium), largest A first for each body, variable and power
+
+to run:
+
+    ./pylaunch.sh Planets.py -- venus 1992-12-20T00:00:00 --precision 1
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import argparse
+import math
+import os
+import re
+import struct
+
+import coords
+
+import Transforms.EclipticEquatorial
+import Transforms.EquatorialHorizon
+import Transforms.lazy
+
+numpy = Transforms.lazy.Module('numpy') # imported on first use, only the tables and series need it
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+default_table = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vsop87d_meeus.bin')
+
+bodies = ('mercury', 'venus', 'earth', 'mars', 'jupiter', 'saturn', 'uranus', 'neptune') # VSOP87 body 1 to 8
+
+semi_major_axes = {'mercury': 0.387, 'venus': 0.723, 'earth': 1.0, 'mars': 1.524,
+                   'jupiter': 5.203, 'saturn': 9.537, 'uranus': 19.19, 'neptune': 30.07} # AU
+
+variables = ('longitude', 'latitude', 'radius')
+
+magic = b'VSOP'
+version = 1
+header = struct.Struct('<4sHI')
+
+term_fields = (('body', '<u1'), ('variable', '<u1'), ('power', '<u1'),
+               ('A', '<f8'), ('B', '<f8'), ('C', '<f8')) # 27 bytes
+
+vsop87_header_re = re.compile(r'\s*VSOP87\s+VERSION\s+(\w)(\d)\s+\w+\s+VARIABLE\s+(\d)\s+\(LBR\)\s+\*T\*\*(\d)')
+
+light_time_days = 0.0057755183 # per AU, Meeus eqn. 33.3
+
+arcsec_per_radian = 180*3600/math.pi
+
+chunk_elements = 1 << 20 # terms times instants evaluated at a time
+
+tables = dict() # (path, precision_arcsec) to Series, see load
+
+earth_cache = {'last': (None, None)} # (key, position) of the earth at the last instants, see earth_position
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+class Series(object):
+    """The terms of a table kept at a precision
+
+    Attributes:
+        terms (dict): (body, variable) to a list by power of T of (A, B, C)
+            numpy arrays
+        precision_arcsec (float): the smallest term kept
+        counts (dict): body to (terms kept, terms in the table)
+    """
+
+    def __init__(self, terms, precision_arcsec, counts):
+        self.terms = terms
+        self.precision_arcsec = precision_arcsec
+        self.counts = counts
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+# ----------------------
+# ----- the tables -----
+# ----------------------
+
+
+def term_dtype():
+    """numpy record of one term"""
+
+    return numpy.dtype(list(term_fields))
+
+
+def amplitude_arcsec(terms):
+    """Amplitudes as arcseconds so the series can be truncated alike
+
+    A radius term in AU is the angle it subtends at the semi major axis
+    of its body.
+
+    Args:
+        terms (numpy.ndarray): of term_dtype
+
+    Returns: numpy.ndarray
+    """
+
+    axes = numpy.array([semi_major_axes[a_body] for a_body in bodies])[terms['body']]
+
+    return numpy.where(terms['variable'] == 2, numpy.abs(terms['A'])/axes, numpy.abs(terms['A']))*arcsec_per_radian
+
+
+def read_vsop87(a_path):
+    """The terms of a VSOP87D file, one planet
+
+    Each series starts with a header line like
+
+        VSOP87 VERSION D3    EARTH     VARIABLE 1 (LBR)       *T**0   559 TERMS ...
+
+    and each term line ends in its A, B and C.
+
+    Returns: list of (body, variable, power, A, B, C), body and variable
+        from 0, see bodies and variables
+
+    Raises: Error if it is not VSOP87D
+    """
+
+    terms = list()
+    series = None
+
+    with open(a_path) as a_file:
+
+        for i, a_line in enumerate(a_file):
+
+            if not a_line.strip():
+                continue
+
+            a_match = vsop87_header_re.match(a_line)
+
+            if a_match is not None:
+
+                if a_match.group(1) != 'D':
+                    raise Error('{} line {}: VSOP87 version {}, not D (heliocentric, of date)'.format(
+                        a_path, i + 1, a_match.group(1)))
+
+                series = (int(a_match.group(2)) - 1, int(a_match.group(3)) - 1, int(a_match.group(4)))
+                continue
+
+            if series is None:
+                raise Error('{} line {}: a term before any VSOP87 header'.format(a_path, i + 1))
+
+            try:
+                terms.append(series + tuple(float(x) for x in a_line.split()[-3:]))
+            except ValueError:
+                raise Error('{} line {}: not a VSOP87 term: {}'.format(a_path, i + 1, a_line.strip()))
+
+    return terms
+
+
+def write_table(a_path, terms):
+    """Write a table
+
+    Args:
+        a_path (str): the file
+        terms (list): of (body, variable, power, A, B, C), see read_vsop87
+    """
+
+    records = numpy.array([tuple(a_term) for a_term in terms], dtype=term_dtype())
+
+    # by series, largest first so a truncation reads a prefix
+    records = records[numpy.lexsort((-numpy.abs(records['A']), records['power'], records['variable'], records['body']))]
+
+    with open(a_path, 'wb') as a_file:
+        a_file.write(header.pack(magic, version, len(records)))
+        a_file.write(records.tobytes())
+
+    return
+
+
+def read_table(a_path, precision_arcsec=0.0):
+    """Read a table keeping the terms of at least precision_arcsec
+
+    Args:
+        a_path (str): the file
+        precision_arcsec (float): the smallest amplitude kept, see amplitude_arcsec
+
+    Returns: Series
+
+    Raises: Error if the file is not a table
+    """
+
+    with open(a_path, 'rb') as a_file:
+        data = a_file.read()
+
+    if len(data) < header.size:
+        raise Error('not a VSOP87 table: {}'.format(a_path))
+
+    a_magic, a_version, a_count = header.unpack_from(data)
+
+    if a_magic != magic or a_version != version:
+        raise Error('not a VSOP87 table version {}: {}'.format(version, a_path))
+
+    dtype = term_dtype()
+
+    if len(data) != header.size + a_count*dtype.itemsize:
+        raise Error('VSOP87 table truncated: {}'.format(a_path))
+
+    records = numpy.frombuffer(data, dtype=dtype, count=a_count, offset=header.size)
+
+    if a_count and (records['body'].max() >= len(bodies) or records['variable'].max() >= len(variables)):
+        raise Error('VSOP87 table has an unknown body or variable: {}'.format(a_path))
+
+    kept = records[amplitude_arcsec(records) >= precision_arcsec]
+
+    terms = dict()
+    counts = dict()
+
+    for i, a_body in enumerate(bodies):
+
+        if not numpy.any(records['body'] == i):
+            continue
+
+        counts[a_body] = (int(numpy.sum(kept['body'] == i)), int(numpy.sum(records['body'] == i)))
+
+        for j, a_variable in enumerate(variables):
+
+            some_terms = kept[(kept['body'] == i) & (kept['variable'] == j)]
+            powers = list()
+
+            for a_power in range(int(some_terms['power'].max()) + 1 if len(some_terms) else 0):
+                by_power = some_terms[some_terms['power'] == a_power]
+                powers.append(tuple(numpy.ascontiguousarray(by_power[a_field]) for a_field in ('A', 'B', 'C')))
+
+            terms[(a_body, a_variable)] = powers
+
+    return Series(terms, precision_arcsec, counts)
+
+
+def load(precision_arcsec=0.0, a_table=None):
+    """The series of a table at a precision, read on first use
+
+    Args:
+        precision_arcsec (float): the smallest term kept
+        a_table (str): the table file, default_table if None
+
+    Returns: Series
+    """
+
+    key = (a_table or default_table, float(precision_arcsec))
+
+    a_series = tables.get(key)
+
+    if a_series is None:
+        a_series = tables[key] = read_table(key[0], key[1])
+
+    return a_series
+
+
+# ----------------------
+# ----- the series -----
+# ----------------------
+
+
+def evaluate(powers, T):
+    """Sum a VSOP87 variable over instants
+
+    Args:
+        powers (list): by power of T of (A, B, C), see Series
+        T (numpy.ndarray): Julian millennia from J2000
+
+    Returns: numpy.ndarray, a sum per instant
+    """
+
+    total = numpy.zeros(len(T))
+
+    for a_power, (A, B, C) in reversed(list(enumerate(powers))):
+
+        a_sum = numpy.zeros(len(T))
+
+        if len(A):
+
+            step = max(1, chunk_elements//len(A))
+
+            for start in range(0, len(T), step):
+                some_T = T[start:start + step]
+                a_sum[start:start + step] = numpy.dot(A, numpy.cos(B[:, None] + numpy.multiply.outer(C, some_T)))
+
+        total = total*T + a_sum if a_power < len(powers) - 1 else a_sum # Horner's rule
+
+    return total
+
+
+def heliocentric(a_body, T, a_series):
+    """Heliocentric longitude, latitude (radians) and radius (AU) of a body at millennia T"""
+
+    if a_body not in a_series.counts:
+        raise Error('no VSOP87 series for {}, convert the VSOP87D files, see Bodies/Planets.py'.format(a_body))
+
+    return tuple(evaluate(a_series.terms[(a_body, a_variable)], T) for a_variable in variables)
+
+
+def HeliocentricLongLatRange_array(a_body, julian_dates, precision_arcsec=0.0, a_table=None):
+    """The heliocentric ecliptic longitude, latitude and radius of a body
+
+    Meeus chapter 32, ecliptic and equinox of date.
+
+    Args:
+        a_body (str): one of bodies
+        julian_dates (numpy.ndarray or sequence): Julian dates
+        precision_arcsec (float): drop terms smaller than this, see load
+        a_table (str): the table file, default_table if None
+
+    Returns: (longitude degrees [0, 360), latitude degrees, radius AU)
+        numpy.ndarray of the shape of julian_dates
+
+    Raises: Error if the table has no series for the body
+    """
+
+    julian_dates = numpy.asarray(julian_dates, dtype=float)
+    T = (julian_dates.ravel() - 2451545.0)/365250.0
+
+    L, B, R = heliocentric(a_body, T, load(precision_arcsec, a_table))
+
+    return (numpy.mod(numpy.degrees(L), 360.0).reshape(julian_dates.shape),
+            numpy.degrees(B).reshape(julian_dates.shape),
+            R.reshape(julian_dates.shape))
+
+
+def earth_position(T, precision_arcsec=0.0, a_table=None):
+    """The earth at millennia T, kept for the next planet at the same instants
+
+    Returns: (longitude radians, latitude radians, radius AU) numpy.ndarray
+    """
+
+    key = (a_table or default_table, float(precision_arcsec), T.tobytes())
+
+    a_key, a_position = earth_cache['last'] # one read, the threads of a worker share it
+
+    if a_key != key:
+        a_position = heliocentric('earth', T, load(precision_arcsec, a_table))
+        earth_cache['last'] = (key, a_position)
+
+    return a_position
+
+
+def rectangular(L, B, R):
+    """x, y, z of spherical ecliptic coordinates in radians"""
+
+    return R*numpy.cos(B)*numpy.cos(L), R*numpy.cos(B)*numpy.sin(L), R*numpy.sin(B)
+
+
+def GeocentricLongLatRange_array(a_body, julian_dates, precision_arcsec=0.0, a_table=None):
+    """The geocentric ecliptic longitude, latitude and distance of a planet
+
+    Meeus eqns. 33.1 and 33.2, corrected once for light time.
+
+    Args:
+        a_body (str): one of bodies but the earth
+        julian_dates (numpy.ndarray or sequence): Julian dates
+        precision_arcsec (float): drop terms smaller than this, see load
+        a_table (str): the table file, default_table if None
+
+    Returns: (longitude degrees [0, 360), latitude degrees, distance AU)
+        numpy.ndarray of the shape of julian_dates
+
+    Raises: Error if a_body is the earth or the table has no series for it
+    """
+
+    if a_body == 'earth':
+        raise Error('the earth has no geocentric position')
+
+    a_series = load(precision_arcsec, a_table)
+
+    julian_dates = numpy.asarray(julian_dates, dtype=float)
+    T = (julian_dates.ravel() - 2451545.0)/365250.0
+
+    x0, y0, z0 = rectangular(*earth_position(T, precision_arcsec, a_table))
+
+    x, y, z = rectangular(*heliocentric(a_body, T, a_series))
+    distances = numpy.sqrt((x - x0)**2 + (y - y0)**2 + (z - z0)**2)
+
+    # where the planet was when its light left
+    x, y, z = rectangular(*heliocentric(a_body, T - light_time_days*distances/365250.0, a_series))
+    x, y, z = x - x0, y - y0, z - z0
+
+    longitudes = numpy.mod(numpy.degrees(numpy.arctan2(y, x)), 360.0)
+    latitudes = numpy.degrees(numpy.arctan2(z, numpy.hypot(x, y)))
+    distances = numpy.sqrt(x*x + y*y + z*z)
+
+    return (longitudes.reshape(julian_dates.shape),
+            latitudes.reshape(julian_dates.shape),
+            distances.reshape(julian_dates.shape))
+
+
+def LongLatRange(a_body, a_datetime, precision_arcsec=0.0, a_table=None):
+    """Calculates the geocentric ecliptical longitude, latitude and distance of a planet
+
+    See GeocentricLongLatRange_array.
+
+    Args:
+        a_body (str): one of bodies but the earth
+        a_datetime (coords.datetime): The time of the observation.
+        precision_arcsec (float): drop terms smaller than this
+        a_table (str): the table file, default_table if None
+
+    Returns: the ecliptical longitude (coords.angle), latitude (coords.angle) and distance (in AU)
+    """
+
+    longitudes, latitudes, distances = GeocentricLongLatRange_array(a_body, [a_datetime.toJulianDate()],
+                                                                    precision_arcsec, a_table)
+
+    return coords.angle(float(longitudes[0])), coords.angle(float(latitudes[0])), float(distances[0])
+
+
+def EclipticCoords(a_body, a_datetime, precision_arcsec=0.0, a_table=None):
+    """Calculate the location of a planet in ecliptic coordinates
+
+    Args:
+        a_body (str): one of bodies but the earth
+        a_datetime (coords.datetime): The time of the observation.
+        precision_arcsec (float): drop terms smaller than this
+        a_table (str): the table file, default_table if None
+
+    Returns (coords.spherical): the distance, the complement of the
+    ecliptic latitude and the ecliptic longitude of the planet.
+    """
+
+    elong, elat, distance = LongLatRange(a_body, a_datetime, precision_arcsec, a_table)
+
+    return coords.spherical(distance, elat.complement(), elong)
+
+
+def EquatorialCoords(a_body, a_datetime, precision_arcsec=0.0, a_table=None):
+    """Calculate the location of a planet in equatorial coordinates
+
+    Args:
+        a_body (str): one of bodies but the earth
+        a_datetime (coords.datetime): The time of the observation.
+        precision_arcsec (float): drop terms smaller than this
+        a_table (str): the table file, default_table if None
+
+    Returns (coords.spherical): the position of the planet in equatorial coordinates.
+    """
+
+    an_ec = EclipticCoords(a_body, a_datetime, precision_arcsec, a_table)
+
+    return Transforms.EclipticEquatorial.toEquatorial(an_ec, a_datetime)
+
+
+def HorizontalCoords(a_body, an_observer, a_datetime, precision_arcsec=0.0, a_table=None):
+    """Calculate the location of a planet relative to an observer
+
+    Args:
+
+    a_body (str): one of bodies but the earth
+
+    an_observer (coords.spherical): the latitude (in degrees) and
+    longitude of an observer as a spherical coordinate where theta
+    is the complement of latitude and longitude is measured
+    positive east. See utils.latlon2spherical.
+
+    a_datetime (coords.datetime): The time of the observation.
+
+    precision_arcsec (float): drop terms smaller than this
+
+    a_table (str): the table file, default_table if None
+
+    Returns (coords.spherical): the position of the planet in horizon coordinates.
+    """
+
+    an_eq = EquatorialCoords(a_body, a_datetime, precision_arcsec, a_table)
+
+    return Transforms.EquatorialHorizon.toHorizon(an_eq, an_observer, a_datetime)
+
+
+# ================
+# ===== main =====
+# ================
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='VSOP87 planets and their tables')
+
+    parser.add_argument('body', nargs='?', default='venus', choices=bodies, help='the planet')
+    parser.add_argument('datetime', nargs='?', default='1992-12-20T00:00:00', help='ISO 8601 date and time')
+    parser.add_argument('--precision', type=float, default=0.0, help='smallest term in arcseconds')
+    parser.add_argument('--table', default=None, help='table file, default {}'.format(default_table))
+    parser.add_argument('--vsop87', nargs='+', metavar='VSOP87D', help='write VSOP87D files to -o')
+    parser.add_argument('-o', '--output', default=None, help='table file to write')
+
+    args = parser.parse_args()
+
+    if args.vsop87:
+
+        if args.output is None:
+            parser.error('-o is required to write a table')
+
+        terms = list()
+
+        for a_path in args.vsop87:
+            terms.extend(read_vsop87(a_path))
+
+        write_table(args.output, terms)
+
+        print('wrote {}: {} terms'.format(args.output, len(terms)))
+
+    else:
+
+        a_datetime = coords.datetime(args.datetime)
+
+        a_series = load(args.precision, args.table)
+
+        print('Test date: {}'.format(a_datetime))
+        print('terms {}'.format(', '.join('{} {} of {}'.format(a_body, *a_series.counts[a_body])
+                                          for a_body in bodies if a_body in a_series.counts)))
+
+        if args.body == 'earth':
+            L, B, R = HeliocentricLongLatRange_array('earth', [a_datetime.toJulianDate()], args.precision, args.table)
+            print('heliocentric L {} B {} R {}'.format(L[0], B[0], R[0]))
+        else:
+            elong, elat, distance = LongLatRange(args.body, a_datetime, args.precision, args.table)
+            print('ecLon {}'.format(elong.degrees))
+            print('ecLat {}'.format(elat.degrees))
+            print('distance {}'.format(distance))
@@ -0,0 +1,469 @@
+#!/usr/bin/env python
+
+"""The bright stars above an observer's horizon
+
+A catalog is loaded once into contiguous numpy arrays of RA, Dec and
+magnitude with the unit vector of each star, and its stars are indexed
+by sky pixel, see SkyIndex. A query finds the local sidereal time once,
+USNO_C163.LSTA with the full nutation, and transforms only the stars of the pixels that can
+reach above the altitude asked for.
+
+The catalog shipped, bright_stars.csv, has the stars of magnitude 2.1
+and brighter, J2000, rounded to a tenth of a second of RA and a second
+of Dec: good for a chart of the sky now, not for pointing. The Yale
+Bright Star Catalogue, 5th ed. (BSC5, the 'catalog' file), loads the
+same way:
+
+    a_catalog = Stars.load('/path/to/catalog', a_format='bsc5')
+
+and so does a catalog converted to the binary format, see
+CatalogFile.py, without parsing it and with its columns mapped from
+the file:
+
+    a_catalog = Stars.load('/path/to/bsc5.cat')
+
+AboveHorizon precesses the J2000 positions to the date of the query,
+one matrix for the catalog, see Transforms.Precession. Proper motion is
+not applied.
+
+to run:
+
+    ./pylaunch.sh Stars.py -- 37:24 -122:04:57 2015-03-21T21:00:00-07 --altitude 10
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import argparse
+import csv
+import math
+import os
+
+import coords
+import numpy
+
+import Bodies.CatalogFile
+import Transforms.Precession
+import Transforms.SiderealTime
+import Transforms.utils
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+default_catalog = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bright_stars.csv')
+
+default_pixel_degrees = 10.0 # height of a band of sky pixels
+
+ra_limits = (0, 24) # hours
+
+formats = {'.csv': 'csv', '.cat': 'aaicat'} # by file extension, bsc5 otherwise
+
+catalogs = dict() # (path, format, pixel degrees) to Catalog, see load
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+class SkyIndex(object):
+    """Points on the sky by pixel
+
+    The sky is cut into bands of declination a_pixel_degrees high and
+    each band into pixels about as wide. Each pixel that has points
+    keeps their mean direction and the largest angle from it to one of
+    them, so a cone finds its candidate pixels with one dot product per
+    pixel.
+
+    Attributes:
+        order (numpy.ndarray): point indices sorted by pixel
+        starts (numpy.ndarray): where each pixel's points start in order, and the end
+        centers (numpy.ndarray): unit vector of each pixel's mean direction
+        radii (numpy.ndarray): degrees from each center to its farthest point
+    """
+
+    def __init__(self, units, a_pixel_degrees=default_pixel_degrees):
+        """Index unit vectors
+
+        Args:
+            units (numpy.ndarray): N by 3 unit vectors
+            a_pixel_degrees (float): band height
+        """
+
+        n_bands = int(math.ceil(180.0/a_pixel_degrees))
+
+        decs = numpy.degrees(numpy.arcsin(numpy.clip(units[:, 2], -1, 1)))
+        ras = numpy.mod(numpy.degrees(numpy.arctan2(units[:, 1], units[:, 0])), 360.0)
+
+        # as many pixels as keep them no wider than high at the band's widest
+        edges = numpy.linspace(-90, 90, n_bands + 1)
+        widest = numpy.where((edges[:-1] < 0) & (edges[1:] > 0), 0, numpy.minimum(numpy.abs(edges[:-1]), numpy.abs(edges[1:])))
+        cells = numpy.maximum(1, numpy.ceil(360.0*numpy.cos(numpy.radians(widest))/a_pixel_degrees)).astype(int)
+        offsets = numpy.concatenate(([0], numpy.cumsum(cells)))
+
+        bands = numpy.minimum(((decs + 90)//a_pixel_degrees).astype(int), n_bands - 1)
+        pixels = offsets[bands] + numpy.minimum((ras*cells[bands]/360.0).astype(int), cells[bands] - 1)
+
+        self.order = numpy.argsort(pixels, kind='stable')
+
+        occupied, self.starts = numpy.unique(pixels[self.order], return_index=True)
+        self.starts = numpy.append(self.starts, len(pixels)).astype(int)
+
+        sums = numpy.add.reduceat(units[self.order], self.starts[:-1], axis=0) if len(pixels) else numpy.zeros((0, 3))
+        self.centers = sums/numpy.linalg.norm(sums, axis=1)[:, None]
+
+        owners = numpy.repeat(numpy.arange(len(occupied)), numpy.diff(self.starts))
+        cosines = numpy.clip(numpy.sum(units[self.order]*self.centers[owners], axis=1), -1, 1)
+        self.radii = numpy.degrees(numpy.arccos(numpy.minimum.reduceat(cosines, self.starts[:-1]))) if len(pixels) else numpy.zeros(0)
+
+
+    @classmethod
+    def stored(cls, order, starts, centers, radii):
+        """An index built before, e.g. the views of a CatalogFile
+
+        Args:
+            order, starts, centers, radii (numpy.ndarray): the attributes
+
+        Returns: SkyIndex
+        """
+
+        an_index = cls.__new__(cls)
+
+        an_index.order = order
+        an_index.starts = starts
+        an_index.centers = centers
+        an_index.radii = radii
+
+        return an_index
+
+
+    def query(self, a_center, a_radius):
+        """Indices of the points that may be in a cone, a superset
+
+        Args:
+            a_center (numpy.ndarray): unit vector of the cone's axis
+            a_radius (float): degrees from the axis
+
+        Returns: numpy.ndarray of point indices
+        """
+
+        distances = numpy.degrees(numpy.arccos(numpy.clip(numpy.dot(self.centers, a_center), -1, 1)))
+        candidates = numpy.flatnonzero(distances <= a_radius + self.radii)
+
+        if not len(candidates):
+            return numpy.zeros(0, dtype=int)
+
+        return numpy.concatenate([self.order[self.starts[i]:self.starts[i + 1]] for i in candidates])
+
+
+class Catalog(object):
+    """Stars in contiguous arrays with their unit vectors and a SkyIndex
+
+    Attributes:
+        ids, names (list or CatalogFile.Strings): of str
+        ras (numpy.ndarray): right ascension in hours
+        decs (numpy.ndarray): declination in degrees
+        magnitudes (numpy.ndarray): float32 visual magnitude
+        units (numpy.ndarray): N by 3 equatorial unit vectors
+        index (SkyIndex): of units
+
+    The units and index are built from the columns unless given, as
+    load gives those stored in a CatalogFile.
+    """
+
+    def __init__(self, ids, names, ras, decs, magnitudes, a_pixel_degrees=default_pixel_degrees, units=None, an_index=None):
+
+        self.ids = ids
+        self.names = names
+        self.ras = numpy.ascontiguousarray(ras, dtype=float)
+        self.decs = numpy.ascontiguousarray(decs, dtype=float)
+        self.magnitudes = numpy.ascontiguousarray(magnitudes, dtype=numpy.float32)
+        self.units = radec2units(self.ras, self.decs) if units is None else units
+        self.index = SkyIndex(self.units, a_pixel_degrees) if an_index is None else an_index
+
+
+    def __len__(self):
+        return len(self.ids)
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+# -----------------------
+# ----- the catalog -----
+# -----------------------
+
+
+def radec2units(ras, decs):
+    """Equatorial unit vectors
+
+    Args:
+        ras (numpy.ndarray): right ascension in hours
+        decs (numpy.ndarray): declination in degrees
+
+    Returns: numpy.ndarray N by 3, x to the vernal equinox, z to the north pole
+    """
+
+    ras = numpy.radians(numpy.asarray(ras, dtype=float)*15)
+    decs = numpy.radians(numpy.asarray(decs, dtype=float))
+
+    return numpy.column_stack((numpy.cos(decs)*numpy.cos(ras), numpy.cos(decs)*numpy.sin(ras), numpy.sin(decs)))
+
+
+def read_csv(a_path):
+    """A catalog CSV file
+
+    A header of id, name, ra, dec and magnitude, then a row per star, ra
+    in hours and dec in degrees, decimal or hh:mm:ss, see
+    Transforms.utils.dms2degrees.
+
+    Returns: ids, names, ras, decs and magnitudes
+
+    Raises: Error on a bad row
+    """
+
+    with open(a_path) as a_file:
+        rows = list(csv.DictReader(a_file))
+
+    try:
+
+        ras = Transforms.utils.dms2degrees_array([r['ra'] for r in rows], ra_limits, a_name='ra')
+        decs = Transforms.utils.dms2degrees_array([r['dec'] for r in rows], Transforms.utils.latitude_limits, a_name='dec')
+        magnitudes = numpy.array([float(r['magnitude']) for r in rows])
+
+    except (KeyError, ValueError, Transforms.utils.Error) as err:
+        raise Error('{}: {}'.format(a_path, err))
+
+    return [r['id'] for r in rows], [r['name'] for r in rows], ras, decs, magnitudes
+
+
+def read_bsc5(a_path):
+    """The Yale Bright Star Catalogue, 5th ed., 'catalog' file
+
+    Fixed width, bytes 1-4 the HR number, 5-14 the name, 76-83 the
+    J2000 RA (hh mm ss.s), 84-90 the J2000 Dec (+dd mm ss) and 103-107
+    the V magnitude. The entries without a position, novae and
+    clusters removed from the catalogue, are skipped.
+
+    Returns: ids, names, ras, decs and magnitudes
+
+    Raises: Error on a bad line
+    """
+
+    ids, names, ras, decs, magnitudes = list(), list(), list(), list(), list()
+
+    with open(a_path) as a_file:
+
+        for i, a_line in enumerate(a_file):
+
+            if not a_line[75:90].strip():
+                continue
+
+            try:
+
+                ra = int(a_line[75:77]) + int(a_line[77:79])/60.0 + float(a_line[79:83])/3600.0
+                dec = int(a_line[84:86]) + int(a_line[86:88])/60.0 + int(a_line[88:90])/3600.0
+                magnitude = float(a_line[102:107])
+
+            except ValueError:
+                raise Error('{} line {}: not a BSC5 record'.format(a_path, i + 1))
+
+            ids.append('HR {}'.format(a_line[0:4].strip()))
+            names.append(a_line[4:14].strip())
+            ras.append(ra)
+            decs.append(-dec if a_line[83] == '-' else dec)
+            magnitudes.append(magnitude)
+
+    return ids, names, ras, decs, magnitudes
+
+
+def load(a_path=None, a_format=None, a_pixel_degrees=default_pixel_degrees):
+    """A catalog, read on first use
+
+    Args:
+        a_path (str): the file, default_catalog if None
+        a_format (str): csv, aaicat or bsc5, see formats if None
+        a_pixel_degrees (float): of its SkyIndex
+
+    Returns: Catalog
+
+    Raises: Error if the file cannot be read
+    """
+
+    a_path = a_path or default_catalog
+    a_format = a_format or formats.get(os.path.splitext(a_path)[1], 'bsc5')
+
+    a_catalog = catalogs.get((a_path, a_format, a_pixel_degrees))
+
+    if a_catalog is None:
+
+        stored = dict()
+
+        if a_format == 'csv':
+            columns = read_csv(a_path)
+        elif a_format == 'bsc5':
+            columns = read_bsc5(a_path)
+        elif a_format == 'aaicat':
+            a_file = open_catalog(a_path)
+            columns = (a_file.ids, a_file.names, a_file.ras, a_file.decs, a_file.magnitudes)
+            # mapped, not built per worker, the index if it has the pixels asked for
+            stored['units'] = a_file.units
+            if a_file.pixel_degrees == a_pixel_degrees:
+                stored['an_index'] = SkyIndex.stored(*a_file.index)
+        else:
+            raise Error('unsupported catalog format {}'.format(a_format))
+
+        a_catalog = catalogs[(a_path, a_format, a_pixel_degrees)] = Catalog(*columns, a_pixel_degrees=a_pixel_degrees, **stored)
+
+    return a_catalog
+
+
+def open_catalog(a_path):
+    """CatalogFile.open_catalog with its errors as Error"""
+
+    try:
+        return Bodies.CatalogFile.open_catalog(a_path)
+    except Bodies.CatalogFile.Error as err:
+        raise Error(str(err))
+
+
+# -----------------------
+# ----- the queries -----
+# -----------------------
+
+
+def altaz_array(units, lst_hours, a_latitude):
+    """Altitudes and azimuths of unit vectors for an observer
+
+    Args:
+        units (numpy.ndarray): N by 3 equatorial unit vectors
+        lst_hours (float): the observer's local sidereal time
+        a_latitude (float): the observer's latitude in degrees
+
+    Returns: (altitudes, azimuths) numpy.ndarray in degrees, azimuth from
+        the north positive east as EquatorialHorizon.toHorizon
+    """
+
+    theta = math.radians(lst_hours*15)
+    phi = math.radians(a_latitude)
+
+    up = numpy.array([math.cos(phi)*math.cos(theta), math.cos(phi)*math.sin(theta), math.sin(phi)])
+    east = numpy.array([-math.sin(theta), math.cos(theta), 0.0])
+    north = numpy.array([-math.sin(phi)*math.cos(theta), -math.sin(phi)*math.sin(theta), math.cos(phi)])
+
+    altitudes = numpy.degrees(numpy.arcsin(numpy.clip(numpy.dot(units, up), -1, 1)))
+    azimuths = numpy.mod(numpy.degrees(numpy.arctan2(numpy.dot(units, east), numpy.dot(units, north))), 360.0)
+
+    return altitudes, azimuths
+
+
+def above_horizon_array(a_catalog, lst_hours, a_latitude, a_min_altitude=0.0, a_max_magnitude=None, a_julian_date=None):
+    """The stars of a catalog above an altitude
+
+    Args:
+        a_catalog (Catalog): the stars
+        lst_hours (float): the observer's local sidereal time
+        a_latitude (float): the observer's latitude in degrees
+        a_min_altitude (float): degrees
+        a_max_magnitude (float): the faintest star, None for all
+        a_julian_date (float): the date to precess the J2000 catalog
+            to, to the day, see Precession.of_date, None to use it as it is
+
+    Returns: dict of id, name, ra, dec, magnitude, altitude and azimuth
+        lists, brightest first, ra and dec as in the catalog
+    """
+
+    zenith = radec2units([lst_hours], [a_latitude])[0]
+
+    if a_julian_date is not None:
+        a_julian_date = Transforms.Precession.of_date(a_julian_date) # a matrix a day
+        # the index is of the catalog, so the zenith goes back to J2000
+        zenith = numpy.dot(Transforms.Precession.matrix(Transforms.Precession.J2000, a_julian_date).T, zenith)
+
+    candidates = a_catalog.index.query(zenith, 90.0 - a_min_altitude)
+
+    if a_max_magnitude is not None:
+        candidates = candidates[a_catalog.magnitudes[candidates] <= a_max_magnitude]
+
+    units = a_catalog.units[candidates]
+
+    if a_julian_date is not None:
+        units = Transforms.Precession.precess_units(units, Transforms.Precession.J2000, a_julian_date)
+
+    altitudes, azimuths = altaz_array(units, lst_hours, a_latitude)
+
+    above = altitudes >= a_min_altitude
+    candidates, altitudes, azimuths = candidates[above], altitudes[above], azimuths[above]
+
+    order = numpy.argsort(a_catalog.magnitudes[candidates], kind='stable')
+    candidates, altitudes, azimuths = candidates[order], altitudes[order], azimuths[order]
+
+    return {'id': [a_catalog.ids[i] for i in candidates],
+            'name': [a_catalog.names[i] for i in candidates],
+            'ra': a_catalog.ras[candidates].tolist(),
+            'dec': a_catalog.decs[candidates].tolist(),
+            'magnitude': [round(m, 2) for m in a_catalog.magnitudes[candidates].tolist()],
+            'altitude': altitudes.tolist(),
+            'azimuth': azimuths.tolist()}
+
+
+def AboveHorizon(an_observer, a_datetime, a_min_altitude=0.0, a_max_magnitude=None, a_catalog=None):
+    """The stars above an observer's horizon
+
+    Args:
+
+    an_observer (coords.spherical): the latitude (in degrees) and
+    longitude of an observer as a spherical coordinate where theta
+    is the complement of latitude and longitude is measured
+    positive east. See utils.latlon2spherical.
+
+    a_datetime (coords.datetime): The time of the observation.
+
+    a_min_altitude (float): degrees, e.g. 10 to clear the trees
+
+    a_max_magnitude (float): the faintest star, None for all
+
+    a_catalog (Catalog): the stars, J2000, load() if None
+
+    Returns: see above_horizon_array, the stars precessed to a_datetime
+    """
+
+    lst = Transforms.SiderealTime.USNO_C163.LSTA(an_observer, a_datetime.inTimezoneOffset(0), a_nutation=True)
+
+    return above_horizon_array(a_catalog or load(), lst.degrees, an_observer.theta.complement().degrees,
+                               a_min_altitude, a_max_magnitude, a_datetime.toJulianDate())
+
+
+# ================
+# ===== main =====
+# ================
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='The bright stars above the horizon')
+
+    parser.add_argument('latitude', type=str, help='observer latitude')
+    parser.add_argument('longitude', type=str, help='observer longitude, positive east')
+    parser.add_argument('datetime', type=str, help='ISO 8601 date and time')
+    parser.add_argument('--altitude', type=float, default=0.0, help='lowest altitude in degrees')
+    parser.add_argument('--magnitude', type=float, default=None, help='faintest magnitude')
+    parser.add_argument('--catalog', default=None, help='catalog file, default {}'.format(default_catalog))
+
+    args = parser.parse_args()
+
+    an_observer = Transforms.utils.latlon2spherical(a_latitude=Transforms.utils.parse_angle_arg(args.latitude),
+                                                    a_longitude=Transforms.utils.parse_angle_arg(args.longitude))
+
+    stars = AboveHorizon(an_observer, coords.datetime(args.datetime), args.altitude, args.magnitude,
+                         load(args.catalog) if args.catalog else None)
+
+    for a_row in zip(stars['name'], stars['magnitude'], stars['altitude'], stars['azimuth']):
+        print('{:<20} {:5.2f} alt {:7.3f} az {:7.3f}'.format(*a_row))
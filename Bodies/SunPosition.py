@@ -70,6 +70,7 @@ import coords
 
 import Transforms.EclipticEquatorial
 import Transforms.EquatorialHorizon
+import Transforms.Refraction
 import Transforms.utils
 
 
@@ -211,7 +212,7 @@ def EquationOfTime(a_datetime):
     return eot
 
 
-def SunRiseAndSet(an_observer, a_datetime):
+def SunRiseAndSet(an_observer, a_datetime, a_refraction=None):
     """Sun rise and set times
 
     Args:
@@ -224,6 +225,10 @@ def SunRiseAndSet(an_observer, a_datetime):
 
     a_datetime (coords.datetime): The time of the observation.
 
+    a_refraction (tuple): (temperature in Celsius, pressure in
+    millibars), e.g. Refraction.standard, to refract the upper limb at
+    the horizon. None for the usual -0.8333 degrees.
+
     Returns (coords.datetime, coords.datetime, coords.datetime) of
     rising, transit and setting in local time.
     """
@@ -232,11 +237,15 @@ def SunRiseAndSet(an_observer, a_datetime):
     sun_ec = coords.spherical(R, coords.angle(90), ecliptic_longitude)
     sun_eq = Transforms.EclipticEquatorial.toEquatorial(sun_ec, a_datetime)
 
+    if a_refraction is not None:
+        # the semidiameter, 16 arcminutes
+        return RiseAndSet(sun_eq, an_observer, a_datetime, an_altitude=coords.angle(-16/60.0), a_refraction=a_refraction)
+
     return RiseAndSet(sun_eq, an_observer, a_datetime, an_altitude=coords.angle(-0.8333))
 
 
 # TODO move to own module. shared with others like moon
-def RiseAndSet(an_object, an_observer, a_datetime, an_altitude=coords.angle(0)):
+def RiseAndSet(an_object, an_observer, a_datetime, an_altitude=coords.angle(0), a_refraction=None):
     """Rise and set times
 
     from Meeus, ch. 15
@@ -259,12 +268,19 @@ def RiseAndSet(an_object, an_observer, a_datetime, an_altitude=coords.angle(0)):
         ho = -0.8333 for the Sun.
         ho = +0.125  for the the moon, approximately.
 
+    a_refraction (tuple): (temperature in Celsius, pressure in
+    millibars), e.g. Refraction.standard, to add the refraction at the
+    horizon to an_altitude, which is then without it, e.g. 0 for
+    stars and -16/60.0 for the upper limb of the Sun.
 
     Returns (coords.datetime, coords.datetime, coords.datetime) of
     rising, transit and setting in local time.
 
     """
 
+    if a_refraction is not None:
+        an_altitude = coords.angle(an_altitude.degrees + Transforms.Refraction.toGeometric(0.0, *a_refraction))
+
     JD, JDo = Transforms.SiderealTime.USNO_C163.JulianDate0(a_datetime.inTimezoneOffset(0))
 
     midnight = a_datetime.fromJulianDate(JDo)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+"""Accuracy against speed for the sun and moon
+
+Uses the runner in Transforms/accuracy.py.
+
+to run:    ./pylaunch.sh accuracy.py
+samples:   ./pylaunch.sh accuracy.py --samples 2000
+some:      ./pylaunch.sh accuracy.py -k Moon
+
+The exit status is 1 if any budget is exceeded.
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import sys
+
+import coords
+
+import Bodies.APCBodies
+import Bodies.ELP2000
+import Bodies.MoonPosition
+import Bodies.Planets
+import Bodies.Stars
+import Bodies.SunPosition
+import Transforms.EquatorialHorizon
+import Transforms.SiderealTime
+import Transforms.accuracy
+import Transforms.utils
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def stars_altaz(x):
+    """Stars.altaz_array of one input as a coords.spherical"""
+
+    lst = Transforms.SiderealTime.USNO_C163.LSTA(x['observer'], x['datetime'].inTimezoneOffset(0))
+
+    units = Bodies.Stars.radec2units([x['equatorial'].phi.degrees/15], [x['equatorial'].theta.complement().degrees])
+    altitudes, azimuths = Bodies.Stars.altaz_array(units, lst.degrees, x['observer'].theta.complement().degrees)
+
+    return Transforms.utils.azalt2spherical(coords.angle(azimuths[0]), coords.angle(altitudes[0]))
+
+
+# =======================
+# ===== comparisons =====
+# =======================
+
+# see Transforms.accuracy.comparisons
+
+comparisons = {
+
+    # APC mini sun and moon are known to be off, see test_SunPosition.py
+    'APCBodies.SunPosition': {
+        'reference': lambda x: Bodies.SunPosition.HorizontalCoords(x['observer'], x['datetime']),
+        'candidate': lambda x: Bodies.APCBodies.SunPosition(x['observer'], x['datetime']),
+        'error': Transforms.accuracy.separation_arcsec,
+        'budget': None},
+
+    'APCBodies.MoonPosition': {
+        'reference': lambda x: Bodies.MoonPosition.HorizontalCoords(x['observer'], x['datetime']),
+        'candidate': lambda x: Bodies.APCBodies.MoonPosition(x['observer'], x['datetime']),
+        'error': Transforms.accuracy.separation_arcsec,
+        'budget': None},
+
+    # every term of tables 47.A and 47.B: floating point only
+    'ELP2000.HorizontalCoords': {
+        'reference': lambda x: Bodies.MoonPosition.HorizontalCoords(x['observer'], x['datetime']),
+        'candidate': lambda x: Bodies.ELP2000.HorizontalCoords(x['observer'], x['datetime']),
+        'error': Transforms.accuracy.separation_arcsec,
+        'budget': {'max': 0.01, 'rms': 0.005}},
+
+    # the quick look truncation, terms of 10 arcseconds and more
+    'ELP2000.HorizontalCoords 10 arcsec': {
+        'reference': lambda x: Bodies.MoonPosition.HorizontalCoords(x['observer'], x['datetime']),
+        'candidate': lambda x: Bodies.ELP2000.HorizontalCoords(x['observer'], x['datetime'], precision_arcsec=10),
+        'error': Transforms.accuracy.separation_arcsec,
+        'budget': {'max': 150.0, 'rms': 30.0}},
+
+    # the quick look truncation, larger near inferior conjunction
+    'Planets.HorizontalCoords venus 10 arcsec': {
+        'reference': lambda x: Bodies.Planets.HorizontalCoords('venus', x['observer'], x['datetime']),
+        'candidate': lambda x: Bodies.Planets.HorizontalCoords('venus', x['observer'], x['datetime'], precision_arcsec=10),
+        'error': Transforms.accuracy.separation_arcsec,
+        'budget': {'max': 150.0, 'rms': 30.0}},
+
+    # unit vectors for the catalogs, the same transform: floating point only
+    'Stars.altaz_array': {
+        'reference': lambda x: Transforms.EquatorialHorizon.toHorizon(x['equatorial'], x['observer'], x['datetime']),
+        'candidate': stars_altaz,
+        'error': Transforms.accuracy.separation_arcsec,
+        'budget': {'max': 0.01, 'rms': 0.005},
+        'timed': False},
+}
+
+
+# ====================
+# ===== fixtures =====
+# ====================
+
+# NOAA solar calculator, http://www.esrl.noaa.gov/gmd/grad/solcalc/,
+# equation of time in minutes, as in test_SunPosition.py. NOAA gives
+# 0.01 minutes and differs most, 19 s, in early January.
+
+noaa_equation_of_time = (('2015-01-02T12:00:00', -3.59),
+                         ('2015-02-11T12:00:00', -14.24),
+                         ('2015-03-20T12:00:00', -7.44),
+                         ('2015-05-14T12:00:00', 3.65),
+                         ('2015-07-26T12:00:00', -6.54),
+                         ('2015-11-03T12:00:00', 16.48))
+
+# see Transforms.accuracy.fixtures
+
+fixtures = {
+    'SunPosition.EquationOfTime NOAA': {
+        'function': lambda x: Bodies.SunPosition.EquationOfTime(x['datetime']),
+        'cases': [({'datetime': coords.datetime(a_datetime)}, coords.angle(minutes/60.0))
+                  for a_datetime, minutes in noaa_equation_of_time],
+        'error': Transforms.accuracy.hours_seconds,
+        'budget': {'max': 20.0, 'rms': 10.0}},
+
+    # Meeus example 33.a, geometric with light time
+    'Planets.EclipticCoords venus Meeus': {
+        'function': lambda x: Bodies.Planets.EclipticCoords('venus', x['datetime']),
+        'cases': [({'datetime': coords.datetime('1992-12-20T00:00:00')},
+                   Transforms.utils.latlon2spherical(coords.angle(-2.08474), coords.angle(313.08102)))],
+        'error': Transforms.accuracy.separation_arcsec,
+        'budget': {'max': 1.0, 'rms': 1.0}},
+}
+
+
+# ================
+# ===== main =====
+# ================
+
+if __name__ == '__main__':
+    sys.exit(Transforms.accuracy.main(comparisons, fixtures, a_description='Bodies accuracy against speed'))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+"""Micro-benchmarks for the Bodies with stored baselines
+
+Uses the runner and inputs in Transforms/benchmark.py.
+
+to run:      ./pylaunch.sh benchmark.py
+save:        ./pylaunch.sh benchmark.py -o baseline-Bodies.json
+compare:     ./pylaunch.sh benchmark.py --compare baseline-Bodies.json
+some cases:  ./pylaunch.sh benchmark.py -k Moon --sizes 1 100
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import sys
+
+import Bodies.APCBodies
+import Bodies.ConeSearch
+import Bodies.ELP2000
+import Bodies.MoonPosition
+import Bodies.Planets
+import Bodies.Stars
+import Bodies.StjarnHimlen
+import Bodies.SunPosition
+import Transforms.benchmark
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def sun_rise_and_set(an_input):
+    """SunRiseAndSet, counting the circumpolar and never rises cases"""
+
+    try:
+        return Bodies.SunPosition.SunRiseAndSet(an_input['observer'], an_input['datetime'])
+    except Bodies.SunPosition.Error:
+        return None
+
+
+def make_arrays(inputs):
+    """Transforms.benchmark.make_arrays with a catalog of the batch's equatorial points
+
+    The catalog has a star per item, so above_horizon_array is timed
+    over as many stars as the batch has items.
+    """
+
+    arrays = Transforms.benchmark.make_arrays(inputs)
+
+    arrays['catalog'] = Bodies.Stars.Catalog([str(i) for i in range(len(inputs))], [''] * len(inputs),
+                                             arrays['ras'], arrays['decs'], [1.0] * len(inputs))
+
+    arrays['lst_hours'] = (arrays['gasts'][0] + arrays['longitudes'][0]/15.0) % 24.0
+
+    return arrays
+
+
+# =================
+# ===== cases =====
+# =================
+
+# name to function of one input dictionary, see Transforms.benchmark.make_inputs,
+# or a Transforms.benchmark.Batch of the arrays of a batch, see make_arrays
+
+cases = {
+    'SunPosition.SolarLongitudeRange': lambda x: Bodies.SunPosition.SolarLongitudeRange(x['datetime']),
+    'SunPosition.EquatorialCoords': lambda x: Bodies.SunPosition.EquatorialCoords(x['datetime']),
+    'SunPosition.HorizontalCoords': lambda x: Bodies.SunPosition.HorizontalCoords(x['observer'], x['datetime']),
+    'SunPosition.EquationOfTime': lambda x: Bodies.SunPosition.EquationOfTime(x['datetime']),
+    'SunPosition.SunRiseAndSet': sun_rise_and_set,
+    'MoonPosition.LunarLongLatRange': lambda x: Bodies.MoonPosition.LunarLongLatRange(x['datetime']),
+    'MoonPosition.EquatorialCoords': lambda x: Bodies.MoonPosition.EquatorialCoords(x['datetime']),
+    'MoonPosition.HorizontalCoords': lambda x: Bodies.MoonPosition.HorizontalCoords(x['observer'], x['datetime']),
+    'ELP2000.LunarLongLatRange': lambda x: Bodies.ELP2000.LunarLongLatRange(x['datetime']),
+    'ELP2000.LunarLongLatRange 10 arcsec': lambda x: Bodies.ELP2000.LunarLongLatRange(x['datetime'], 10),
+    'ELP2000.HorizontalCoords': lambda x: Bodies.ELP2000.HorizontalCoords(x['observer'], x['datetime']),
+    'Planets.LongLatRange venus': lambda x: Bodies.Planets.LongLatRange('venus', x['datetime']),
+    'Planets.LongLatRange venus 10 arcsec': lambda x: Bodies.Planets.LongLatRange('venus', x['datetime'], 10),
+    'Planets.HorizontalCoords venus': lambda x: Bodies.Planets.HorizontalCoords('venus', x['observer'], x['datetime']),
+    'Stars.AboveHorizon': lambda x: Bodies.Stars.AboveHorizon(x['observer'], x['datetime']),
+    'Stars.AboveHorizon 30 degrees': lambda x: Bodies.Stars.AboveHorizon(x['observer'], x['datetime'], 30.0),
+    'ConeSearch.ConeSearch 5 degrees': lambda x: Bodies.ConeSearch.ConeSearch(x['equatorial'], 5.0),
+    'ConeSearch.ConeSearch moon 10 degrees': lambda x: Bodies.ConeSearch.ConeSearch('moon', 10.0, x['datetime']),
+    'APCBodies.MiniSun': lambda x: Bodies.APCBodies.MiniSun(x['datetime']),
+    'APCBodies.SunPosition': lambda x: Bodies.APCBodies.SunPosition(x['observer'], x['datetime']),
+    'APCBodies.MiniMoon': lambda x: Bodies.APCBodies.MiniMoon(x['datetime']),
+    'APCBodies.MoonPosition': lambda x: Bodies.APCBodies.MoonPosition(x['observer'], x['datetime']),
+    'StjarnHimlen.SolarRADec': lambda x: Bodies.StjarnHimlen.SolarRADec(x['datetime']),
+    'StjarnHimlen.GMST': lambda x: Bodies.StjarnHimlen.GMST(x['datetime']),
+    'ELP2000.LunarLongLatRange_array': Transforms.benchmark.Batch(lambda x: Bodies.ELP2000.LunarLongLatRange_array(x['julian_dates'])),
+    'ELP2000.LunarLongLatRange_array 10 arcsec': Transforms.benchmark.Batch(lambda x: Bodies.ELP2000.LunarLongLatRange_array(x['julian_dates'], 10)),
+    'Planets.GeocentricLongLatRange_array venus': Transforms.benchmark.Batch(lambda x: Bodies.Planets.GeocentricLongLatRange_array('venus', x['julian_dates'])),
+    'Planets.GeocentricLongLatRange_array venus 10 arcsec': Transforms.benchmark.Batch(
+        lambda x: Bodies.Planets.GeocentricLongLatRange_array('venus', x['julian_dates'], 10)),
+    'Stars.above_horizon_array': Transforms.benchmark.Batch(lambda x: Bodies.Stars.above_horizon_array(x['catalog'], x['lst_hours'], x['latitudes'][0])),
+}
+
+
+# ================
+# ===== main =====
+# ================
+
+if __name__ == '__main__':
+    sys.exit(Transforms.benchmark.main(cases, a_description='Bodies micro-benchmarks', a_make_arrays=make_arrays))
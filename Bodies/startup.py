@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+"""Import time of the Bodies with budgets
+
+Uses the runner in Transforms/startup.py. The budgets include the
+Transforms each body imports.
+
+to run:    ./pylaunch.sh startup.py
+some:      ./pylaunch.sh startup.py -k Moon --top 20
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import sys
+
+import Transforms.startup
+
+
+# ===================
+# ===== targets =====
+# ===================
+
+# see Transforms.startup.targets
+
+targets = {
+    'Bodies.SunPosition': {'statement': 'import Bodies.SunPosition', 'budget_ms': 200},
+    'Bodies.MoonPosition': {'statement': 'import Bodies.MoonPosition', 'budget_ms': 200},
+    'Bodies.ELP2000': {'statement': 'import Bodies.ELP2000', 'budget_ms': 200, 'deferred': ['numpy']},
+    'Bodies.Planets': {'statement': 'import Bodies.Planets', 'budget_ms': 200, 'deferred': ['numpy']},
+    'Bodies.Stars': {'statement': 'import Bodies.Stars', 'budget_ms': 200},
+    'Bodies.CatalogFile': {'statement': 'import Bodies.CatalogFile', 'budget_ms': 200},
+    'Bodies.ConeSearch': {'statement': 'import Bodies.ConeSearch', 'budget_ms': 200},
+    'Bodies.APCBodies': {'statement': 'import Bodies.APCBodies', 'budget_ms': 200},
+    'Bodies.StjarnHimlen': {'statement': 'import Bodies.StjarnHimlen', 'budget_ms': 100},
+}
+
+
+# ================
+# ===== main =====
+# ================
+
+if __name__ == '__main__':
+    sys.exit(Transforms.startup.main(targets, a_description='Bodies import time'))
@@ -21,3 +21,28 @@ echo '============'
 echo 'Moon Position'
 echo '============'
 python test_MoonPosition.py "$@"
+
+echo '============'
+echo 'ELP-2000/82'
+echo '============'
+python test_ELP2000.py "$@"
+
+echo '======='
+echo 'Planets'
+echo '======='
+python test_Planets.py "$@"
+
+echo '====='
+echo 'Stars'
+echo '====='
+python test_Stars.py "$@"
+
+echo '============'
+echo 'Catalog File'
+echo '============'
+python test_CatalogFile.py "$@"
+
+echo '==========='
+echo 'Cone Search'
+echo '==========='
+python test_ConeSearch.py "$@"
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the binary catalog format
+
+to run:  ./pylaunch.sh test_CatalogFile.py
+verbose: ./pylaunch.sh test_CatalogFile.py -v
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import CatalogFile
+import Stars
+
+
+class CatalogFileTests(unittest.TestCase):
+    """Test the binary catalog format"""
+
+    def setUp(self):
+        """Set up test parameters."""
+
+        self.tmpdir = tempfile.mkdtemp()
+
+        self.a_path = os.path.join(self.tmpdir, 'test.cat')
+
+        self.ids = ['HR 2491', 'HR 7001', 'M 31']
+        self.names = [u'Sirius', u'Vega', u'Andromeda – Galaxy']
+        self.ras = [6.752481, 18.615649, 0.712306]
+        self.decs = [-16.716116, 38.783690, 41.268750]
+        self.magnitudes = [-1.46, 0.03, 3.44]
+
+        return
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmpdir)
+
+        return
+
+
+    def test_round_trip(self):
+        """The columns read back as written"""
+
+        CatalogFile.write(self.a_path, self.ids, self.names, self.ras, self.decs, self.magnitudes)
+
+        a_file = CatalogFile.open_catalog(self.a_path)
+
+        self.assertEqual(3, len(a_file))
+        self.assertEqual(self.ras, a_file.ras.tolist())
+        self.assertEqual(self.decs, a_file.decs.tolist())
+        self.assertEqual(numpy.float32, a_file.magnitudes.dtype)
+        self.assertEqual(numpy.array(self.magnitudes, dtype=numpy.float32).tolist(), a_file.magnitudes.tolist())
+
+        self.assertEqual(self.ids, a_file.ids[:])
+        self.assertEqual(self.names, a_file.names[:])
+        self.assertEqual(u'Andromeda – Galaxy', a_file.names[-1])
+
+        with self.assertRaises(IndexError):
+            a_file.ids[3]
+
+        return
+
+
+    def test_zero_copy(self):
+        """The columns are read only views of the file"""
+
+        CatalogFile.write(self.a_path, self.ids, self.names, self.ras, self.decs, self.magnitudes)
+
+        a_file = CatalogFile.open_catalog(self.a_path)
+
+        self.assertFalse(a_file.ras.flags.writeable)
+        self.assertFalse(a_file.ras.flags.owndata)
+
+        a_catalog = Stars.Catalog(a_file.ids, a_file.names, a_file.ras, a_file.decs, a_file.magnitudes)
+
+        self.assertTrue(numpy.shares_memory(a_catalog.ras, a_file.ras))
+        self.assertTrue(numpy.shares_memory(a_catalog.magnitudes, a_file.magnitudes))
+
+        return
+
+
+    def test_stored_index(self):
+        """The unit vectors and index are written once and mapped by Stars.load"""
+
+        CatalogFile.write(self.a_path, self.ids, self.names, self.ras, self.decs, self.magnitudes)
+
+        a_file = CatalogFile.open_catalog(self.a_path)
+        an_index = Stars.SkyIndex(Stars.radec2units(self.ras, self.decs))
+
+        self.assertEqual(Stars.default_pixel_degrees, a_file.pixel_degrees)
+        self.assertTrue(numpy.allclose(Stars.radec2units(self.ras, self.decs), a_file.units))
+
+        for a_stored, a_built in zip(a_file.index, (an_index.order, an_index.starts, an_index.centers, an_index.radii)):
+            self.assertTrue(numpy.allclose(a_built, a_stored))
+
+        # mapped, so read only, rather than built
+        a_catalog = Stars.load(self.a_path)
+
+        self.assertFalse(a_catalog.units.flags.writeable)
+        self.assertFalse(a_catalog.index.order.flags.writeable)
+        self.assertFalse(a_catalog.index.radii.flags.writeable)
+
+        # another pixel size is built from the stored units
+        a_catalog = Stars.load(self.a_path, a_pixel_degrees=5.0)
+
+        self.assertFalse(a_catalog.units.flags.writeable)
+        self.assertTrue(a_catalog.index.order.flags.writeable)
+
+        return
+
+
+    def test_empty(self):
+        """A catalog with no objects"""
+
+        CatalogFile.write(self.a_path, [], [], [], [], [])
+
+        a_file = CatalogFile.open_catalog(self.a_path)
+
+        self.assertEqual(0, len(a_file))
+        self.assertEqual([], a_file.names[:])
+        self.assertEqual((0, 3), a_file.units.shape)
+
+        return
+
+
+    def test_stars_load(self):
+        """Stars.load maps a .cat file and answers as the CSV"""
+
+        a_csv = Stars.load()
+
+        CatalogFile.write(self.a_path, *Stars.read_csv(Stars.default_catalog))
+
+        a_catalog = Stars.load(self.a_path)
+
+        self.assertEqual(Stars.above_horizon_array(a_csv, 5.5, 37.4, 10.0),
+                         Stars.above_horizon_array(a_catalog, 5.5, 37.4, 10.0))
+
+        return
+
+
+    def test_bad_files(self):
+        """Not a catalog, truncated and uneven columns"""
+
+        with open(self.a_path, 'wb') as a_file:
+            a_file.write(b'id,name,ra,dec,magnitude\n')
+
+        with self.assertRaises(CatalogFile.Error):
+            CatalogFile.open_catalog(self.a_path)
+
+        CatalogFile.write(self.a_path, self.ids, self.names, self.ras, self.decs, self.magnitudes)
+
+        with open(self.a_path, 'rb') as a_file:
+            data = a_file.read()
+
+        with open(self.a_path, 'wb') as a_file:
+            a_file.write(data[:len(data)//2])
+
+        with self.assertRaises(CatalogFile.Error):
+            CatalogFile.open_catalog(self.a_path)
+
+        with self.assertRaises(CatalogFile.Error):
+            CatalogFile.write(self.a_path, self.ids, self.names[:2], self.ras, self.decs, self.magnitudes)
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+"""Unit tests for the cone search
+
+to run:  ./pylaunch.sh test_ConeSearch.py
+verbose: ./pylaunch.sh test_ConeSearch.py -v
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import unittest
+
+import coords
+import numpy
+
+import ConeSearch
+import MoonPosition
+import Stars
+
+import Transforms.Precession
+import Transforms.utils
+
+
+class ConeSearchTests(unittest.TestCase):
+    """Test the cone search"""
+
+    def test_separation_meeus(self):
+        """Meeus example 17.a, Arcturus to Spica"""
+
+        units = Stars.radec2units([14 + 15/60.0 + 39.7/3600.0, 13 + 25/60.0 + 11.6/3600.0],
+                                  [19 + 10/60.0 + 57/3600.0, -(11 + 9/60.0 + 41/3600.0)])
+
+        separations = ConeSearch.separation_array(units[0], units[1])
+
+        self.assertAlmostEqual(32 + 47/60.0 + 35/3600.0, float(separations), 4)
+
+        self.assertEqual((2, 2), ConeSearch.separation_matrix(units, units).shape)
+        self.assertAlmostEqual(float(separations), ConeSearch.separation_matrix(units, units)[1, 0], 12)
+
+        return
+
+
+    def test_separation_small(self):
+        """A milliarcsecond and its antipode keep their precision"""
+
+        a_milliarcsecond = numpy.radians(1e-3/3600)
+
+        units = numpy.array([[1.0, 0.0, 0.0], [-1.0, 0.0, 0.0]])
+        others = numpy.array([[numpy.cos(a_milliarcsecond), numpy.sin(a_milliarcsecond), 0.0],
+                              [numpy.cos(a_milliarcsecond), numpy.sin(a_milliarcsecond), 0.0]])
+
+        separations = ConeSearch.separation_array(units, others)
+
+        self.assertAlmostEqual(1e-3, separations[0]*3600, 9)
+        self.assertAlmostEqual(180*3600 - 1e-3, separations[1]*3600, 6)
+
+        return
+
+
+    def test_index(self):
+        """The index finds every object a full scan does"""
+
+        random = numpy.random.RandomState(47)
+
+        n = 20000
+        ras = random.uniform(0, 24, n)
+        decs = numpy.degrees(numpy.arcsin(random.uniform(-1, 1, n)))
+
+        a_catalog = ConeSearch.objects([str(i) for i in range(n)], [''] * n, ras, decs)
+
+        for a_radius in (0.1, 1.0, 5.0, 45.0, 180.0):
+            for ra, dec in ((3.3, 37.4), (12.0, -89.9), (20.0, 89.99), (0.0, 0.0), (23.99, 2.0)):
+
+                a_center = Stars.radec2units([ra], [dec])[0]
+
+                found = ConeSearch.cone_search_array(a_catalog, a_center, a_radius)
+
+                separations = ConeSearch.separation_array(a_catalog.units, a_center)
+
+                self.assertEqual(sorted(numpy.flatnonzero(separations <= a_radius).tolist()),
+                                 sorted(int(an_id) for an_id in found['id']))
+                self.assertEqual(sorted(found['separation']), found['separation'])
+
+        return
+
+
+    def test_orion(self):
+        """The belt and shoulders, nearest first"""
+
+        alnilam = Stars.radec2units([5 + 36/60.0 + 12.8/3600.0], [-(1 + 12/60.0 + 7/3600.0)])[0]
+
+        found = ConeSearch.cone_search_array(ConeSearch.load(), alnilam, 10.0)
+
+        self.assertEqual('Alnilam', found['name'][0])
+        self.assertAlmostEqual(0.0, found['separation'][0], 6)
+        self.assertEqual('Alnitak', found['name'][1])
+        self.assertIn('Betelgeuse', found['name'])
+        self.assertIn('Rigel', found['name'])
+        self.assertNotIn('Sirius', found['name'])
+
+        found = ConeSearch.cone_search_array(ConeSearch.load(), alnilam, 10.0, 1.0)
+
+        self.assertEqual(['Betelgeuse', 'Rigel'], sorted(found['name']))
+
+        return
+
+
+    def test_objects(self):
+        """A list without magnitudes"""
+
+        a_catalog = ConeSearch.objects(['M 42', 'M 31'], ['Orion Nebula', 'Andromeda Galaxy'],
+                                       [5.588, 0.712], [-5.391, 41.269])
+
+        found = ConeSearch.cone_search_array(a_catalog, Stars.radec2units([5.5], [-5.0])[0], 5.0, 1.0)
+
+        self.assertEqual(['M 42'], found['id'])
+        self.assertEqual([None], found['magnitude'])
+
+        with self.assertRaises(ConeSearch.Error):
+            ConeSearch.objects(['M 42'], [], [5.588], [-5.391])
+
+        return
+
+
+    def test_near_the_moon(self):
+        """The moon at its own center and the sun far from it"""
+
+        a_datetime = coords.datetime('2015-03-21T21:00:00-07')
+
+        found = ConeSearch.ConeSearch('moon', 1.0, a_datetime)
+
+        self.assertEqual('moon', found['id'][0])
+        self.assertAlmostEqual(0.0, found['separation'][0], 6)
+
+        found = ConeSearch.ConeSearch('sun', 180.0, a_datetime)
+
+        self.assertEqual(['sun', 'moon'], [an_id for an_id in found['id'] if an_id in ConeSearch.bodies])
+
+        sirius = Transforms.utils.radec2spherical(coords.angle(6, 45, 8.9), coords.angle(-16, 42, 58))
+
+        self.assertEqual('Sirius', ConeSearch.ConeSearch(sirius, 1.0)['name'][0])
+
+        with self.assertRaises(ConeSearch.Error):
+            ConeSearch.ConeSearch('moon', 1.0)
+
+        with self.assertRaises(ConeSearch.Error):
+            ConeSearch.ConeSearch('mars', 1.0, a_datetime)
+
+        return
+
+
+    def test_solar_system_J2000(self):
+        """The Sun and Moon of the date are precessed to J2000 with the stars"""
+
+        a_datetime = coords.datetime('2050-03-21T21:00:00-07')
+
+        a_solar_system = ConeSearch.solar_system(a_datetime)
+
+        moon = ConeSearch.spherical2unit(MoonPosition.EquatorialCoords(a_datetime))
+        moon_J2000 = Transforms.Precession.precess_units(moon, Transforms.Precession.of_date(a_datetime.toJulianDate()),
+                                                         Transforms.Precession.J2000)
+
+        self.assertLess(numpy.max(numpy.abs(moon_J2000 - a_solar_system.units[1])), 1e-12)
+        self.assertLess(0.6, ConeSearch.separation_array(moon, a_solar_system.units[1])) # half a century of precession
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
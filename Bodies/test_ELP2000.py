@@ -0,0 +1,194 @@
+"""Unit tests for the ELP-2000/82 moon
+
+to run:  ./pylaunch.sh test_ELP2000.py
+verbose: ./pylaunch.sh test_ELP2000.py -v
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import coords
+import numpy
+
+import ELP2000
+import MoonPosition
+
+
+class ELP2000Tests(unittest.TestCase):
+    """Test the ELP-2000/82 moon"""
+
+    def setUp(self):
+        """Set up test parameters."""
+
+        self.places = 9
+
+        self.meeus_jd = 2448724.5 # 1992-04-12T00:00:00
+
+        self.tmpdir = tempfile.mkdtemp()
+
+        return
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmpdir)
+
+        return
+
+
+    def test_meeus_1992_04_12(self):
+        """Meeus p. 342, before nutation"""
+
+        longitudes, latitudes, distances = ELP2000.LunarLongLatRange_array([self.meeus_jd])
+
+        self.assertAlmostEqual(133.162655, longitudes[0], 6)
+        self.assertAlmostEqual(-3.229126, latitudes[0], 6)
+        self.assertAlmostEqual(368409.7, distances[0], 1)
+
+        return
+
+
+    def test_moon_position(self):
+        """Every term of tables 47.A and 47.B is MoonPosition"""
+
+        a_datetime = coords.datetime('1992-04-12T00:00:00')
+
+        ecLon, ecLat, distance = MoonPosition.LunarLongLatRange(a_datetime)
+        elong, elat, elp_distance = ELP2000.LunarLongLatRange(a_datetime)
+
+        self.assertAlmostEqual(ecLon.degrees, elong.degrees, self.places)
+        self.assertAlmostEqual(ecLat.degrees, elat.degrees, self.places)
+        self.assertAlmostEqual(distance, elp_distance, 6)
+
+        return
+
+
+    def test_precision(self):
+        """Fewer terms and a larger error as the precision grows"""
+
+        julian_dates = numpy.linspace(2415020.5, 2488069.5, 500)
+
+        longitudes, latitudes, distances = ELP2000.LunarLongLatRange_array(julian_dates)
+
+        previous = None
+
+        for precision_arcsec in (1.0, 10.0, 100.0):
+
+            a_series = ELP2000.load(precision_arcsec)
+            kept = sum(a_series.counts[a_name][0] for a_name in ELP2000.series_names)
+
+            if previous is not None:
+                self.assertLess(kept, previous)
+
+            previous = kept
+
+            some_longitudes, some_latitudes, some_distances = ELP2000.LunarLongLatRange_array(julian_dates, precision_arcsec)
+
+            dlon = (some_longitudes - longitudes + 180) % 360 - 180
+
+            # the dropped terms add up to a few times the precision
+            self.assertLess(numpy.max(numpy.abs(dlon))*3600, 20*precision_arcsec)
+            self.assertLess(numpy.max(numpy.abs(some_latitudes - latitudes))*3600, 20*precision_arcsec)
+
+        self.assertIs(ELP2000.load(10.0), ELP2000.load(10))
+
+        return
+
+
+    def test_shape(self):
+        """The answer has the shape of the Julian dates"""
+
+        julian_dates = self.meeus_jd + numpy.arange(6.0).reshape(2, 3)
+
+        longitudes, latitudes, distances = ELP2000.LunarLongLatRange_array(julian_dates)
+
+        self.assertEqual((2, 3), longitudes.shape)
+        self.assertEqual((2, 3), distances.shape)
+        self.assertAlmostEqual(133.162655, longitudes[0, 0], 6)
+
+        return
+
+
+    def test_eccentricity(self):
+        """Terms in kM are multiplied by E**k, as the main problem has up to 4M"""
+
+        multipliers = numpy.array([(0, m, 0, 0) for m in (0, 1, -2, 3, -4)])
+        amplitudes = numpy.ones(5)
+
+        totals = ELP2000.evaluate((multipliers, amplitudes), numpy.zeros((4, 2)), numpy.array([0.5, 1.0]), numpy.cos)
+
+        self.assertAlmostEqual(1 + 0.5 + 0.25 + 0.125 + 0.0625, totals[0], 12)
+        self.assertAlmostEqual(5.0, totals[1], 12)
+
+        return
+
+
+    def test_write_read_table(self):
+        """A table reads back largest term first, the constant distance always kept"""
+
+        a_path = os.path.join(self.tmpdir, 'small.bin')
+
+        ELP2000.write_table(a_path, {'longitude': [(0, 0, 1, 0, 0.5), (0, 0, 1, 0, 22639.586)],
+                                     'latitude': [(0, 0, 0, 1, 18461.24)],
+                                     'distance': [(0, 0, 1, 0, -20905.355), (0, 0, 0, 0, 385000.56)]})
+
+        a_series = ELP2000.read_table(a_path, 1.0)
+
+        self.assertEqual((1, 2), a_series.counts['longitude'])
+        self.assertAlmostEqual(22639.586/3600, a_series.longitude[1][0], 12)
+        self.assertEqual((2, 2), a_series.counts['distance'])
+        self.assertAlmostEqual(385000.56, a_series.distance[1][0], 6)
+
+        a_series = ELP2000.read_table(a_path, 1e6)
+
+        self.assertEqual((0, 2), a_series.counts['longitude'])
+        self.assertEqual((1, 2), a_series.counts['distance'])
+
+        return
+
+
+    def test_bad_table(self):
+        """Not a table"""
+
+        a_path = os.path.join(self.tmpdir, 'bad.bin')
+
+        with open(a_path, 'wb') as a_file:
+            a_file.write(b'not an ELP table at all')
+
+        with self.assertRaises(ELP2000.Error):
+            ELP2000.read_table(a_path)
+
+        return
+
+
+    def test_read_elp_main(self):
+        """ELP1 records"""
+
+        a_path = os.path.join(self.tmpdir, 'ELP1')
+
+        with open(a_path, 'w') as a_file:
+            a_file.write(' MAIN PROBLEM. LONGITUDE (SINE)\n')
+
+            for a_term in ((0, 0, 1, 0, 22639.58578), (2, 0, -1, 0, 4586.4383)):
+                a_file.write('{:3d}{:3d}{:3d}{:3d}  {:13.5f}'.format(*a_term) + '{:12.2f}'.format(0)*6 + '\n')
+
+        terms = ELP2000.read_elp_main(a_path)
+
+        self.assertEqual([(0, 0, 1, 0, 22639.58578), (2, 0, -1, 0, 4586.4383)], terms)
+
+        with open(a_path, 'a') as a_file:
+            a_file.write('  x  0  1  0   22639.58578\n')
+
+        with self.assertRaises(ELP2000.Error):
+            ELP2000.read_elp_main(a_path)
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,247 @@
+"""Unit tests for the VSOP87 planets
+
+to run:  ./pylaunch.sh test_Planets.py
+verbose: ./pylaunch.sh test_Planets.py -v
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import coords
+import numpy
+
+import Planets
+
+
+class PlanetsTests(unittest.TestCase):
+    """Test the VSOP87 planets"""
+
+    def setUp(self):
+        """Set up test parameters."""
+
+        self.tmpdir = tempfile.mkdtemp()
+
+        return
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmpdir)
+
+        return
+
+
+    def test_earth_1992_10_13(self):
+        """Meeus example 25.b"""
+
+        L, B, R = Planets.HeliocentricLongLatRange_array('earth', [2448908.5])
+
+        self.assertAlmostEqual(19.907372, L[0], 6)
+        self.assertAlmostEqual(-0.000179, B[0], 6)
+        self.assertAlmostEqual(0.99760775, R[0], 8)
+
+        return
+
+
+    def test_venus_1992_12_20(self):
+        """Meeus examples 32.a and 33.a"""
+
+        L, B, R = Planets.HeliocentricLongLatRange_array('venus', [2448976.5])
+
+        self.assertAlmostEqual(26.11428, L[0], 5)
+        self.assertAlmostEqual(-2.62070, B[0], 5)
+        self.assertAlmostEqual(0.724603, R[0], 6)
+
+        longitudes, latitudes, distances = Planets.GeocentricLongLatRange_array('venus', [2448976.5])
+
+        self.assertAlmostEqual(313.08102, longitudes[0], 4)
+        self.assertAlmostEqual(-2.08474, latitudes[0], 4)
+        self.assertAlmostEqual(0.910947, distances[0], 6)
+
+        return
+
+
+    def test_planets_1992_12_20(self):
+        """Mercury to Neptune at the instant of Meeus example 33.a, from the full VSOP87D series"""
+
+        for a_body, L, B, R in (('mercury', 202.25642, 3.08211, 0.419940),
+                                ('mars', 98.70585, 1.40063, 1.590873),
+                                ('jupiter', 182.18530, 1.29148, 5.446765),
+                                ('saturn', 319.31841, -1.08015, 9.867006),
+                                ('uranus', 287.89104, -0.43066, 19.570238),
+                                ('neptune', 288.53858, 0.69671, 30.188054)):
+
+            some_L, some_B, some_R = Planets.HeliocentricLongLatRange_array(a_body, [2448976.5])
+
+            self.assertAlmostEqual(L, some_L[0], delta=3/3600.0, msg=a_body)
+            self.assertAlmostEqual(B, some_B[0], delta=3/3600.0, msg=a_body)
+            self.assertAlmostEqual(R, some_R[0], delta=2e-4, msg=a_body)
+
+            longitudes, latitudes, distances = Planets.GeocentricLongLatRange_array(a_body, [2448976.5])
+
+            self.assertTrue(0 <= longitudes[0] < 360)
+
+        return
+
+
+    def test_ecliptic_coords(self):
+        """A coords.spherical for EclipticEquatorial"""
+
+        elong, elat, distance = Planets.LongLatRange('venus', coords.datetime('1992-12-20T00:00:00'))
+
+        self.assertAlmostEqual(313.08102, elong.degrees, 4)
+        self.assertAlmostEqual(-2.08474, elat.degrees, 4)
+
+        return
+
+
+    def test_earth_cache(self):
+        """The earth is shared by the planets at the same instants"""
+
+        julian_dates = 2448976.5 + numpy.arange(3.0)
+
+        Planets.GeocentricLongLatRange_array('venus', julian_dates)
+        an_earth = Planets.earth_cache['last'][1]
+
+        Planets.GeocentricLongLatRange_array('mars', julian_dates)
+        self.assertIs(an_earth, Planets.earth_cache['last'][1])
+
+        Planets.GeocentricLongLatRange_array('venus', julian_dates + 1)
+        self.assertIsNot(an_earth, Planets.earth_cache['last'][1])
+
+        return
+
+
+    def test_earth_threads(self):
+        """Each thread gets the earth of its own instants"""
+
+        import threading
+
+        instants = [2448976.5 + i + numpy.arange(3.0) for i in range(8)]
+        expected = [Planets.GeocentricLongLatRange_array('mars', julian_dates)[0] for julian_dates in instants]
+        failures = list()
+
+        def run(i):
+            for n in range(50):
+                if not numpy.array_equal(expected[i], Planets.GeocentricLongLatRange_array('mars', instants[i])[0]):
+                    failures.append(i)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(instants))]
+
+        for a_thread in threads:
+            a_thread.start()
+
+        for a_thread in threads:
+            a_thread.join()
+
+        self.assertEqual([], failures)
+
+        return
+
+
+    def test_precision(self):
+        """Fewer terms and a larger error as the precision grows"""
+
+        julian_dates = numpy.linspace(2415020.5, 2488069.5, 500).reshape(50, 10)
+
+        longitudes, latitudes, distances = Planets.HeliocentricLongLatRange_array('venus', julian_dates)
+
+        self.assertEqual((50, 10), longitudes.shape)
+
+        previous = None
+
+        for precision_arcsec in (1.0, 10.0, 100.0):
+
+            kept = Planets.load(precision_arcsec).counts['venus'][0]
+
+            if previous is not None:
+                self.assertLess(kept, previous)
+
+            previous = kept
+
+            some_longitudes, some_latitudes, some_distances = Planets.HeliocentricLongLatRange_array(
+                'venus', julian_dates, precision_arcsec)
+
+            dlon = (some_longitudes - longitudes + 180) % 360 - 180
+
+            self.assertLess(numpy.max(numpy.abs(dlon))*3600, 20*precision_arcsec)
+            self.assertLess(numpy.max(numpy.abs(some_latitudes - latitudes))*3600, 20*precision_arcsec)
+
+        return
+
+
+    def test_no_series(self):
+        """Bodies not in the table"""
+
+        a_table = os.path.join(self.tmpdir, 'venus.bin')
+
+        Planets.write_table(a_table, [(1, 0, 0, 3.17614667, 0.0, 0.0)])
+
+        with self.assertRaises(Planets.Error):
+            Planets.HeliocentricLongLatRange_array('mars', [2448976.5], a_table=a_table)
+
+        with self.assertRaises(Planets.Error):
+            Planets.GeocentricLongLatRange_array('earth', [2448976.5])
+
+        return
+
+
+    def test_vsop87_table(self):
+        """A VSOP87D file to a table and back"""
+
+        a_vsop87 = os.path.join(self.tmpdir, 'VSOP87D.ven')
+        a_table = os.path.join(self.tmpdir, 'venus.bin')
+
+        with open(a_vsop87, 'w') as a_file:
+            a_file.write(' VSOP87 VERSION D2    VENUS     VARIABLE 1 (LBR)       *T**0      2 TERMS    HIGH PRECISION\n')
+            a_file.write(' 4210    1  0  0  0  0  0  0  0  0  0  0  0  0  0     0.00000001000 0.00000000000'
+                         '  0.00000000000          0.01353968000 5.59313320000    10213.28554620000\n')
+            a_file.write(' 4210    2  0  0  0  0  0  0  0  0  0  0  0  0  0     0.00000001000 0.00000000000'
+                         '  0.00000000000          3.17614667000 0.00000000000        0.00000000000\n')
+            a_file.write(' VSOP87 VERSION D2    VENUS     VARIABLE 3 (LBR)       *T**1      1 TERMS    HIGH PRECISION\n')
+            a_file.write('    1    0.00034551000   0.89199000000    10213.28555000000\n')
+
+        terms = Planets.read_vsop87(a_vsop87)
+
+        self.assertEqual([(1, 0, 0, 0.01353968, 5.5931332, 10213.2855462),
+                          (1, 0, 0, 3.17614667, 0.0, 0.0),
+                          (1, 2, 1, 0.00034551, 0.89199, 10213.28555)], terms)
+
+        Planets.write_table(a_table, terms)
+
+        a_series = Planets.read_table(a_table)
+
+        self.assertEqual({'venus': (3, 3)}, a_series.counts)
+        self.assertEqual([3.17614667, 0.01353968], a_series.terms[('venus', 'longitude')][0][0].tolist())
+        self.assertEqual([], a_series.terms[('venus', 'latitude')])
+        self.assertEqual(2, len(a_series.terms[('venus', 'radius')]))
+
+        self.assertEqual({'venus': (1, 3)}, Planets.read_table(a_table, 10000).counts)
+
+        return
+
+
+    def test_bad_files(self):
+        """Not VSOP87D and not a table"""
+
+        a_path = os.path.join(self.tmpdir, 'VSOP87B.ven')
+
+        with open(a_path, 'w') as a_file:
+            a_file.write(' VSOP87 VERSION B2    VENUS     VARIABLE 1 (LBR)       *T**0      2 TERMS    HIGH PRECISION\n')
+
+        with self.assertRaises(Planets.Error):
+            Planets.read_vsop87(a_path)
+
+        with self.assertRaises(Planets.Error):
+            Planets.read_table(a_path)
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+"""Unit tests for the bright star catalog
+
+to run:  ./pylaunch.sh test_Stars.py
+verbose: ./pylaunch.sh test_Stars.py -v
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import coords
+import numpy
+
+import Stars
+
+import Transforms.Precession
+import Transforms.utils
+
+
+class StarsTests(unittest.TestCase):
+    """Test the bright star catalog"""
+
+    def setUp(self):
+        """Set up test parameters."""
+
+        self.tmpdir = tempfile.mkdtemp()
+
+        return
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmpdir)
+
+        return
+
+
+    def test_altaz_meeus(self):
+        """Meeus example 13.b, as EquatorialHorizon.toHorizon"""
+
+        latitude = 38 + 55/60.0 + 17/3600.0
+        longitude = -(77 + 3/60.0 + 56/3600.0)
+        gast = 8 + 34/60.0 + 56.8371/3600.0
+
+        units = Stars.radec2units([23 + 9/60.0 + 16.641/3600.0], [-(6 + 43/60.0 + 11.61/3600.0)])
+
+        altitudes, azimuths = Stars.altaz_array(units, gast + longitude/15, latitude)
+
+        self.assertAlmostEqual(15.1250216498, altitudes[0], 6)
+        self.assertAlmostEqual(248.033549102, azimuths[0], 6)
+
+        return
+
+
+    def test_index(self):
+        """The index finds every star a full scan does"""
+
+        random = numpy.random.RandomState(42)
+
+        n = 20000
+        ras = random.uniform(0, 24, n)
+        decs = numpy.degrees(numpy.arcsin(random.uniform(-1, 1, n)))
+
+        a_catalog = Stars.Catalog([str(i) for i in range(n)], [''] * n, ras, decs, random.uniform(-1, 8, n))
+
+        for a_min_altitude in (0.0, 30.0, 80.0):
+            for lst_hours, a_latitude in ((3.3, 37.4), (12.0, -89.9), (20.0, 89.99), (0.0, 0.0)):
+
+                stars = Stars.above_horizon_array(a_catalog, lst_hours, a_latitude, a_min_altitude)
+
+                altitudes, azimuths = Stars.altaz_array(a_catalog.units, lst_hours, a_latitude)
+
+                self.assertEqual(sorted(numpy.flatnonzero(altitudes >= a_min_altitude).tolist()),
+                                 sorted(int(an_id) for an_id in stars['id']))
+
+        return
+
+
+    def test_precessed(self):
+        """The index of the J2000 catalog finds the stars of the date"""
+
+        random = numpy.random.RandomState(49)
+
+        n = 20000
+        ras = random.uniform(0, 24, n)
+        decs = numpy.degrees(numpy.arcsin(random.uniform(-1, 1, n)))
+
+        a_catalog = Stars.Catalog([str(i) for i in range(n)], [''] * n, ras, decs, random.uniform(-1, 8, n))
+
+        a_julian_date = 2451545.0 + 100*365.25 # a century, 1.4 degrees
+
+        units = Transforms.Precession.precess_units(a_catalog.units, Transforms.Precession.J2000, a_julian_date)
+
+        for lst_hours, a_latitude in ((3.3, 37.4), (20.0, 89.99)):
+
+            stars = Stars.above_horizon_array(a_catalog, lst_hours, a_latitude, 60.0, a_julian_date=a_julian_date)
+
+            altitudes, azimuths = Stars.altaz_array(units, lst_hours, a_latitude)
+
+            self.assertEqual(sorted(numpy.flatnonzero(altitudes >= 60.0).tolist()),
+                             sorted(int(an_id) for an_id in stars['id']))
+
+        return
+
+
+    def test_bright_stars(self):
+        """Orion is up on a winter evening, Scorpius is not"""
+
+        stars = Stars.above_horizon_array(Stars.load(), 5.5, 37.4, 10.0, 1.0)
+
+        self.assertIn('Betelgeuse', stars['name'])
+        self.assertIn('Rigel', stars['name'])
+        self.assertNotIn('Antares', stars['name'])
+
+        self.assertEqual('Sirius', stars['name'][0]) # brightest first
+        self.assertEqual(sorted(stars['magnitude']), stars['magnitude'])
+        self.assertTrue(all(an_altitude >= 10.0 for an_altitude in stars['altitude']))
+
+        return
+
+
+    def test_above_horizon(self):
+        """From an observer and a time"""
+
+        an_observer = Transforms.utils.latlon2spherical(a_latitude=coords.angle(37, 24),
+                                                        a_longitude=coords.angle(-122, 4, 56))
+
+        stars = Stars.AboveHorizon(an_observer, coords.datetime('2015-01-15T21:00:00-08'), 10.0, 1.0)
+
+        self.assertIn('Sirius', stars['name'])
+        self.assertNotIn('Vega', stars['name'])
+
+        return
+
+
+    def test_read_csv(self):
+        """A bad row names the column and row"""
+
+        a_path = os.path.join(self.tmpdir, 'stars.csv')
+
+        with open(a_path, 'w') as a_file:
+            a_file.write('id,name,ra,dec,magnitude\n1,Sirius,06:45:08.9,-16:42:58,-1.46\n2,Bad,25:00,0,1\n')
+
+        with self.assertRaises(Stars.Error) as context:
+            Stars.read_csv(a_path)
+
+        self.assertIn('ra', str(context.exception))
+        self.assertIn('row 1', str(context.exception))
+
+        return
+
+
+    def test_read_bsc5(self):
+        """A BSC5 record and a removed entry"""
+
+        a_line = [' ']*114
+        for start, a_field in ((0, '2491'), (4, '9Alp CMa'), (75, '064508.9'), (83, '-164258'), (102, '-1.46')):
+            a_line[start:start + len(a_field)] = a_field
+
+        a_path = os.path.join(self.tmpdir, 'catalog')
+
+        with open(a_path, 'w') as a_file:
+            a_file.write(''.join(a_line) + '\n')
+            a_file.write('  92' + ' '*100 + '\n')
+
+        ids, names, ras, decs, magnitudes = Stars.read_bsc5(a_path)
+
+        self.assertEqual(['HR 2491'], ids)
+        self.assertEqual(['9Alp CMa'], names)
+        self.assertAlmostEqual(6 + 45/60.0 + 8.9/3600, ras[0], 12)
+        self.assertAlmostEqual(-(16 + 42/60.0 + 58/3600.0), decs[0], 12)
+        self.assertEqual([-1.46], magnitudes)
+
+        self.assertEqual(1, len(Stars.load(a_path, 'bsc5')))
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
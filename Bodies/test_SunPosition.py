@@ -23,6 +23,7 @@ import unittest
 import coords
 import SunPosition
 
+import Transforms.Refraction
 import Transforms.utils
 
 
@@ -356,6 +357,31 @@ class SunRiseAndSetTests(unittest.TestCase):
         return
 
 
+    def test_refraction(self):
+        """Tests the refraction of the upper limb at the horizon"""
+
+        a_datetime = coords.datetime('2015-05-22T12:00:00-07')
+
+        rising, transit, setting = SunPosition.SunRiseAndSet(self.mlc404, a_datetime)
+
+        some_rising, some_transit, some_setting = SunPosition.SunRiseAndSet(self.mlc404, a_datetime,
+                                                                            a_refraction=Transforms.Refraction.standard)
+
+        self.assertEqual(str(transit), str(some_transit))
+
+        # 34.5 + 16 arcminutes below the horizon instead of 50, about 3 seconds
+        self.assertAlmostEqual(rising.toJulianDate(), some_rising.toJulianDate(), delta=5/86400.0)
+        self.assertAlmostEqual(setting.toJulianDate(), some_setting.toJulianDate(), delta=5/86400.0)
+
+        # colder air refracts more, earlier rising and later setting
+        cold_rising, cold_transit, cold_setting = SunPosition.SunRiseAndSet(self.mlc404, a_datetime, a_refraction=(-20.0, 1030.0))
+
+        self.assertLess(cold_rising.toJulianDate(), some_rising.toJulianDate())
+        self.assertGreater(cold_setting.toJulianDate(), some_setting.toJulianDate())
+
+        return
+
+
     def test_timezone_p6(self):
         """Tests timezone +6
 
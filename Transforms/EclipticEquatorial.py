@@ -32,6 +32,7 @@ from __future__ import absolute_import # for python 2 and 3
 import math
 import coords
 
+import Transforms.Nutation
 import Transforms.utils
 
 
@@ -48,7 +49,7 @@ obe.append(coords.angle(23, 26, 21.45))
 obe.append(coords.angle(-1)*coords.angle(0, 0, 46.815)) # TODO no unary minus in boost wrappers
 obe.append(coords.angle(-1)*coords.angle(0, 0, 0.0006))
 obe.append(coords.angle(0, 0, 0.00181))
-# TODO more terms, updated
+# Laskar's terms and the nutation are in Nutation.py, see true_obliquity
 
 
 def obliquity(a_datetime):
@@ -63,7 +64,21 @@ def obliquity(a_datetime):
     return coords.angle(eps)
 
 
-def _xform(an_object, a_datetime, a_direction):
+def true_obliquity(a_datetime):
+    """Calculates the true obliquity of the ecliptic given the datetime
+
+    Laskar's mean obliquity and the IAU 1980 nutation in obliquity,
+    for apparent positions of the date. See Nutation.daily.
+
+    a_datetime (coords.datetime): The time of the observation.
+    """
+
+    dpsi, deps, eps = Transforms.Nutation.daily(a_datetime.toJulianDate())
+
+    return coords.angle(eps)
+
+
+def _xform(an_object, a_datetime, a_direction, a_nutation=False):
     """Transforms a vector to/from equatorial/ecliptic coordinates.
 
     Args:
@@ -77,23 +92,36 @@ def _xform(an_object, a_datetime, a_direction):
 
     a_direction (int): +1 to equatorial, -1 to ecliptic
 
+    a_nutation (bool): the nutation in longitude and the true
+    obliquity, see Nutation.daily, or the mean obliquity
+
     Returns: coords.spherical in the transformed coordinates.
     """
 
     if not isinstance(an_object, coords.spherical):
         raise Error('object must be in spherical coordinates')
 
+    if a_nutation:
+        dpsi, deps, eps = Transforms.Nutation.daily(a_datetime.toJulianDate())
+        dpsi, eps = coords.angle(dpsi/3600.0), coords.angle(eps)
+    else:
+        eps = obliquity(a_datetime)
+
+    if a_nutation and a_direction > 0:
+        an_object = coords.spherical(coords.Cartesian(an_object)) # a copy
+        an_object.phi += dpsi # the mean longitude of date to the true
+
     the_rotatee = coords.Cartesian(an_object)
 
-    the_rotated = equinox_axis.rotate(the_rotatee, coords.angle(a_direction) * obliquity(a_datetime))
+    the_result = coords.spherical(equinox_axis.rotate(the_rotatee, coords.angle(a_direction) * eps))
 
-    if isinstance(an_object, coords.spherical):
-        return coords.spherical(the_rotated)
-    else:
-        return the_rotated
+    if a_nutation and a_direction < 0:
+        the_result.phi += coords.angle(-1)*dpsi # the true longitude to the mean of date
+
+    return the_result
 
 
-def toEcliptic(an_object, a_datetime):
+def toEcliptic(an_object, a_datetime, a_nutation=False):
     """Transforms an_object from equatorial to ecliptic coordinates
 
     Args:
@@ -104,13 +132,17 @@ def toEcliptic(an_object, a_datetime):
 
     a_datetime (coords.datetime): The time of the observation.
 
+    a_nutation (bool): the apparent RA and Dec of the date, with the
+    true obliquity, to the mean longitude and latitude of the date, or
+    the mean obliquity for both
+
     Returns: coords.spherical in the transformed coordinates.
 
     """
-    return _xform(an_object, a_datetime, -1.0)
+    return _xform(an_object, a_datetime, -1.0, a_nutation)
 
 
-def toEquatorial(an_object, a_datetime):
+def toEquatorial(an_object, a_datetime, a_nutation=False):
     """Transforms an_object from ecliptic to equatorial coordinates
 
     Args:
@@ -121,10 +153,14 @@ def toEquatorial(an_object, a_datetime):
 
     a_datetime (coords.datetime): The time of the observation.
 
+    a_nutation (bool): the mean longitude and latitude of the date,
+    with the nutation in longitude added, to the apparent RA and Dec
+    with the true obliquity, or the mean obliquity for both
+
     Returns: coords.spherical in the transformed coordinates.
 
     """
-    return _xform(an_object, a_datetime, 1.0)
+    return _xform(an_object, a_datetime, 1.0, a_nutation)
 
 
 
@@ -65,15 +65,20 @@ from __future__ import absolute_import # for python 2 and 3
 import math
 import coords
 
+import Transforms.Precession
+import Transforms.Refraction
 import Transforms.SiderealTime
+import Transforms.lazy
 import Transforms.utils
 
+numpy = Transforms.lazy.Module('numpy') # imported on first use, only the bulk callers need it
+
 
 class Error(Exception):
     pass
 
 
-def toHorizon(an_object, an_observer, a_datetime, is_verbose=False):
+def toHorizon(an_object, an_observer, a_datetime, is_verbose=False, an_epoch=None, a_refraction=None):
     """Transforms a coordinate vector from equatorial to horizon coordinates.
 
     Astronomical Algorithms 2ed, Jean Meeus ISBN 0-943396-61-1
@@ -95,6 +100,14 @@ def toHorizon(an_object, an_observer, a_datetime, is_verbose=False):
 
     is_verbose(bool): print partial calculations to stdout for debugging.
 
+    an_epoch (float): Julian date of the equinox of an_object, e.g.
+    Precession.J2000 for a catalog position, to precess it to
+    a_datetime first. None if it is of the date.
+
+    a_refraction (tuple): (temperature in Celsius, pressure in
+    millibars), e.g. Refraction.standard, for the apparent altitude.
+    None for the geometric altitude.
+
     Returns (coords.spherical): the object in the transformed coordinates.
     """
 
@@ -104,6 +117,9 @@ def toHorizon(an_object, an_observer, a_datetime, is_verbose=False):
     if not isinstance(an_observer, coords.spherical):
         raise Error('observer must be in spherical coordinates')
 
+    if an_epoch is not None:
+        an_object = Transforms.Precession.Precess(an_object, an_epoch, a_datetime.toJulianDate())
+
     gast = Transforms.SiderealTime.USNO_C163.GAST(a_datetime.inTimezoneOffset(0))
 
     local_hour_angle = coords.angle(gast.degrees*15 + an_observer.phi.degrees - an_object.phi.degrees)
@@ -118,6 +134,9 @@ def toHorizon(an_object, an_observer, a_datetime, is_verbose=False):
 
     theta = coords.angle(coords.angle().rad2deg(math.pi/2 - math.asin(sinaltitude)))
 
+    if a_refraction is not None:
+        theta = coords.angle(90.0 - Transforms.Refraction.toApparent(theta.complement().degrees, *a_refraction))
+
 
     # Meeus 13.5
     nom = math.sin(local_hour_angle.radians)
@@ -141,7 +160,7 @@ def toHorizon(an_object, an_observer, a_datetime, is_verbose=False):
     return coords.spherical(1, theta, phi)
 
 
-def toEquatorial(an_object, an_observer, a_datetime, is_verbose=False):
+def toEquatorial(an_object, an_observer, a_datetime, is_verbose=False, a_refraction=None):
     """Transforms a coordinate vector from horizon to equatorial coordinates.
 
     Astronomical Algorithms 2ed, Jean Meeus ISBN 0-943396-61-1
@@ -160,6 +179,10 @@ def toEquatorial(an_object, an_observer, a_datetime, is_verbose=False):
 
     is_verbose(bool): print partial calculations to stdout for debugging.
 
+    a_refraction (tuple): (temperature in Celsius, pressure in
+    millibars), e.g. Refraction.standard, if the altitude is apparent,
+    as observed. None if it is geometric.
+
     Returns (coords.spherical): the object in the transformed coordinates.
     """
 
@@ -171,6 +194,9 @@ def toEquatorial(an_object, an_observer, a_datetime, is_verbose=False):
 
     altitude = an_object.theta.complement()
 
+    if a_refraction is not None:
+        altitude = coords.angle(Transforms.Refraction.toGeometric(altitude.degrees, *a_refraction))
+
     # The calculation assumes "that Azimuth (A) is measured from the
     # South point, turning positive to the West". coords.spherical
     # assumes azimuth is measured from the x-axis as north.
@@ -213,6 +239,56 @@ def toEquatorial(an_object, an_observer, a_datetime, is_verbose=False):
     return Transforms.utils.radec2spherical(a_right_ascension=object_ra, a_declination=object_dec)
 
 
+def toEquatorial_array(azimuths, altitudes, latitudes, longitudes, gasts, a_refraction=None):
+    """Transforms many horizon coordinates to equatorial coordinates.
+
+    toEquatorial with numpy for bulk rows, each with its own observer
+    and time. The arguments broadcast, so one observer or one time can
+    be a scalar.
+
+    Args:
+
+    azimuths (numpy.ndarray): degrees from the north, positive east
+
+    altitudes (numpy.ndarray): degrees from the horizon
+
+    latitudes (numpy.ndarray): observer latitudes in degrees
+
+    longitudes (numpy.ndarray): observer longitudes in degrees, positive east
+
+    gasts (numpy.ndarray): Greenwich apparent sidereal times in hours,
+    see SiderealTime.USNO_C163.GAST_array
+
+    a_refraction (tuple): (temperatures in Celsius, pressures in
+    millibars), scalars or numpy.ndarray, if the altitudes are
+    apparent. None if they are geometric. See Refraction.toGeometric_array.
+
+    Returns (numpy.ndarray, numpy.ndarray): the right ascensions in
+    hours, 0 to 24, and declinations in degrees
+    """
+
+    if a_refraction is not None:
+        altitudes = Transforms.Refraction.toGeometric_array(altitudes, *a_refraction)
+
+    latitude = numpy.radians(latitudes)
+    altitude = numpy.radians(altitudes)
+    azimuth = numpy.radians(numpy.asarray(azimuths, dtype=numpy.float64) - 180) # from the south, see toEquatorial
+
+    # Meeus, p. 94
+    sindec = numpy.sin(latitude)*numpy.sin(altitude) - numpy.cos(latitude)*numpy.cos(altitude)*numpy.cos(azimuth)
+
+    object_dec = numpy.degrees(numpy.arcsin(numpy.clip(sindec, -1, 1)))
+
+    local_hour_angle = numpy.degrees(numpy.arctan2(numpy.sin(azimuth),
+                                                   numpy.cos(azimuth)*numpy.sin(latitude)
+                                                   + numpy.tan(altitude)*numpy.cos(latitude)))
+
+    object_longitude = (15.0*numpy.asarray(gasts) + longitudes - local_hour_angle) % 360
+
+    return 24.0*object_longitude/360.0, object_dec
+
+
+
 
 # ================
 # ===== main =====
@@ -0,0 +1,480 @@
+#!/usr/bin/env python
+
+"""Nutation, the true obliquity of the ecliptic and annual aberration
+
+The IAU 1980 theory of nutation, the 63 terms of Meeus table 22.A,
+gives the nutation in longitude and in obliquity within 0.001
+arcseconds of the full theory. The mean obliquity is Laskar's, Meeus
+eq. 22.3, good to 0.01 arcseconds within 1000 years of J2000.
+
+The nutation changes by at most 0.2 arcseconds in a day, so the series
+is evaluated at 0h UT of each day asked for, kept, and interpolated in
+between, see daily and daily_array. The interpolation is within about
+0.01 arcseconds of the series at every instant, and is a few
+dictionary lookups instead of 63 terms.
+
+SiderealTime.USNO_C163.GAST uses it for the equation of the equinoxes,
+and EclipticEquatorial.toEquatorial and toEcliptic for the nutation in
+longitude and the true obliquity, with a_nutation=True. Stars.AboveHorizon
+uses the sidereal time with it.
+
+References:
+
+    Meeus, Astronomical Algorithms 2ed., chapter 22 Nutation and the
+    Obliquity of the Ecliptic, chapter 23 Apparent Place of a Star
+
+to run:
+
+    ./pylaunch.sh Nutation.py 1987-04-10T00:00:00
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import argparse
+import math
+import threading
+
+import Transforms.lazy
+
+numpy = Transforms.lazy.Module('numpy') # imported on first use, only the bulk callers need it
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+J2000 = 2451545.0 # Julian date
+
+# Meeus table 22.A, the multiples of D, M, M', F and Omega, then the
+# sine coefficients of the nutation in longitude and the cosine
+# coefficients of the nutation in obliquity, constant and per Julian
+# century, in units of 0.0001 arcseconds
+
+terms = (
+    (0, 0, 0, 0, 1, -171996, -174.2, 92025, 8.9),
+    (-2, 0, 0, 2, 2, -13187, -1.6, 5736, -3.1),
+    (0, 0, 0, 2, 2, -2274, -0.2, 977, -0.5),
+    (0, 0, 0, 0, 2, 2062, 0.2, -895, 0.5),
+    (0, 1, 0, 0, 0, 1426, -3.4, 54, -0.1),
+    (0, 0, 1, 0, 0, 712, 0.1, -7, 0),
+    (-2, 1, 0, 2, 2, -517, 1.2, 224, -0.6),
+    (0, 0, 0, 2, 1, -386, -0.4, 200, 0),
+    (0, 0, 1, 2, 2, -301, 0, 129, -0.1),
+    (-2, -1, 0, 2, 2, 217, -0.5, -95, 0.3),
+    (-2, 0, 1, 0, 0, -158, 0, 0, 0),
+    (-2, 0, 0, 2, 1, 129, 0.1, -70, 0),
+    (0, 0, -1, 2, 2, 123, 0, -53, 0),
+    (2, 0, 0, 0, 0, 63, 0, 0, 0),
+    (0, 0, 1, 0, 1, 63, 0.1, -33, 0),
+    (2, 0, -1, 2, 2, -59, 0, 26, 0),
+    (0, 0, -1, 0, 1, -58, -0.1, 32, 0),
+    (0, 0, 1, 2, 1, -51, 0, 27, 0),
+    (-2, 0, 2, 0, 0, 48, 0, 0, 0),
+    (0, 0, -2, 2, 1, 46, 0, -24, 0),
+    (2, 0, 0, 2, 2, -38, 0, 16, 0),
+    (0, 0, 2, 2, 2, -31, 0, 13, 0),
+    (0, 0, 2, 0, 0, 29, 0, 0, 0),
+    (-2, 0, 1, 2, 2, 29, 0, -12, 0),
+    (0, 0, 0, 2, 0, 26, 0, 0, 0),
+    (-2, 0, 0, 2, 0, -22, 0, 0, 0),
+    (0, 0, -1, 2, 1, 21, 0, -10, 0),
+    (0, 2, 0, 0, 0, 17, -0.1, 0, 0),
+    (2, 0, -1, 0, 1, 16, 0, -8, 0),
+    (-2, 2, 0, 2, 2, -16, 0.1, 7, 0),
+    (0, 1, 0, 0, 1, -15, 0, 9, 0),
+    (-2, 0, 1, 0, 1, -13, 0, 7, 0),
+    (0, -1, 0, 0, 1, -12, 0, 6, 0),
+    (0, 0, 2, -2, 0, 11, 0, 0, 0),
+    (2, 0, -1, 2, 1, -10, 0, 5, 0),
+    (2, 0, 1, 2, 2, -8, 0, 3, 0),
+    (0, 1, 0, 2, 2, 7, 0, -3, 0),
+    (-2, 1, 1, 0, 0, -7, 0, 0, 0),
+    (0, -1, 0, 2, 2, -7, 0, 3, 0),
+    (2, 0, 0, 2, 1, -7, 0, 3, 0),
+    (2, 0, 1, 0, 0, 6, 0, 0, 0),
+    (-2, 0, 2, 2, 2, 6, 0, -3, 0),
+    (-2, 0, 1, 2, 1, 6, 0, -3, 0),
+    (2, 0, -2, 0, 1, -6, 0, 3, 0),
+    (2, 0, 0, 0, 1, -6, 0, 3, 0),
+    (0, -1, 1, 0, 0, 5, 0, 0, 0),
+    (-2, -1, 0, 2, 1, -5, 0, 3, 0),
+    (-2, 0, 0, 0, 1, -5, 0, 3, 0),
+    (0, 0, 2, 2, 1, -5, 0, 3, 0),
+    (-2, 0, 2, 0, 1, 4, 0, 0, 0),
+    (-2, 1, 0, 2, 1, 4, 0, 0, 0),
+    (0, 0, 1, -2, 0, 4, 0, 0, 0),
+    (-1, 0, 1, 0, 0, -4, 0, 0, 0),
+    (-2, 1, 0, 0, 0, -4, 0, 0, 0),
+    (1, 0, 0, 0, 0, -4, 0, 0, 0),
+    (0, 0, 1, 2, 0, 3, 0, 0, 0),
+    (0, 0, -2, 2, 2, -3, 0, 0, 0),
+    (-1, -1, 1, 0, 0, -3, 0, 0, 0),
+    (0, 1, 1, 0, 0, -3, 0, 0, 0),
+    (0, -1, 1, 2, 2, -3, 0, 0, 0),
+    (2, -1, -1, 2, 2, -3, 0, 0, 0),
+    (0, 0, 3, 2, 2, -3, 0, 0, 0),
+    (2, -1, 0, 2, 2, -3, 0, 0, 0),
+)
+
+unit_arcsec = 0.0001 # of the coefficients
+
+# Laskar's mean obliquity, Meeus eq. 22.3, arcseconds by powers of T/100
+obliquity_arcsec = (84381.448, -4680.93, -1.55, 1999.25, -51.38, -249.67, -39.05, 7.12, 27.87, 5.79, 2.45)
+
+aberration_arcsec = 20.49552 # the constant of aberration
+
+days = dict() # day number, the Julian date at 0h UT less 0.5, to (dpsi, deps) arcseconds
+max_days = 100000 # kept before days is emptied, about 270 years
+days_lock = threading.Lock() # the threads of a worker share days
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+# ----------------------
+# ----- the series -----
+# ----------------------
+
+
+def julian_century(julian_dates):
+    """Julian centuries from J2000"""
+
+    return (julian_dates - J2000)/36525.0
+
+
+def mean_arguments(T):
+    """Meeus chapter 22, D, M, M', F and Omega in degrees
+
+    Args:
+        T (float or numpy.ndarray): Julian centuries from J2000
+
+    Returns: tuple of five of the same
+    """
+
+    D = 297.85036 + T*(445267.111480 + T*(-0.0019142 + T/189474.0))
+    M = 357.52772 + T*(35999.050340 + T*(-0.0001603 - T/300000.0))
+    Mp = 134.96298 + T*(477198.867398 + T*(0.0086972 + T/56250.0))
+    F = 93.27191 + T*(483202.017538 + T*(-0.0036825 + T/327270.0))
+    Omega = 125.04452 + T*(-1934.136261 + T*(0.0020708 + T/450000.0))
+
+    return D, M, Mp, F, Omega
+
+
+def mean_obliquity(T):
+    """Laskar's mean obliquity of the ecliptic, Meeus eq. 22.3
+
+    Args:
+        T (float or numpy.ndarray): Julian centuries from J2000
+
+    Returns: degrees, the same type as T
+    """
+
+    U = T/100.0
+
+    eps = 0
+    for a_coefficient in reversed(obliquity_arcsec):
+        eps = eps*U + a_coefficient
+
+    return eps/3600.0
+
+
+def nutation(a_julian_date):
+    """The nutation in longitude and obliquity of an instant, the series
+
+    Args:
+        a_julian_date (float): of the instant
+
+    Returns: (dpsi, deps) in arcseconds
+    """
+
+    T = julian_century(a_julian_date)
+
+    arguments = [math.radians(an_argument % 360.0) for an_argument in mean_arguments(T)]
+
+    dpsi, deps = 0.0, 0.0
+
+    for D, M, Mp, F, Omega, psi, psi_T, eps, eps_T in terms:
+
+        an_angle = D*arguments[0] + M*arguments[1] + Mp*arguments[2] + F*arguments[3] + Omega*arguments[4]
+
+        dpsi += (psi + psi_T*T)*math.sin(an_angle)
+        deps += (eps + eps_T*T)*math.cos(an_angle)
+
+    return dpsi*unit_arcsec, deps*unit_arcsec
+
+
+def nutation_array(julian_dates):
+    """The nutation in longitude and obliquity of many instants, the series
+
+    Args:
+        julian_dates (numpy.ndarray): of the instants, any shape
+
+    Returns: (dpsi, deps) numpy.ndarray in arcseconds, the shape of julian_dates
+    """
+
+    T = julian_century(numpy.asarray(julian_dates, dtype=float))
+
+    table = numpy.array(terms, dtype=float)
+
+    arguments = numpy.radians(numpy.mod(numpy.stack(mean_arguments(T), axis=-1), 360.0))
+    angles = numpy.dot(arguments, table[:, :5].T) # instants by terms
+
+    dpsi = numpy.sum((table[:, 5] + table[:, 6]*T[..., None])*numpy.sin(angles), axis=-1)
+    deps = numpy.sum((table[:, 7] + table[:, 8]*T[..., None])*numpy.cos(angles), axis=-1)
+
+    return dpsi*unit_arcsec, deps*unit_arcsec
+
+
+# ---------------------------
+# ----- the daily table -----
+# ---------------------------
+
+
+def keep(some_days, evaluate):
+    """The (dpsi, deps) of days, from the table or evaluated and added to it
+
+    The table is read before and written after the series is evaluated,
+    each under days_lock, and emptied first if it would be too large.
+    The values returned are never read back after emptying it.
+
+    Args:
+        some_days (list): of int day numbers
+        evaluate (callable): the list of (dpsi, deps) of a list of day numbers
+
+    Returns: list of (dpsi, deps) in arcseconds, one per day
+    """
+
+    with days_lock:
+        found = dict((d, days[d]) for d in some_days if d in days)
+
+    missing = [d for d in some_days if d not in found]
+
+    if missing:
+        found.update(zip(missing, evaluate(missing)))
+
+        with days_lock:
+            if len(days) + len(missing) > max_days:
+                days.clear()
+
+            days.update((d, found[d]) for d in missing)
+
+    return [found[d] for d in some_days]
+
+
+def daily(a_julian_date):
+    """The nutation and true obliquity of an instant, interpolated
+
+    The series at 0h UT of the day before and after, from the table or
+    evaluated once and kept.
+
+    Args:
+        a_julian_date (float): of the instant
+
+    Returns: (dpsi, deps, eps) in arcseconds, arcseconds and degrees,
+        eps the true obliquity
+    """
+
+    a_day = int(math.floor(a_julian_date - 0.5))
+    fraction = a_julian_date - 0.5 - a_day
+
+    (dpsi0, deps0), (dpsi1, deps1) = keep([a_day, a_day + 1], lambda missing: [nutation(d + 0.5) for d in missing])
+
+    dpsi = dpsi0 + fraction*(dpsi1 - dpsi0)
+    deps = deps0 + fraction*(deps1 - deps0)
+
+    return dpsi, deps, mean_obliquity(julian_century(a_julian_date)) + deps/3600.0
+
+
+def daily_array(julian_dates):
+    """The nutation and true obliquity of many instants, interpolated
+
+    As daily, with the series evaluated once for all the days missing
+    from the table.
+
+    Args:
+        julian_dates (numpy.ndarray): of the instants, any shape
+
+    Returns: (dpsi, deps, eps) numpy.ndarray in arcseconds, arcseconds
+        and degrees, the shape of julian_dates
+    """
+
+    julian_dates = numpy.asarray(julian_dates, dtype=float)
+
+    some_days = numpy.floor(julian_dates - 0.5)
+    fractions = julian_dates - 0.5 - some_days
+
+    needed, inverse = numpy.unique(numpy.concatenate((some_days.ravel(), some_days.ravel() + 1)), return_inverse=True)
+    needed = needed.astype(int).tolist()
+
+    def evaluate(missing):
+        dpsis, depss = nutation_array(numpy.array(missing) + 0.5)
+        return list(zip(dpsis.tolist(), depss.tolist()))
+
+    values = numpy.array(keep(needed, evaluate)).reshape(-1, 2)[inverse]
+    before, after = numpy.split(values, 2)
+
+    dpsi = (before[:, 0] + fractions.ravel()*(after[:, 0] - before[:, 0])).reshape(julian_dates.shape)
+    deps = (before[:, 1] + fractions.ravel()*(after[:, 1] - before[:, 1])).reshape(julian_dates.shape)
+
+    return dpsi, deps, mean_obliquity(julian_century(julian_dates)) + deps/3600.0
+
+
+def equation_of_equinoxes(a_julian_date):
+    """The apparent less the mean sidereal time, dpsi cos(eps)
+
+    Args:
+        a_julian_date (float): of the instant
+
+    Returns: float hours
+    """
+
+    dpsi, deps, eps = daily(a_julian_date)
+
+    return dpsi*math.cos(math.radians(eps))/15.0/3600.0
+
+
+def equation_of_equinoxes_array(julian_dates):
+    """equation_of_equinoxes of many instants
+
+    Returns: numpy.ndarray hours, the shape of julian_dates
+    """
+
+    dpsi, deps, eps = daily_array(julian_dates)
+
+    return dpsi*numpy.cos(numpy.radians(eps))/15.0/3600.0
+
+
+# -----------------------------
+# ----- the apparent place -----
+# -----------------------------
+
+
+def equatorial_nutation_array(ras, decs, julian_dates):
+    """Corrections of RA and Dec for nutation, Meeus eq. 23.1
+
+    Not for stars near the poles, where the corrections of RA are
+    large, see Meeus p. 151.
+
+    Args:
+        ras (numpy.ndarray): mean right ascension of date in hours
+        decs (numpy.ndarray): mean declination of date in degrees
+        julian_dates (numpy.ndarray): of the instants, or one for all
+
+    Returns: (dra, ddec) numpy.ndarray in arcseconds, dra of arc
+    """
+
+    dpsi, deps, eps = daily_array(julian_dates)
+
+    alpha = numpy.radians(numpy.asarray(ras, dtype=float)*15)
+    delta = numpy.radians(numpy.asarray(decs, dtype=float))
+    eps = numpy.radians(eps)
+
+    dra = (numpy.cos(eps) + numpy.sin(eps)*numpy.sin(alpha)*numpy.tan(delta))*dpsi - numpy.cos(alpha)*numpy.tan(delta)*deps
+    ddec = numpy.sin(eps)*numpy.cos(alpha)*dpsi + numpy.sin(alpha)*deps
+
+    return dra, ddec
+
+
+def aberration_array(ras, decs, julian_dates):
+    """Corrections of RA and Dec for annual aberration, Meeus eq. 23.3
+
+    With the eccentricity of the earth's orbit, the Sun's true
+    longitude of Meeus chapter 25 and the true obliquity.
+
+    Args:
+        ras (numpy.ndarray): right ascension in hours
+        decs (numpy.ndarray): declination in degrees
+        julian_dates (numpy.ndarray): of the instants, or one for all
+
+    Returns: (dra, ddec) numpy.ndarray in arcseconds, dra of arc
+    """
+
+    julian_dates = numpy.asarray(julian_dates, dtype=float)
+    T = julian_century(julian_dates)
+
+    L0 = 280.46646 + T*(36000.76983 + T*0.0003032)
+    M = numpy.radians(357.52911 + T*(35999.05029 - T*0.0001537))
+    C = (1.914602 - T*(0.004817 + T*0.000014))*numpy.sin(M) + (0.019993 - T*0.000101)*numpy.sin(2*M) + 0.000289*numpy.sin(3*M)
+
+    sun = numpy.radians(L0 + C)
+    e = 0.016708634 - T*(0.000042037 + T*0.0000001267)
+    perihelion = numpy.radians(102.93735 + T*(1.71946 + T*0.00046))
+
+    eps = numpy.radians(daily_array(julian_dates)[2])
+
+    alpha = numpy.radians(numpy.asarray(ras, dtype=float)*15)
+    delta = numpy.radians(numpy.asarray(decs, dtype=float))
+
+    k = aberration_arcsec
+
+    dra = (-k*(numpy.cos(alpha)*numpy.cos(sun)*numpy.cos(eps) + numpy.sin(alpha)*numpy.sin(sun))
+           + e*k*(numpy.cos(alpha)*numpy.cos(perihelion)*numpy.cos(eps) + numpy.sin(alpha)*numpy.sin(perihelion)))/numpy.cos(delta)
+
+    tilt = numpy.tan(eps)*numpy.cos(delta) - numpy.sin(alpha)*numpy.sin(delta)
+
+    ddec = (-k*(numpy.cos(sun)*numpy.cos(eps)*tilt + numpy.cos(alpha)*numpy.sin(delta)*numpy.sin(sun))
+            + e*k*(numpy.cos(perihelion)*numpy.cos(eps)*tilt + numpy.cos(alpha)*numpy.sin(delta)*numpy.sin(perihelion)))
+
+    return dra, ddec
+
+
+# ----------------------
+# ----- the coords -----
+# ----------------------
+
+
+def NutationAndObliquity(a_datetime):
+    """The nutation and true obliquity of an instant
+
+    Args:
+
+    a_datetime (coords.datetime): The time of the observation.
+
+    Returns: (coords.angle, coords.angle, coords.angle) the nutation in
+    longitude, in obliquity and the true obliquity
+    """
+
+    import coords # deferred, the functions above do not need it
+
+    dpsi, deps, eps = daily(a_datetime.toJulianDate())
+
+    return coords.angle(dpsi/3600.0), coords.angle(deps/3600.0), coords.angle(eps)
+
+
+# ================
+# ===== main =====
+# ================
+
+
+if __name__ == '__main__':
+
+    import coords
+
+    parser = argparse.ArgumentParser(description='Nutation and the obliquity of the ecliptic')
+
+    parser.add_argument('datetime', type=str, help='ISO 8601 date and time')
+
+    args = parser.parse_args()
+
+    a_julian_date = coords.datetime(args.datetime).toJulianDate()
+
+    dpsi, deps = nutation(a_julian_date)
+    eps0 = mean_obliquity(julian_century(a_julian_date))
+
+    print('Julian date', a_julian_date)
+    print('nutation in longitude {:.3f}"'.format(dpsi))
+    print('nutation in obliquity {:.3f}"'.format(deps))
+    print('mean obliquity', coords.angle(eps0))
+    print('true obliquity', coords.angle(eps0 + deps/3600.0))
+    print('equation of the equinoxes {:.4f} s'.format(equation_of_equinoxes(a_julian_date)*3600))
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+"""Precession of equatorial coordinates between epochs
+
+The rigorous method of Meeus chapter 21, the IAU 1976 angles zeta, z
+and theta of eq. 21.2 from any starting epoch, as a rotation matrix.
+The matrix of a pair of epochs is built once and kept, see matrix, so
+a catalog precessed to the date of a query costs one matrix build and
+one matrix multiply of its unit vectors. The dates of queries are all
+different, so those callers round them with of_date and share a matrix
+a day, 0.07 arcseconds at most from that of the exact date:
+
+    ras, decs = Precession.precess_array(catalog_ras, catalog_decs, Precession.J2000, Precession.of_date(a_julian_date))
+
+EquatorialHorizon.toHorizon precesses a catalog position to the date
+of the observation with an_epoch=Precession.J2000. Proper motion and
+the apparent place corrections, Nutation.py, are not applied.
+
+References:
+
+    Meeus, Astronomical Algorithms 2ed., chapter 21 Precession
+
+to run:
+
+    ./pylaunch.sh Precession.py -- 02:44:11.986 49:13:42.48 2028-11-13T04:33:36
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import argparse
+import math
+
+import Transforms.lazy
+
+numpy = Transforms.lazy.Module('numpy') # imported on first use, only the bulk callers need it
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+J2000 = 2451545.0 # Julian date of the standard epoch
+B1950 = 2433282.4235 # Julian date of the Besselian epoch 1950.0
+
+matrices = dict() # (from, to) Julian dates to the precession matrix, see matrix
+max_matrices = 1000 # kept before matrices is emptied
+
+epoch_days = 1.0 # the dates of queries are rounded to, see of_date
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def angles(a_from, a_to):
+    """Meeus eq. 21.2, the precession angles between two epochs
+
+    Args:
+        a_from (float): Julian date of the starting epoch
+        a_to (float): Julian date of the final epoch
+
+    Returns: (zeta, z, theta) in arcseconds
+    """
+
+    T = (a_from - J2000)/36525.0
+    t = (a_to - a_from)/36525.0
+
+    zeta = (2306.2181 + T*(1.39656 - T*0.000139))*t + (0.30188 - T*0.000344)*t*t + 0.017998*t*t*t
+    z = (2306.2181 + T*(1.39656 - T*0.000139))*t + (1.09468 + T*0.000066)*t*t + 0.018203*t*t*t
+    theta = (2004.3109 - T*(0.85330 + T*0.000217))*t - (0.42665 + T*0.000217)*t*t - 0.041833*t*t*t
+
+    return zeta, z, theta
+
+
+def of_date(a_julian_date):
+    """The epoch of a query's date, rounded so that its matrix is kept
+
+    Precession is about 50 arcseconds a year, so epoch_days of a day
+    moves a position by 0.07 arcseconds at most.
+
+    Args:
+        a_julian_date (float): of the query
+
+    Returns: the nearest multiple of epoch_days
+    """
+
+    return math.floor(a_julian_date/epoch_days + 0.5)*epoch_days
+
+
+def matrix(a_from, a_to):
+    """The precession matrix between two epochs, built on first use
+
+    Rotates equatorial unit vectors of the mean equator and equinox of
+    a_from to those of a_to, R3(-z) R2(theta) R3(-zeta), Meeus eq. 21.4
+    as a rotation.
+
+    Args:
+        a_from (float): Julian date of the starting epoch
+        a_to (float): Julian date of the final epoch
+
+    Returns: numpy.ndarray 3 by 3, read only
+
+    The pair is the key of matrices, so a date that varies per query
+    should be rounded with of_date first.
+    """
+
+    a_matrix = matrices.get((a_from, a_to))
+
+    if a_matrix is None:
+
+        zeta, z, theta = [math.radians(an_angle/3600.0) for an_angle in angles(a_from, a_to)]
+
+        cz, sz = math.cos(zeta), math.sin(zeta)
+        cZ, sZ = math.cos(z), math.sin(z)
+        ct, st = math.cos(theta), math.sin(theta)
+
+        a_matrix = numpy.array([[cZ*ct*cz - sZ*sz, -cZ*ct*sz - sZ*cz, -cZ*st],
+                                [sZ*ct*cz + cZ*sz, -sZ*ct*sz + cZ*cz, -sZ*st],
+                                [st*cz, -st*sz, ct]])
+
+        a_matrix.flags.writeable = False
+
+        if len(matrices) >= max_matrices:
+            matrices.clear()
+
+        matrices[(a_from, a_to)] = a_matrix
+
+    return a_matrix
+
+
+def precess_units(units, a_from, a_to):
+    """Precess unit vectors
+
+    Args:
+        units (numpy.ndarray): N by 3 equatorial unit vectors, or one
+        a_from (float): Julian date of their epoch
+        a_to (float): Julian date of the epoch wanted
+
+    Returns: numpy.ndarray of the same shape
+    """
+
+    return numpy.dot(units, matrix(a_from, a_to).T)
+
+
+def precess_array(ras, decs, a_from, a_to):
+    """Precess right ascensions and declinations
+
+    Args:
+        ras (numpy.ndarray): right ascension in hours
+        decs (numpy.ndarray): declination in degrees
+        a_from (float): Julian date of their epoch, e.g. J2000
+        a_to (float): Julian date of the epoch wanted
+
+    Returns: (ras, decs) numpy.ndarray, hours 0 to 24 and degrees
+    """
+
+    alpha = numpy.radians(numpy.asarray(ras, dtype=float)*15)
+    delta = numpy.radians(numpy.asarray(decs, dtype=float))
+
+    units = numpy.stack((numpy.cos(delta)*numpy.cos(alpha), numpy.cos(delta)*numpy.sin(alpha), numpy.sin(delta)), axis=-1)
+
+    units = precess_units(units, a_from, a_to)
+
+    ras = numpy.mod(numpy.degrees(numpy.arctan2(units[..., 1], units[..., 0]))/15, 24.0)
+    decs = numpy.degrees(numpy.arcsin(numpy.clip(units[..., 2], -1, 1)))
+
+    return ras, decs
+
+
+def Precess(an_object, a_from, a_to):
+    """Precess an equatorial position
+
+    Args:
+
+    an_object (coords.spherical): the RA and Dec as a spherical
+    coordinate where theta is the complement of the declination and
+    phi is the RA in degrees. See utils.radec2spherical.
+
+    a_from (float): Julian date of its epoch, e.g. J2000
+
+    a_to (float): Julian date of the epoch wanted, e.g. a_datetime.toJulianDate()
+
+    Returns: coords.spherical of the same radius
+    """
+
+    import coords # deferred, the functions above do not need it
+
+    if not isinstance(an_object, coords.spherical):
+        raise Error('object must be in spherical coordinates')
+
+    ras, decs = precess_array([an_object.phi.degrees/15.0], [an_object.theta.complement().degrees], a_from, a_to)
+
+    return coords.spherical(an_object.r, coords.angle(90.0 - decs[0]), coords.angle(ras[0]*15.0))
+
+
+# ================
+# ===== main =====
+# ================
+
+
+if __name__ == '__main__':
+
+    import coords
+
+    import Transforms.utils
+
+    parser = argparse.ArgumentParser(description='Precess an equatorial position from J2000')
+
+    parser.add_argument('ra', type=str, help='right ascension in hours')
+    parser.add_argument('dec', type=str, help='declination in degrees')
+    parser.add_argument('datetime', type=str, help='ISO 8601 date and time of the epoch wanted')
+
+    args = parser.parse_args()
+
+    ras, decs = precess_array([Transforms.utils.dms2degrees(args.ra, (0, 24), 'ra')],
+                              [Transforms.utils.dms2degrees(args.dec, Transforms.utils.latitude_limits, 'dec')],
+                              J2000, coords.datetime(args.datetime).toJulianDate())
+
+    print('RA:', coords.angle(ras[0]), ', Dec:', coords.angle(decs[0]))
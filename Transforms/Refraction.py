@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+
+"""Atmospheric refraction of altitudes
+
+Meeus chapter 16. Bennett's formula, eq. 16.3, gives the refraction of
+an apparent, observed, altitude and Saemundsson's, eq. 16.4, that of a
+geometric, true, altitude, both in arcminutes for 10 C and 1010 mbar
+and scaled to another temperature and pressure by eq. 16.5. Each has
+the constant of Meeus p. 106 added so that there is no refraction at
+the zenith. The two agree within 0.07 arcminutes at 10 C and 1010 mbar
+but not once scaled, so toApparent refines Saemundsson's altitude with
+Newton's method on Bennett's formula and toGeometric of toApparent is
+the altitude given, for pointing lists at any temperature and pressure.
+
+    an_apparent = Refraction.toApparent(a_geometric)
+    apparents = Refraction.toApparent_array(geometrics, temperatures, pressures)
+
+The formulas are for the visible sky. Below min_altitude the
+refraction of min_altitude is tapered linearly to none at zero_altitude,
+see taper, so that a body well below the horizon is not lifted by it.
+The taper is gentle enough that toGeometric still increases with the
+altitude and toApparent can invert it.
+
+EquatorialHorizon.toHorizon, toEquatorial and toEquatorial_array and
+SunPosition.RiseAndSet apply it with a_refraction=(temperature,
+pressure), e.g. Refraction.standard. Their altitudes are geometric
+without it.
+
+References:
+
+    Meeus, Astronomical Algorithms 2ed., chapter 16 Atmospheric Refraction
+
+to run:
+
+    ./pylaunch.sh Refraction.py -- 0:30
+    ./pylaunch.sh Refraction.py --toGeometric --temperature -10 --pressure 980 -- 0:30
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import argparse
+import math
+
+import Transforms.lazy
+
+numpy = Transforms.lazy.Module('numpy') # imported on first use, only the bulk callers need it
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+standard_temperature = 10.0 # Celsius, of the formulas
+standard_pressure = 1010.0 # millibars, of the formulas
+
+standard = (standard_temperature, standard_pressure) # a_refraction of the transforms
+
+min_altitude = -1.0 # degrees, the lowest the formulas are used at
+zero_altitude = -3.0 # degrees, no refraction below, see taper
+
+newton_iterations = 5 # of toApparent, from Saemundsson's altitude, two more for the taper's corners
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def scale(a_temperature=standard_temperature, a_pressure=standard_pressure):
+    """Meeus eq. 16.5, the refraction at a temperature and pressure over the standard one
+
+    Args:
+        a_temperature (float): Celsius
+        a_pressure (float): millibars
+
+    Returns: the factor, 1 for the standard atmosphere
+    Raises: Error if the temperature is below absolute zero or the pressure negative
+    """
+
+    if a_temperature <= -273.0 or a_pressure < 0:
+        raise Error('unsupported temperature {} C or pressure {} mbar'.format(a_temperature, a_pressure))
+
+    return (a_pressure/standard_pressure)*(283.0/(273.0 + a_temperature))
+
+
+def taper(an_altitude):
+    """The fraction of the refraction of min_altitude used below it
+
+    Args:
+        an_altitude (float): degrees
+
+    Returns: 1 at and above min_altitude, 0 at and below zero_altitude
+    """
+
+    return min(1.0, max(0.0, (an_altitude - zero_altitude)/(min_altitude - zero_altitude)))
+
+
+def bennett(an_apparent, a_temperature=standard_temperature, a_pressure=standard_pressure):
+    """Meeus eq. 16.3, the refraction of an apparent altitude
+
+    Args:
+        an_apparent (float): apparent altitude in degrees
+        a_temperature (float): Celsius
+        a_pressure (float): millibars
+
+    Returns: refraction in arcminutes
+    """
+
+    h = max(an_apparent, min_altitude)
+
+    R = 1.0/math.tan(math.radians(h + 7.31/(h + 4.4))) + 0.0013515
+
+    return R*taper(an_apparent)*scale(a_temperature, a_pressure)
+
+
+def saemundsson(a_geometric, a_temperature=standard_temperature, a_pressure=standard_pressure):
+    """Meeus eq. 16.4, the refraction of a geometric altitude
+
+    Args:
+        a_geometric (float): geometric altitude in degrees
+        a_temperature (float): Celsius
+        a_pressure (float): millibars
+
+    Returns: refraction in arcminutes
+    """
+
+    h = max(a_geometric, min_altitude)
+
+    R = 1.02/math.tan(math.radians(h + 10.3/(h + 5.11))) + 0.0019279
+
+    return R*taper(a_geometric)*scale(a_temperature, a_pressure)
+
+
+def bennett_slope(an_apparent, a_temperature=standard_temperature, a_pressure=standard_pressure):
+    """The derivative of bennett
+
+    Args:
+        an_apparent (float): apparent altitude in degrees
+        a_temperature (float): Celsius
+        a_pressure (float): millibars
+
+    Returns: arcminutes of refraction per degree of altitude, that of
+        the taper below min_altitude
+    """
+
+    if an_apparent <= zero_altitude:
+        return 0.0
+
+    if an_apparent < min_altitude:
+        return bennett(min_altitude, a_temperature, a_pressure)/(min_altitude - zero_altitude)
+
+    x = math.radians(an_apparent + 7.31/(an_apparent + 4.4))
+
+    return -math.radians(1.0 - 7.31/(an_apparent + 4.4)**2)/math.sin(x)**2*scale(a_temperature, a_pressure)
+
+
+def toApparent(a_geometric, a_temperature=standard_temperature, a_pressure=standard_pressure):
+    """The apparent altitude of a geometric one
+
+    Saemundsson's, refined so that toGeometric returns a_geometric.
+
+    Args:
+        a_geometric (float): geometric altitude in degrees
+        a_temperature (float): Celsius
+        a_pressure (float): millibars
+
+    Returns: apparent altitude in degrees
+    """
+
+    an_apparent = a_geometric + saemundsson(a_geometric, a_temperature, a_pressure)/60.0
+
+    for i in range(newton_iterations):
+        an_apparent -= (toGeometric(an_apparent, a_temperature, a_pressure) - a_geometric) \
+                       / (1.0 - bennett_slope(an_apparent, a_temperature, a_pressure)/60.0)
+
+    return an_apparent
+
+
+def toGeometric(an_apparent, a_temperature=standard_temperature, a_pressure=standard_pressure):
+    """The geometric altitude of an apparent one
+
+    Args:
+        an_apparent (float): apparent altitude in degrees
+        a_temperature (float): Celsius
+        a_pressure (float): millibars
+
+    Returns: geometric altitude in degrees
+    """
+
+    return an_apparent - bennett(an_apparent, a_temperature, a_pressure)/60.0
+
+
+def scale_array(temperatures, pressures):
+    """scale with numpy, see scale
+
+    Raises: Error if a temperature is below absolute zero or a pressure negative
+    """
+
+    temperatures = numpy.asarray(temperatures, dtype=numpy.float64)
+    pressures = numpy.asarray(pressures, dtype=numpy.float64)
+
+    if numpy.any(temperatures <= -273.0) or numpy.any(pressures < 0):
+        raise Error('unsupported temperature or pressure')
+
+    return (pressures/standard_pressure)*(283.0/(273.0 + temperatures))
+
+
+def taper_array(altitudes):
+    """taper with numpy"""
+
+    return numpy.clip((numpy.asarray(altitudes, dtype=numpy.float64) - zero_altitude)/(min_altitude - zero_altitude), 0.0, 1.0)
+
+
+def bennett_array(apparents, temperatures=standard_temperature, pressures=standard_pressure):
+    """bennett with numpy for a pointing list
+
+    The arguments broadcast, so one temperature and pressure can be
+    scalars or each altitude can have its own.
+
+    Args:
+        apparents (numpy.ndarray): apparent altitudes in degrees
+        temperatures (numpy.ndarray): Celsius
+        pressures (numpy.ndarray): millibars
+
+    Returns: numpy.ndarray of refractions in arcminutes
+    """
+
+    h = numpy.maximum(apparents, min_altitude)
+
+    R = 1.0/numpy.tan(numpy.radians(h + 7.31/(h + 4.4))) + 0.0013515
+
+    return R*taper_array(apparents)*scale_array(temperatures, pressures)
+
+
+def saemundsson_array(geometrics, temperatures=standard_temperature, pressures=standard_pressure):
+    """saemundsson with numpy for a pointing list, see bennett_array"""
+
+    h = numpy.maximum(geometrics, min_altitude)
+
+    R = 1.02/numpy.tan(numpy.radians(h + 10.3/(h + 5.11))) + 0.0019279
+
+    return R*taper_array(geometrics)*scale_array(temperatures, pressures)
+
+
+def bennett_slope_array(apparents, temperatures=standard_temperature, pressures=standard_pressure):
+    """bennett_slope with numpy, see bennett_array"""
+
+    h = numpy.maximum(apparents, min_altitude)
+    x = numpy.radians(h + 7.31/(h + 4.4))
+
+    slopes = -numpy.radians(1.0 - 7.31/(h + 4.4)**2)/numpy.sin(x)**2*scale_array(temperatures, pressures)
+
+    tapers = numpy.where(numpy.asarray(apparents) > zero_altitude,
+                         bennett_array(min_altitude, temperatures, pressures)/(min_altitude - zero_altitude), 0.0)
+
+    return numpy.where(numpy.asarray(apparents) < min_altitude, tapers, slopes)
+
+
+def toApparent_array(geometrics, temperatures=standard_temperature, pressures=standard_pressure):
+    """toApparent with numpy, see bennett_array
+
+    Returns: numpy.ndarray of apparent altitudes in degrees
+    """
+
+    geometrics = numpy.asarray(geometrics, dtype=numpy.float64)
+
+    apparents = geometrics + saemundsson_array(geometrics, temperatures, pressures)/60.0
+
+    for i in range(newton_iterations):
+        apparents = apparents - (toGeometric_array(apparents, temperatures, pressures) - geometrics) \
+                                / (1.0 - bennett_slope_array(apparents, temperatures, pressures)/60.0)
+
+    return apparents
+
+
+def toGeometric_array(apparents, temperatures=standard_temperature, pressures=standard_pressure):
+    """toGeometric with numpy, see bennett_array
+
+    Returns: numpy.ndarray of geometric altitudes in degrees
+    """
+
+    apparents = numpy.asarray(apparents, dtype=numpy.float64)
+
+    return apparents - bennett_array(apparents, temperatures, pressures)/60.0
+
+
+# ================
+# ===== main =====
+# ================
+
+
+if __name__ == '__main__':
+
+    import Transforms.utils
+
+    parser = argparse.ArgumentParser(description='Refract an altitude')
+
+    parser.add_argument('altitude', type=str, help='geometric altitude in degrees, apparent with --toGeometric')
+    parser.add_argument('--toGeometric', action='store_true', help='apparent to geometric [%(default)s]')
+    parser.add_argument('--temperature', type=float, default=standard_temperature, help='Celsius [%(default)s]')
+    parser.add_argument('--pressure', type=float, default=standard_pressure, help='millibars [%(default)s]')
+
+    args = parser.parse_args()
+
+    an_altitude = Transforms.utils.dms2degrees(args.altitude, Transforms.utils.latitude_limits, 'altitude')
+
+    if args.toGeometric:
+        print('Geometric altitude:', toGeometric(an_altitude, args.temperature, args.pressure))
+
+    else:
+        print('Apparent altitude:', toApparent(an_altitude, args.temperature, args.pressure))
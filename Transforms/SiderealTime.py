@@ -22,8 +22,12 @@ import math
 
 import coords
 import Transforms.EclipticEquatorial
+import Transforms.Nutation
+import Transforms.lazy
 import Transforms.utils
 
+numpy = Transforms.lazy.Module('numpy') # imported on first use, only the bulk callers need it
+
 
 class Error(Exception):
     pass
@@ -171,20 +175,29 @@ class USNO_C163(object):
 
 
     @classmethod
-    def GAST(cls, a_datetime):
+    def GAST(cls, a_datetime, a_nutation=False):
         """Greenwich apparent sidereal time
 
         http://aa.usno.navy.mil/faq/docs/GAST.php
 
+        The equation of the equinoxes is the USNO two term
+        approximation, within about 0.05 seconds, or with a_nutation
+        the IAU 1980 nutation from the daily table of Nutation.py.
+
         Args:
 
         a_datetime: local date and time of the observation.
 
+        a_nutation (bool): the full nutation
+
         Returns GMST as an angle in hours
         """
 
         gmst = cls.GMST(a_datetime)
 
+        if a_nutation:
+            return gmst + coords.angle(Transforms.Nutation.equation_of_equinoxes(a_datetime.toJulianDate()))
+
         JD, JDo = cls.JulianDate0(a_datetime)
         D = JD - a_datetime.J2000
         eps = cls.obliquity(a_datetime) # TODO JPL eps? EclipticEquatorial.eps(a_datetime)
@@ -197,6 +210,44 @@ class USNO_C163(object):
         return gast
 
 
+    @classmethod
+    def GAST_array(cls, julian_dates, a_nutation=False):
+        """Greenwich apparent sidereal time of many instants
+
+        GAST with numpy, for bulk transforms of rows that each have
+        their own time.
+
+        Args:
+        julian_dates (numpy.ndarray): Julian dates of the observations, UT
+        a_nutation (bool): the full nutation, see GAST
+
+        Returns (numpy.ndarray): GAST in hours, 0 to 24
+        """
+
+        JD = numpy.asarray(julian_dates, dtype=numpy.float64)
+
+        JDfloor = numpy.floor(JD)
+        JDo = numpy.where(JD - JDfloor >= 0.5, JDfloor + 0.5, JDfloor - 0.5) # previous midnight
+
+        D = JD - cls.J2000.toJulianDate()
+        Do = JDo - cls.J2000.toJulianDate()
+        H = (JD - JDo)*24
+        T = D/36525
+
+        gmst = 6.697374558 + 0.06570982441908*Do + 1.00273790935*H + 0.000026*T*T
+
+        if a_nutation:
+            return (gmst + Transforms.Nutation.equation_of_equinoxes_array(JD)) % 24
+
+        eps = numpy.radians(23.4393 - 0.0000004*D)
+        L = numpy.radians(280.47 + 0.98565*D)
+        omega = numpy.radians(125.04 - 0.052954*D)
+
+        eqeq = (-0.000319*numpy.sin(omega) - 0.000024*numpy.sin(2*L))*numpy.cos(eps)
+
+        return (gmst + eqeq) % 24
+
+
     @classmethod
     def LSTM(cls, an_observer, a_datetime):
         """Local sidereal time, mean
@@ -221,7 +272,7 @@ class USNO_C163(object):
 
 
     @classmethod
-    def LSTA(cls, an_observer, a_datetime):
+    def LSTA(cls, an_observer, a_datetime, a_nutation=False):
         """Local sidereal time, apparent
 
         Args:
@@ -233,11 +284,13 @@ class USNO_C163(object):
 
         a_datetime (coords.datetime): The time of the observation.
 
+        a_nutation (bool): the full nutation, see GAST
+
         Returns (coords.angle): LSTA as an angle in hours
 
         """
 
-        gast = cls.GAST(a_datetime)
+        gast = cls.GAST(a_datetime, a_nutation)
         lst = gast + coords.angle(an_observer.phi.degrees/15) # TODO use RA?
         lst.normalize(0, 24)
         return lst
@@ -299,5 +352,6 @@ if __name__ == '__main__':
 
     print('GMST', USNO_C163.GMST(a_datetime))
     print('GAST', USNO_C163.GAST(a_datetime))
+    print('GAST IAU 1980 nutation', USNO_C163.GAST(a_datetime, a_nutation=True))
     print('LSTM', USNO_C163.LSTM(an_observer, a_datetime))
     print('LSTA', USNO_C163.LSTA(an_observer, a_datetime))
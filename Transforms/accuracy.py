@@ -0,0 +1,450 @@
+#!/usr/bin/env python
+
+"""Accuracy against speed for the faster or alternative paths
+
+Each comparison runs a candidate, a faster or alternative algorithm,
+and the reference implementation on the same sample of instants and
+observers (see benchmark.make_inputs). It reports the maximum and RMS
+error in arcseconds, for directions, or seconds of time, next to how
+much faster the candidate is. Fixtures compare a function to
+published values.
+
+A comparison with a budget fails if its maximum or RMS error is over
+it. Those without one are only reported, like the APC variants that
+are known to be off.
+
+to run:    ./pylaunch.sh accuracy.py
+samples:   ./pylaunch.sh accuracy.py --samples 2000
+some:      ./pylaunch.sh accuracy.py -k GMST
+
+The exit status is 1 if any budget is exceeded.
+
+Bodies/accuracy.py has the sun and moon comparisons.
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import argparse
+import math
+import sys
+
+import coords
+
+import Transforms.APCTransforms
+import Transforms.EclipticEquatorial
+import Transforms.EquatorialHorizon
+import Transforms.Nutation
+import Transforms.Precession
+import Transforms.Refraction
+import Transforms.SiderealTime
+import Transforms.benchmark
+import Transforms.utils
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+default_samples = 500
+
+
+# ==================
+# ===== errors =====
+# ==================
+
+
+def separation_arcsec(a_reference, a_candidate):
+    """Angle between two directions in arcseconds
+
+    Uses the haversine so small separations keep their precision. The
+    radii are ignored.
+
+    Args:
+        a_reference (coords.spherical): a direction
+        a_candidate (coords.spherical): another
+
+    Returns: float
+    """
+
+    lat1 = math.radians(90 - a_reference.theta.degrees)
+    lat2 = math.radians(90 - a_candidate.theta.degrees)
+    dlon = math.radians(a_candidate.phi.degrees - a_reference.phi.degrees)
+
+    h = math.sin((lat2 - lat1)/2)**2 + math.cos(lat1)*math.cos(lat2)*math.sin(dlon/2)**2
+
+    return math.degrees(2*math.asin(min(1.0, math.sqrt(h))))*3600
+
+
+def hours_seconds(a_reference, a_candidate):
+    """Difference of two angles in hours, in seconds of time, across 0/24h
+
+    Args:
+        a_reference (coords.angle): in hours, like GMST
+        a_candidate (coords.angle): in hours
+
+    Returns: float
+    """
+
+    difference = (a_candidate.degrees - a_reference.degrees + 12) % 24 - 12
+
+    return difference*3600
+
+
+def seconds_of_time(a_reference, a_candidate):
+    """Difference of two times given in seconds"""
+
+    return a_candidate - a_reference
+
+
+units = {separation_arcsec: 'arcsec',
+         hours_seconds: 's',
+         seconds_of_time: 's'}
+
+
+# =======================
+# ===== comparisons =====
+# =======================
+
+
+def toEquatorial_array(x):
+    """EquatorialHorizon.toEquatorial_array of one input as a coords.spherical"""
+
+    ras, decs = Transforms.EquatorialHorizon.toEquatorial_array(
+        [x['horizon'].phi.degrees], [x['horizon'].theta.complement().degrees],
+        x['observer'].theta.complement().degrees, x['observer'].phi.degrees,
+        Transforms.SiderealTime.USNO_C163.GAST_array([x['datetime'].inTimezoneOffset(0).toJulianDate()]))
+
+    return Transforms.utils.radec2spherical(coords.angle(ras[0]), coords.angle(decs[0]))
+
+
+def refraction_round_trip(x):
+    """Refraction.toGeometric of toApparent of the horizon direction of one input"""
+
+    an_altitude = Transforms.Refraction.toGeometric(Transforms.Refraction.toApparent(x['horizon'].theta.complement().degrees))
+
+    return Transforms.utils.azalt2spherical(x['horizon'].phi, coords.angle(an_altitude))
+
+
+def GAST_nutation_series(x):
+    """GAST with the equation of the equinoxes from the full series, not the daily table"""
+
+    a_julian_date = x['datetime'].toJulianDate()
+
+    dpsi, deps = Transforms.Nutation.nutation(a_julian_date)
+    eps = Transforms.Nutation.mean_obliquity(Transforms.Nutation.julian_century(a_julian_date)) + deps/3600.0
+
+    return Transforms.SiderealTime.USNO_C163.GMST(x['datetime']) + coords.angle(dpsi*math.cos(math.radians(eps))/15.0/3600.0)
+
+
+# name to
+#     reference: function of one input dictionary, the current implementation
+#     candidate: function of one input dictionary, the faster or alternative path
+#     error: separation_arcsec, hours_seconds or seconds_of_time
+#     budget: maximum and RMS error allowed, None to only report
+#     timed: False when the speed comparison means nothing, like a round trip
+
+comparisons = {
+
+    # the same formula rearranged, only the T**2 term differs: < 10 ms of time 1990 to 2030
+    'SiderealTime.USNO_C163.GMST_simplified': {
+        'reference': lambda x: Transforms.SiderealTime.USNO_C163.GMST(x['datetime']),
+        'candidate': lambda x: Transforms.SiderealTime.USNO_C163.GMST_simplified(x['datetime']),
+        'error': hours_seconds,
+        'budget': {'max': 0.02, 'rms': 0.01}},
+
+    'SiderealTime.USNO_C163.GMST_simplified2': {
+        'reference': lambda x: Transforms.SiderealTime.USNO_C163.GMST(x['datetime']),
+        'candidate': lambda x: Transforms.SiderealTime.USNO_C163.GMST_simplified2(x['datetime']),
+        'error': hours_seconds,
+        'budget': {'max': 0.02, 'rms': 0.01}},
+
+    # IAU 1982 in seconds, APC p. 40
+    'APCTransforms.GMST': {
+        'reference': lambda x: Transforms.SiderealTime.USNO_C163.GMST(x['datetime']),
+        'candidate': lambda x: Transforms.APCTransforms.GMST(x['datetime']),
+        'error': hours_seconds,
+        'budget': {'max': 0.1, 'rms': 0.05}},
+
+    # Meeus 7.1 from the fields, in seconds: floating point only
+    'utils.julian_date': {
+        'reference': lambda x: x['datetime'].toJulianDate()*86400,
+        'candidate': lambda x: Transforms.utils.julian_date(x['datetime'].year, x['datetime'].month, x['datetime'].day,
+                                                            x['datetime'].hour, x['datetime'].minute, x['datetime'].second,
+                                                            x['datetime'].offset())*86400,
+        'error': seconds_of_time,
+        'budget': {'max': 0.01, 'rms': 0.005}},
+
+    # numpy versions for bulk rows, the same formulas: floating point only
+    'SiderealTime.USNO_C163.GAST_array': {
+        'reference': lambda x: Transforms.SiderealTime.USNO_C163.GAST(x['datetime']),
+        'candidate': lambda x: coords.angle(Transforms.SiderealTime.USNO_C163.GAST_array([x['datetime'].toJulianDate()])[0]),
+        'error': hours_seconds,
+        'budget': {'max': 0.001, 'rms': 0.001},
+        'timed': False},
+
+    # the USNO two term equation of the equinoxes against the IAU 1980 nutation
+    'SiderealTime.USNO_C163.GAST two terms': {
+        'reference': lambda x: Transforms.SiderealTime.USNO_C163.GAST(x['datetime'], a_nutation=True),
+        'candidate': lambda x: Transforms.SiderealTime.USNO_C163.GAST(x['datetime']),
+        'error': hours_seconds,
+        'budget': {'max': 0.05, 'rms': 0.02}},
+
+    # the daily table interpolated: < 0.011 arcseconds of nutation
+    'Nutation.daily': {
+        'reference': GAST_nutation_series,
+        'candidate': lambda x: Transforms.SiderealTime.USNO_C163.GAST(x['datetime'], a_nutation=True),
+        'error': hours_seconds,
+        'budget': {'max': 0.001, 'rms': 0.0005}},
+
+    'SiderealTime.USNO_C163.GAST_array nutation': {
+        'reference': lambda x: Transforms.SiderealTime.USNO_C163.GAST(x['datetime'], a_nutation=True),
+        'candidate': lambda x: coords.angle(Transforms.SiderealTime.USNO_C163.GAST_array([x['datetime'].toJulianDate()],
+                                                                                        a_nutation=True)[0]),
+        'error': hours_seconds,
+        'budget': {'max': 0.001, 'rms': 0.001},
+        'timed': False},
+
+    'EquatorialHorizon.toEquatorial_array': {
+        'reference': lambda x: Transforms.EquatorialHorizon.toEquatorial(x['horizon'], x['observer'], x['datetime']),
+        'candidate': toEquatorial_array,
+        'error': separation_arcsec,
+        'budget': {'max': 0.01, 'rms': 0.005},
+        'timed': False},
+
+    'EclipticEquatorial.Meeus.toEquatorial': {
+        'reference': lambda x: Transforms.EclipticEquatorial.toEquatorial(x['ecliptic'], x['datetime']),
+        'candidate': lambda x: Transforms.EclipticEquatorial.Meeus.toEquatorial(x['ecliptic'], x['datetime']),
+        'error': separation_arcsec,
+        'budget': None},
+
+    # round trips lose only floating point precision, most where acos is near 0 or 180
+    'EclipticEquatorial round trip': {
+        'reference': lambda x: x['ecliptic'],
+        'candidate': lambda x: Transforms.EclipticEquatorial.toEcliptic(
+            Transforms.EclipticEquatorial.toEquatorial(x['ecliptic'], x['datetime']), x['datetime']),
+        'error': separation_arcsec,
+        'budget': {'max': 0.05, 'rms': 0.01},
+        'timed': False},
+
+    'Precession round trip': {
+        'reference': lambda x: x['equatorial'],
+        'candidate': lambda x: Transforms.Precession.Precess(
+            Transforms.Precession.Precess(x['equatorial'], Transforms.Precession.J2000, x['datetime'].toJulianDate()),
+            x['datetime'].toJulianDate(), Transforms.Precession.J2000),
+        'error': separation_arcsec,
+        'budget': {'max': 0.01, 'rms': 0.005},
+        'timed': False},
+
+    # toApparent is Newton's method on toGeometric
+    'Refraction round trip': {
+        'reference': lambda x: x['horizon'],
+        'candidate': refraction_round_trip,
+        'error': separation_arcsec,
+        'budget': {'max': 0.001, 'rms': 0.001},
+        'timed': False},
+
+    'EquatorialHorizon round trip': {
+        'reference': lambda x: x['equatorial'],
+        'candidate': lambda x: Transforms.EquatorialHorizon.toEquatorial(
+            Transforms.EquatorialHorizon.toHorizon(x['equatorial'], x['observer'], x['datetime']),
+            x['observer'], x['datetime']),
+        'error': separation_arcsec,
+        'budget': {'max': 0.05, 'rms': 0.01},
+        'timed': False},
+}
+
+# name to
+#     function: of one input dictionary
+#     cases: list of (input dictionary, published value)
+#     error, budget: as above
+
+fixtures = {
+    # Meeus example 21.b, theta Persei with its proper motion to 2028 November 13.19 TD
+    'Precession.Precess Meeus': {
+        'function': lambda x: Transforms.Precession.Precess(x['equatorial'], Transforms.Precession.J2000, x['julian_date']),
+        'cases': [({'equatorial': Transforms.utils.radec2spherical(coords.angle(2, 44, 12.975), coords.angle(49, 13, 39.896)),
+                    'julian_date': 2462088.69},
+                   Transforms.utils.radec2spherical(coords.angle(41.547214/15), coords.angle(49.348483)))],
+        'error': separation_arcsec,
+        'budget': {'max': 0.05, 'rms': 0.05}},
+}
+
+
+# ==================
+# ===== runner =====
+# ==================
+
+
+def error_summary(errors):
+    """max and RMS of the absolute errors"""
+
+    if not errors:
+        return {'max': None, 'rms': None}
+
+    return {'max': max(abs(e) for e in errors),
+            'rms': math.sqrt(sum(e*e for e in errors)/len(errors))}
+
+
+def within_budget(a_summary, a_budget):
+    """True if there is no budget or the errors are within it"""
+
+    if a_budget is None:
+        return True
+
+    if a_summary['max'] is None:
+        return False
+
+    return a_summary['max'] <= a_budget['max'] and a_summary['rms'] <= a_budget['rms']
+
+
+def evaluate(a_comparison, inputs, a_repeat=3):
+    """Errors and speedup of one comparison
+
+    Samples where either side raises, like rise and set for a
+    circumpolar sun, are counted and skipped.
+
+    Args:
+        a_comparison (dict): from comparisons
+        inputs (list): from benchmark.make_inputs
+        a_repeat (int): timing runs
+
+    Returns: dict of max, rms, unit, budget, skipped, speedup and ok
+    """
+
+    errors = list()
+    skipped = 0
+
+    for an_input in inputs:
+
+        try:
+            reference = a_comparison['reference'](an_input)
+            candidate = a_comparison['candidate'](an_input)
+        except Exception: # the Bodies and Transforms each have their own Error
+            skipped += 1
+            continue
+
+        errors.append(a_comparison['error'](reference, candidate))
+
+    result = error_summary(errors)
+
+    result['unit'] = units[a_comparison['error']]
+    result['budget'] = a_comparison['budget']
+    result['samples'] = len(errors)
+    result['skipped'] = skipped
+    result['ok'] = within_budget(result, a_comparison['budget'])
+    result['speedup'] = None
+
+    if a_comparison.get('timed', True) and errors:
+
+        def safely(a_function):
+            def wrapper(an_input):
+                try:
+                    return a_function(an_input)
+                except Exception:
+                    return None
+            return wrapper
+
+        reference_time = Transforms.benchmark.measure(safely(a_comparison['reference']), inputs, a_repeat)
+        candidate_time = Transforms.benchmark.measure(safely(a_comparison['candidate']), inputs, a_repeat)
+
+        result['speedup'] = reference_time['best_us']/candidate_time['best_us']
+
+    return result
+
+
+def evaluate_fixture(a_fixture):
+    """Errors of one fixture against its published values
+
+    Returns: dict as evaluate, without a speedup
+    """
+
+    errors = [a_fixture['error'](expected, a_fixture['function'](an_input))
+              for an_input, expected in a_fixture['cases']]
+
+    result = error_summary(errors)
+
+    result['unit'] = units[a_fixture['error']]
+    result['budget'] = a_fixture['budget']
+    result['samples'] = len(errors)
+    result['skipped'] = 0
+    result['ok'] = within_budget(result, a_fixture['budget'])
+    result['speedup'] = None
+
+    return result
+
+
+def format_results(results):
+    """The results as a table"""
+
+    row = '{:<45} {:>7} {:>7} {:>12} {:>12} {:>6} {:>16} {:>8} {}'
+
+    lines = [row.format('comparison', 'samples', 'skipped', 'max', 'rms', 'unit', 'budget max/rms', 'speedup', '')]
+
+    for a_name, a_result in sorted(results.items()):
+
+        def value(v):
+            return '{:.4g}'.format(v) if v is not None else ''
+
+        budget = '{}/{}'.format(a_result['budget']['max'], a_result['budget']['rms']) if a_result['budget'] else ''
+
+        lines.append(row.format(a_name, a_result['samples'], a_result['skipped'],
+                                value(a_result['max']), value(a_result['rms']), a_result['unit'], budget,
+                                '{:.2f}x'.format(a_result['speedup']) if a_result['speedup'] else '',
+                                '' if a_result['ok'] else 'OVER BUDGET'))
+
+    return '\n'.join(lines)
+
+
+def run(some_comparisons, some_fixtures, a_samples=default_samples, a_make_inputs=Transforms.benchmark.make_inputs):
+    """Evaluate the comparisons on a sample and the fixtures
+
+    Returns: dict of name to result
+    """
+
+    inputs = a_make_inputs(a_samples)
+
+    results = dict()
+
+    for a_name, a_comparison in some_comparisons.items():
+        results[a_name] = evaluate(a_comparison, inputs)
+
+    for a_name, a_fixture in some_fixtures.items():
+        results[a_name] = evaluate_fixture(a_fixture)
+
+    return results
+
+
+def main(some_comparisons, some_fixtures, a_description='Transforms accuracy against speed'):
+    """Command line for an accuracy module
+
+    Returns: exit status
+    """
+
+    parser = argparse.ArgumentParser(description=a_description)
+
+    parser.add_argument('--samples', type=int, dest='samples', default=default_samples,
+                        help='instants and observers to compare')
+
+    parser.add_argument('-k', type=str, dest='keywords', action='append', default=None,
+                        help='only comparisons with this in their name')
+
+    args = parser.parse_args()
+
+    if args.keywords:
+        some_comparisons = dict((k, v) for k, v in some_comparisons.items() if any(a in k for a in args.keywords))
+        some_fixtures = dict((k, v) for k, v in some_fixtures.items() if any(a in k for a in args.keywords))
+
+    results = run(some_comparisons, some_fixtures, args.samples)
+
+    print(format_results(results))
+
+    return 0 if all(a_result['ok'] for a_result in results.values()) else 1
+
+
+# ================
+# ===== main =====
+# ================
+
+if __name__ == '__main__':
+    sys.exit(main(comparisons, fixtures))
@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+
+"""Micro-benchmarks for the Transforms with stored baselines
+
+Each case is timed on batches of 1 (the scalar path, mostly call
+overhead) and more instants and observers. A batch is one call per
+item, or one call for the whole batch for a Batch case of an _array
+function, given the inputs as arrays, see make_arrays. Both are
+reported per item so a scalar case and its _array case compare at
+each size.
+
+to run:      ./pylaunch.sh benchmark.py
+save:        ./pylaunch.sh benchmark.py -o baseline-Transforms.json
+compare:     ./pylaunch.sh benchmark.py --compare baseline-Transforms.json
+some cases:  ./pylaunch.sh benchmark.py -k GMST -k toHorizon --sizes 1 100
+
+The comparison exits with 1 if any case is slower per item than the
+baseline by more than --threshold percent. Baselines are only
+comparable on the same machine and python.
+
+Bodies/benchmark.py uses the same runner for the Bodies.
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+
+import coords
+import numpy
+
+import Transforms.APCTransforms
+import Transforms.EclipticEquatorial
+import Transforms.EquatorialHorizon
+import Transforms.Nutation
+import Transforms.Precession
+import Transforms.Refraction
+import Transforms.SiderealTime
+import Transforms.utils
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+default_sizes = (1, 10, 100, 1000)
+default_repeat = 5
+default_threshold = 10.0 # percent
+
+items_per_run = 1000 # calls per timing run, in batches of the size being timed
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+class Batch(object):
+    """A case called once per batch with the inputs as arrays, see make_arrays
+
+    Attributes:
+        function: of the dictionary of arrays
+    """
+
+    def __init__(self, a_function):
+
+        self.function = a_function
+
+
+# ==================
+# ===== inputs =====
+# ==================
+
+
+def make_inputs(a_size):
+    """Instants, observers and objects for a batch
+
+    Spread over 1990 to 2030 and the inhabited latitudes so no case
+    only sees one easy value.
+
+    Args:
+        a_size (int): batch size
+
+    Returns: list of dict of datetime, observer, dms, equatorial and ecliptic
+    """
+
+    inputs = list()
+
+    for i in range(a_size):
+
+        a_datetime = coords.datetime('{:04}-{:02}-{:02}T{:02}:{:02}:{:02}'.format(1990 + i % 41, 1 + i % 12, 1 + i % 28,
+                                                                                 i % 24, (7*i) % 60, (13*i) % 60))
+
+        an_observer = Transforms.utils.latlon2spherical(coords.angle(-60 + (37*i) % 130),
+                                                        coords.angle(-180 + (53*i) % 360))
+
+        inputs.append({'datetime': a_datetime,
+                       'observer': an_observer,
+                       'dms': '{}:{:02}:{:06.3f}'.format(-89 + (37*i) % 179, (7*i) % 60, (13.7*i) % 60),
+                       'equatorial': Transforms.utils.radec2spherical(coords.angle((7*i) % 24),
+                                                                      coords.angle(-80 + (29*i) % 160)),
+                       'ecliptic': coords.spherical(1, coords.angle(10 + (31*i) % 160), coords.angle((17*i) % 360)),
+                       'horizon': Transforms.utils.azalt2spherical(coords.angle((41*i) % 360),
+                                                                   coords.angle(-10 + (11*i) % 100))})
+
+    return inputs
+
+
+def make_arrays(inputs):
+    """The inputs of a batch as the arrays of the _array functions
+
+    Made before a Batch case is timed, as a bulk caller has its columns
+    before it transforms them.
+
+    Args:
+        inputs (list): from make_inputs
+
+    Returns: dict of dms (list of str) and numpy.ndarray of
+        julian_dates (UT), ras (hours), decs, latitudes, longitudes,
+        azimuths, altitudes (degrees) and gasts (hours), an item each
+    """
+
+    arrays = {'dms': [x['dms'] for x in inputs],
+              'julian_dates': numpy.array([x['datetime'].inTimezoneOffset(0).toJulianDate() for x in inputs]),
+              'ras': numpy.array([x['equatorial'].phi.RA for x in inputs]),
+              'decs': numpy.array([x['equatorial'].theta.complement().degrees for x in inputs]),
+              'latitudes': numpy.array([x['observer'].theta.complement().degrees for x in inputs]),
+              'longitudes': numpy.array([x['observer'].phi.degrees for x in inputs]),
+              'azimuths': numpy.array([x['horizon'].phi.degrees for x in inputs]),
+              'altitudes': numpy.array([x['horizon'].theta.complement().degrees for x in inputs])}
+
+    arrays['gasts'] = Transforms.SiderealTime.USNO_C163.GAST_array(arrays['julian_dates'])
+
+    return arrays
+
+
+# =================
+# ===== cases =====
+# =================
+
+# name to function of one input dictionary, or a Batch of the arrays of a batch
+
+cases = {
+    'utils.dms2degrees': lambda x: Transforms.utils.dms2degrees(x['dms']),
+    'utils.parse_angle_arg': lambda x: Transforms.utils.parse_angle_arg(x['dms']),
+    'SiderealTime.USNO_C163.GMST': lambda x: Transforms.SiderealTime.USNO_C163.GMST(x['datetime']),
+    'SiderealTime.USNO_C163.GAST': lambda x: Transforms.SiderealTime.USNO_C163.GAST(x['datetime']),
+    'SiderealTime.USNO_C163.GAST nutation': lambda x: Transforms.SiderealTime.USNO_C163.GAST(x['datetime'], a_nutation=True),
+    'SiderealTime.USNO_C163.LSTA': lambda x: Transforms.SiderealTime.USNO_C163.LSTA(x['observer'], x['datetime']),
+    'EclipticEquatorial.obliquity': lambda x: Transforms.EclipticEquatorial.obliquity(x['datetime']),
+    'EclipticEquatorial.true_obliquity': lambda x: Transforms.EclipticEquatorial.true_obliquity(x['datetime']),
+    'Nutation.nutation': lambda x: Transforms.Nutation.nutation(x['datetime'].toJulianDate()),
+    'EclipticEquatorial.toEquatorial': lambda x: Transforms.EclipticEquatorial.toEquatorial(x['ecliptic'], x['datetime']),
+    'EclipticEquatorial.toEcliptic': lambda x: Transforms.EclipticEquatorial.toEcliptic(x['equatorial'], x['datetime']),
+    'EquatorialHorizon.toHorizon': lambda x: Transforms.EquatorialHorizon.toHorizon(x['equatorial'], x['observer'], x['datetime']),
+    'EquatorialHorizon.toHorizon J2000': lambda x: Transforms.EquatorialHorizon.toHorizon(x['equatorial'], x['observer'], x['datetime'],
+                                                                                          an_epoch=Transforms.Precession.J2000),
+    'Precession.Precess': lambda x: Transforms.Precession.Precess(x['equatorial'], Transforms.Precession.J2000, x['datetime'].toJulianDate()),
+    'EquatorialHorizon.toHorizon refraction': lambda x: Transforms.EquatorialHorizon.toHorizon(x['equatorial'], x['observer'], x['datetime'],
+                                                                                             a_refraction=Transforms.Refraction.standard),
+    'Refraction.toApparent': lambda x: Transforms.Refraction.toApparent(x['horizon'].theta.complement().degrees),
+    'EquatorialHorizon.toEquatorial': lambda x: Transforms.EquatorialHorizon.toEquatorial(x['horizon'], x['observer'], x['datetime']),
+    'APCTransforms.GMST': lambda x: Transforms.APCTransforms.GMST(x['datetime']),
+    'APCTransforms.toHorizon': lambda x: Transforms.APCTransforms.toHorizon(x['equatorial'], x['observer'], x['datetime']),
+    'utils.dms2degrees_array': Batch(lambda x: Transforms.utils.dms2degrees_array(x['dms'])),
+    'SiderealTime.USNO_C163.GAST_array': Batch(lambda x: Transforms.SiderealTime.USNO_C163.GAST_array(x['julian_dates'])),
+    'SiderealTime.USNO_C163.GAST_array nutation': Batch(lambda x: Transforms.SiderealTime.USNO_C163.GAST_array(x['julian_dates'],
+                                                                                                            a_nutation=True)),
+    'Nutation.nutation_array': Batch(lambda x: Transforms.Nutation.nutation_array(x['julian_dates'])),
+    'Nutation.daily_array': Batch(lambda x: Transforms.Nutation.daily_array(x['julian_dates'])),
+    'Precession.precess_array': Batch(lambda x: Transforms.Precession.precess_array(x['ras'], x['decs'], Transforms.Precession.J2000,
+                                                                                    x['julian_dates'][0])),
+    'Refraction.toApparent_array': Batch(lambda x: Transforms.Refraction.toApparent_array(x['altitudes'])),
+    'EquatorialHorizon.toEquatorial_array': Batch(lambda x: Transforms.EquatorialHorizon.toEquatorial_array(
+        x['azimuths'], x['altitudes'], x['latitudes'], x['longitudes'], x['gasts'])),
+}
+
+
+# ==================
+# ===== runner =====
+# ==================
+
+
+def measure(a_case, inputs, a_repeat=default_repeat, a_make_arrays=make_arrays):
+    """Time a case over a batch of inputs
+
+    Args:
+        a_case: function of one input dictionary, or a Batch
+        inputs (list): from make_inputs
+        a_repeat (int): timing runs, the best is kept
+        a_make_arrays: inputs to the dictionary of arrays of a Batch
+
+    Returns: dict of best and median seconds per item
+    """
+
+    number = max(1, items_per_run//len(inputs))
+
+    if isinstance(a_case, Batch):
+
+        arrays = a_make_arrays(inputs)
+
+        def batch():
+            a_case.function(arrays)
+
+    else:
+
+        def batch():
+            for an_input in inputs:
+                a_case(an_input)
+
+    times = sorted(timeit.Timer(batch).repeat(repeat=a_repeat, number=number))
+
+    per_item = 1.0/(number*len(inputs))
+
+    return {'best_us': 1e6*times[0]*per_item,
+            'median_us': 1e6*times[len(times)//2]*per_item}
+
+
+def run(some_cases, sizes=default_sizes, a_repeat=default_repeat, a_make_inputs=make_inputs, is_verbose=False,
+        a_make_arrays=make_arrays):
+    """Time every case at every batch size
+
+    Args:
+        some_cases (dict): name to function of one input dictionary, or a Batch
+        sizes (tuple): batch sizes
+        a_repeat (int): timing runs per case and size
+        a_make_inputs: batch size to list of input dictionaries
+        is_verbose (bool): print each result as it is measured
+        a_make_arrays: inputs to the dictionary of arrays of a Batch
+
+    Returns: dict of the machine and results[case][size]
+    """
+
+    results = dict()
+
+    for a_size in sizes:
+
+        inputs = a_make_inputs(a_size)
+
+        for a_name, a_case in sorted(some_cases.items()):
+
+            a_result = measure(a_case, inputs, a_repeat, a_make_arrays)
+            results.setdefault(a_name, dict())[str(a_size)] = a_result
+
+            if is_verbose:
+                print('{:<45} {:>6} {:>12.2f} us/item'.format(a_name, a_size, a_result['best_us']))
+
+    return {'python': platform.python_version(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'results': results}
+
+
+def compare(a_baseline, a_current, a_threshold=default_threshold):
+    """Compare results to a baseline, best time per item
+
+    Args:
+        a_baseline (dict): from run()
+        a_current (dict): from run()
+        a_threshold (float): percent slower to call a regression
+
+    Returns: (table str, list of regressions)
+    """
+
+    row = '{:<45} {:>6} {:>12} {:>12} {:>8}'
+
+    lines = [row.format('case', 'size', 'baseline us', 'current us', 'change')]
+    regressions = list()
+
+    for a_name in sorted(a_current['results']):
+
+        for a_size, a_result in sorted(a_current['results'][a_name].items(), key=lambda item: int(item[0])):
+
+            baseline = a_baseline['results'].get(a_name, dict()).get(a_size)
+
+            if baseline is None:
+                lines.append(row.format(a_name, a_size, '', '{:.2f}'.format(a_result['best_us']), 'new'))
+                continue
+
+            change = 100.0*(a_result['best_us'] - baseline['best_us'])/baseline['best_us']
+
+            lines.append(row.format(a_name, a_size, '{:.2f}'.format(baseline['best_us']),
+                                    '{:.2f}'.format(a_result['best_us']), '{:+.1f}%'.format(change)))
+
+            if change > a_threshold:
+                regressions.append('{} size {} {:+.1f}%'.format(a_name, a_size, change))
+
+    if (a_baseline['python'], a_baseline['machine']) != (a_current['python'], a_current['machine']):
+        lines.append('warning: baseline is from python {} on {}'.format(a_baseline['python'], a_baseline['machine']))
+
+    return '\n'.join(lines), regressions
+
+
+def main(some_cases, a_make_inputs=make_inputs, a_description='Transforms micro-benchmarks', a_make_arrays=make_arrays):
+    """Command line for a benchmark module
+
+    Args:
+        some_cases (dict): name to function of one input dictionary, or a Batch
+        a_make_inputs: batch size to list of input dictionaries
+        a_description (str): for --help
+        a_make_arrays: inputs to the dictionary of arrays of a Batch
+
+    Returns: exit status
+    """
+
+    parser = argparse.ArgumentParser(description=a_description)
+
+    parser.add_argument('-o', '--output', type=str, dest='output', default=None,
+                        help='save the results as a JSON baseline')
+
+    parser.add_argument('--compare', type=str, dest='compare', default=None,
+                        metavar='baseline', help='compare to a saved baseline')
+
+    parser.add_argument('--threshold', type=float, dest='threshold', default=default_threshold,
+                        help='percent slower to call a regression')
+
+    parser.add_argument('--sizes', type=int, dest='sizes', nargs='+', default=list(default_sizes),
+                        help='batch sizes')
+
+    parser.add_argument('--repeat', type=int, dest='repeat', default=default_repeat,
+                        help='timing runs per case and size')
+
+    parser.add_argument('-k', type=str, dest='keywords', action='append', default=None,
+                        help='only cases with this in their name')
+
+    args = parser.parse_args()
+
+    if args.keywords:
+        some_cases = dict((a_name, a_case) for a_name, a_case in some_cases.items()
+                          if any(a_keyword in a_name for a_keyword in args.keywords))
+
+    if not some_cases:
+        raise Error('no cases match {}'.format(args.keywords))
+
+    current = run(some_cases, args.sizes, args.repeat, a_make_inputs, is_verbose=args.compare is None,
+                  a_make_arrays=a_make_arrays)
+
+    if args.output is not None:
+        with open(args.output, 'w') as a_file:
+            json.dump(current, a_file, indent=4, sort_keys=True)
+
+    if args.compare is None:
+        return 0
+
+    with open(args.compare) as a_file:
+        table, regressions = compare(json.load(a_file), current, args.threshold)
+
+    print(table)
+
+    for a_regression in regressions:
+        print('regression: {}'.format(a_regression))
+
+    return 1 if regressions else 0
+
+
+# ================
+# ===== main =====
+# ================
+
+if __name__ == '__main__':
+    sys.exit(main(cases))
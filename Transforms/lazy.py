@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+"""Modules imported on first use
+
+The scalar transforms and bodies are used by every request, numpy only
+by their bulk functions. A module with both binds numpy once, at module
+level, to a Module instead of importing it in each bulk function:
+
+    numpy = Transforms.lazy.Module('numpy')
+
+    def precess_array(ras, decs, a_from, a_to):
+        alpha = numpy.radians(...) # imports numpy the first time
+
+so importing it does not import numpy, see the deferred modules of the
+startup targets.
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import importlib
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Module(object):
+    """A module imported on the first use of one of its attributes
+
+    Its attributes are then copied to the instance so later uses are
+    plain attribute lookups.
+    """
+
+    def __init__(self, a_name):
+        self.__dict__['module_name'] = a_name
+
+
+    def __getattr__(self, an_attribute):
+
+        a_module = importlib.import_module(self.__dict__['module_name'])
+
+        self.__dict__.update(vars(a_module))
+
+        return getattr(a_module, an_attribute)
+
+
+    def __repr__(self):
+        return '<lazy module {}>'.format(self.__dict__['module_name'])
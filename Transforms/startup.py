@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+
+"""Import time of the Transforms with budgets
+
+Each target is a python statement, usually an import, run in a fresh
+interpreter. The best of a few runs is compared to the target's budget
+in milliseconds, and one more run with python -X importtime lists the
+imports that took the longest, like:
+
+    python -X importtime -c 'import Transforms.EquatorialHorizon'
+
+Only the time of the statement is counted, not the interpreter's own
+start up.
+
+to run:      ./pylaunch.sh startup.py
+more:        ./pylaunch.sh startup.py --repeat 10 --top 20
+some:        ./pylaunch.sh startup.py -k EquatorialHorizon
+
+The exit status is 1 if any target is over its budget or imports a
+module it should defer. -X importtime needs python 3.7 or later.
+
+Bodies/startup.py and www/startup.py use the same runner for the
+Bodies and the web app.
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import argparse
+import json
+import subprocess
+import sys
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+default_repeat = 5
+default_top = 10
+
+marker = '# aai startup' # written to stderr when the statement starts
+
+# the budgets are for the statement, a few times what a laptop measures
+# so only a new heavy import or module level calculation fails them
+
+targets = {
+    'Transforms.utils': {'statement': 'import Transforms.utils', 'budget_ms': 100, 'deferred': ['numpy']},
+    'Transforms.SiderealTime': {'statement': 'import Transforms.SiderealTime', 'budget_ms': 150, 'deferred': ['numpy']},
+    'Transforms.EclipticEquatorial': {'statement': 'import Transforms.EclipticEquatorial', 'budget_ms': 150},
+    'Transforms.Nutation': {'statement': 'import Transforms.Nutation', 'budget_ms': 50, 'deferred': ['numpy']},
+    'Transforms.Precession': {'statement': 'import Transforms.Precession', 'budget_ms': 50, 'deferred': ['numpy']},
+    'Transforms.Refraction': {'statement': 'import Transforms.Refraction', 'budget_ms': 50, 'deferred': ['numpy']},
+    'Transforms.EquatorialHorizon': {'statement': 'import Transforms.EquatorialHorizon', 'budget_ms': 150, 'deferred': ['numpy']},
+    'Transforms.lazy': {'statement': 'import Transforms.lazy', 'budget_ms': 20, 'deferred': ['numpy']},
+    'Transforms.APCTransforms': {'statement': 'import Transforms.APCTransforms', 'budget_ms': 100},
+}
+
+# name to
+#     statement: python to time
+#     budget_ms: milliseconds allowed
+#     deferred: modules the statement must not import, optional
+#     cwd: directory to run in, optional
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+# ==================
+# ===== runner =====
+# ==================
+
+
+def program(a_statement):
+    """The -c program that times a_statement
+
+    Writes a marker on stderr first so the importtime lines of the
+    interpreter's start up can be told apart, and the seconds the
+    statement took as the last line on stdout.
+    """
+
+    return '; '.join(['import sys, time',
+                      'sys.stderr.write({!r} + chr(10))'.format(marker),
+                      'sys.stderr.flush()',
+                      't = time.perf_counter()',
+                      a_statement,
+                      'sys.stdout.write(chr(10) + repr(time.perf_counter() - t))'])
+
+
+def parse_importtime(a_stderr):
+    """The imports after the marker in python -X importtime output
+
+    Lines look like
+
+        import time: self [us] | cumulative | imported package
+        import time:       612 |       1203 |   Transforms.utils
+
+    where the indent of the package name is its depth.
+
+    Args:
+        a_stderr (str): the interpreter's standard error
+
+    Returns: list of dict of module, self_us, cumulative_us and depth
+    """
+
+    records = list()
+
+    lines = a_stderr.splitlines()
+
+    if marker in lines:
+        lines = lines[lines.index(marker) + 1:]
+
+    for a_line in lines:
+
+        if not a_line.startswith('import time:'):
+            continue
+
+        fields = a_line[len('import time:'):].split('|')
+
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue # the header
+
+        a_name = fields[2].rstrip()
+
+        records.append({'module': a_name.strip(),
+                        'self_us': int(fields[0]),
+                        'cumulative_us': int(fields[1]),
+                        'depth': (len(a_name) - len(a_name.lstrip()) - 1)//2})
+
+    return records
+
+
+def measure(a_target, a_repeat=default_repeat):
+    """Time a target in fresh interpreters
+
+    Args:
+        a_target (dict): from targets
+        a_repeat (int): interpreters to time, the best is kept
+
+    Returns: dict of best_ms, median_ms and the importtime records
+    Raises: Error if the statement fails
+    """
+
+    def python(*options):
+
+        a_process = subprocess.Popen([sys.executable] + list(options) + ['-c', program(a_target['statement'])],
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                     cwd=a_target.get('cwd'), universal_newlines=True)
+
+        stdout, stderr = a_process.communicate()
+
+        if a_process.returncode != 0:
+            raise Error('{} failed: {}'.format(a_target['statement'], (stderr.strip().splitlines() or [''])[-1]))
+
+        return float(stdout.splitlines()[-1]), stderr
+
+    times = sorted(1e3*python()[0] for i in range(a_repeat))
+
+    records = parse_importtime(python('-X', 'importtime')[1])
+
+    return {'best_ms': times[0],
+            'median_ms': times[len(times)//2],
+            'imports': records}
+
+
+def top_imports(records, a_count=default_top):
+    """The imports with the most time in themselves"""
+
+    return sorted(records, key=lambda a_record: a_record['self_us'], reverse=True)[:a_count]
+
+
+def evaluate(a_target, a_repeat=default_repeat):
+    """Time a target and check its budget and deferred modules
+
+    Returns: dict as measure with budget_ms, loaded (deferred modules that were imported) and ok
+    """
+
+    result = measure(a_target, a_repeat)
+
+    imported = set(a_record['module'] for a_record in result['imports'])
+
+    result['budget_ms'] = a_target['budget_ms']
+    result['loaded'] = sorted(imported.intersection(a_target.get('deferred', ())))
+    result['ok'] = result['best_ms'] <= a_target['budget_ms'] and not result['loaded']
+
+    return result
+
+
+def format_report(results, a_top=default_top):
+    """The results as a table and each target's slowest imports"""
+
+    row = '{:<40} {:>10} {:>10} {:>10} {}'
+
+    lines = [row.format('target', 'best ms', 'median ms', 'budget ms', '')]
+
+    for a_name, a_result in sorted(results.items()):
+
+        problems = list()
+
+        if a_result['best_ms'] > a_result['budget_ms']:
+            problems.append('OVER BUDGET')
+
+        if a_result['loaded']:
+            problems.append('imports {}'.format(', '.join(a_result['loaded'])))
+
+        lines.append(row.format(a_name, '{:.1f}'.format(a_result['best_ms']), '{:.1f}'.format(a_result['median_ms']),
+                                a_result['budget_ms'], ' '.join(problems)))
+
+    for a_name, a_result in sorted(results.items()):
+
+        lines.append('')
+        lines.append('{}: self us, cumulative us, module'.format(a_name))
+
+        for a_record in top_imports(a_result['imports'], a_top):
+            lines.append('{:>10} {:>10}  {}{}'.format(a_record['self_us'], a_record['cumulative_us'],
+                                                     '  '*a_record['depth'], a_record['module']))
+
+    return '\n'.join(lines)
+
+
+def run(some_targets, a_repeat=default_repeat):
+    """Evaluate every target
+
+    Returns: dict of name to result
+    """
+
+    return dict((a_name, evaluate(a_target, a_repeat)) for a_name, a_target in some_targets.items())
+
+
+def main(some_targets, a_description='Transforms import time'):
+    """Command line for a startup module
+
+    Args:
+        some_targets (dict): as targets
+        a_description (str): for --help
+
+    Returns: exit status
+    """
+
+    parser = argparse.ArgumentParser(description=a_description)
+
+    parser.add_argument('--repeat', type=int, dest='repeat', default=default_repeat,
+                        help='interpreters to time per target')
+
+    parser.add_argument('--top', type=int, dest='top', default=default_top,
+                        help='slowest imports to list per target')
+
+    parser.add_argument('-o', '--output', type=str, dest='output', default=None,
+                        help='save the results as JSON')
+
+    parser.add_argument('-k', type=str, dest='keywords', action='append', default=None,
+                        help='only targets with this in their name')
+
+    args = parser.parse_args()
+
+    if args.keywords:
+        some_targets = dict((a_name, a_target) for a_name, a_target in some_targets.items()
+                            if any(a_keyword in a_name for a_keyword in args.keywords))
+
+    if not some_targets:
+        raise Error('no targets match {}'.format(args.keywords))
+
+    results = run(some_targets, args.repeat)
+
+    print(format_report(results, args.top))
+
+    if args.output is not None:
+        with open(args.output, 'w') as a_file:
+            json.dump(results, a_file, indent=4, sort_keys=True)
+
+    return 0 if all(a_result['ok'] for a_result in results.values()) else 1
+
+
+# ================
+# ===== main =====
+# ================
+
+if __name__ == '__main__':
+    sys.exit(main(targets))
@@ -203,6 +203,28 @@ class EclipticEquatorialTests(unittest.TestCase):
         return
 
 
+    def test_nutation(self):
+        """The true equinox is at the mean longitude -dpsi, Meeus example 22.a"""
+
+        a_datetime = coords.datetime('1987-04-10T00:00:00')
+        an_equinox = coords.spherical(coords.Cartesian.Ux)
+
+        an_equinox_ec = Transforms.EclipticEquatorial.toEcliptic(an_equinox, a_datetime, a_nutation=True)
+
+        self.assertAlmostEqual(0, an_equinox_ec.theta.complement().degrees, 9)
+        self.assertAlmostEqual(3.788, an_equinox_ec.phi.degrees*3600, 2) # Meeus: dpsi -3.788 arcseconds
+
+        pollux = Transforms.utils.radec2spherical(coords.latitude(7, 45, 18.946), coords.angle(28, 1, 34.26))
+
+        pollux_eq = Transforms.EclipticEquatorial.toEquatorial(
+            Transforms.EclipticEquatorial.toEcliptic(pollux, a_datetime, a_nutation=True), a_datetime, a_nutation=True)
+
+        self.assertAlmostEqual(pollux.theta.degrees, pollux_eq.theta.degrees, 9)
+        self.assertAlmostEqual(pollux.phi.degrees, pollux_eq.phi.degrees, 9)
+
+        return
+
+
 
 class MeeusEclipticEquatorialTests(unittest.TestCase):
     """Test ecliptic equatorial coordinate transformations"""
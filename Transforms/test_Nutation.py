@@ -0,0 +1,188 @@
+"""Unit tests for nutation, the true obliquity and aberration
+
+to run:  ./pylaunch.sh test_Nutation.py
+verbose: ./pylaunch.sh test_Nutation.py -v
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import unittest
+
+import coords
+import numpy
+
+import Transforms.Nutation
+import Transforms.SiderealTime
+
+
+class NutationTests(unittest.TestCase):
+    """Test the IAU 1980 nutation and its daily table"""
+
+    def setUp(self):
+        """Set up test parameters."""
+
+        self.places = 3 # Meeus gives milliarcseconds
+
+        Transforms.Nutation.days.clear()
+
+        return
+
+
+    def test_meeus_22a(self):
+        """Meeus example 22.a, 1987 April 10 0h TD"""
+
+        a_julian_date = 2446895.5
+
+        dpsi, deps = Transforms.Nutation.nutation(a_julian_date)
+
+        self.assertAlmostEqual(-3.788, dpsi, self.places)
+        self.assertAlmostEqual(9.443, deps, self.places)
+
+        eps0 = Transforms.Nutation.mean_obliquity(Transforms.Nutation.julian_century(a_julian_date))
+
+        self.assertAlmostEqual(23*3600 + 26*60 + 27.407, eps0*3600, self.places)
+
+        dpsi, deps, eps = Transforms.Nutation.daily(a_julian_date)
+
+        self.assertAlmostEqual(23*3600 + 26*60 + 36.850, eps*3600, delta=0.001) # 27.407 + 9.443 rounded
+
+        return
+
+
+    def test_array(self):
+        """The numpy series is the scalar series, in the shape given"""
+
+        julian_dates = numpy.linspace(2415020.5, 2488069.5, 60).reshape(3, 20)
+
+        dpsis, depss = Transforms.Nutation.nutation_array(julian_dates)
+
+        self.assertEqual((3, 20), dpsis.shape)
+
+        for a_julian_date, dpsi, deps in zip(julian_dates.ravel(), dpsis.ravel(), depss.ravel()):
+            self.assertAlmostEqual(dpsi, Transforms.Nutation.nutation(a_julian_date)[0], 9)
+            self.assertAlmostEqual(deps, Transforms.Nutation.nutation(a_julian_date)[1], 9)
+
+        return
+
+
+    def test_daily(self):
+        """The table at 0h UT is the series, and close to it in between"""
+
+        random = numpy.random.RandomState(48)
+
+        julian_dates = 2451545.0 + random.uniform(-36525, 36525, 5000)
+
+        dpsis, depss, epss = Transforms.Nutation.daily_array(julian_dates)
+        some_dpsis, some_depss = Transforms.Nutation.nutation_array(julian_dates)
+
+        self.assertLess(numpy.max(numpy.abs(dpsis - some_dpsis)), 0.011)
+        self.assertLess(numpy.max(numpy.abs(depss - some_depss)), 0.011)
+
+        for a_julian_date in julian_dates[:20]:
+            self.assertAlmostEqual(Transforms.Nutation.daily(a_julian_date)[0],
+                                   Transforms.Nutation.daily_array([a_julian_date])[0][0], 9)
+
+        a_midnight = 2457023.5
+
+        for a_series, a_table in zip(Transforms.Nutation.nutation(a_midnight), Transforms.Nutation.daily(a_midnight)):
+            self.assertAlmostEqual(a_series, a_table, 9)
+        self.assertIn(int(a_midnight - 0.5), Transforms.Nutation.days)
+
+        return
+
+
+    def test_max_days(self):
+        """The table is emptied when it is full"""
+
+        max_days = Transforms.Nutation.max_days
+
+        try:
+            Transforms.Nutation.max_days = 10
+
+            Transforms.Nutation.daily_array(2451545.0 + numpy.arange(8.0))
+            self.assertEqual(9, len(Transforms.Nutation.days))
+
+            Transforms.Nutation.daily_array(2461545.0 + numpy.arange(3.0))
+            self.assertEqual(4, len(Transforms.Nutation.days))
+
+        finally:
+            Transforms.Nutation.max_days = max_days
+
+        return
+
+
+    def test_eviction(self):
+        """A day already in a full table survives the day added after it"""
+
+        max_days = Transforms.Nutation.max_days
+        a_julian_date = 2446897.7
+
+        try:
+            Transforms.Nutation.max_days = 3
+
+            Transforms.Nutation.daily_array([a_julian_date - 1.0, a_julian_date - 2.0])
+            self.assertEqual(3, len(Transforms.Nutation.days))
+
+            dpsi, deps, eps = Transforms.Nutation.daily(a_julian_date) # its day is kept, the next one empties the table
+            self.assertEqual(1, len(Transforms.Nutation.days))
+
+            self.assertAlmostEqual(Transforms.Nutation.nutation(a_julian_date)[0], dpsi, 1)
+
+            Transforms.Nutation.daily_array([a_julian_date + 5.0, a_julian_date + 10.0])
+            self.assertEqual(4, len(Transforms.Nutation.days))
+
+        finally:
+            Transforms.Nutation.max_days = max_days
+
+        return
+
+
+    def test_equation_of_equinoxes(self):
+        """Meeus example 12.a and the USNO values in test_SiderealTime.py"""
+
+        for a_julian_date, seconds in ((2446895.5, -0.2317),
+                                       (2457023.5 - 1 + 20/24.0 + 41/1440.0, 0.2975),
+                                       (2457023.5 + 8/24.0, 0.2992),
+                                       (2457023.5 + 14/24.0, 0.3003)):
+
+            self.assertAlmostEqual(seconds, Transforms.Nutation.equation_of_equinoxes(a_julian_date)*3600, delta=0.001)
+
+        return
+
+
+    def test_meeus_23a(self):
+        """Meeus example 23.a, theta Persei 2028 November 13.19 TD"""
+
+        a_julian_date = 2462088.69
+        ra, dec = 41.5599646/15, 49.3520685
+
+        dra, ddec = Transforms.Nutation.equatorial_nutation_array([ra], [dec], a_julian_date)
+
+        self.assertAlmostEqual(15.843, dra[0], delta=0.01)
+        self.assertAlmostEqual(6.218, ddec[0], delta=0.01)
+
+        dra, ddec = Transforms.Nutation.aberration_array([ra], [dec], a_julian_date)
+
+        self.assertAlmostEqual(30.045, dra[0], delta=0.01)
+        self.assertAlmostEqual(6.698, ddec[0], delta=0.01)
+
+        return
+
+
+    def test_GAST(self):
+        """GAST with nutation, Meeus example 12.a 13:10:46.1351"""
+
+        a_gast = Transforms.SiderealTime.USNO_C163.GAST(coords.datetime('1987-04-10T00:00:00'), a_nutation=True)
+
+        self.assertEqual('13:10:46.1', str(a_gast))
+
+        gasts = Transforms.SiderealTime.USNO_C163.GAST_array([2446895.5], a_nutation=True)
+
+        self.assertAlmostEqual(a_gast.degrees, gasts[0], 9)
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""Unit tests for precession
+
+to run:  ./pylaunch.sh test_Precession.py
+verbose: ./pylaunch.sh test_Precession.py -v
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import unittest
+
+import coords
+import numpy
+
+import Transforms.EquatorialHorizon
+import Transforms.Precession
+import Transforms.utils
+
+
+class PrecessionTests(unittest.TestCase):
+    """Test the Meeus chapter 21 precession"""
+
+    def setUp(self):
+        """Set up test parameters."""
+
+        # Meeus example 21.b, theta Persei with its proper motion to 2028 November 13.19 TD
+        self.a_julian_date = 2462088.69
+        self.ra = 2 + 44/60.0 + 12.975/3600.0
+        self.dec = 49 + 13/60.0 + 39.896/3600.0
+
+        Transforms.Precession.matrices.clear()
+
+        return
+
+
+    def test_meeus_21b(self):
+        """Meeus example 21.b"""
+
+        ras, decs = Transforms.Precession.precess_array([self.ra], [self.dec], Transforms.Precession.J2000, self.a_julian_date)
+
+        self.assertAlmostEqual(41.547214, ras[0]*15, 5)
+        self.assertAlmostEqual(49.348483, decs[0], 5)
+
+        return
+
+
+    def test_round_trip(self):
+        """There and back, and a rotation"""
+
+        random = numpy.random.RandomState(49)
+
+        ras = random.uniform(0, 24, (4, 250))
+        decs = numpy.degrees(numpy.arcsin(random.uniform(-1, 1, (4, 250))))
+
+        some_ras, some_decs = Transforms.Precession.precess_array(ras, decs, Transforms.Precession.J2000, self.a_julian_date)
+
+        self.assertEqual((4, 250), some_ras.shape)
+
+        some_ras, some_decs = Transforms.Precession.precess_array(some_ras, some_decs, self.a_julian_date, Transforms.Precession.J2000)
+
+        dra = (some_ras - ras + 12) % 24 - 12
+
+        self.assertLess(numpy.max(numpy.abs(dra*numpy.cos(numpy.radians(decs))))*15*3600, 1e-6)
+        self.assertLess(numpy.max(numpy.abs(some_decs - decs))*3600, 1e-6)
+
+        a_matrix = Transforms.Precession.matrix(Transforms.Precession.B1950, Transforms.Precession.J2000)
+
+        self.assertTrue(numpy.allclose(numpy.dot(a_matrix, a_matrix.T), numpy.eye(3), atol=1e-15))
+        self.assertAlmostEqual(1.0, numpy.linalg.det(a_matrix), 15)
+
+        return
+
+
+    def test_cache(self):
+        """A matrix is built once per pair of epochs and read only"""
+
+        a_matrix = Transforms.Precession.matrix(Transforms.Precession.J2000, self.a_julian_date)
+
+        self.assertIs(a_matrix, Transforms.Precession.matrix(Transforms.Precession.J2000, self.a_julian_date))
+        self.assertIsNot(a_matrix, Transforms.Precession.matrix(self.a_julian_date, Transforms.Precession.J2000))
+
+        with self.assertRaises(ValueError):
+            a_matrix[0, 0] = 0
+
+        max_matrices = Transforms.Precession.max_matrices
+
+        try:
+            Transforms.Precession.max_matrices = 2
+
+            Transforms.Precession.matrix(Transforms.Precession.J2000, Transforms.Precession.J2000 + 1)
+            self.assertEqual(1, len(Transforms.Precession.matrices))
+
+        finally:
+            Transforms.Precession.max_matrices = max_matrices
+
+        return
+
+
+    def test_of_date(self):
+        """The queries of a day share a matrix within 0.07 arcseconds of the exact one"""
+
+        dates = Transforms.Precession.J2000 + 100*365.25 + numpy.linspace(-0.49, 0.49, 9)
+
+        matrices = [Transforms.Precession.matrix(Transforms.Precession.J2000, Transforms.Precession.of_date(a_date)) for a_date in dates]
+
+        self.assertTrue(all(a_matrix is matrices[0] for a_matrix in matrices))
+
+        for a_date, a_matrix in zip(dates, matrices):
+            exact = Transforms.Precession.matrix(Transforms.Precession.J2000, a_date)
+            self.assertLess(numpy.degrees(numpy.max(numpy.abs(a_matrix - exact)))*3600, 0.07)
+
+        return
+
+
+    def test_precess(self):
+        """A coords.spherical, and toHorizon from J2000"""
+
+        an_object = Transforms.utils.radec2spherical(coords.angle(self.ra), coords.angle(self.dec))
+
+        a_precessed = Transforms.Precession.Precess(an_object, Transforms.Precession.J2000, self.a_julian_date)
+
+        self.assertAlmostEqual(41.547214, a_precessed.phi.degrees, 5)
+        self.assertAlmostEqual(49.348483, a_precessed.theta.complement().degrees, 5)
+
+        an_observer = Transforms.utils.latlon2spherical(a_latitude=coords.angle(37, 24), a_longitude=coords.angle(-122, 4, 56))
+        a_datetime = coords.datetime('2028-11-13T04:33:36')
+
+        a_horizon = Transforms.EquatorialHorizon.toHorizon(an_object, an_observer, a_datetime, an_epoch=Transforms.Precession.J2000)
+        some_horizon = Transforms.EquatorialHorizon.toHorizon(
+            Transforms.Precession.Precess(an_object, Transforms.Precession.J2000, a_datetime.toJulianDate()), an_observer, a_datetime)
+
+        self.assertAlmostEqual(some_horizon.phi.degrees, a_horizon.phi.degrees, 12)
+        self.assertAlmostEqual(some_horizon.theta.degrees, a_horizon.theta.degrees, 12)
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
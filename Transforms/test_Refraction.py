@@ -0,0 +1,145 @@
+"""Unit tests for atmospheric refraction
+
+to run:  ./pylaunch.sh test_Refraction.py
+verbose: ./pylaunch.sh test_Refraction.py -v
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import unittest
+
+import coords
+import numpy
+
+import Transforms.EquatorialHorizon
+import Transforms.Refraction
+import Transforms.SiderealTime
+import Transforms.utils
+
+
+class RefractionTests(unittest.TestCase):
+    """Test the Bennett and Saemundsson refraction"""
+
+    def setUp(self):
+        """Set up test parameters."""
+
+        self.mlc404 = coords.spherical(1, coords.latitude(37, 24), coords.angle(-122, 4, 57))
+
+        self.sirius = Transforms.utils.radec2spherical(a_right_ascension=coords.angle(6, 45, 8.9173),
+                                                       a_declination=coords.angle(-16, 42, 58.017))
+
+        return
+
+
+    def test_meeus_16(self):
+        """About 34 arcminutes at the horizon, 1 at 45 degrees and none at the zenith"""
+
+        self.assertAlmostEqual(34.479, Transforms.Refraction.bennett(0.0), 3)
+        self.assertAlmostEqual(28.755, Transforms.Refraction.bennett(0.5), 3)
+        self.assertAlmostEqual(0.996, Transforms.Refraction.bennett(45.0), 3)
+
+        self.assertAlmostEqual(0.0, Transforms.Refraction.bennett(90.0), 6)
+        self.assertAlmostEqual(0.0, Transforms.Refraction.saemundsson(90.0), 6)
+
+        # below min_altitude the refraction tapers to none at zero_altitude
+        self.assertAlmostEqual(Transforms.Refraction.bennett(-1.0)/2, Transforms.Refraction.bennett(-2.0), 12)
+        self.assertEqual(0.0, Transforms.Refraction.bennett(-3.0))
+        self.assertEqual(0.0, Transforms.Refraction.saemundsson(-30.0))
+        self.assertEqual(-30.0, Transforms.Refraction.toApparent(-30.0))
+
+        return
+
+
+    def test_temperature_pressure(self):
+        """Less refraction when warm or high, none in a vacuum"""
+
+        a_refraction = Transforms.Refraction.bennett(0.5)
+
+        self.assertAlmostEqual(a_refraction*283/303.0, Transforms.Refraction.bennett(0.5, 30.0), 12)
+        self.assertAlmostEqual(a_refraction/2, Transforms.Refraction.bennett(0.5, a_pressure=505.0), 12)
+        self.assertEqual(0.0, Transforms.Refraction.saemundsson(0.5, -20.0, 0.0))
+
+        with self.assertRaises(Transforms.Refraction.Error):
+            Transforms.Refraction.scale(-300.0, 1010.0)
+
+        return
+
+
+    def test_round_trip(self):
+        """toGeometric of toApparent, at any temperature and pressure"""
+
+        altitudes = numpy.linspace(-10, 90, 10001)
+
+        for a_temperature, a_pressure in (Transforms.Refraction.standard, (-20.0, 1040.0), (30.0, 700.0)):
+
+            apparents = Transforms.Refraction.toApparent_array(altitudes, a_temperature, a_pressure)
+
+            self.assertTrue(numpy.all(apparents >= altitudes - 1e-9))
+
+            geometrics = Transforms.Refraction.toGeometric_array(apparents, a_temperature, a_pressure)
+
+            self.assertLess(numpy.max(numpy.abs(geometrics - altitudes))*3600, 1e-6)
+
+            # Saemundsson alone within 0.07 arcminutes of Bennett at 10 C and 1010 mbar
+            if (a_temperature, a_pressure) == Transforms.Refraction.standard:
+                saemundssons = altitudes[altitudes >= 0] + Transforms.Refraction.saemundsson_array(altitudes[altitudes >= 0])/60.0
+                self.assertLess(numpy.max(numpy.abs(saemundssons - apparents[altitudes >= 0]))*60, 0.07)
+
+        return
+
+
+    def test_array(self):
+        """The numpy forms are the scalar ones, a temperature and pressure per altitude"""
+
+        altitudes = numpy.linspace(-5, 90, 20).reshape(4, 5)
+        temperatures = numpy.linspace(-30, 40, 20).reshape(4, 5)
+        pressures = numpy.linspace(600, 1050, 20).reshape(4, 5)
+
+        apparents = Transforms.Refraction.toApparent_array(altitudes, temperatures, pressures)
+        geometrics = Transforms.Refraction.toGeometric_array(altitudes, temperatures, pressures)
+
+        self.assertEqual((4, 5), apparents.shape)
+
+        for i in numpy.ndindex(altitudes.shape):
+            self.assertAlmostEqual(Transforms.Refraction.toApparent(altitudes[i], temperatures[i], pressures[i]), apparents[i], 12)
+            self.assertAlmostEqual(Transforms.Refraction.toGeometric(altitudes[i], temperatures[i], pressures[i]), geometrics[i], 12)
+
+        with self.assertRaises(Transforms.Refraction.Error):
+            Transforms.Refraction.toApparent_array(altitudes, temperatures, -pressures)
+
+        return
+
+
+    def test_horizon(self):
+        """toHorizon and toEquatorial with refraction"""
+
+        a_datetime = coords.datetime('2014-12-31T20:41:41-08')
+
+        sirius_hz = Transforms.EquatorialHorizon.toHorizon(self.sirius, self.mlc404, a_datetime)
+        apparent_hz = Transforms.EquatorialHorizon.toHorizon(self.sirius, self.mlc404, a_datetime,
+                                                             a_refraction=Transforms.Refraction.standard)
+
+        self.assertEqual(sirius_hz.phi.degrees, apparent_hz.phi.degrees)
+        self.assertAlmostEqual(Transforms.Refraction.toApparent(sirius_hz.theta.complement().degrees),
+                               apparent_hz.theta.complement().degrees, 12)
+
+        sirius_eq = Transforms.EquatorialHorizon.toEquatorial(apparent_hz, self.mlc404, a_datetime,
+                                                              a_refraction=Transforms.Refraction.standard)
+
+        self.assertAlmostEqual(self.sirius.theta.degrees, sirius_eq.theta.degrees, delta=0.05/3600) # as without refraction
+
+        gasts = Transforms.SiderealTime.USNO_C163.GAST_array([a_datetime.inTimezoneOffset(0).toJulianDate()])
+
+        ras, decs = Transforms.EquatorialHorizon.toEquatorial_array([apparent_hz.phi.degrees], [apparent_hz.theta.complement().degrees],
+                                                                    37.4, -(122 + 4/60.0 + 57/3600.0), gasts,
+                                                                    a_refraction=Transforms.Refraction.standard)
+
+        self.assertAlmostEqual(sirius_eq.theta.complement().degrees, decs[0], 9)
+        self.assertAlmostEqual(sirius_eq.phi.RA, ras[0], 9)
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
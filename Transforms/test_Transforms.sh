@@ -7,6 +7,16 @@ echo 'APC'
 echo '==='
 python test_APCTransforms.py "$@"
 
+echo '========'
+echo 'Accuracy'
+echo '========'
+python test_accuracy.py "$@"
+
+echo '========='
+echo 'Benchmark'
+echo '========='
+python test_benchmark.py "$@"
+
 echo '==================='
 echo 'Ecliptic Equatorial'
 echo '==================='
@@ -17,11 +27,36 @@ echo 'Equatorial Horizon'
 echo '=================='
 python test_EquatorialHorizon.py "$@"
 
+echo '========'
+echo 'Nutation'
+echo '========'
+python test_Nutation.py "$@"
+
+echo '===='
+echo 'Lazy'
+echo '===='
+python test_lazy.py "$@"
+
+echo '=========='
+echo 'Precession'
+echo '=========='
+python test_Precession.py "$@"
+
+echo '=========='
+echo 'Refraction'
+echo '=========='
+python test_Refraction.py "$@"
+
 echo '============'
 echo 'SiderealTime'
 echo '============'
 python test_SiderealTime.py "$@"
 
+echo '======='
+echo 'Startup'
+echo '======='
+python test_startup.py "$@"
+
 echo '====='
 echo 'Utils'
 echo '====='
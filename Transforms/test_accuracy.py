@@ -0,0 +1,74 @@
+"""Test the accuracy against speed runner
+
+to run:  ./pylaunch.sh test_accuracy.py
+verbose: ./pylaunch.sh test_accuracy.py -v
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import unittest
+
+import coords
+
+import Transforms.accuracy
+import Transforms.benchmark
+
+
+class AccuracyTests(unittest.TestCase):
+    """Test the error functions, budgets and comparisons"""
+
+    def test_separation(self):
+        """Test the separation of two directions in arcseconds"""
+        a = coords.spherical(1, coords.angle(45), coords.angle(10))
+        b = coords.spherical(1, coords.angle(45), coords.angle(10))
+
+        self.assertAlmostEqual(0, Transforms.accuracy.separation_arcsec(a, b), places=6)
+
+        b = coords.spherical(1, coords.angle(46), coords.angle(10))
+
+        self.assertAlmostEqual(3600, Transforms.accuracy.separation_arcsec(a, b), places=3)
+
+        return
+
+
+    def test_hours_seconds(self):
+        """Test hours wrap across 0/24h"""
+        self.assertAlmostEqual(-2.0, Transforms.accuracy.hours_seconds(coords.angle(0.5/3600),
+                                                                      coords.angle(24 - 1.5/3600)), places=6)
+
+        return
+
+
+    def test_budget(self):
+        """Test a summary against a budget"""
+        summary = Transforms.accuracy.error_summary([3.0, -4.0])
+
+        self.assertEqual(4.0, summary['max'])
+        self.assertAlmostEqual(12.5**0.5, summary['rms'])
+
+        self.assertTrue(Transforms.accuracy.within_budget(summary, None))
+        self.assertTrue(Transforms.accuracy.within_budget(summary, {'max': 4.0, 'rms': 4.0}))
+        self.assertFalse(Transforms.accuracy.within_budget(summary, {'max': 3.0, 'rms': 4.0}))
+        self.assertFalse(Transforms.accuracy.within_budget(Transforms.accuracy.error_summary([]),
+                                                           {'max': 1.0, 'rms': 1.0}))
+
+        return
+
+
+    def test_comparisons(self):
+        """Test every comparison is within its budget"""
+        inputs = Transforms.benchmark.make_inputs(50)
+
+        for a_name, a_comparison in Transforms.accuracy.comparisons.items():
+
+            result = Transforms.accuracy.evaluate(a_comparison, inputs, a_repeat=1)
+
+            self.assertEqual(50, result['samples'] + result['skipped'], a_name)
+            self.assertTrue(result['ok'], '{} {}'.format(a_name, result))
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""Test the micro-benchmark runner
+
+to run:  ./pylaunch.sh test_benchmark.py
+verbose: ./pylaunch.sh test_benchmark.py -v
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import unittest
+
+import Transforms.benchmark
+
+
+class BenchmarkTests(unittest.TestCase):
+    """Test the benchmark runner and baseline comparison"""
+
+    def setUp(self):
+        """Set up test parameters."""
+
+        self.baseline = {'python': '3.6.9', 'machine': 'x86_64',
+                         'results': {'a': {'1': {'best_us': 10.0, 'median_us': 11.0},
+                                           '100': {'best_us': 5.0, 'median_us': 5.5}},
+                                     'b': {'1': {'best_us': 2.0, 'median_us': 2.0}}}}
+
+        return
+
+
+    def test_inputs(self):
+        """Test a batch of inputs"""
+        inputs = Transforms.benchmark.make_inputs(30)
+
+        self.assertEqual(30, len(inputs))
+        self.assertNotEqual(str(inputs[0]['datetime']), str(inputs[1]['datetime']))
+
+        return
+
+
+    def test_run(self):
+        """Test every case runs at every size"""
+        results = Transforms.benchmark.run(Transforms.benchmark.cases, sizes=(1, 3), a_repeat=1)
+
+        self.assertEqual(sorted(Transforms.benchmark.cases), sorted(results['results']))
+
+        for a_name, a_result in results['results'].items():
+            self.assertEqual(['1', '3'], sorted(a_result))
+            self.assertLess(0, a_result['3']['best_us'])
+
+        return
+
+
+    def test_batch(self):
+        """Test a Batch case is called once per batch with its arrays"""
+        calls = list()
+
+        a_case = Transforms.benchmark.Batch(lambda x: calls.append(len(x['julian_dates'])))
+
+        a_result = Transforms.benchmark.measure(a_case, Transforms.benchmark.make_inputs(10), a_repeat=2)
+
+        self.assertEqual([10]*2*(Transforms.benchmark.items_per_run//10), calls)
+        self.assertLess(0, a_result['best_us'])
+
+        return
+
+
+    def test_compare_same(self):
+        """Test no regressions against itself"""
+        table, regressions = Transforms.benchmark.compare(self.baseline, self.baseline)
+
+        self.assertEqual([], regressions)
+        self.assertEqual(4, len(table.splitlines()))
+
+        return
+
+
+    def test_compare_regression(self):
+        """Test a slower case is a regression"""
+        current = {'python': '3.6.9', 'machine': 'x86_64',
+                   'results': {'a': {'1': {'best_us': 10.5, 'median_us': 11.0},
+                                     '100': {'best_us': 6.0, 'median_us': 6.5}},
+                               'c': {'1': {'best_us': 1.0, 'median_us': 1.0}}}}
+
+        table, regressions = Transforms.benchmark.compare(self.baseline, current, a_threshold=10.0)
+
+        self.assertEqual(['a size 100 +20.0%'], regressions)
+        self.assertIn('new', table)
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""Unit tests for modules imported on first use
+
+to run:  ./pylaunch.sh test_lazy.py
+verbose: ./pylaunch.sh test_lazy.py -v
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import sys
+import unittest
+
+import Transforms.lazy
+
+
+class LazyTests(unittest.TestCase):
+    """Test Transforms.lazy.Module"""
+
+    def test_first_use(self):
+        """Imported by the first attribute and then the module's own"""
+
+        sys.modules.pop('colorsys', None)
+
+        colorsys = Transforms.lazy.Module('colorsys')
+
+        self.assertNotIn('colorsys', sys.modules)
+
+        self.assertEqual((0.0, 0.0, 1.0), colorsys.rgb_to_hsv(1.0, 1.0, 1.0))
+        self.assertIn('colorsys', sys.modules)
+        self.assertIs(sys.modules['colorsys'].rgb_to_hls, colorsys.rgb_to_hls)
+
+        with self.assertRaises(AttributeError):
+            colorsys.not_an_attribute
+
+        return
+
+
+    def test_missing(self):
+        """A module that is not installed fails on first use"""
+
+        a_module = Transforms.lazy.Module('not_a_module_anywhere')
+
+        with self.assertRaises(ImportError):
+            a_module.array
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+"""Test the import time runner
+
+to run:  ./pylaunch.sh test_startup.py
+verbose: ./pylaunch.sh test_startup.py -v
+
+"""
+
+from __future__ import absolute_import # for python 2 and 3
+
+import unittest
+
+import Transforms.startup
+
+
+class StartupTests(unittest.TestCase):
+    """Test the importtime parser and budgets"""
+
+    def test_parse_importtime(self):
+        """Test only the imports after the marker are kept"""
+        stderr = '\n'.join(['import time: self [us] | cumulative | imported package',
+                            'import time:       100 |        100 | site',
+                            Transforms.startup.marker,
+                            'import time:       300 |        300 |     coords',
+                            'import time:       200 |        600 |   Transforms.utils',
+                            'import time:        50 |        650 | Transforms.EquatorialHorizon'])
+
+        records = Transforms.startup.parse_importtime(stderr)
+
+        self.assertEqual(['coords', 'Transforms.utils', 'Transforms.EquatorialHorizon'],
+                         [a_record['module'] for a_record in records])
+        self.assertEqual([2, 1, 0], [a_record['depth'] for a_record in records])
+        self.assertEqual('coords', Transforms.startup.top_imports(records, 1)[0]['module'])
+
+        return
+
+
+    def test_evaluate(self):
+        """Test a target in a fresh interpreter"""
+        result = Transforms.startup.evaluate({'statement': 'import Transforms.utils', 'budget_ms': 1e6}, a_repeat=1)
+
+        self.assertTrue(result['ok'])
+        self.assertIn('Transforms.utils', [a_record['module'] for a_record in result['imports']])
+
+        return
+
+
+    def test_deferred(self):
+        """Test a target fails if it imports a deferred module"""
+        result = Transforms.startup.evaluate({'statement': 'import Transforms.EquatorialHorizon', 'budget_ms': 1e6,
+                                              'deferred': ('Transforms.SiderealTime',)}, a_repeat=1)
+
+        self.assertFalse(result['ok'])
+        self.assertEqual(['Transforms.SiderealTime'], result['loaded'])
+
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
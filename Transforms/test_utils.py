@@ -29,6 +29,7 @@ import time
 import unittest
 
 import coords
+import numpy
 import utils
 
 class UtilsTests(unittest.TestCase):
@@ -60,6 +61,23 @@ class UtilsTests(unittest.TestCase):
         return
 
 
+    def test_julian_date(self):
+        """Test Julian date, Meeus examples 7.a and 7.b"""
+        self.assertAlmostEqual(2436116.31, utils.julian_date(1957, 10, 4, 19, 26, 24))
+        self.assertAlmostEqual(1842713.0, utils.julian_date(333, 1, 27, 12))
+        self.assertAlmostEqual(2451545.0, utils.julian_date(2000, 1, 1, 4, an_offset=-8))
+
+        return
+
+
+    def test_julian_date_coords(self):
+        """Test Julian date is the same as coords.datetime"""
+        a_datetime = coords.datetime('2015-03-06T20:00:00-08')
+        self.assertAlmostEqual(a_datetime.toJulianDate(), utils.julian_date(2015, 3, 6, 20, an_offset=-8))
+
+        return
+
+
     def test_get_latitude_npole(self):
         """Test get_latitude north pole"""
         a_point = coords.spherical(1)
@@ -166,6 +184,84 @@ class UtilsTests(unittest.TestCase):
 
 
 
+class DMSTests(unittest.TestCase):
+    """Test the deg:min:sec parser"""
+
+
+    def test_dms2degrees(self):
+        """Test deg, deg:min and deg:min:sec"""
+        self.assertEqual(45.0, utils.dms2degrees('45'))
+        self.assertAlmostEqual(37.4, utils.dms2degrees('37:24'))
+        self.assertAlmostEqual(-122.0825, utils.dms2degrees('-122:04:57'))
+        self.assertAlmostEqual(248.03354910000002, utils.dms2degrees('248:02:0.77676'))
+        self.assertAlmostEqual(12.5, utils.dms2degrees('+12.5'))
+
+        return
+
+
+    def test_dms2degrees_negative_zero(self):
+        """Test the sign applies to the minutes of -0:30"""
+        self.assertAlmostEqual(-0.5, utils.dms2degrees('-0:30'))
+        self.assertAlmostEqual(-0.25, utils.dms2degrees('-0:15:00'))
+
+        return
+
+
+    def test_dms2degrees_format(self):
+        """Test unsupported formats"""
+        for a_dms in ('we36asdf', '', '37:', '37::30', '37:-30', '1e3', '12.5:30', '37:30.5:10', '37:30:30:30', 'nan'):
+            with self.assertRaises(utils.Error):
+                utils.dms2degrees(a_dms)
+
+        return
+
+
+    def test_dms2degrees_range(self):
+        """Test minutes, seconds and limits out of range"""
+        for a_dms in ('37:60', '37:30:60', '361'):
+            with self.assertRaises(utils.Error):
+                utils.dms2degrees(a_dms)
+
+        self.assertEqual(-90.0, utils.dms2degrees('-90', utils.latitude_limits))
+
+        with self.assertRaises(utils.Error):
+            utils.dms2degrees('90:00:01', utils.latitude_limits)
+
+        return
+
+
+    def test_dms2degrees_array(self):
+        """Test a column matches the scalar parser"""
+        some_dms = ['{}:{:02}:{:06.3f}'.format(-89 + i % 179, (7*i) % 60, (13.7*i) % 60) for i in range(1000)]
+
+        degrees = utils.dms2degrees_array(some_dms)
+
+        self.assertEqual(numpy.float64, degrees.dtype)
+        self.assertEqual([utils.dms2degrees(a_dms) for a_dms in some_dms], degrees.tolist())
+        self.assertEqual(degrees.tolist(), utils.dms2degrees_array(numpy.array(some_dms)).tolist())
+        self.assertEqual(degrees.tolist(), utils.dms2degrees_array(iter(some_dms)).tolist())
+
+        return
+
+
+    def test_dms2degrees_array_invalid(self):
+        """Test the invalid row is reported or filled"""
+        some_dms = ['10:30', '20', '95', 'x']
+
+        with self.assertRaises(utils.Error) as context:
+            utils.dms2degrees_array(some_dms, utils.latitude_limits)
+
+        self.assertIn('(row 2)', str(context.exception))
+
+        degrees = utils.dms2degrees_array(some_dms, utils.latitude_limits, an_invalid=numpy.nan)
+
+        self.assertEqual([10.5, 20.0], degrees[:2].tolist())
+        self.assertTrue(numpy.isnan(degrees[2:]).all())
+
+        return
+
+
+
 class GetAzimuthTests(unittest.TestCase):
     """Test get azimuth"""
 
@@ -7,42 +7,196 @@ import re
 
 import coords
 
+import Transforms.lazy
+
+numpy = Transforms.lazy.Module('numpy') # imported on first use, only the bulk parsers need it
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+# [+-]deg[:min[:sec]], only the last field may have a fraction
+
+dms_re = re.compile(r'\s*([-+]?)(\d+(?:\.\d*)?|\.\d+)(?::(\d+(?:\.\d*)?|\.\d+))?(?::(\d+(?:\.\d*)?|\.\d+))?\s*\Z')
+
+# inclusive limits in degrees
+
+angle_limits = (-360.0, 360.0)
+latitude_limits = (-90.0, 90.0)
+longitude_limits = (-180.0, 180.0)
+
+
+# ===================
+# ===== classes =====
+# ===================
+
 
 class Error(Exception):
     pass
 
 
-angle_re = re.compile(r'(-){0,1}(\d+)(:\d+){0,1}(:\d+\.?\d+){0,1}') # TODO limits 0-360, 0-60, etc
+# =====================
+# ===== functions =====
+# =====================
 
-def parse_angle_arg(an_arg):
-    """Parse angle arg as a string of dd:mm:ss.sss"""
 
-    degrees = 0
-    minutes = 0
-    seconds = 0
+def dms2degrees(a_dms, a_limits=angle_limits, a_name='angle'):
+    """Parse a string of [+-]dd[:mm[:ss.sss]] into decimal degrees
 
-    if not angle_re.match(an_arg):
-        raise Error('Unsupported angle format: %s' % (an_arg,))
+    The sign applies to the whole angle, so -0:30 is -0.5. Minutes and
+    seconds are less than 60 and only the last field may have a
+    fraction.
 
-    words = an_arg.split(':')
+    Args:
+        a_dms (str): the angle
+        a_limits (tuple): minimum and maximum degrees
+        a_name (str): name of the value for error messages
 
-    if len(words) == 3:
-        degrees = float(words[0])
-        minutes = float(words[1])
-        seconds = float(words[2])
-    elif len(words) == 2:
-        degrees = float(words[0])
-        minutes = float(words[1])
-    elif len(words) == 1:
-        degrees = float(words[0])
-    else:
-        raise Error('Unsupported format')
+    Returns: float degrees
+    Raises: Error if unsupported format or out of range
+    """
+
+    found = dms_re.match(a_dms)
+
+    if found is None:
+        raise Error('unsupported format for {}: {}'.format(a_name, a_dms))
+
+    sign, degrees, minutes, seconds = found.groups()
+
+    result = float(degrees)
 
-    result = coords.angle(degrees, minutes, seconds)
+    if minutes is not None:
+
+        if '.' in degrees or (seconds is not None and '.' in minutes):
+            raise Error('unsupported format for {}: {}'.format(a_name, a_dms))
+
+        minutes = float(minutes)
+
+        if seconds is not None:
+
+            seconds = float(seconds)
+
+            if seconds >= 60:
+                raise Error('{} seconds out of range [0, 60): {}'.format(a_name, a_dms))
+
+            result += seconds/3600.0
+
+        if minutes >= 60:
+            raise Error('{} minutes out of range [0, 60): {}'.format(a_name, a_dms))
+
+        result += minutes/60.0
+
+    if sign == '-':
+        result = -result
+
+    if not a_limits[0] <= result <= a_limits[1]:
+        raise Error('{} out of range [{}, {}]: {}'.format(a_name, a_limits[0], a_limits[1], a_dms))
 
     return result
 
 
+def dms2degrees_array(some_dms, a_limits=angle_limits, an_invalid=None, a_name='angle'):
+    """Parse a column of [+-]dd[:mm[:ss.sss]] strings into degrees
+
+    For files and bulk requests with many angles, each parsed as
+    dms2degrees into one float64 array without a list of floats or
+    coords.angle in between.
+
+    Args:
+        some_dms (iterable): of str, a list, a numpy array of str or a file column
+        a_limits (tuple): minimum and maximum degrees
+        an_invalid (float): value for unsupported or out of range
+            strings, like numpy.nan, or None to raise
+        a_name (str): name of the values for error messages
+
+    Returns: numpy.ndarray of float64 degrees
+    Raises: Error on the first invalid string if an_invalid is None
+    """
+
+    if isinstance(some_dms, numpy.ndarray):
+        some_dms = some_dms.tolist()
+    elif not isinstance(some_dms, (list, tuple)):
+        some_dms = list(some_dms) # to find the invalid row
+
+    if an_invalid is None:
+
+        def parse(a_dms):
+            return dms2degrees(a_dms, a_limits, a_name)
+
+    else:
+
+        def parse(a_dms):
+            try:
+                return dms2degrees(a_dms, a_limits, a_name)
+            except (Error, TypeError):
+                return an_invalid
+
+    try:
+        return numpy.fromiter(map(parse, some_dms), dtype=numpy.float64, count=len(some_dms))
+    except Error as err:
+        raise Error('{} (row {})'.format(err, first_invalid(some_dms, a_limits)))
+
+
+def first_invalid(some_dms, a_limits=angle_limits):
+    """Index of the first string dms2degrees rejects, None if all parse"""
+
+    for i, a_dms in enumerate(some_dms):
+        try:
+            dms2degrees(a_dms, a_limits)
+        except Error:
+            return i
+
+    return None
+
+
+def parse_angle_arg(an_arg, a_limits=angle_limits):
+    """Parse angle arg as a string of dd:mm:ss.sss
+
+    Args:
+        an_arg (str): see dms2degrees
+        a_limits (tuple): minimum and maximum degrees
+
+    Returns: coords.angle
+    Raises: Error if unsupported format or out of range
+    """
+
+    return coords.angle(dms2degrees(an_arg, a_limits))
+
+
+def julian_date(year, month, day, hour=0, minute=0, seconds=0, an_offset=0):
+    """Calculates the Julian date of a date and time
+
+    Meeus eq. 7.1, p. 61, without constructing a coords.datetime, for
+    callers that already have the fields, like a parsed ISO 8601
+    string. Dates before 1582-10-15 are Julian calendar dates.
+
+    Args:
+
+        year, month, day (int): the date
+
+        hour, minute (int), seconds (float): the local time
+
+        an_offset (float): hours the time zone is east of UTC, e.g. -8
+
+    Returns a float equal to the Julian date.
+    """
+
+    if month <= 2:
+        year -= 1
+        month += 12
+
+    if (year, month, day) >= (1582, 10, 15):
+        A = year//100
+        B = 2 - A + A//4
+    else:
+        B = 0
+
+    day_fraction = (hour - an_offset + minute/60.0 + seconds/3600.0)/24.0
+
+    return math.floor(365.25*(year + 4716)) + math.floor(30.6001*(month + 1)) + day + B - 1524.5 + day_fraction
+
+
 def JulianCentury(a_datetime):
     """Calculates the Julian century relative to J2000 of the given date
 
@@ -17,6 +17,13 @@ import logging
 import os
 
 import api
+import compute
+import metrics
+import preload
+import profiling
+import scheduler
+import slowlog
+import tracing
 import views
 
 
@@ -54,6 +61,14 @@ def factory(a_config_flnm=None):
     aai_app.register_blueprint(views.home_page)
     aai_app.register_blueprint(api.api)
 
+    metrics.init_app(aai_app) # first to time the requests the scheduler turns away
+    tracing.init_app(aai_app) # and trace them
+    slowlog.init_app(aai_app) # after metrics, which times the stages it logs
+    compute.init_app(aai_app)
+    scheduler.init_app(aai_app)
+    profiling.init_app(aai_app) # after the scheduler to profile only requests it lets in
+    preload.init_app(aai_app) # last, it answers requests through all the hooks
+
     return aai_app
 
 
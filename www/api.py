@@ -21,20 +21,87 @@ import flask
 
 import coords
 import re
+
+import compute
+import formats
 import utils
 
-import Bodies.MoonPosition
-import Bodies.SunPosition
-import Transforms.EclipticEquatorial
-import Transforms.EquatorialHorizon
 import Transforms.utils
 
+# charts, the Bodies and the other Transforms are imported by the
+# handlers that use them so the app starts without loading them, see
+# startup.py
+
 # -------------------
 # ----- globals -----
 # -------------------
 
 api = flask.Blueprint('api', __name__, url_prefix='/api/v1')
 
+max_scenarios = 16 # per lunar_daily_altitudes request
+
+# chart resolution bounds, override with AAI_RESOLUTION_BOUNDS and
+# AAI_TOLERANCE_BOUNDS in the flask config
+
+default_resolution_bounds = (1, 60) # minutes between chart points
+default_tolerance_bounds = (0.01, 5) # degrees of adaptive interpolation error
+
+temperature_bounds = (-90, 60) # Celsius, of the refraction
+pressure_bounds = (0, 1100) # millibars, of the refraction
+
+# ---------------------
+# ----- utilities -----
+# ---------------------
+
+
+def request_chart_options(a_flask_request):
+    """Gets the chart resolution and tolerance from the request args
+
+    resolution is the minutes between chart points or 'adaptive' for
+    points only where the curves bend, with the straight lines between
+    them within tolerance degrees of the curves. See
+    charts.adaptive_samples.
+
+    Args:
+        a_flask_request (werkzeug.local.LocalProxy): reference to the flask request object
+
+    Returns: dict of chart keyword arguments
+    Raises: utils.Error if out of the configured bounds
+    """
+
+    config = flask.current_app.config
+
+    return {'a_resolution': utils.request_resolution('resolution', a_flask_request,
+                                                     config.get('AAI_RESOLUTION_BOUNDS', default_resolution_bounds)),
+            'a_tolerance': utils.request_bounded_float('tolerance', a_flask_request,
+                                                       config.get('AAI_TOLERANCE_BOUNDS', default_tolerance_bounds))}
+
+
+def request_refraction(a_flask_request):
+    """Gets the optional refraction temperature and pressure from the request args
+
+    Either one asks for the apparent altitude, the other one is then
+    that of Transforms.Refraction.standard.
+
+    Args:
+        a_flask_request (werkzeug.local.LocalProxy): reference to the flask request object
+
+    Returns: (temperature, pressure) or None if neither is in the request
+    Raises: utils.Error if out of bounds
+    """
+
+    a_temperature = utils.request_bounded_float('temperature', a_flask_request, temperature_bounds)
+    a_pressure = utils.request_bounded_float('pressure', a_flask_request, pressure_bounds)
+
+    if a_temperature is None and a_pressure is None:
+        return None
+
+    import Transforms.Refraction
+
+    return (Transforms.Refraction.standard_temperature if a_temperature is None else a_temperature,
+            Transforms.Refraction.standard_pressure if a_pressure is None else a_pressure)
+
+
 # ----------------------
 # ----- transforms -----
 # ----------------------
@@ -72,7 +139,7 @@ def dec2dms():
     """
     result = {'errors': list()}
     try:
-        dec = utils.request_angle('dec', flask.request)
+        dec = utils.request_angle('dec', flask.request, Transforms.utils.angle_limits) # any angle, not a declination
         result['dms'] = str(dec)
     except (utils.Error, Transforms.utils.Error, TypeError, ValueError, RuntimeError) as err:
         result['errors'].append(str(err))
@@ -165,12 +232,15 @@ def standardize():
 
     """
 
+    import Transforms.EquatorialHorizon
+
     result = {'params': dict(), 'errors': list(), 'warnings': list()}
 
     # ----- datetime stuff -----
     std_datetime = None
 
-    if 'time' in flask.request.args and \
+    if 'datetime' in flask.request.args or \
+       'time' in flask.request.args and \
        'date' in flask.request.args and \
        'timezone' in flask.request.args:
 
@@ -228,7 +298,7 @@ def standardize():
                 std_val = utils.request_angle(key, flask.request)
                 result['params'][key] = str(std_val.getDegrees())
 
-            elif key in ('azalt', 'date', 'notes', 'observer', 'target', 'time', 'timezone'):
+            elif key in ('azalt', 'date', 'datetime', 'notes', 'observer', 'target', 'time', 'timezone'):
                 pass
 
             else:
@@ -241,6 +311,35 @@ def standardize():
     return flask.jsonify(**result)
 
 
+@api.route("/standardize", methods=['POST'])
+def standardize_log():
+    """Standardizes every observation of a CSV or JSON lines log
+
+    The log is read and the answer streamed a chunk of rows at a time,
+    see bulk.py
+
+    Args:
+        azalt (true): transform az/alt to ra/dec for every row
+
+    Returns: CSV or JSON lines, the format of the log, a line per row
+        with its own errors and warnings. JSON with errors if the
+        format is not supported.
+    """
+
+    import bulk
+
+    try:
+        a_format = bulk.input_format(flask.request)
+    except bulk.Error as err:
+        return flask.jsonify(errors=[str(err)]), 415
+
+    rows = bulk.standardize(flask.request.stream, a_format,
+                            is_azalt=flask.request.args.get('azalt') == 'true',
+                            a_chunk_rows=flask.current_app.config.get('AAI_BULK_CHUNK_ROWS', bulk.default_chunk_rows))
+
+    return flask.Response(flask.stream_with_context(rows), mimetype=bulk.mimetypes[a_format])
+
+
 @api.route("/azalt2radec")
 def azalt2radec():
     """Transform Azimuth, Altitude to Right Ascension, Declination Coordinates
@@ -253,6 +352,8 @@ def azalt2radec():
         timezone (hr:min)
         azimuth (degrees[:minutes[:seconds]])
         altitude (degrees[:minutes[:seconds]])
+        temperature (Celsius, optional) of an apparent altitude
+        pressure (millibars, optional) of an apparent altitude
 
     Returns:
         observer location (str)
@@ -262,6 +363,8 @@ def azalt2radec():
         errors (list)
     """
 
+    import Transforms.EquatorialHorizon
+
     result = {'errors': list()}
 
     try:
@@ -279,7 +382,8 @@ def azalt2radec():
         body_hz = Transforms.utils.azalt2spherical(utils.request_angle('azimuth', flask.request),
                                                    utils.request_angle('altitude', flask.request))
 
-        body_eq = Transforms.EquatorialHorizon.toEquatorial(body_hz, an_observer, a_datetime)
+        body_eq = Transforms.EquatorialHorizon.toEquatorial(body_hz, an_observer, a_datetime,
+                                                            a_refraction=request_refraction(flask.request))
 
         result['ra'] = body_eq.phi.RA
         result['dec'] = body_eq.theta.complement().degrees
@@ -302,6 +406,8 @@ def radec2azalt():
         timezone (hr:min)
         ra (hr:mn)
         dec (degrees[:minutes[:seconds]])
+        temperature (Celsius, optional) for the apparent altitude
+        pressure (millibars, optional) for the apparent altitude
 
     Returns:
         observer location (str)
@@ -311,6 +417,8 @@ def radec2azalt():
         errors (list)
     """
 
+    import Transforms.EquatorialHorizon
+
     result = {'errors': list()}
 
     try:
@@ -326,7 +434,8 @@ def radec2azalt():
         body_eq = Transforms.utils.radec2spherical(utils.request_angle('ra', flask.request),
                                                    utils.request_angle('dec', flask.request))
 
-        body_hz = Transforms.EquatorialHorizon.toHorizon(body_eq, an_observer, a_datetime)
+        body_hz = Transforms.EquatorialHorizon.toHorizon(body_eq, an_observer, a_datetime,
+                                                         a_refraction=request_refraction(flask.request))
 
         result['azimuth']  = body_hz.phi.degrees
         result['altitude'] = body_hz.theta.complement().degrees
@@ -355,6 +464,8 @@ def radec2eclatlon():
         errors (list)
     """
 
+    import Transforms.EclipticEquatorial
+
     result = {'errors': list()}
 
     try:
@@ -394,6 +505,8 @@ def eclatlon2radec():
         errors (list)
     """
 
+    import Transforms.EclipticEquatorial
+
     result = {'errors': list()}
 
     try:
@@ -426,6 +539,8 @@ def eclatlon2radec():
 def solar_ecliptic_coords():
     """Calculate the azimuth and altitude of the sun for an observer at a_datetime"""
 
+    import Bodies.SunPosition
+
     result = {'errors': list()}
 
     try:
@@ -448,6 +563,8 @@ def solar_ecliptic_coords():
 def solar_equatorial_coords(an_observer, a_datetime):
     """Calculate the azimuth and altitude of the sun for an observer at a_datetime"""
 
+    import Bodies.SunPosition
+
     result = {'errors': list()}
 
     try:
@@ -473,6 +590,8 @@ def solar_horizontal_coords(an_observer, a_datetime):
         an_observer (coords.spherical): an observer locatioin
         a_datetime (coords.datetime): time of obsevation
     """
+    import Bodies.SunPosition
+
     result = {'errors': list()}
 
     try:
@@ -501,196 +620,33 @@ def solar_horizontal_coords(an_observer, a_datetime):
 
 @api.route("/solar_daily_altitude")
 def solar_daily_altitude():
-    """Get the sun position chart for the given day as JSON
-
-    result.datetime
-          .date_label
-          .sun_marker_time
-          .sun_marker_altitude
-          .sun_marker_azimuth
-          .rising
-          .transit
-          .setting
-          .altitude_data_24h[time, current, vernal, summer, autumnal, winter]
+    """Get the sun position chart for the given day
+
+    JSON by default, packed floats with ?format=f32 or f64. See formats.py.
+
+    Optional resolution=minutes between points (default 15) or
+    resolution=adaptive with tolerance=degrees (default 0.1). See
+    request_chart_options.
 
+    See charts.solar_daily_altitude
     """
 
     result = {'errors': list()}
 
     try:
 
-        an_observer = Transforms.utils.latlon2spherical(utils.request_angle('latitude', flask.request),
-                                                        utils.request_angle('longitude', flask.request))
-
-        result['observer'] = str(an_observer) # TODO format? XML from c++ operator::<<()
-        result['latitude'] = utils.request_angle('latitude', flask.request).degrees
-        result['longitude'] = utils.request_angle('longitude', flask.request).degrees
-
+        a_latitude = utils.request_angle('latitude', flask.request)
+        a_longitude = utils.request_angle('longitude', flask.request)
         a_datetime = utils.request_datetime('date','time', 'timezone', flask.request)
 
-        result['datetime'] = str(a_datetime)
-
-        result['current_date'] = '{}-{:02}-{:02}'.format(a_datetime.year, a_datetime.month, a_datetime.day)
-        result['current_time'] = '{:02}:{:02}:{:05.2f}'.format(a_datetime.hour, a_datetime.minute, a_datetime.second)
-        result['current_timezone'] = '{}'.format(a_datetime.offset())
-
-        result['sun_marker_time'] = a_datetime.hour + a_datetime.minute/60.0
-        # distance on x-axis to plot sun marker
-
-        vernal_equinox = coords.datetime(a_datetime.year, 3, 20)
-        vernal_equinox.timezone = a_datetime.offset()
-        vernal_equinox -= a_datetime.offset() * 1.0/24 # to center plot at local noon
-
-        summer_solstice = coords.datetime(a_datetime.year, 6, 20)
-        summer_solstice.timezone = a_datetime.offset()
-        summer_solstice -= a_datetime.offset() * 1.0/24 # to center plot at local noon
-
-        autumnal_equinox = coords.datetime(a_datetime.year, 9, 22)
-        autumnal_equinox.timezone = a_datetime.offset()
-        autumnal_equinox -= a_datetime.offset() * 1.0/24 # to center plot at local noon
-
-        winter_solstice = coords.datetime(a_datetime.year, 12, 21)
-        winter_solstice.timezone = a_datetime.offset()
-        winter_solstice -= a_datetime.offset() * 1.0/24 # to center plot at local noon
-
-        result['date_label'] = '{year}-{month}-{day}'.format(year=a_datetime.year,
-                                                             month=a_datetime.month,
-                                                             day=a_datetime.day),
-
-        # ----- plot path -----
-
-        npts = 24*4
-        dtime = 0
+        a_chart_options = request_chart_options(flask.request)
 
-        altitude = list()
+        result.update(compute.chart('solar_daily_altitude', a_latitude, a_longitude, a_datetime, **a_chart_options))
 
-        current_time = coords.datetime(a_datetime.year, a_datetime.month, a_datetime.day)
-        current_time.timezone = a_datetime.offset()
-        current_time -= a_datetime.offset() * 1.0/24 # to center plot at local noon
-
-        for d in range(0, npts + 1):
-
-            sun_ct = Bodies.SunPosition.HorizontalCoords(an_observer, current_time)
-            sun_ve = Bodies.SunPosition.HorizontalCoords(an_observer, vernal_equinox)
-            sun_ss = Bodies.SunPosition.HorizontalCoords(an_observer, summer_solstice)
-            sun_ae = Bodies.SunPosition.HorizontalCoords(an_observer, autumnal_equinox)
-            sun_ws = Bodies.SunPosition.HorizontalCoords(an_observer, winter_solstice)
-
-            altitude.append([dtime,
-                             sun_ve.theta.complement().degrees,
-                             sun_ss.theta.complement().degrees,
-                             sun_ae.theta.complement().degrees,
-                             sun_ws.theta.complement().degrees,
-                             sun_ct.theta.complement().degrees # needs to be last for sun position marker
-                         ]
-            )
-
-
-            dtime += 1.0/npts*24
-
-            current_time += 1.0/npts
-            vernal_equinox += 1.0/npts
-            summer_solstice += 1.0/npts
-            autumnal_equinox += 1.0/npts
-            winter_solstice += 1.0/npts
-
-        result['altitude_data_24h'] = altitude # list
-
-        rts = get_sun_rise_transit_set(utils.request_angle('latitude', flask.request),
-                                       utils.request_angle('longitude', flask.request),
-                                       utils.request_datetime('date',
-                                                              'time',
-                                                              'timezone',
-                                                              flask.request))
-
-        result['sun_marker_altitude'] = '{}'.format(str(rts['altitude']))
-        result['sun_marker_azimuth']  = '{}'.format(str(rts['azimuth']))
-
-        result['rising']   = rts['rising']
-        result['transit']  = rts['transit']
-        result['setting']  = rts['setting']
-
-
-    except Bodies.SunPosition.Error as err:
-
-        result['sun_marker_altitude'] = str(err)
-        result['sun_marker_azimuth']  = str(err)
-        result['rising']   = str(err)
-        result['transit']  = str(err)
-        result['setting']  = str(err)
-
-    except (utils.Error, Transforms.utils.Error, TypeError, ValueError, RuntimeError) as err:
+    except (compute.Error, utils.Error, Transforms.utils.Error, TypeError, ValueError, RuntimeError) as err:
         result['errors'].append(str(err))
 
-    return flask.jsonify(**result)
-
-
-def get_sun_rise_transit_set(a_latitude, a_longitude, a_datetime):
-    """Calculate the sun position at rise, transit and set.
-
-    Args:
-        a_latitude (coords.angle): observer's latitude
-        a_longitude (coords.angle): observer's longitude
-        a_datetime (coords.datetime): observer's time
-
-
-    return results dictionary
-    """
-
-    result = dict()
-    result['latitude'] = a_latitude
-    result['longitude'] = a_longitude
-    result['datetime'] = a_datetime
-
-    result['eot'] = Bodies.SunPosition.EquationOfTime(a_datetime)
-    result['obliquity'] = Transforms.EclipticEquatorial.obliquity(a_datetime)
-
-    an_observer = Transforms.utils.latlon2spherical(a_latitude, a_longitude)
-
-    rising, transit, setting = Bodies.SunPosition.SunRiseAndSet(an_observer, a_datetime)
-
-    result['rising']  = '{:02}:{:02}:{:04.1f}'.format(rising.hour, rising.minute, rising.second)
-    result['transit'] = '{:02}:{:02}:{:04.1f}'.format(transit.hour, transit.minute, transit.second)
-    result['setting'] = '{:02}:{:02}:{:04.1f}'.format(setting.hour, setting.minute, setting.second)
-
-    sun_azalt = get_sun_azalt(an_observer, a_datetime)
-
-    result['azimuth']  = '{}'.format(sun_azalt['azimuth'])
-    result['altitude'] = '{}'.format(sun_azalt['altitude'])
-
-
-    return result
-
-
-# solar azimuth
-
-
-def get_sun_azalt(an_observer, a_datetime):
-    """Calculate the azimuth and altitude of the sun for an observer at a_datetime
-
-    TODO duplication in SunPosition and above
-
-    Args:
-        an_observer (coords.spherical): an observer locatioin
-        a_datetime (coords.datetime): time of obsevation
-    """
-    result = dict()
-
-    ecliptic_longitude, R = Bodies.SunPosition.SolarLongitudeRange(a_datetime)
-
-    sun_ec = coords.spherical(R, coords.angle(90), ecliptic_longitude)
-    sun_eq = Transforms.EclipticEquatorial.toEquatorial(sun_ec, a_datetime)
-    sun_hz = Transforms.EquatorialHorizon.toHorizon(sun_eq, an_observer, a_datetime)
-
-    result['dec'] = sun_eq.theta.complement()
-
-    result['R'] = R
-    result['ecliptic_longitude'] = str(ecliptic_longitude)
-
-    result['azimuth'] = sun_hz.phi
-    result['altitude'] = sun_hz.theta.complement()
-
-    return result
+    return formats.respond(result)
 
 
 @api.route("/sun_rise_set_azimuths")
@@ -700,6 +656,8 @@ def sun_rise_set_azimuths():
     TODO check timezone
     """
 
+    import charts
+
     result = {'errors': list()}
 
     try:
@@ -717,18 +675,18 @@ def sun_rise_set_azimuths():
         result['current_time'] = '{:02}:{:02}:{:05.2f}'.format(a_datetime.hour, a_datetime.minute, a_datetime.second)
         result['current_timezone'] = '{}'.format(a_datetime.offset())
 
-        rts = get_sun_rise_transit_set(utils.request_angle('latitude', flask.request),
-                                       utils.request_angle('longitude', flask.request),
-                                       utils.request_datetime('date',
-                                                              'time',
-                                                              'timezone',
-                                                              flask.request))
+        rts = charts.get_sun_rise_transit_set(utils.request_angle('latitude', flask.request),
+                                              utils.request_angle('longitude', flask.request),
+                                              utils.request_datetime('date',
+                                                                     'time',
+                                                                     'timezone',
+                                                                     flask.request))
 
 
         result['current_altitude_str'] = rts['altitude']
         result['current_azimuth_str']  = rts['azimuth']
 
-        current_azalt = get_sun_azalt(an_observer, a_datetime)
+        current_azalt = charts.get_sun_azalt(an_observer, a_datetime)
         result['current_azimuth'] = current_azalt['azimuth'].degrees
 
         result['rising']   = rts['rising']
@@ -736,26 +694,17 @@ def sun_rise_set_azimuths():
         result['setting']  = rts['setting']
 
 
-        # TODO does not support fractional time zones like India yet
-        if a_datetime.offset() < 0:
-            timezone = '{:03}'.format(int(a_datetime.offset()))
-        else:
-            timezone = '+{:02}'.format(int(a_datetime.offset()))
-
-
-        a_rising_datetime = coords.datetime('{}-{:02}-{:02}T{}{}'.format(a_datetime.year, a_datetime.month, a_datetime.day,
-                                                                         result['rising'], timezone))
-
-        a_transit_datetime = coords.datetime('{}-{:02}-{:02}T{}{}'.format(a_datetime.year, a_datetime.month, a_datetime.day,
-                                                                          result['transit'], timezone))
+        a_date = '{}-{:02}-{:02}'.format(a_datetime.year, a_datetime.month, a_datetime.day)
+        timezone = utils.offset2timezone(a_datetime.offset()) # +05:30 too
 
-        a_setting_datetime = coords.datetime('{}-{:02}-{:02}T{}{}'.format(a_datetime.year, a_datetime.month, a_datetime.day,
-                                                                          result['setting'], timezone))
+        a_rising_datetime = utils.parse_datetime(a_date, result['rising'], timezone)
+        a_transit_datetime = utils.parse_datetime(a_date, result['transit'], timezone)
+        a_setting_datetime = utils.parse_datetime(a_date, result['setting'], timezone)
 
 
-        rising_azalt = get_sun_azalt(an_observer, a_rising_datetime)
-        transit_azalt = get_sun_azalt(an_observer, a_transit_datetime)
-        setting_azalt = get_sun_azalt(an_observer, a_setting_datetime)
+        rising_azalt = charts.get_sun_azalt(an_observer, a_rising_datetime)
+        transit_azalt = charts.get_sun_azalt(an_observer, a_transit_datetime)
+        setting_azalt = charts.get_sun_azalt(an_observer, a_setting_datetime)
 
         result['rising_azimuth'] = rising_azalt['azimuth'].degrees
         result['transit_azimuth'] = transit_azalt['azimuth'].degrees
@@ -787,6 +736,8 @@ def sun_rise_set_azimuths():
 def lunar_ecliptic_coords():
     """Calculate the azimuth and altitude of the moon for an observer at a_datetime"""
 
+    import Bodies.MoonPosition
+
     result = {'errors': list()}
 
     try:
@@ -809,6 +760,8 @@ def lunar_ecliptic_coords():
 def lunar_equatorial_coords(an_observer, a_datetime):
     """Calculate the azimuth and altitude of the moon for an observer at a_datetime"""
 
+    import Bodies.MoonPosition
+
     result = {'errors': list()}
 
     try:
@@ -835,6 +788,8 @@ def lunar_horizontal_coords(an_observer, a_datetime):
         an_observer (coords.spherical): an observer locatioin
         a_datetime (coords.datetime): time of obsevation
     """
+    import Bodies.MoonPosition
+
     result = {'errors': list()}
 
     try:
@@ -857,35 +812,6 @@ def lunar_horizontal_coords(an_observer, a_datetime):
     return flask.jsonify(**result)
 
 
-def get_moon_rise_transit_set(a_latitude, a_longitude, a_datetime):
-    """Calculate the moon position at local rise, transit set
-
-    Args:
-        a_latitude (coords.angle): observer's latitude
-        a_longitude (coords.angle): observer's longitude
-        a_datetime (coords.datetime): observer's time
-
-    return results dictionary
-    """
-
-    result = dict()
-    result['latitude'] = a_latitude
-    result['longitude'] = a_longitude
-    result['datetime'] = a_datetime
-
-    an_observer = Transforms.utils.latlon2spherical(a_latitude, a_longitude)
-
-    moon_eq = Bodies.MoonPosition.EquatorialCoords(a_datetime)
-
-    rising, transit, setting = Bodies.SunPosition.RiseAndSet(moon_eq, an_observer, a_datetime)
-
-    result['rising']  = '{:02}:{:02}:{:04.1f}'.format(rising.hour, rising.minute, rising.second)
-    result['transit'] = '{:02}:{:02}:{:04.1f}'.format(transit.hour, transit.minute, transit.second)
-    result['setting'] = '{:02}:{:02}:{:04.1f}'.format(setting.hour, setting.minute, setting.second)
-
-    return result
-
-
 # --------------------------------
 # ----- lunar daily altitude -----
 # --------------------------------
@@ -894,181 +820,92 @@ def get_moon_rise_transit_set(a_latitude, a_longitude, a_datetime):
 
 @api.route("/lunar_daily_altitude")
 def lunar_daily_altitude():
-    """Get the moon position chart for the given day as JSON
-
-
-    result.datetime
-          .sun_date_label
-          .sun_marker_time
-          .sun_marker_altitude
-          .sun_marker_azimuth
-          .sun_rising
-          .sun_transit
-          .sun_setting
-          .moon_date_label
-          .moon_marker_time
-          .moon_marker_altitude
-          .moon_marker_azimuth
-          .moon_rising
-          .moon_transit
-          .moon_setting
-          .altitude_data_24h[time, sun, moon ]
+    """Get the moon position chart for the given day
 
+    JSON by default, packed floats with ?format=f32 or f64. See formats.py.
+
+    Optional resolution=minutes between points (default 15) or
+    resolution=adaptive with tolerance=degrees (default 0.1). See
+    request_chart_options.
+
+    See charts.lunar_daily_altitude
     """
 
+    import Bodies.SunPosition
+
     result = {'errors': list()}
 
     try:
 
-        an_observer = Transforms.utils.latlon2spherical(utils.request_angle('latitude', flask.request),
-                                                        utils.request_angle('longitude', flask.request))
-
-        result['observer'] = str(an_observer) # TODO format? XML from c++ operator::<<()
-        result['latitude'] = utils.request_angle('latitude', flask.request).degrees
-        result['longitude'] = utils.request_angle('longitude', flask.request).degrees
-
+        a_latitude = utils.request_angle('latitude', flask.request)
+        a_longitude = utils.request_angle('longitude', flask.request)
         a_datetime = utils.request_datetime('date','time', 'timezone', flask.request)
 
-        result['datetime'] = str(a_datetime)
-
-        result['current_date'] = '{}-{:02}-{:02}'.format(a_datetime.year, a_datetime.month, a_datetime.day)
-        result['current_time'] = '{:02}:{:02}:{:05.2f}'.format(a_datetime.hour, a_datetime.minute, a_datetime.second)
-        result['current_timezone'] = '{}'.format(a_datetime.offset())
-
-
-        sun_ec_position = Bodies.SunPosition.EclipticCoords(a_datetime)
-        result['sun_ec_latitude']  = str(sun_ec_position.theta.complement().degrees)
-        result['sun_ec_latitude_dms']  = str(sun_ec_position.theta.complement())
-        result['sun_ec_longitude']  = str(sun_ec_position.phi.degrees)
-        result['sun_ec_longitude_dms']  = str(sun_ec_position.phi)
-
-        result['sun_range'] = '{:6.4f}'.format((sun_ec_position.r / 6.6845871226706E-12)/ 299792458.0) # AU/(AU/m)/m/light-second
-
-        sun_eq_position = Transforms.EclipticEquatorial.toEquatorial(sun_ec_position, a_datetime)
-        result['sun_eq_ra_dms']  = utils.dd2dms(sun_eq_position.phi.RA)
-        result['sun_eq_dec_dms']  = utils.dd2dms(sun_eq_position.theta.complement().degrees)
-
-        sun_hz_position = Transforms.EquatorialHorizon.toHorizon(sun_eq_position, an_observer, a_datetime)
-        result['sun_altitude']  = str(sun_hz_position.theta.complement().degrees)
-        result['sun_altitude_dms']  = str(sun_hz_position.theta.complement())
-        result['sun_azimuth']  = str(sun_hz_position.phi.degrees)
-        result['sun_azimuth_dms']  = str(sun_hz_position.phi)
+        a_chart_options = request_chart_options(flask.request)
 
+        result.update(compute.chart('lunar_daily_altitude', a_latitude, a_longitude, a_datetime, **a_chart_options))
 
-        moon_ec_position = Bodies.MoonPosition.EclipticCoords(a_datetime)
-        result['moon_ec_latitude']  = str(moon_ec_position.theta.complement().degrees)
-        result['moon_ec_latitude_dms']  = str(moon_ec_position.theta.complement())
-        result['moon_ec_longitude']  = str(moon_ec_position.phi.degrees)
-        result['moon_ec_longitude_dms']  = str(moon_ec_position.phi)
-
-        result['moon_range'] = '{:6.4f}'.format(moon_ec_position.r / 299792.458) # km / (km/light-second)
-
-        moon_eq_position = Transforms.EclipticEquatorial.toEquatorial(moon_ec_position, a_datetime)
-        result['moon_eq_ra_dms'] = utils.dd2dms(moon_eq_position.phi.RA)
-        result['moon_eq_dec_dms'] = utils.dd2dms(moon_eq_position.theta.complement().degrees)
-
-        moon_hz_position = Transforms.EquatorialHorizon.toHorizon(moon_eq_position, an_observer, a_datetime)
-        result['moon_altitude']  = str(moon_hz_position.theta.complement().degrees)
-        result['moon_altitude_dms']  = str(moon_hz_position.theta.complement())
-        result['moon_azimuth']  = str(moon_hz_position.phi.degrees)
-        result['moon_azimuth_dms']  = str(moon_hz_position.phi)
-
-
-
-        # ----- plot data -----
-
-        npts = 24*4
-
-        dtime = 0
-
-        moon_azal = list()
-
-        current_time = coords.datetime(a_datetime.year, a_datetime.month, a_datetime.day)
-        current_time.timezone = a_datetime.offset()
-        current_time += a_datetime.offset() * 1.0/24 # to center plot at local noon
-
-        daily_sun_azimuth = list()
-        daily_sun_altitude = list()
-
-        daily_moon_azimuth = list()
-        daily_moon_altitude = list()
-
-        for i in range(0, npts):
-
-            current_time += 1.0/npts # previous day on 0?
-
-            current_sun_position_hz = Bodies.SunPosition.HorizontalCoords(an_observer, current_time)
-
-            # break wrap
-            if i > 0:
-
-                # opposite in southern hemisphere
-                if utils.request_angle('latitude', flask.request).degrees < 0:
-                    if current_sun_position_hz.phi.degrees > daily_sun_azimuth[-1]:
-                        daily_sun_azimuth.append(None)
+    except (compute.Error, Bodies.SunPosition.Error, utils.Error, Transforms.utils.Error, TypeError, ValueError, RuntimeError) as err:
+        result['errors'].append(str(err))
 
-                else:
+    return formats.respond(result)
 
-                    if current_sun_position_hz.phi.degrees < daily_sun_azimuth[-1]:
-                        daily_sun_azimuth.append(None)
 
-            daily_sun_azimuth.append(current_sun_position_hz.phi.degrees)
-            daily_sun_altitude.append(current_sun_position_hz.theta.complement().degrees)
+@api.route("/lunar_daily_altitudes", methods=['POST'])
+def lunar_daily_altitudes():
+    """Get the moon position charts for several scenarios in one request
 
+    POST JSON:
+        {"scenarios": [{"latitude": "37:24:01", "longitude": "-122:04:56",
+                        "date": "2017-08-21", "time": "09:00", "timezone": "-08:00"},
+                       ...]}
 
-            current_moon_position_hz = Bodies.MoonPosition.HorizontalCoords(an_observer, current_time)
+    Scenarios on the same date and time zone share the sun and moon
+    calculations. See charts.lunar_daily_altitudes
 
-            # break wrap
-            if i > 0:
+    Returns: JSON
+        result.scenarios = list of lunar_daily_altitude results, each with its own errors
+        result.errors = list()
+    """
 
-                # opposite in southern hemisphere
-                if utils.request_angle('latitude', flask.request).degrees < 0:
-                    if current_moon_position_hz.phi.degrees > daily_moon_azimuth[-1]:
-                        daily_moon_azimuth.append(None)
+    result = {'errors': list(), 'scenarios': list()}
 
-                else:
+    try:
 
-                    if current_moon_position_hz.phi.degrees < daily_moon_azimuth[-1]:
-                        daily_moon_azimuth.append(None)
+        request_data = flask.request.get_json(force=True, silent=True)
 
-            daily_moon_azimuth.append(current_moon_position_hz.phi.degrees)
-            daily_moon_altitude.append(current_moon_position_hz.theta.complement().degrees)
+        if not isinstance(request_data, dict) or not isinstance(request_data.get('scenarios'), list):
+            raise utils.Error('expected JSON object with a scenarios list')
 
+        if len(request_data['scenarios']) > max_scenarios:
+            raise utils.Error('too many scenarios: {} > {}'.format(len(request_data['scenarios']), max_scenarios))
 
-        result['daily_sun_azimuth'] = daily_sun_azimuth
-        result['daily_sun_altitude'] = daily_sun_altitude
+        scenarios = list()
 
-        result['daily_moon_azimuth'] = daily_moon_azimuth
-        result['daily_moon_altitude'] = daily_moon_altitude
+        for a_scenario in request_data['scenarios']:
 
+            scenario_result = {'errors': list()}
 
-        # ----- rise, transit, set -----
+            try:
 
-        sun_rts = get_sun_rise_transit_set(utils.request_angle('latitude', flask.request),
-                                           utils.request_angle('longitude', flask.request),
-                                           utils.request_datetime('date',
-                                                                  'time',
-                                                                  'timezone',
-                                                                  flask.request))
+                scenarios.append((utils.parse_angle('latitude', a_scenario['latitude']),
+                                  utils.parse_angle('longitude', a_scenario['longitude']),
+                                  utils.parse_datetime(a_scenario['date'], a_scenario['time'], a_scenario['timezone'])))
 
-        result['sun_rising']   = sun_rts['rising']
-        result['sun_transit']  = sun_rts['transit']
-        result['sun_setting']  = sun_rts['setting']
+            except KeyError as err:
+                scenario_result['errors'].append('missing scenario key {}'.format(err))
 
+            except (utils.Error, TypeError, ValueError, RuntimeError) as err:
+                scenario_result['errors'].append(str(err))
 
-        moon_rts = get_moon_rise_transit_set(utils.request_angle('latitude', flask.request),
-                                             utils.request_angle('longitude', flask.request),
-                                             utils.request_datetime('date',
-                                                                    'time',
-                                                                    'timezone',
-                                                                    flask.request))
+            result['scenarios'].append(scenario_result)
 
-        result['moon_rising']   = moon_rts['rising']
-        result['moon_transit']  = moon_rts['transit']
-        result['moon_setting']  = moon_rts['setting']
+        valid_results = [scenario_result for scenario_result in result['scenarios'] if not scenario_result['errors']]
 
+        for scenario_result, chart in zip(valid_results, compute.chart_scenarios('lunar_daily_altitudes', scenarios)):
+            scenario_result.update(chart)
 
-    except (Bodies.SunPosition.Error, utils.Error, Transforms.utils.Error, TypeError, ValueError, RuntimeError) as err:
+    except (compute.Error, utils.Error, Transforms.utils.Error, TypeError, ValueError, RuntimeError) as err:
         result['errors'].append(str(err))
 
     return flask.jsonify(**result)
@@ -0,0 +1,415 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Standardizes observation logs, a CSV or JSON lines upload at a time
+
+GET /api/v1/standardize standardizes one observation. POST a log to it
+to standardize every row:
+
+    curl -X POST -H 'Content-Type: text/csv' --data-binary @log.csv \\
+         http://0.0.0.0:8080/api/v1/standardize
+
+    curl -X POST -H 'Content-Type: application/x-ndjson' --data-binary @log.jsonl \\
+         http://0.0.0.0:8080/api/v1/standardize?azalt=true
+
+A CSV log has a header row of the GET keys (latitude, longitude, date,
+time, timezone or an ISO 8601 datetime, ra, dec, az, alt, azalt,
+notes, observer, target) and a row per observation. A JSON lines log has a JSON object with
+those keys per line. ?azalt=true transforms az/alt to ra/dec for every
+row, like an azalt column of true does for one.
+
+The answer is streamed in the same format, a line per row:
+
+    {"row": 1, "params": {"iso8601": "2018-01-11T10:14:56.0-0800", "latitude": 37.5125, ...},
+     "errors": [], "warnings": []}
+
+or the CSV columns row, iso8601, alt, az, dec, latitude, longitude, ra,
+errors and warnings, with the errors and warnings joined by '; '. The
+angles are numbers of degrees, ra is in hours when it comes from az/alt.
+row counts the observations from 1.
+
+The rows are read, standardized and answered chunk_rows at a time, so
+memory does not grow with the upload. The angles of a chunk are parsed
+a column at a time into numpy arrays, see
+Transforms.utils.dms2degrees_array, and its az/alt rows are
+transformed together, see Transforms.EquatorialHorizon.toEquatorial_array.
+
+"""
+
+import csv
+import io
+import json
+
+import numpy
+
+import metrics
+import utils
+
+import Transforms.EquatorialHorizon
+import Transforms.SiderealTime
+import Transforms.utils
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+default_chunk_rows = 1000 # override with AAI_BULK_CHUNK_ROWS in the flask config
+
+max_line_bytes = 64*1024 # longer lines end the upload
+
+content_types = {'text/csv': 'csv',
+                 'application/x-ndjson': 'ndjson',
+                 'application/jsonl': 'ndjson'}
+
+mimetypes = {'csv': 'text/csv',
+             'ndjson': 'application/x-ndjson'}
+
+angle_keys = ('alt', 'az', 'dec', 'latitude', 'longitude', 'ra')
+datetime_keys = ('date', 'time', 'timezone')
+iso8601_key = 'datetime'
+azalt_keys = ('az', 'alt', 'latitude', 'longitude')
+other_keys = ('azalt', 'notes', 'observer', 'target')
+
+csv_columns = ('row', 'iso8601') + angle_keys + ('errors', 'warnings')
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+# =================
+# ===== input =====
+# =================
+
+
+def input_format(a_flask_request):
+    """csv or ndjson from the request content type
+
+    Raises: Error if neither
+    """
+
+    a_format = content_types.get(a_flask_request.mimetype)
+
+    if a_format is None:
+        raise Error('unsupported content type {}, expected one of {}'.format(
+            a_flask_request.mimetype, ', '.join(sorted(content_types))))
+
+    return a_format
+
+
+def read_lines(a_stream, a_max_bytes=max_line_bytes):
+    """The lines of a binary stream as str, one at a time
+
+    Raises: Error if a line is longer than a_max_bytes, UnicodeDecodeError if not utf-8
+    """
+
+    while True:
+
+        a_line = a_stream.readline(a_max_bytes + 1)
+
+        if not a_line:
+            break
+
+        if len(a_line) > a_max_bytes:
+            raise Error('line longer than {} bytes'.format(a_max_bytes))
+
+        yield a_line.decode('utf-8')
+
+    return
+
+
+def as_str(a_value):
+    """A JSON value as the string a GET parameter would be"""
+
+    if a_value is None:
+        return ''
+
+    if isinstance(a_value, bool):
+        return 'true' if a_value else 'false'
+
+    return str(a_value)
+
+
+def read_rows(lines, a_format):
+    """The observations of a log
+
+    Args:
+        lines (iterator): of str, see read_lines
+        a_format (str): csv or ndjson
+
+    Returns: iterator of (dict of str to str or None, error str or None)
+    """
+
+    if a_format == 'csv':
+
+        for a_row in csv.DictReader(lines):
+
+            if None in a_row:
+                yield None, 'more fields than the header'
+            else:
+                yield dict((a_key, a_value or '') for a_key, a_value in a_row.items()), None
+
+        return
+
+    for a_line in lines:
+
+        if not a_line.strip():
+            continue
+
+        try:
+            a_row = json.loads(a_line)
+        except ValueError:
+            yield None, 'not JSON: {}'.format(a_line.strip()[:80])
+            continue
+
+        if not isinstance(a_row, dict):
+            yield None, 'not a JSON object: {}'.format(a_line.strip()[:80])
+            continue
+
+        yield dict((a_key, as_str(a_value)) for a_key, a_value in a_row.items()), None
+
+    return
+
+
+# ===========================
+# ===== standardization =====
+# ===========================
+
+
+@metrics.timed('parse')
+def parse_angles(rows):
+    """Parse the angle columns of a chunk
+
+    Args:
+        rows (list): of dict or None
+
+    Returns: (dict of key to numpy.ndarray of degrees, NaN where missing
+        or invalid, dict of row index to errors)
+    """
+
+    degrees = dict()
+    errors = dict()
+
+    for a_key in angle_keys:
+
+        limits = utils.angle_limits.get(a_key, Transforms.utils.angle_limits)
+
+        indices = [i for i, a_row in enumerate(rows) if a_row is not None and a_row.get(a_key, '') != '']
+        values = [rows[i][a_key] for i in indices]
+
+        column = numpy.full(len(rows), numpy.nan)
+        column[indices] = Transforms.utils.dms2degrees_array(values, limits, an_invalid=numpy.nan, a_name=a_key)
+
+        for i in numpy.flatnonzero(numpy.isnan(column[indices])):
+
+            try:
+                Transforms.utils.dms2degrees(values[i], limits, a_key)
+            except Transforms.utils.Error as err:
+                errors.setdefault(indices[i], list()).append(str(err))
+
+        degrees[a_key] = column
+
+    return degrees, errors
+
+
+@metrics.timed('parse')
+def parse_datetimes(rows, results):
+    """Parse the dates and times of a chunk
+
+    A datetime column is used if a row has one, otherwise its date,
+    time and timezone.
+
+    Args:
+        rows (list): of dict or None
+        results (list): of the rows, their iso8601, errors and warnings are added
+
+    Returns: list of the fields of each row, None where missing or
+        invalid, see utils.parse_datetime_fields
+    """
+
+    datetimes = [None]*len(rows)
+
+    for i, a_row in enumerate(rows):
+
+        if a_row is None:
+            continue
+
+        try:
+
+            if a_row.get(iso8601_key, '') != '':
+                datetimes[i] = utils.parse_iso8601_fields(a_row[iso8601_key])
+            elif all(a_row.get(a_key, '') != '' for a_key in datetime_keys):
+                datetimes[i] = utils.parse_datetime_fields(a_row['date'], a_row['time'], a_row['timezone'])
+            else:
+                results[i]['warnings'].append('Incomplete datetime key set')
+                continue
+
+            results[i]['params']['iso8601'] = str(utils.fields2datetime(datetimes[i]))
+
+        except (utils.Error, TypeError, ValueError, RuntimeError) as err:
+            datetimes[i] = None
+            results[i]['errors'].append(str(err))
+
+    return datetimes
+
+
+@metrics.timed('transform')
+def transform_azalt(degrees, julian_dates, indices):
+    """az/alt to ra/dec of some rows of a chunk
+
+    Args:
+        degrees (dict): from parse_angles
+        julian_dates (list): UT Julian dates of the rows
+        indices (list): of the rows
+
+    Returns: (ra hours, dec degrees) numpy.ndarray
+    """
+
+    gasts = Transforms.SiderealTime.USNO_C163.GAST_array(julian_dates)
+
+    return Transforms.EquatorialHorizon.toEquatorial_array(degrees['az'][indices], degrees['alt'][indices],
+                                                           degrees['latitude'][indices], degrees['longitude'][indices],
+                                                           gasts)
+
+
+def standardize_chunk(rows, first_row, is_azalt=False):
+    """Standardize a chunk of observations
+
+    Args:
+        rows (list): of (row, error) from read_rows
+        first_row (int): the row number of the first
+        is_azalt (bool): transform az/alt to ra/dec for every row
+
+    Returns: list of dict of row, params, errors and warnings, as GET
+        /api/v1/standardize with the angles as numbers
+    """
+
+    results = [{'row': first_row + i, 'params': dict(), 'errors': [an_error] if an_error else list(), 'warnings': list()}
+               for i, (a_row, an_error) in enumerate(rows)]
+
+    rows = [a_row for a_row, an_error in rows]
+
+    # ----- datetime stuff -----
+
+    datetimes = parse_datetimes(rows, results)
+
+    # ----- angles -----
+
+    degrees, errors = parse_angles(rows)
+
+    for i, some_errors in sorted(errors.items()):
+        results[i]['errors'].extend(some_errors)
+
+    for a_key in angle_keys:
+        for i in numpy.flatnonzero(~numpy.isnan(degrees[a_key])):
+            results[i]['params'][a_key] = float(degrees[a_key][i])
+
+    # ----- azalt stuff -----
+
+    indices = list()
+
+    for i, a_row in enumerate(rows):
+
+        if a_row is None or not (is_azalt or a_row.get('azalt') == 'true'):
+            continue
+
+        if datetimes[i] is None or any(a_row.get(a_key, '') == '' for a_key in azalt_keys):
+            results[i]['errors'].append('Incomplete az alt key set')
+        elif not any(numpy.isnan(degrees[a_key][i]) for a_key in azalt_keys):
+            indices.append(i)
+
+    if indices:
+
+        ras, decs = transform_azalt(degrees, [Transforms.utils.julian_date(*datetimes[i]) for i in indices], indices)
+
+        # an ra or dec in the row is kept, as GET
+        for i, a_ra, a_dec in zip(indices, ras.tolist(), decs.tolist()):
+            results[i]['params'].setdefault('ra', a_ra)
+            results[i]['params'].setdefault('dec', a_dec)
+
+    # ----- the other keys -----
+
+    for i, a_row in enumerate(rows):
+
+        if a_row is None:
+            continue
+
+        for a_key, a_value in sorted(a_row.items()):
+            if a_key not in angle_keys and a_key not in datetime_keys and a_key not in other_keys and a_key != iso8601_key:
+                results[i]['warnings'].append('Unsupported standard type {}: {}'.format(a_key, a_value))
+
+    return results
+
+
+# ==================
+# ===== output =====
+# ==================
+
+
+@metrics.timed('serialize')
+def format_results(results, a_format):
+    """A chunk of results as lines of CSV or JSON"""
+
+    if a_format == 'ndjson':
+        return ''.join(json.dumps(a_result, sort_keys=True) + '\n' for a_result in results)
+
+    a_buffer = io.StringIO()
+    a_writer = csv.writer(a_buffer, lineterminator='\n')
+
+    for a_result in results:
+        a_writer.writerow([a_result['row'], a_result['params'].get('iso8601', '')]
+                          + [a_result['params'].get(a_key, '') for a_key in angle_keys]
+                          + ['; '.join(a_result['errors']), '; '.join(a_result['warnings'])])
+
+    return a_buffer.getvalue()
+
+
+def standardize(a_stream, a_format, is_azalt=False, a_chunk_rows=default_chunk_rows):
+    """Standardize a log, a chunk at a time
+
+    Args:
+        a_stream: binary file like object of the log
+        a_format (str): csv or ndjson, of the log and the answer
+        is_azalt (bool): transform az/alt to ra/dec for every row
+        a_chunk_rows (int): rows to standardize at a time
+
+    Returns: iterator of str, the answer
+    """
+
+    if a_format == 'csv':
+        yield ','.join(csv_columns) + '\n'
+
+    rows = read_rows(read_lines(a_stream), a_format)
+
+    chunk = list()
+    first_row = 1
+    an_error = None
+
+    try:
+
+        for a_row in rows:
+
+            chunk.append(a_row)
+
+            if len(chunk) == a_chunk_rows:
+                yield format_results(standardize_chunk(chunk, first_row, is_azalt), a_format)
+                first_row += len(chunk)
+                chunk = list()
+
+    except (Error, csv.Error, UnicodeDecodeError) as err:
+        an_error = str(err) # the rest of the log cannot be read
+
+    if chunk:
+        yield format_results(standardize_chunk(chunk, first_row, is_azalt), a_format)
+        first_row += len(chunk)
+
+    if an_error is not None:
+        yield format_results([{'row': first_row, 'params': dict(), 'errors': [an_error], 'warnings': list()}], a_format)
+
+    return
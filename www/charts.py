@@ -0,0 +1,656 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""AAI chart calculations
+
+The daily altitude charts evaluate the sun and moon hundreds of times
+per request. These are kept apart from the flask request handling in
+api.py so they can be run in the request thread or in a worker
+process (see compute.py) with the same results.
+
+The daily charts take a resolution, the minutes between chart points,
+or 'adaptive' for points only where the curves bend. See
+adaptive_samples for its interpolation error.
+
+"""
+
+import coords
+
+import metrics
+import utils
+
+import Bodies.MoonPosition
+import Bodies.SunPosition
+import Transforms.EclipticEquatorial
+import Transforms.EquatorialHorizon
+import Transforms.utils
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+default_resolution = 15 # minutes between chart points, 24*4 a day
+
+adaptive_steps = (1, 60) # finest and coarsest minutes between adaptive chart points
+default_tolerance = 0.1  # degrees of adaptive interpolation error
+
+
+# --------------------
+# ----- sampling -----
+# --------------------
+
+
+def wrap180(a_degrees):
+    """a_degrees in [-180, 180)"""
+
+    return (a_degrees + 180.0) % 360.0 - 180.0
+
+
+def chart_time(a_date, a_timezone, a_days):
+    """A chart point: local midnight of a_date plus a_days
+
+    Args:
+        a_date (tuple): year, month, day
+        a_timezone (float): hours from UTC
+        a_days (float): days from midnight, including any shift to center the plot
+
+    Returns: coords.datetime
+    """
+
+    a_time = coords.datetime(*a_date)
+    a_time.timezone = a_timezone
+    a_time += a_days
+
+    return a_time
+
+
+def day_offsets(a_resolution):
+    """Fractions of a day a_resolution minutes apart: 0, step, ... 1
+
+    Args:
+        a_resolution (float): minutes between points
+
+    Returns: list of float
+    """
+
+    npts = int(round(24*60.0/a_resolution))
+
+    return [i*1.0/npts for i in range(npts + 1)]
+
+
+def adaptive_samples(a_function, a_tolerance, an_angle_columns=(), a_steps=adaptive_steps):
+    """Sample a_function over a day, densely only where it bends
+
+    Starts with points a_steps[1] minutes apart and splits an interval
+    in two while the function at its middle is more than a_tolerance
+    from the straight line between its ends, down to a_steps[0]
+    minutes or less. Altitude curves bend most near rise, transit and
+    set so that is where the points end up.
+
+    Maximum interpolation error: a straight line between two returned
+    points is within a_tolerance degrees of every curve at the middle
+    of the interval. For curves that are close to parabolic over the
+    interval, like altitude, the middle is where a straight line is
+    furthest off, so a_tolerance is the maximum interpolation
+    error. Only intervals at the finest step may exceed it, in practice
+    azimuth within a degree or so of the zenith.
+
+    Args:
+        a_function: days from the start of the chart to a list of degrees
+        a_tolerance (float): maximum interpolation error in degrees
+        an_angle_columns (tuple): indexes of the values that wrap at 360, like azimuth
+        a_steps (tuple): finest and coarsest minutes between points
+
+    Returns: list of (days, values) in time order
+    """
+
+    finest = a_steps[0]/(24*60.0)
+
+    def deviation(a_values, middle_values, b_values):
+
+        worst = 0
+
+        for c, middle in enumerate(middle_values):
+
+            if c in an_angle_columns:
+                line = a_values[c] + wrap180(b_values[c] - a_values[c])/2.0
+                worst = max(worst, abs(wrap180(middle - line)))
+            else:
+                worst = max(worst, abs(middle - (a_values[c] + b_values[c])/2.0))
+
+        return worst
+
+    samples = list()
+
+    def refine(a_days, a_values, b_days, b_values):
+
+        if b_days - a_days > finest:
+
+            middle_days = (a_days + b_days)/2.0
+            middle_values = a_function(middle_days)
+
+            if deviation(a_values, middle_values, b_values) > a_tolerance:
+                refine(a_days, a_values, middle_days, middle_values)
+                refine(middle_days, middle_values, b_days, b_values)
+                return
+
+        samples.append((b_days, b_values))
+
+        return
+
+    coarse = [(days, a_function(days)) for days in day_offsets(a_steps[1])]
+
+    samples.append(coarse[0])
+
+    for (a_days, a_values), (b_days, b_values) in zip(coarse[:-1], coarse[1:]):
+        refine(a_days, a_values, b_days, b_values)
+
+    return samples
+
+
+def chart_samples(a_function, a_resolution, a_tolerance, an_angle_columns=()):
+    """Sample a chart at a resolution or adaptively
+
+    Args:
+        a_function: days from the start of the chart to a list of degrees
+        a_resolution: minutes between points or 'adaptive'
+        a_tolerance (float): adaptive interpolation error in degrees
+        an_angle_columns (tuple): indexes of the values that wrap at 360
+
+    Returns: list of (days, values) in time order
+    """
+
+    if a_resolution == 'adaptive':
+        return adaptive_samples(a_function, a_tolerance, an_angle_columns)
+
+    return [(days, a_function(days)) for days in day_offsets(a_resolution)]
+
+
+# ------------------
+# ----- stages -----
+# ------------------
+
+
+@metrics.timed('ephemeris')
+def sun_equatorial(a_datetime):
+    """The sun in equatorial coordinates at a_datetime"""
+
+    return Bodies.SunPosition.EquatorialCoords(a_datetime)
+
+
+@metrics.timed('transform')
+def to_horizon(an_object, an_observer, a_datetime):
+    """Transforms.EquatorialHorizon.toHorizon timed as a stage"""
+
+    return Transforms.EquatorialHorizon.toHorizon(an_object, an_observer, a_datetime)
+
+
+# -----------------------------
+# ----- sun position data -----
+# -----------------------------
+
+
+def get_sun_rise_transit_set(a_latitude, a_longitude, a_datetime):
+    """Calculate the sun position at rise, transit and set.
+
+    Args:
+        a_latitude (coords.angle): observer's latitude
+        a_longitude (coords.angle): observer's longitude
+        a_datetime (coords.datetime): observer's time
+
+
+    return results dictionary
+    """
+
+    result = dict()
+    result['latitude'] = a_latitude
+    result['longitude'] = a_longitude
+    result['datetime'] = a_datetime
+
+    result['eot'] = Bodies.SunPosition.EquationOfTime(a_datetime)
+    result['obliquity'] = Transforms.EclipticEquatorial.obliquity(a_datetime)
+
+    an_observer = Transforms.utils.latlon2spherical(a_latitude, a_longitude)
+
+    rising, transit, setting = Bodies.SunPosition.SunRiseAndSet(an_observer, a_datetime)
+
+    result['rising']  = '{:02}:{:02}:{:04.1f}'.format(rising.hour, rising.minute, rising.second)
+    result['transit'] = '{:02}:{:02}:{:04.1f}'.format(transit.hour, transit.minute, transit.second)
+    result['setting'] = '{:02}:{:02}:{:04.1f}'.format(setting.hour, setting.minute, setting.second)
+
+    sun_azalt = get_sun_azalt(an_observer, a_datetime)
+
+    result['azimuth']  = '{}'.format(sun_azalt['azimuth'])
+    result['altitude'] = '{}'.format(sun_azalt['altitude'])
+
+
+    return result
+
+
+def get_sun_azalt(an_observer, a_datetime):
+    """Calculate the azimuth and altitude of the sun for an observer at a_datetime
+
+    TODO duplication in SunPosition and above
+
+    Args:
+        an_observer (coords.spherical): an observer locatioin
+        a_datetime (coords.datetime): time of obsevation
+    """
+    result = dict()
+
+    ecliptic_longitude, R = Bodies.SunPosition.SolarLongitudeRange(a_datetime)
+
+    sun_ec = coords.spherical(R, coords.angle(90), ecliptic_longitude)
+    sun_eq = Transforms.EclipticEquatorial.toEquatorial(sun_ec, a_datetime)
+    sun_hz = Transforms.EquatorialHorizon.toHorizon(sun_eq, an_observer, a_datetime)
+
+    result['dec'] = sun_eq.theta.complement()
+
+    result['R'] = R
+    result['ecliptic_longitude'] = str(ecliptic_longitude)
+
+    result['azimuth'] = sun_hz.phi
+    result['altitude'] = sun_hz.theta.complement()
+
+    return result
+
+
+def solar_daily_altitude(a_latitude, a_longitude, a_datetime, a_resolution=None, a_tolerance=None):
+    """Calculate the sun position chart for the given day
+
+    Args:
+        a_latitude (coords.angle): observer's latitude
+        a_longitude (coords.angle): observer's longitude
+        a_datetime (coords.datetime): observer's time
+        a_resolution: minutes between chart points or 'adaptive', default_resolution if None
+        a_tolerance (float): adaptive interpolation error in degrees, default_tolerance if None
+
+    Returns: dictionary of
+
+    result.datetime
+          .date_label
+          .sun_marker_time
+          .sun_marker_altitude
+          .sun_marker_azimuth
+          .rising
+          .transit
+          .setting
+          .resolution
+          .tolerance, if adaptive
+          .altitude_data_24h[time, current, vernal, summer, autumnal, winter]
+
+    """
+
+    if a_resolution is None:
+        a_resolution = default_resolution
+
+    if a_tolerance is None:
+        a_tolerance = default_tolerance
+
+    result = dict()
+
+    an_observer = Transforms.utils.latlon2spherical(a_latitude, a_longitude)
+
+    result['observer'] = str(an_observer) # TODO format? XML from c++ operator::<<()
+    result['latitude'] = a_latitude.degrees
+    result['longitude'] = a_longitude.degrees
+
+    result['datetime'] = str(a_datetime)
+
+    result['current_date'] = '{}-{:02}-{:02}'.format(a_datetime.year, a_datetime.month, a_datetime.day)
+    result['current_time'] = '{:02}:{:02}:{:05.2f}'.format(a_datetime.hour, a_datetime.minute, a_datetime.second)
+    result['current_timezone'] = '{}'.format(a_datetime.offset())
+
+    result['sun_marker_time'] = a_datetime.hour + a_datetime.minute/60.0
+    # distance on x-axis to plot sun marker
+
+    current_day = (a_datetime.year, a_datetime.month, a_datetime.day)
+
+    vernal_equinox = (a_datetime.year, 3, 20)
+    summer_solstice = (a_datetime.year, 6, 20)
+    autumnal_equinox = (a_datetime.year, 9, 22)
+    winter_solstice = (a_datetime.year, 12, 21)
+
+    result['date_label'] = '{year}-{month}-{day}'.format(year=a_datetime.year,
+                                                         month=a_datetime.month,
+                                                         day=a_datetime.day),
+
+    # ----- plot path -----
+
+    shift = -a_datetime.offset() * 1.0/24 # to center plot at local noon
+
+    def sun_altitude(a_day, days):
+
+        a_time = chart_time(a_day, a_datetime.offset(), shift + days)
+
+        return to_horizon(sun_equatorial(a_time), an_observer, a_time).theta.complement().degrees
+
+    def sun_altitudes(days):
+
+        return [sun_altitude(a_day, days) for a_day in (vernal_equinox,
+                                                        summer_solstice,
+                                                        autumnal_equinox,
+                                                        winter_solstice,
+                                                        current_day)] # current needs to be last for sun position marker
+
+    altitude = [[days*24] + altitudes for days, altitudes in chart_samples(sun_altitudes, a_resolution, a_tolerance)]
+
+    result['resolution'] = a_resolution
+
+    if a_resolution == 'adaptive':
+        result['tolerance'] = a_tolerance
+
+    result['altitude_data_24h'] = altitude # list
+
+    try:
+
+        rts = get_sun_rise_transit_set(a_latitude, a_longitude, a_datetime)
+
+        result['sun_marker_altitude'] = '{}'.format(str(rts['altitude']))
+        result['sun_marker_azimuth']  = '{}'.format(str(rts['azimuth']))
+
+        result['rising']   = rts['rising']
+        result['transit']  = rts['transit']
+        result['setting']  = rts['setting']
+
+    except Bodies.SunPosition.Error as err:
+
+        result['sun_marker_altitude'] = str(err)
+        result['sun_marker_azimuth']  = str(err)
+        result['rising']   = str(err)
+        result['transit']  = str(err)
+        result['setting']  = str(err)
+
+    return result
+
+
+# ------------------------------
+# ----- moon position data -----
+# ------------------------------
+
+
+def get_moon_rise_transit_set(a_latitude, a_longitude, a_datetime):
+    """Calculate the moon position at local rise, transit set
+
+    Args:
+        a_latitude (coords.angle): observer's latitude
+        a_longitude (coords.angle): observer's longitude
+        a_datetime (coords.datetime): observer's time
+
+    return results dictionary
+    """
+
+    result = dict()
+    result['latitude'] = a_latitude
+    result['longitude'] = a_longitude
+    result['datetime'] = a_datetime
+
+    an_observer = Transforms.utils.latlon2spherical(a_latitude, a_longitude)
+
+    moon_eq = Bodies.MoonPosition.EquatorialCoords(a_datetime)
+
+    rising, transit, setting = Bodies.SunPosition.RiseAndSet(moon_eq, an_observer, a_datetime)
+
+    result['rising']  = '{:02}:{:02}:{:04.1f}'.format(rising.hour, rising.minute, rising.second)
+    result['transit'] = '{:02}:{:02}:{:04.1f}'.format(transit.hour, transit.minute, transit.second)
+    result['setting'] = '{:02}:{:02}:{:04.1f}'.format(setting.hour, setting.minute, setting.second)
+
+    return result
+
+
+@metrics.timed('ephemeris')
+def sun_moon_equatorial(a_datetime, a_cache=None):
+    """The sun and moon in equatorial coordinates at a_datetime
+
+    These do not depend on the observer so scenarios that share
+    instants can share them through a_cache.
+
+    Args:
+        a_datetime (coords.datetime): the instant
+        a_cache (dict): Julian date to positions, or None
+
+    Returns (coords.spherical, coords.spherical): the sun and the moon
+    """
+
+    if a_cache is None:
+        return (Bodies.SunPosition.EquatorialCoords(a_datetime),
+                Bodies.MoonPosition.EquatorialCoords(a_datetime))
+
+    key = round(a_datetime.toJulianDate(), 8) # about a millisecond
+
+    if key not in a_cache:
+        a_cache[key] = (Bodies.SunPosition.EquatorialCoords(a_datetime),
+                        Bodies.MoonPosition.EquatorialCoords(a_datetime))
+
+    return a_cache[key]
+
+
+def lunar_daily_altitude(a_latitude, a_longitude, a_datetime, a_cache=None, a_resolution=None, a_tolerance=None):
+    """Calculate the moon position chart for the given day
+
+    Args:
+        a_latitude (coords.angle): observer's latitude
+        a_longitude (coords.angle): observer's longitude
+        a_datetime (coords.datetime): observer's time
+        a_cache (dict): shared sun and moon positions, see sun_moon_equatorial
+        a_resolution: minutes between chart points or 'adaptive', default_resolution if None
+        a_tolerance (float): adaptive interpolation error in degrees, default_tolerance if None
+
+    Returns: dictionary of
+
+    result.datetime
+          .sun_date_label
+          .sun_marker_time
+          .sun_marker_altitude
+          .sun_marker_azimuth
+          .sun_rising
+          .sun_transit
+          .sun_setting
+          .moon_date_label
+          .moon_marker_time
+          .moon_marker_altitude
+          .moon_marker_azimuth
+          .moon_rising
+          .moon_transit
+          .moon_setting
+          .resolution
+          .tolerance, if adaptive
+          .daily_sun_azimuth, daily_sun_altitude
+          .daily_moon_azimuth, daily_moon_altitude
+          .daily_time, hours from the start of the chart of each altitude,
+                       not evenly spaced if adaptive
+
+    Raises: Bodies.SunPosition.Error if there is no rise or set
+    """
+
+    if a_resolution is None:
+        a_resolution = default_resolution
+
+    if a_tolerance is None:
+        a_tolerance = default_tolerance
+
+    result = dict()
+
+    an_observer = Transforms.utils.latlon2spherical(a_latitude, a_longitude)
+
+    result['observer'] = str(an_observer) # TODO format? XML from c++ operator::<<()
+    result['latitude'] = a_latitude.degrees
+    result['longitude'] = a_longitude.degrees
+
+    result['datetime'] = str(a_datetime)
+
+    result['current_date'] = '{}-{:02}-{:02}'.format(a_datetime.year, a_datetime.month, a_datetime.day)
+    result['current_time'] = '{:02}:{:02}:{:05.2f}'.format(a_datetime.hour, a_datetime.minute, a_datetime.second)
+    result['current_timezone'] = '{}'.format(a_datetime.offset())
+
+
+    sun_ec_position = Bodies.SunPosition.EclipticCoords(a_datetime)
+    result['sun_ec_latitude']  = str(sun_ec_position.theta.complement().degrees)
+    result['sun_ec_latitude_dms']  = str(sun_ec_position.theta.complement())
+    result['sun_ec_longitude']  = str(sun_ec_position.phi.degrees)
+    result['sun_ec_longitude_dms']  = str(sun_ec_position.phi)
+
+    result['sun_range'] = '{:6.4f}'.format((sun_ec_position.r / 6.6845871226706E-12)/ 299792458.0) # AU/(AU/m)/m/light-second
+
+    sun_eq_position = Transforms.EclipticEquatorial.toEquatorial(sun_ec_position, a_datetime)
+    result['sun_eq_ra_dms']  = utils.dd2dms(sun_eq_position.phi.RA)
+    result['sun_eq_dec_dms']  = utils.dd2dms(sun_eq_position.theta.complement().degrees)
+
+    sun_hz_position = Transforms.EquatorialHorizon.toHorizon(sun_eq_position, an_observer, a_datetime)
+    result['sun_altitude']  = str(sun_hz_position.theta.complement().degrees)
+    result['sun_altitude_dms']  = str(sun_hz_position.theta.complement())
+    result['sun_azimuth']  = str(sun_hz_position.phi.degrees)
+    result['sun_azimuth_dms']  = str(sun_hz_position.phi)
+
+
+    moon_ec_position = Bodies.MoonPosition.EclipticCoords(a_datetime)
+    result['moon_ec_latitude']  = str(moon_ec_position.theta.complement().degrees)
+    result['moon_ec_latitude_dms']  = str(moon_ec_position.theta.complement())
+    result['moon_ec_longitude']  = str(moon_ec_position.phi.degrees)
+    result['moon_ec_longitude_dms']  = str(moon_ec_position.phi)
+
+    result['moon_range'] = '{:6.4f}'.format(moon_ec_position.r / 299792.458) # km / (km/light-second)
+
+    moon_eq_position = Transforms.EclipticEquatorial.toEquatorial(moon_ec_position, a_datetime)
+    result['moon_eq_ra_dms'] = utils.dd2dms(moon_eq_position.phi.RA)
+    result['moon_eq_dec_dms'] = utils.dd2dms(moon_eq_position.theta.complement().degrees)
+
+    moon_hz_position = Transforms.EquatorialHorizon.toHorizon(moon_eq_position, an_observer, a_datetime)
+    result['moon_altitude']  = str(moon_hz_position.theta.complement().degrees)
+    result['moon_altitude_dms']  = str(moon_hz_position.theta.complement())
+    result['moon_azimuth']  = str(moon_hz_position.phi.degrees)
+    result['moon_azimuth_dms']  = str(moon_hz_position.phi)
+
+
+
+    # ----- plot data -----
+
+    shift = a_datetime.offset() * 1.0/24 # to center plot at local noon
+
+    def sun_moon_azalt(days):
+
+        current_time = chart_time((a_datetime.year, a_datetime.month, a_datetime.day), a_datetime.offset(), shift + days)
+
+        current_sun_position_eq, current_moon_position_eq = sun_moon_equatorial(current_time, a_cache)
+
+        current_sun_position_hz = to_horizon(current_sun_position_eq, an_observer, current_time)
+        current_moon_position_hz = to_horizon(current_moon_position_eq, an_observer, current_time)
+
+        return [current_sun_position_hz.phi.degrees,
+                current_sun_position_hz.theta.complement().degrees,
+                current_moon_position_hz.phi.degrees,
+                current_moon_position_hz.theta.complement().degrees]
+
+    samples = chart_samples(sun_moon_azalt, a_resolution, a_tolerance, an_angle_columns=(0, 2))
+
+    samples = samples[1:] # previous day on 0? the chart has always started a step after it
+
+    result['resolution'] = a_resolution
+
+    if a_resolution == 'adaptive':
+        result['tolerance'] = a_tolerance
+
+    daily_sun_azimuth = list()
+    daily_sun_altitude = list()
+
+    daily_moon_azimuth = list()
+    daily_moon_altitude = list()
+
+    daily_time = list()
+
+    for i, (days, (sun_azimuth, sun_altitude, moon_azimuth, moon_altitude)) in enumerate(samples):
+
+        # break wrap
+        if i > 0:
+
+            # opposite in southern hemisphere
+            if a_latitude.degrees < 0:
+                if sun_azimuth > daily_sun_azimuth[-1]:
+                    daily_sun_azimuth.append(None)
+
+            else:
+
+                if sun_azimuth < daily_sun_azimuth[-1]:
+                    daily_sun_azimuth.append(None)
+
+        daily_sun_azimuth.append(sun_azimuth)
+        daily_sun_altitude.append(sun_altitude)
+
+
+        # break wrap
+        if i > 0:
+
+            # opposite in southern hemisphere
+            if a_latitude.degrees < 0:
+                if moon_azimuth > daily_moon_azimuth[-1]:
+                    daily_moon_azimuth.append(None)
+
+            else:
+
+                if moon_azimuth < daily_moon_azimuth[-1]:
+                    daily_moon_azimuth.append(None)
+
+        daily_moon_azimuth.append(moon_azimuth)
+        daily_moon_altitude.append(moon_altitude)
+
+        daily_time.append(days*24)
+
+
+    result['daily_sun_azimuth'] = daily_sun_azimuth
+    result['daily_sun_altitude'] = daily_sun_altitude
+
+    result['daily_moon_azimuth'] = daily_moon_azimuth
+    result['daily_moon_altitude'] = daily_moon_altitude
+
+    result['daily_time'] = daily_time
+
+
+    # ----- rise, transit, set -----
+
+    sun_rts = get_sun_rise_transit_set(a_latitude, a_longitude, a_datetime)
+
+    result['sun_rising']   = sun_rts['rising']
+    result['sun_transit']  = sun_rts['transit']
+    result['sun_setting']  = sun_rts['setting']
+
+
+    moon_rts = get_moon_rise_transit_set(a_latitude, a_longitude, a_datetime)
+
+    result['moon_rising']   = moon_rts['rising']
+    result['moon_transit']  = moon_rts['transit']
+    result['moon_setting']  = moon_rts['setting']
+
+    return result
+
+
+def lunar_daily_altitudes(scenarios):
+    """Calculate the moon position charts for several scenarios
+
+    Scenarios on the same date and time zone sample the same instants
+    so the sun and moon are calculated once for all of them and only
+    the transform to each observer's horizon is repeated.
+
+    Args:
+        scenarios (list): of (coords.angle latitude, coords.angle longitude, coords.datetime)
+
+    Returns: list of result dictionaries, each with its own errors list
+    """
+
+    a_cache = dict()
+
+    results = list()
+
+    for a_latitude, a_longitude, a_datetime in scenarios:
+
+        result = {'errors': list()}
+
+        try:
+            result.update(lunar_daily_altitude(a_latitude, a_longitude, a_datetime, a_cache))
+
+        except (Bodies.SunPosition.Error, Transforms.utils.Error, TypeError, ValueError, RuntimeError) as err:
+            result['errors'].append(str(err))
+
+        results.append(result)
+
+    return results
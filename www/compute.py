@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Runs the AAI chart calculations in a bounded process pool
+
+The chart endpoints are CPU bound. With a sync gunicorn worker a
+lunar chart holds the whole worker while cheap requests like
+/api/v1/dms2dec queue behind it. Run with threaded workers
+(config/aai-gunicorn-threaded-config.py) and set these in the flask
+config to move the chart calculations into worker processes while the
+request threads stay free to parse and answer the light endpoints:
+
+    AAI_COMPUTE_PROCESSES = 2  # 0, the default, calculates in the request thread
+    AAI_COMPUTE_QUEUE = 8      # charts in flight before new ones are refused
+    AAI_COMPUTE_TIMEOUT = 30   # seconds to wait for a chart
+
+The processes import Bodies and Transforms and build the lunar tables
+once when they start, not on every request. Without a pool charts.py,
+and the Bodies with it, are imported by the first chart request.
+
+"""
+
+import concurrent.futures
+import logging
+import multiprocessing.util
+import os
+import threading
+
+import coords
+
+import metrics
+import profiling
+import tracing
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+chart_names = ('solar_daily_altitude', 'lunar_daily_altitude', 'lunar_daily_altitudes')
+
+processes = 0 # AAI_COMPUTE_PROCESSES
+
+executor = None
+executor_pid = None
+executor_lock = threading.Lock()
+executor_slots = None
+executor_timeout = None
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+class Busy(Exception):
+    """All compute slots are in use
+
+    Not an Error so the API handlers let it through to the 503
+    handler in scheduler.py.
+    """
+    pass
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def chart_function(a_chart_name):
+    """The chart calculation, importing charts.py on first use
+
+    Args:
+        a_chart_name (str): one of chart_names
+
+    Returns: function in charts.py
+    """
+
+    import charts
+
+    if a_chart_name not in chart_names:
+        raise Error('unknown chart {}'.format(a_chart_name))
+
+    return getattr(charts, a_chart_name)
+
+
+def preload(a_metrics_dir=None):
+    """Process pool initializer
+
+    Imports the charts and bodies, which builds the lunar tables, and
+    evaluates each body once so the first request to this process does
+    not pay for it.
+
+    Args:
+        a_metrics_dir (str): where to write this process's metrics, see metrics.py
+    """
+
+    metrics.metrics_dir = a_metrics_dir
+    metrics.reset()
+
+    # pool processes exit without atexit, see metrics.flush_at_exit
+    multiprocessing.util.Finalize(None, metrics.flush, kwargs={'force': True}, exitpriority=10)
+
+    import charts
+    import Bodies.MoonPosition
+    import Bodies.SunPosition
+
+    a_datetime = coords.datetime('2000-01-01T12:00:00')
+
+    Bodies.MoonPosition.EclipticCoords(a_datetime)
+    Bodies.SunPosition.EclipticCoords(a_datetime)
+
+    return
+
+
+def run_chart(a_chart_name, a_latitude, a_longitude, a_datetime_str, options=None):
+    """Calculate a chart from plain arguments
+
+    coords objects do not pickle so the pool is given degrees and the
+    ISO 8601 string of the datetime.
+
+    Args:
+        a_chart_name (str): one of chart_names
+        a_latitude (float): observer's latitude in degrees
+        a_longitude (float): observer's longitude in degrees
+        a_datetime_str (str): observer's time as str(coords.datetime)
+        options (dict): chart keyword arguments, like a_resolution
+
+    Returns: the chart's results dictionary
+    """
+
+    try:
+        return chart_function(a_chart_name)(coords.angle(a_latitude),
+                                            coords.angle(a_longitude),
+                                            coords.datetime(a_datetime_str),
+                                            **(options or dict()))
+    finally:
+        metrics.flush()
+
+
+def run_scenarios(a_chart_name, scenarios):
+    """Calculate a multiple scenario chart from plain arguments
+
+    Args:
+        a_chart_name (str): one of chart_names
+        scenarios (list): of (latitude, longitude, datetime string) as in run_chart
+
+    Returns: the chart's list of results dictionaries
+    """
+
+    try:
+        return chart_function(a_chart_name)([(coords.angle(a_latitude),
+                                              coords.angle(a_longitude),
+                                              coords.datetime(a_datetime_str))
+                                             for a_latitude, a_longitude, a_datetime_str in scenarios])
+    finally:
+        metrics.flush()
+
+
+def init_app(an_app):
+    """Read the process pool settings from the flask config
+
+    Args:
+        an_app (flask.Flask): the AAI app
+    """
+
+    global processes, executor_slots, executor_timeout
+
+    processes = an_app.config.get('AAI_COMPUTE_PROCESSES', 0)
+
+    if not processes:
+        return
+
+    executor_slots = threading.BoundedSemaphore(an_app.config.get('AAI_COMPUTE_QUEUE', 2*processes))
+    executor_timeout = an_app.config.get('AAI_COMPUTE_TIMEOUT', 30)
+
+    logging.info('AAI compute pool: %s processes', processes)
+
+    return
+
+
+def pool():
+    """This process's pool, started by its first chart
+
+    Not started in init_app so a gunicorn master that preloads the app,
+    see preload.py, does not fork workers with a pool whose threads
+    did not survive the fork. Each worker starts its own.
+
+    Returns: concurrent.futures.ProcessPoolExecutor
+    """
+
+    global executor, executor_pid
+
+    with executor_lock:
+
+        if executor is None or executor_pid != os.getpid():
+
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=preload,
+                                                              initargs=(metrics.metrics_dir,))
+            executor_pid = os.getpid()
+
+    return executor
+
+
+@metrics.timed('compute')
+def submit(a_chart_name, a_function, *args):
+    """Run a_function(*args) in the pool and wait for the result
+
+    Args:
+        a_chart_name (str): for error messages
+        a_function: module level function to run in a pool process
+        args: its picklable arguments
+
+    Returns: the function's result
+    Raises: Busy if all the compute slots are in use, Error on timeout
+    """
+
+    if not executor_slots.acquire(False):
+        raise Busy('{} unavailable: compute queue full'.format(a_chart_name))
+
+    try:
+        a_future = pool().submit(a_function, *args)
+    except Exception:
+        executor_slots.release()
+        raise
+
+    a_future.add_done_callback(lambda f: executor_slots.release())
+
+    try:
+        return a_future.result(timeout=executor_timeout)
+    except concurrent.futures.TimeoutError:
+        raise Error('{} timed out after {} seconds'.format(a_chart_name, executor_timeout))
+
+
+def chart(a_chart_name, a_latitude, a_longitude, a_datetime, **options):
+    """Calculate a chart in the pool, if configured, or in this thread
+
+    Profiled and traced requests, see profiling.py and tracing.py, are
+    calculated in this thread.
+
+    Args:
+        a_chart_name (str): one of chart_names
+        a_latitude (coords.angle): observer's latitude
+        a_longitude (coords.angle): observer's longitude
+        a_datetime (coords.datetime): observer's time
+        options: chart keyword arguments, like a_resolution
+
+    Returns: the chart's results dictionary
+    Raises: Busy if all the compute slots are in use, Error on timeout
+    """
+
+    if not processes or profiling.is_active() or tracing.is_active():
+        return chart_function(a_chart_name)(a_latitude, a_longitude, a_datetime, **options)
+
+    return submit(a_chart_name, run_chart, a_chart_name,
+                  a_latitude.degrees, a_longitude.degrees, str(a_datetime), options)
+
+
+def chart_scenarios(a_chart_name, scenarios):
+    """Calculate a multiple scenario chart in the pool, if configured, or in this thread
+
+    Args:
+        a_chart_name (str): one of chart_names
+        scenarios (list): of (coords.angle latitude, coords.angle longitude, coords.datetime)
+
+    Returns: the chart's list of results dictionaries
+    Raises: Busy if all the compute slots are in use, Error on timeout
+    """
+
+    if not processes or profiling.is_active() or tracing.is_active():
+        return chart_function(a_chart_name)(scenarios)
+
+    return submit(a_chart_name, run_scenarios, a_chart_name,
+                  [(a_latitude.degrees, a_longitude.degrees, str(a_datetime))
+                   for a_latitude, a_longitude, a_datetime in scenarios])
@@ -11,3 +11,38 @@ SECRET_KEY = 'changeme'
 
 GOOGLEMAPS_KEY = 'changeme'
 
+
+# chart calculation process pool, see compute.py. 0 calculates in the
+# request thread.
+
+AAI_COMPUTE_PROCESSES = 0
+
+# concurrent API requests by cost class, see scheduler.py
+
+AAI_COST_CLASSES = {'heavy': {'limit': 4, 'wait': 0, 'retry_after': 5}}
+
+# metrics from every process are added up in this directory, see
+# metrics.py. None keeps them in this process.
+
+AAI_METRICS_DIR = None
+
+# allows profiling requests signed with this key, see profiling.py.
+# None does not profile.
+
+AAI_PROFILE_KEY = None
+AAI_PROFILE_TOP = 10
+
+# traces requests to JSON lines files in this directory, see
+# tracing.py. None does not trace.
+
+AAI_TRACE_DIR = None
+
+# API requests slower than AAI_SLOW_SECONDS are logged here to
+# replay, see slowlog.py. None does not log them.
+
+AAI_SLOW_LOG = None
+AAI_SLOW_SECONDS = 1.0
+
+# build the charts and warm up in the app factory, see preload.py
+
+AAI_PRELOAD = False
@@ -3,6 +3,12 @@
 bind = "0.0.0.0:8080"
 workers = 4
 
+# To load the app once in the master and fork the workers from it,
+# uncomment preload_app and set AAI_PRELOAD = True in the flask config
+# to build the charts and warm up there too, see preload.py. Off by
+# default, as the workers then no longer reload the app on HUP.
+# preload_app = True
+
 loglevel = 'info'
 
 capture_output = True
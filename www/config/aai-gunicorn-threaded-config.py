@@ -0,0 +1,25 @@
+# aai gunicorn config with threaded workers
+#
+# Use with AAI_COMPUTE_PROCESSES set in the flask config so the charts
+# are calculated in the compute pool (see compute.py) and the request
+# threads stay free for the light endpoints.
+
+bind = "0.0.0.0:8080"
+workers = 2
+worker_class = 'gthread'
+threads = 8
+
+# To load the app once in the master and fork the workers from it,
+# uncomment preload_app and set AAI_PRELOAD = True in the flask config
+# to build the charts and warm up there too, see preload.py. Off by
+# default, as the workers then no longer reload the app on HUP.
+# preload_app = True
+
+loglevel = 'info'
+
+capture_output = True
+
+errorlog = "/opt/starbug.com/logs/aai-error.log"
+accesslog = "/opt/starbug.com/logs/aai-access.log"
+
+forwarded_allow_ips = "*"
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Response formats for the chart time series
+
+JSON is the default. Scripts that want the series as packed
+little-endian floats ask for them with ?format=f32 (or f64) or an
+Accept: application/x-aai-f32 (or application/x-aai-f64) header.
+
+The packed format is
+
+    magic         4 bytes  b'AAIS'
+    version       uint16   1
+    dtype         1 byte   b'f' float32 or b'd' float64
+    pad           1 byte
+    metadata size uint32
+    metadata      utf-8 JSON
+    series data
+
+all little-endian. The metadata is the JSON object of every field
+that is not a numeric series, plus 'series', a list of
+{'name': ..., 'shape': [rows] or [rows, columns]} in the order the
+data follows. Two dimensional series, like altitude_data_24h, are
+stored a column at a time. Gaps (null in JSON) are NaN.
+
+unpack() reads it back into the same dictionary as the JSON.
+
+"""
+
+import array
+import json
+import struct
+import sys
+
+import flask
+
+import metrics
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+magic = b'AAIS'
+version = 1
+
+header_format = '<4sHccI'
+
+dtypes = {'f32': b'f', 'f64': b'd'}
+
+mimetypes = {'json': 'application/json',
+             'f32': 'application/x-aai-f32',
+             'f64': 'application/x-aai-f64'}
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def is_number(a_value):
+    """True for an int or float, but not a bool"""
+
+    return isinstance(a_value, (int, float)) and not isinstance(a_value, bool)
+
+
+def series_shape(a_value):
+    """The shape of a numeric series or None if it is not one
+
+    Args:
+        a_value: a result field
+
+    Returns: [rows], [rows, columns] or None
+    """
+
+    if not isinstance(a_value, list) or len(a_value) == 0:
+        return None
+
+    if all(v is None or is_number(v) for v in a_value):
+        return [len(a_value)]
+
+    if all(isinstance(v, list) for v in a_value):
+
+        columns = len(a_value[0])
+
+        if all(len(v) == columns and all(c is None or is_number(c) for c in v) for v in a_value):
+            return [len(a_value), columns]
+
+    return None
+
+
+def pack(a_result, a_format='f32'):
+    """Pack a result dictionary's series as little-endian floats
+
+    Args:
+        a_result (dict): an API result
+        a_format (str): f32 or f64
+
+    Returns: bytes
+    """
+
+    if a_format not in dtypes:
+        raise Error('unsupported format {}'.format(a_format))
+
+    metadata = {'series': list()}
+    data = list()
+
+    for key, val in sorted(a_result.items()):
+
+        shape = series_shape(val)
+
+        if shape is None:
+            metadata[key] = val
+            continue
+
+        if len(shape) == 1:
+            values = val
+        else:
+            values = [row[c] for c in range(shape[1]) for row in val] # a column at a time
+
+        packed = array.array(dtypes[a_format].decode(),
+                             (float('nan') if v is None else v for v in values))
+
+        if sys.byteorder == 'big':
+            packed.byteswap()
+
+        metadata['series'].append({'name': key, 'shape': shape})
+        data.append(packed.tobytes())
+
+    metadata_bytes = json.dumps(metadata).encode('utf-8')
+
+    header = struct.pack(header_format, magic, version, dtypes[a_format], b'\0', len(metadata_bytes))
+
+    return b''.join([header, metadata_bytes] + data)
+
+
+def unpack(a_buffer):
+    """Unpack a packed response into a result dictionary
+
+    Args:
+        a_buffer (bytes): from pack()
+
+    Returns: dict as the JSON response would have been
+    """
+
+    header_size = struct.calcsize(header_format)
+
+    a_magic, a_version, a_dtype, pad, metadata_size = struct.unpack_from(header_format, a_buffer)
+
+    if a_magic != magic or a_version != version:
+        raise Error('unsupported packed series {} version {}'.format(a_magic, a_version))
+
+    offset = header_size + metadata_size
+
+    result = json.loads(a_buffer[header_size:offset].decode('utf-8'))
+
+    for a_series in result.pop('series'):
+
+        count = 1
+        for n in a_series['shape']:
+            count *= n
+
+        values = array.array(a_dtype.decode())
+        values.frombytes(a_buffer[offset:offset + count*values.itemsize])
+        offset += count*values.itemsize
+
+        if sys.byteorder == 'big':
+            values.byteswap()
+
+        values = [None if v != v else v for v in values] # NaN to None
+
+        if len(a_series['shape']) == 1:
+            result[a_series['name']] = values
+        else:
+            rows, columns = a_series['shape']
+            result[a_series['name']] = [[values[c*rows + r] for c in range(columns)] for r in range(rows)]
+
+    return result
+
+
+def requested_format(a_flask_request):
+    """The response format from ?format= or the Accept header
+
+    Args:
+        a_flask_request (werkzeug.local.LocalProxy): reference to the flask request object
+
+    Returns: json, f32 or f64
+    Raises: Error if the format parameter is not supported
+    """
+
+    a_format = a_flask_request.args.get('format')
+
+    if a_format is not None:
+
+        if a_format not in mimetypes:
+            raise Error('unsupported format {}'.format(a_format))
+
+        return a_format
+
+    best = a_flask_request.accept_mimetypes.best_match([mimetypes['json'], mimetypes['f32'], mimetypes['f64']],
+                                                       default=mimetypes['json'])
+
+    for a_format, a_mimetype in mimetypes.items():
+        if a_mimetype == best:
+            return a_format
+
+    return 'json'
+
+
+@metrics.timed('serialize')
+def respond(a_result):
+    """Respond with a result dictionary in the requested format
+
+    Args:
+        a_result (dict): an API result with an errors list
+
+    Returns: flask.Response
+    """
+
+    try:
+        a_format = requested_format(flask.request)
+    except Error as err:
+        a_result['errors'].append(str(err))
+        a_format = 'json'
+
+    if a_format == 'json':
+        return flask.jsonify(**a_result)
+
+    return flask.Response(pack(a_result, a_format), mimetype=mimetypes[a_format])
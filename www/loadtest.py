@@ -0,0 +1,517 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Load tests the AAI API
+
+Replays gunicorn access log lines, or a synthetic mix of the API
+routes, against the flask test client, a running server or a gunicorn
+started for the run. Reports throughput, p50/p95/p99 latency and a per
+route breakdown and compares two runs.
+
+To run (in the www directory):
+
+    ./bin/pylaunch.sh loadtest.py --synthetic 500 -o before.json
+    ./bin/pylaunch.sh loadtest.py --replay aai-access.log --url http://0.0.0.0:8080 -n 8
+    ./bin/pylaunch.sh loadtest.py --synthetic 500 --gunicorn config/aai-gunicorn-threaded-config.py -n 16 -o after.json
+
+    ./bin/pylaunch.sh loadtest.py --compare before.json after.json
+
+The replay file can have gunicorn access log lines, JSON lines of
+{"method": ..., "path": ..., "body": ...} or bare paths, one a line.
+Only GET requests are in the access log since it does not have the
+POST bodies.
+
+"""
+
+import argparse
+import json
+import math
+import os
+import queue
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+# "GET /api/v1/dms2dec?dms=45 HTTP/1.1" in the gunicorn access log
+
+access_log_re = re.compile(r'"(?P<method>[A-Z]+) (?P<path>\S+) HTTP/[\d.]+"')
+
+# weight, method, path, body
+
+synthetic_mix = (
+    (20, 'GET', '/api/v1/dms2dec?dms=37:24:01', None),
+    (20, 'GET', '/api/v1/dec2dms?dec=-122.0822', None),
+    (10, 'GET', '/api/v1/datetime2juliandate?date=2018-01-11&time=10%3A14%3A56&timezone=-8', None),
+    (10, 'GET', '/api/v1/standardize?latitude=37:30:45&longitude=-122:45:30&date=2018-01-11&time=10%3A14%3A56&timezone=-8&dst=false&ra=6:30:30&dec=10:30:45&az=12:15:30&alt=-6:15', None),
+    (10, 'GET', '/api/v1/radec2azalt?latitude=37&longitude=-122&date=2018-01-11&time=10%3A14%3A56&timezone=-8&dst=false&ra=0&dec=0', None),
+    (5,  'GET', '/api/v1/radec2eclatlon?date=2018-01-11&time=10%3A14%3A56&timezone=-8&ra=0&dec=0', None),
+    (5,  'GET', '/api/v1/azalt2radec?latitude=37&longitude=-122&date=2018-01-11&time=10%3A14%3A56&timezone=-8&dst=false&azimuth=85.3351397270823&altitude=-6.159799566504844', None),
+    (8,  'GET', '/api/v1/solar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08', None),
+    (8,  'GET', '/api/v1/lunar_daily_altitude?latitude=37:24:01&longitude=-122:04:56&date=2017-08-21&time=09%3A00&timezone=-08:00', None),
+    (4,  'POST', '/api/v1/lunar_daily_altitudes',
+     json.dumps({'scenarios': [{'latitude': '24', 'longitude': '102', 'date': '2019-12-26', 'time': '12:00', 'timezone': '+07:00'},
+                               {'latitude': '20', 'longitude': '102', 'date': '2019-12-26', 'time': '12:00', 'timezone': '+07:00'}]})),
+)
+
+percentiles = (50, 95, 99)
+
+
+# ===================
+# ===== classes =====
+# ===================
+
+
+class Error(Exception):
+    pass
+
+
+class ClientTarget(object):
+    """Sends requests to an AAI app through the flask test client"""
+
+    def __init__(self, a_config_flnm=None):
+
+        import aai # here so a run against a server does not need Bodies and coords
+
+        self.app = aai.factory(a_config_flnm)
+        self.local = threading.local()
+
+    def request(self, a_method, a_path, a_body=None):
+        """Returns the response status, see status"""
+
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+
+        a_response = self.local.client.open(a_path, method=a_method, data=a_body,
+                                            content_type='application/json' if a_body else None)
+
+        return status(a_response.status_code, a_response.mimetype, a_response.get_data())
+
+
+class HTTPTarget(object):
+    """Sends requests to a running server"""
+
+    def __init__(self, a_url):
+
+        self.url = a_url.rstrip('/')
+
+    def request(self, a_method, a_path, a_body=None):
+        """Returns the response status, see status"""
+
+        a_request = urllib.request.Request(self.url + a_path,
+                                           data=a_body.encode('utf-8') if a_body else None,
+                                           headers={'Content-Type': 'application/json'} if a_body else {},
+                                           method=a_method)
+        try:
+            with urllib.request.urlopen(a_request) as a_response:
+                return status(a_response.status, a_response.headers.get_content_type(), a_response.read())
+        except urllib.error.HTTPError as err:
+            return err.code
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def status(a_code, a_content_type, a_body):
+    """The status of a response
+
+    The API answers 200 with the problems in an errors list, so a 200
+    whose JSON has one that is not empty is an error too.
+
+    Args:
+        a_code (int): HTTP status code
+        a_content_type (str): e.g. application/json
+        a_body (bytes): the response
+
+    Returns: a_code, or 'errors' for a 200 with errors
+    """
+
+    if a_code != 200 or a_content_type != 'application/json':
+        return a_code
+
+    try:
+        a_result = json.loads(a_body.decode('utf-8'))
+    except ValueError:
+        return a_code
+
+    if isinstance(a_result, dict) and a_result.get('errors'):
+        return 'errors'
+
+    return a_code
+
+
+def read_requests(a_flnm, a_prefix='/api/'):
+    """Reads the requests to replay
+
+    Args:
+        a_flnm (str): access log, JSON lines or paths
+        a_prefix (str): only replay paths that start with this
+
+    Returns: list of (method, path, body)
+    """
+
+    requests = list()
+
+    with open(a_flnm) as a_file:
+
+        for line in a_file:
+
+            line = line.strip()
+
+            if line.startswith('{'):
+                a_request = json.loads(line)
+                method, path, body = a_request.get('method', 'GET'), a_request['path'], a_request.get('body')
+
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body)
+
+            elif line.startswith('/'):
+                method, path, body = 'GET', line, None
+
+            else:
+                found = access_log_re.search(line)
+
+                if found is None:
+                    continue
+
+                method, path, body = found.group('method'), found.group('path'), None
+
+                if method != 'GET':
+                    continue # no body in the access log
+
+            if path.startswith(a_prefix):
+                requests.append((method, path, body))
+
+    return requests
+
+
+def synthetic_requests(a_count, a_seed=None):
+    """A random mix of API requests weighted by synthetic_mix
+
+    Returns: list of (method, path, body)
+    """
+
+    a_random = random.Random(a_seed)
+
+    weights = [weight for weight, method, path, body in synthetic_mix]
+
+    return [(method, path, body) for weight, method, path, body in
+            a_random.choices(synthetic_mix, weights=weights, k=a_count)]
+
+
+def route(a_path):
+    """The path without its query"""
+
+    return a_path.split('?')[0]
+
+
+def percentile(sorted_values, a_percent):
+    """Nearest rank percentile of a sorted list"""
+
+    if not sorted_values:
+        return None
+
+    rank = max(1, int(math.ceil(a_percent/100.0*len(sorted_values))))
+
+    return sorted_values[rank - 1]
+
+
+def latency_summary(seconds):
+    """count, mean, max and percentiles in milliseconds"""
+
+    seconds = sorted(seconds)
+
+    summary = {'count': len(seconds),
+               'mean_ms': 1000*sum(seconds)/len(seconds) if seconds else None,
+               'max_ms': 1000*seconds[-1] if seconds else None}
+
+    for p in percentiles:
+        value = percentile(seconds, p)
+        summary['p{}_ms'.format(p)] = 1000*value if value is not None else None
+
+    return summary
+
+
+def run(a_target, requests, a_concurrency=1):
+    """Sends the requests with a_concurrency threads
+
+    Args:
+        a_target: ClientTarget or HTTPTarget
+        requests (list): of (method, path, body)
+        a_concurrency (int): threads
+
+    Returns: the report dictionary
+    """
+
+    work = queue.Queue()
+
+    for a_request in requests:
+        work.put(a_request)
+
+    samples = list()
+    samples_lock = threading.Lock()
+
+    def worker():
+
+        while True:
+
+            try:
+                method, path, body = work.get_nowait()
+            except queue.Empty:
+                return
+
+            start = time.perf_counter()
+
+            try:
+                status = a_target.request(method, path, body)
+            except (IOError, OSError) as err:
+                status = str(err)
+
+            elapsed = time.perf_counter() - start
+
+            with samples_lock:
+                samples.append((route(path), elapsed, status))
+
+    threads = [threading.Thread(target=worker) for i in range(a_concurrency)]
+
+    start = time.perf_counter()
+
+    for a_thread in threads:
+        a_thread.start()
+
+    for a_thread in threads:
+        a_thread.join()
+
+    elapsed = time.perf_counter() - start
+
+    report = {'requests': len(samples),
+              'concurrency': a_concurrency,
+              'elapsed_s': elapsed,
+              'throughput_rps': len(samples)/elapsed if elapsed > 0 else None,
+              'errors': len([s for s in samples if s[2] != 200]),
+              'latency': latency_summary([s[1] for s in samples]),
+              'routes': dict()}
+
+    for a_route in sorted(set(s[0] for s in samples)):
+
+        route_samples = [s for s in samples if s[0] == a_route]
+
+        report['routes'][a_route] = latency_summary([s[1] for s in route_samples])
+        report['routes'][a_route]['errors'] = len([s for s in route_samples if s[2] != 200])
+
+    return report
+
+
+def format_ms(a_value):
+    """Milliseconds for the tables, blank for None, a run with no requests"""
+
+    return '{:.2f}'.format(a_value) if a_value is not None else ''
+
+
+def format_report(a_report):
+    """The report as a table"""
+
+    lines = ['{requests} requests, {concurrency} threads, {elapsed_s:.2f} s, {throughput:.1f} requests/s, {errors} errors'.format(
+        throughput=a_report['throughput_rps'] or 0, **a_report)]
+
+    row = '{:<40} {:>7} {:>9} {:>9} {:>9} {:>7}'
+
+    lines.append(row.format('route', 'count', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'))
+
+    for a_route, a_summary in sorted(a_report['routes'].items()) + [('all', dict(a_report['latency'], errors=a_report['errors']))]:
+        lines.append(row.format(a_route, a_summary['count'],
+                                format_ms(a_summary['p50_ms']), format_ms(a_summary['p95_ms']), format_ms(a_summary['p99_ms']),
+                                a_summary['errors']))
+
+    return '\n'.join(lines)
+
+
+def compare(a_before, an_after, a_threshold=10.0):
+    """Compares two reports
+
+    Args:
+        a_before (dict): report of the first run
+        an_after (dict): report of the second run
+        a_threshold (float): percent slower to call a regression
+
+    Returns: (table str, list of regressions)
+    """
+
+    def change(before, after):
+        if not before or after is None:
+            return None
+        return 100.0*(after - before)/before
+
+    regressions = list()
+
+    row = '{:<40} {:>7} {:>10} {:>10} {:>8}'
+
+    lines = [row.format('route', 'metric', 'before', 'after', 'change')]
+
+    throughput_change = change(a_before['throughput_rps'], an_after['throughput_rps'])
+    lines.append(row.format('all', 'req/s', '{:.1f}'.format(a_before['throughput_rps'] or 0),
+                            '{:.1f}'.format(an_after['throughput_rps'] or 0),
+                            '{:+.1f}%'.format(throughput_change) if throughput_change is not None else ''))
+
+    if throughput_change is not None and throughput_change < -a_threshold:
+        regressions.append('all req/s {:+.1f}%'.format(throughput_change))
+
+    routes = [('all', a_before['latency'], an_after['latency'])]
+    routes += [(a_route, a_before['routes'][a_route], an_after['routes'][a_route])
+               for a_route in sorted(set(a_before['routes']) & set(an_after['routes']))]
+
+    for a_route, before, after in routes:
+
+        for p in percentiles:
+
+            key = 'p{}_ms'.format(p)
+            a_change = change(before[key], after[key])
+
+            lines.append(row.format(a_route, key, format_ms(before[key]), format_ms(after[key]),
+                                    '{:+.1f}%'.format(a_change) if a_change is not None else ''))
+
+            if a_change is not None and a_change > a_threshold:
+                regressions.append('{} {} {:+.1f}%'.format(a_route, key, a_change))
+
+    return '\n'.join(lines), regressions
+
+
+def start_gunicorn(a_gunicorn_config, a_bind, a_timeout=30):
+    """Starts gunicorn on the AAI app and waits for it to listen
+
+    Args:
+        a_gunicorn_config (str): gunicorn config file
+        a_bind (str): host:port, overrides the config's bind
+        a_timeout (float): seconds to wait
+
+    Returns: subprocess.Popen
+    Raises: Error if it does not start listening
+    """
+
+    a_process = subprocess.Popen(['gunicorn', '-c', a_gunicorn_config, '-b', a_bind,
+                                  '--access-logfile', os.devnull, 'aai:factory()'])
+
+    host, port = a_bind.rsplit(':', 1)
+
+    deadline = time.time() + a_timeout
+
+    while time.time() < deadline:
+
+        if a_process.poll() is not None:
+            raise Error('gunicorn exited with {}'.format(a_process.returncode))
+
+        try:
+            socket.create_connection((host, int(port)), timeout=1).close()
+            return a_process
+        except (IOError, OSError):
+            time.sleep(0.2)
+
+    a_process.terminate()
+
+    raise Error('gunicorn not listening on {} after {} seconds'.format(a_bind, a_timeout))
+
+
+# ================
+# ===== main =====
+# ================
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='AAI API load test')
+
+    parser.add_argument('--replay', type=str, dest='replay', default=None,
+                        metavar='file', help='access log, JSON lines or paths to replay')
+
+    parser.add_argument('--synthetic', type=int, dest='synthetic', default=None,
+                        metavar='count', help='send count requests from the synthetic mix')
+
+    parser.add_argument('--seed', type=int, dest='seed', default=None,
+                        help='random seed for the synthetic mix')
+
+    parser.add_argument('--url', type=str, dest='url', default=None,
+                        help='send to a running server, e.g. http://0.0.0.0:8080')
+
+    parser.add_argument('--gunicorn', type=str, dest='gunicorn', default=None,
+                        metavar='config', help='start gunicorn with this config for the run')
+
+    parser.add_argument('--bind', type=str, dest='bind', default='127.0.0.1:8089',
+                        help='where --gunicorn listens')
+
+    parser.add_argument('-c', '--config', type=str, dest='config', default=None,
+                        metavar='config', help='flask config file for the test client')
+
+    parser.add_argument('-n', '--concurrency', type=int, dest='concurrency', default=1,
+                        help='concurrent requests')
+
+    parser.add_argument('-o', '--output', type=str, dest='output', default=None,
+                        help='save the report as JSON')
+
+    parser.add_argument('--compare', type=str, dest='compare', nargs=2, default=None,
+                        metavar=('before', 'after'), help='compare two saved reports')
+
+    parser.add_argument('--threshold', type=float, dest='threshold', default=10.0,
+                        help='percent slower to call a regression in --compare')
+
+    args = parser.parse_args()
+
+    # -------------------
+    # ----- compare -----
+    # -------------------
+
+    if args.compare is not None:
+
+        with open(args.compare[0]) as before_file, open(args.compare[1]) as after_file:
+            table, regressions = compare(json.load(before_file), json.load(after_file), args.threshold)
+
+        print(table)
+
+        for a_regression in regressions:
+            print('regression: {}'.format(a_regression))
+
+        sys.exit(1 if regressions else 0)
+
+    # ---------------
+    # ----- run -----
+    # ---------------
+
+    if args.replay is not None:
+        requests = read_requests(args.replay)
+    elif args.synthetic is not None:
+        requests = synthetic_requests(args.synthetic, args.seed)
+    else:
+        parser.error('one of --replay, --synthetic or --compare is required')
+
+    gunicorn_process = None
+
+    if args.gunicorn is not None:
+        gunicorn_process = start_gunicorn(args.gunicorn, args.bind)
+        target = HTTPTarget('http://' + args.bind)
+    elif args.url is not None:
+        target = HTTPTarget(args.url)
+    else:
+        target = ClientTarget(args.config)
+
+    try:
+        report = run(target, requests, args.concurrency)
+    finally:
+        if gunicorn_process is not None:
+            gunicorn_process.terminate()
+            gunicorn_process.wait()
+
+    print(format_report(report))
+
+    if args.output is not None:
+        with open(args.output, 'w') as a_file:
+            json.dump(report, a_file, indent=4, sort_keys=True)
@@ -0,0 +1,500 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Request and compute stage metrics in the Prometheus text format
+
+    curl http://0.0.0.0:8080/metrics
+
+aai_requests_total and aai_request_seconds count and time each flask
+endpoint. aai_stage_seconds times the stages of a request:
+
+    parse      utils.parse_angle, parse_datetime and parse_iso8601
+    ephemeris  the sun and moon positions in charts.py
+    transform  equatorial to horizon in charts.py
+    compute    waiting for a chart from the compute pool, see compute.submit
+    serialize  formats.respond
+
+The stages are timed where the charts call Bodies and Transforms so
+those packages stay free of the web app.
+
+Each process keeps its own metrics. To add them up over the gunicorn
+workers and the compute pool (see compute.py) set a directory they can
+all write to in the flask config:
+
+    AAI_METRICS_DIR = '/tmp/aai-metrics'
+
+Each process then writes its metrics to its own file there, at most
+once a second and once more when it exits, and /metrics adds up the
+files. The file of a process that is no longer running, a gunicorn
+worker that was restarted or a compute pool process, is added into
+the metrics of the process that finds it and removed, so the totals
+keep counting up and the directory has a file per live process. Empty
+the directory when the server starts or the counts carry over from the
+last run.
+
+"""
+
+import atexit
+import bisect
+import functools
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+import flask
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # seconds
+
+descriptions = {'aai_requests_total': ('counter', 'Requests by endpoint and status'),
+                'aai_request_seconds': ('histogram', 'Request latency by endpoint'),
+                'aai_stage_seconds': ('histogram', 'Time in each stage of a request')}
+
+flush_interval = 1.0 # seconds between writes to the metrics directory
+
+metrics_dir = None
+
+lock = threading.Lock()
+flush_lock = threading.Lock() # one flush at a time, they share the .tmp file
+
+counters = dict()   # (name, labels) to count
+histograms = dict() # (name, labels) to [bucket counts..., +Inf count, sum]
+
+owner = {'pid': None, 'name': None, 'flushed': 0, 'at_exit': False}
+
+request_stages = threading.local() # seconds by stage in this thread's request, see slowlog.py
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def reset():
+    """Start this process's metrics from zero"""
+
+    with lock:
+        counters.clear()
+        histograms.clear()
+        owner['pid'] = os.getpid()
+        owner['name'] = 'metrics-{}-{}.json'.format(os.getpid(), int(time.time()*1e6))
+        owner['flushed'] = time.time()
+
+    return
+
+
+def discard():
+    """Forget this process's metrics and remove its file
+
+    For the gunicorn master after it warms the app up, see preload.py,
+    so the warm up requests are not counted.
+    """
+
+    if metrics_dir is not None and owner['name'] is not None:
+
+        try:
+            os.remove(os.path.join(metrics_dir, owner['name']))
+        except OSError:
+            pass # never flushed
+
+    reset()
+
+    return
+
+
+def check_owner():
+    """Forget metrics copied from the parent of a forked process"""
+
+    if owner['pid'] != os.getpid():
+        reset()
+
+    return
+
+
+def increment(a_name, labels, an_amount=1):
+    """Add to a counter
+
+    Args:
+        a_name (str): metric name
+        labels (tuple): of (label, value) pairs
+        an_amount (float): to add
+    """
+
+    check_owner()
+
+    with lock:
+        counters[(a_name, labels)] = counters.get((a_name, labels), 0) + an_amount
+
+    return
+
+
+def observe(a_name, labels, seconds):
+    """Add a time to a histogram
+
+    Args:
+        a_name (str): metric name
+        labels (tuple): of (label, value) pairs
+        seconds (float): the observation
+    """
+
+    check_owner()
+
+    with lock:
+
+        a_histogram = histograms.get((a_name, labels))
+
+        if a_histogram is None:
+            a_histogram = histograms[(a_name, labels)] = [0]*(len(buckets) + 2)
+
+        a_histogram[bisect.bisect_left(buckets, seconds)] += 1
+        a_histogram[-1] += seconds
+
+    return
+
+
+def timed(a_stage):
+    """Decorator to time a function as a stage in aai_stage_seconds
+
+    Args:
+        a_stage (str): parse, ephemeris, transform, compute or serialize
+    """
+
+    labels = (('stage', a_stage),)
+
+    def decorator(a_function):
+
+        @functools.wraps(a_function)
+        def wrapper(*args, **kwargs):
+
+            start = time.perf_counter()
+
+            try:
+                return a_function(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                observe('aai_stage_seconds', labels, seconds)
+                add_request_stage(a_stage, seconds)
+
+        return wrapper
+
+    return decorator
+
+
+def add_request_stage(a_stage, seconds):
+    """Add to the stage times of this thread's request, if there is one"""
+
+    stages = getattr(request_stages, 'seconds', None)
+
+    if stages is not None:
+        stages[a_stage] = stages.get(a_stage, 0) + seconds
+
+    return
+
+
+def request_stage_seconds():
+    """Seconds in each stage so far in this thread's request
+
+    Returns: dict of stage to seconds
+    """
+
+    return dict(getattr(request_stages, 'seconds', None) or ())
+
+
+def snapshot():
+    """This process's metrics as a JSON-able list"""
+
+    with lock:
+        return {'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+                'histograms': [[name, list(labels), value] for (name, labels), value in histograms.items()]}
+
+
+def flush(force=False):
+    """Write this process's metrics to the metrics directory
+
+    Args:
+        force (bool): write even if the last write was less than flush_interval ago
+
+    The request threads of a gthread worker and a /metrics scrape flush
+    under flush_lock, so they never write the .tmp file at once.
+    """
+
+    if metrics_dir is None:
+        return
+
+    check_owner()
+
+    with flush_lock:
+
+        now = time.time()
+
+        if not force and now - owner['flushed'] < flush_interval:
+            return
+
+        owner['flushed'] = now
+
+        a_path = os.path.join(metrics_dir, owner['name'])
+
+        try:
+
+            with open(a_path + '.tmp', 'w') as a_file:
+                json.dump(snapshot(), a_file)
+
+            os.replace(a_path + '.tmp', a_path)
+
+        except (IOError, OSError) as err:
+            logging.warning('AAI metrics not written to %s: %s', a_path, err)
+
+    return
+
+
+def flush_at_exit():
+    """Write this process's metrics when it exits, once per process tree
+
+    The gunicorn workers forked from the master inherit it. The compute
+    pool processes exit without atexit, see compute.preload.
+    """
+
+    if not owner['at_exit']:
+        owner['at_exit'] = True
+        atexit.register(flush, True)
+
+    return
+
+
+def is_running(a_pid):
+    """True if a process with a_pid is running on this host"""
+
+    try:
+        os.kill(a_pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True # someone else's
+
+    return True
+
+
+def add_snapshot(a_snapshot, some_counters, some_histograms):
+    """Add a snapshot's metrics to counters and histograms dictionaries"""
+
+    for name, labels, value in a_snapshot['counters']:
+        key = (name, tuple(tuple(label) for label in labels))
+        some_counters[key] = some_counters.get(key, 0) + value
+
+    for name, labels, value in a_snapshot['histograms']:
+        key = (name, tuple(tuple(label) for label in labels))
+        total = some_histograms.setdefault(key, [0]*len(value))
+        for i, v in enumerate(value):
+            total[i] += v
+
+    return
+
+
+def adopt(a_path):
+    """Add the metrics of a process that is no longer running to this one's
+
+    The file is renamed first so that only one process adds it, then
+    removed once this process's file has the metrics.
+
+    Args:
+        a_path (str): the dead process's metrics file
+
+    Returns: True if adopted, False if another process got there first
+    """
+
+    a_claim = '{}.adopted-{}'.format(a_path, os.getpid())
+
+    try:
+        os.rename(a_path, a_claim)
+    except OSError:
+        return False
+
+    try:
+        with open(a_claim) as a_file:
+            a_snapshot = json.load(a_file)
+
+        check_owner()
+
+        with lock:
+            add_snapshot(a_snapshot, counters, histograms)
+
+        flush(force=True)
+
+    except (IOError, OSError, ValueError) as err:
+        logging.warning('AAI metrics not adopted from %s: %s', a_path, err)
+
+    finally:
+        os.remove(a_claim)
+
+    return True
+
+
+def collect():
+    """Add up the metrics of every process
+
+    Adopts the files of the processes that are no longer running.
+
+    Returns: (counters, histograms) dictionaries keyed by (name, labels)
+    """
+
+    flush(force=True)
+
+    if metrics_dir is not None:
+
+        for a_path in glob.glob(os.path.join(metrics_dir, 'metrics-*.json')):
+
+            try:
+                a_pid = int(os.path.basename(a_path).split('-')[1])
+            except (IndexError, ValueError):
+                continue
+
+            if a_pid != os.getpid() and not is_running(a_pid):
+                adopt(a_path)
+
+    snapshots = [snapshot()]
+
+    if metrics_dir is not None:
+
+        for a_path in glob.glob(os.path.join(metrics_dir, 'metrics-*.json')):
+
+            if os.path.basename(a_path) == owner['name']:
+                continue
+
+            try:
+                with open(a_path) as a_file:
+                    snapshots.append(json.load(a_file))
+            except FileNotFoundError:
+                pass # adopted since, see adopt
+            except (IOError, OSError, ValueError) as err:
+                logging.warning('AAI metrics not read from %s: %s', a_path, err)
+
+    total_counters = dict()
+    total_histograms = dict()
+
+    for a_snapshot in snapshots:
+        add_snapshot(a_snapshot, total_counters, total_histograms)
+
+    return total_counters, total_histograms
+
+
+def label_str(labels, an_extra=None):
+    """Prometheus {label="value",...}"""
+
+    pairs = list(labels) + ([an_extra] if an_extra is not None else [])
+
+    if not pairs:
+        return ''
+
+    return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs) + '}'
+
+
+def exposition():
+    """The metrics of every process in the Prometheus text format
+
+    Returns: str
+    """
+
+    total_counters, total_histograms = collect()
+
+    lines = list()
+
+    for a_name, (a_type, a_help) in sorted(descriptions.items()):
+
+        lines.append('# HELP {} {}'.format(a_name, a_help))
+        lines.append('# TYPE {} {}'.format(a_name, a_type))
+
+        for (name, labels), value in sorted(total_counters.items()):
+            if name == a_name:
+                lines.append('{}{} {}'.format(name, label_str(labels), value))
+
+        for (name, labels), value in sorted(total_histograms.items()):
+
+            if name != a_name:
+                continue
+
+            cumulative = 0
+
+            for le, count in zip(buckets + ('+Inf',), value[:-1]):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(name, label_str(labels, ('le', le)), cumulative))
+
+            lines.append('{}_sum{} {}'.format(name, label_str(labels), value[-1]))
+            lines.append('{}_count{} {}'.format(name, label_str(labels), cumulative))
+
+    return '\n'.join(lines) + '\n'
+
+
+# ----------------------------
+# ----- request handlers -----
+# ----------------------------
+
+
+def start_timer():
+    """before_request: note the start time"""
+
+    flask.g.metrics_start = time.perf_counter()
+    request_stages.seconds = dict()
+
+    return None
+
+
+def record(a_response):
+    """after_request: count and time the request"""
+
+    start = flask.g.pop('metrics_start', None)
+    endpoint = flask.request.endpoint
+
+    if start is not None and endpoint is not None and endpoint != 'metrics':
+
+        increment('aai_requests_total', (('endpoint', endpoint), ('status', str(a_response.status_code))))
+        observe('aai_request_seconds', (('endpoint', endpoint),), time.perf_counter() - start)
+
+        flush()
+
+    return a_response
+
+
+def forget_request(an_error=None):
+    """teardown_request: stop adding up this thread's stage times"""
+
+    request_stages.seconds = None
+
+    return
+
+
+def metrics_page():
+    """GET /metrics"""
+
+    return flask.Response(exposition(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(an_app):
+    """Register the metrics hooks and /metrics
+
+    Args:
+        an_app (flask.Flask): the AAI app
+    """
+
+    global metrics_dir
+
+    metrics_dir = an_app.config.get('AAI_METRICS_DIR')
+
+    if metrics_dir is not None:
+        os.makedirs(metrics_dir, exist_ok=True)
+
+    reset()
+    flush_at_exit()
+
+    an_app.before_request(start_timer)
+    an_app.after_request(record)
+    an_app.teardown_request(forget_request)
+    an_app.add_url_rule('/metrics', 'metrics', metrics_page)
+
+    return
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Builds the app's shared state once, before gunicorn forks the workers
+
+Without it each worker imports coords, charts.py and the Bodies, builds
+the lunar tables and warms up on its first requests, so memory grows
+with the number of workers. With
+
+    AAI_PRELOAD = True
+
+in the flask config the app factory does all of that and answers a few
+common requests (AAI_PRELOAD_PATHS) before it returns. With
+
+    preload_app = True
+
+in the gunicorn config, commented out in both of ours, the factory
+runs once in the master and the workers share what it built
+copy-on-write. gc.freeze() keeps the collector in the workers from
+writing to those objects and so copying their pages.
+
+Each worker starts its own compute pool on its first chart, see
+compute.pool, and its own metrics, see metrics.check_owner.
+
+"""
+
+import gc
+import logging
+import resource
+import sys
+import time
+
+import compute
+import metrics
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+# common requests to answer before forking
+
+default_paths = ('/',
+                 '/api/v1/dms2dec?dms=37:24:01',
+                 '/api/v1/dec2dms?dec=-122.0822',
+                 '/api/v1/datetime2juliandate?date=2018-01-11&time=10%3A14%3A56&timezone=-8',
+                 '/api/v1/standardize?latitude=37:30:45&longitude=-122:45:30&date=2018-01-11&time=10%3A14%3A56&timezone=-8&dst=false&ra=6:30:30&dec=10:30:45&az=12:15:30&alt=-6:15',
+                 '/api/v1/radec2azalt?latitude=37&longitude=-122&date=2018-01-11&time=10%3A14%3A56&timezone=-8&dst=false&ra=0&dec=0',
+                 '/api/v1/radec2eclatlon?date=2018-01-11&time=10%3A14%3A56&timezone=-8&ra=0&dec=0',
+                 '/api/v1/solar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08',
+                 '/api/v1/lunar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08')
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def max_rss_mb():
+    """This process's peak resident memory in megabytes"""
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if sys.platform == 'darwin':
+        return rss/(1024.0*1024.0) # bytes
+
+    return rss/1024.0 # kilobytes
+
+
+def warm_up(an_app, paths):
+    """Answer requests in this process
+
+    The charts are calculated here, not in a compute pool, so the
+    master does not start a pool the workers cannot use.
+
+    Args:
+        an_app (flask.Flask): the AAI app
+        paths (tuple): request paths with queries
+
+    Returns: list of the paths that did not answer 200
+    """
+
+    failed = list()
+
+    processes, compute.processes = compute.processes, 0
+
+    try:
+
+        a_client = an_app.test_client()
+
+        for a_path in paths:
+
+            a_response = a_client.get(a_path)
+
+            if a_response.status_code != 200:
+                failed.append(a_path)
+
+    finally:
+        compute.processes = processes
+
+    return failed
+
+
+def init_app(an_app):
+    """Build and warm up the shared state if AAI_PRELOAD is set
+
+    Args:
+        an_app (flask.Flask): the AAI app, with all its blueprints and hooks
+    """
+
+    if not an_app.config.get('AAI_PRELOAD', False):
+        return
+
+    start = time.time()
+
+    compute.preload(metrics.metrics_dir) # imports charts and the Bodies, builds the tables
+
+    import bulk # and numpy, for the log uploads
+
+    failed = warm_up(an_app, an_app.config.get('AAI_PRELOAD_PATHS', default_paths))
+
+    for a_path in failed:
+        logging.warning('AAI preload: %s failed', a_path)
+
+    metrics.discard() # the warm up requests
+
+    gc.collect()
+
+    if hasattr(gc, 'freeze'): # python 3.7
+        gc.freeze()
+
+    logging.info('AAI preload: %.2f seconds, %.1f MB', time.time() - start, max_rss_mb())
+
+    return
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Profiles single API requests on demand
+
+Set a key in the flask config to allow it:
+
+    AAI_PROFILE_KEY = 'a long random string'
+    AAI_PROFILE_TOP = 20               # functions to report
+    AAI_PROFILE_DIR = '/tmp/aai-prof'  # also keep the full pstats files, optional
+
+and sign the path of the request to profile with it:
+
+    signature = profiling.signature(key, '/api/v1/lunar_daily_altitude')
+
+The signature carries its expiry time, signature_seconds from when it
+is made by default, and is refused after it so that one seen in a log
+or a shell history cannot be replayed to profile requests later.
+
+    curl -H 'X-AAI-Profile: <signature>' http://0.0.0.0:8080/api/v1/lunar_daily_altitude\?...
+
+or add profile=<signature> to the query. The request runs under
+cProfile and a JSON response gets a 'profile' list of the functions
+with the most time in them. Other responses get an X-AAI-Profile
+header with the name of the pstats file in AAI_PROFILE_DIR.
+
+Profiled charts are calculated in the request thread, not the compute
+pool, so the profile shows the Bodies and Transforms calls. One
+request is profiled at a time per process.
+
+Without AAI_PROFILE_KEY none of this is registered with the app.
+
+"""
+
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import pstats
+import threading
+import time
+
+import flask
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+header = 'X-AAI-Profile'
+
+profiling_key = None
+profiling_top = 20
+profiling_dir = None
+
+signature_seconds = 600 # a signature is good for this long by default
+
+one_at_a_time = threading.Lock()
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def signature(a_key, a_path, an_expiry=None):
+    """The signature that allows profiling requests to a_path until an_expiry
+
+    Args:
+        a_key (str): AAI_PROFILE_KEY
+        a_path (str): request path, e.g. /api/v1/lunar_daily_altitude
+        an_expiry (int): seconds since the epoch, signature_seconds from now if None
+
+    Returns: str of the expiry and the hex HMAC of the path and expiry
+    """
+
+    if an_expiry is None:
+        an_expiry = int(time.time()) + signature_seconds
+
+    a_message = '{}\n{}'.format(a_path, int(an_expiry))
+
+    return '{}.{}'.format(int(an_expiry), hmac.new(a_key.encode('utf-8'), a_message.encode('utf-8'), hashlib.sha256).hexdigest())
+
+
+def is_requested(a_flask_request):
+    """True if the request carries a valid profile signature that has not expired"""
+
+    a_signature = a_flask_request.headers.get(header, a_flask_request.args.get('profile'))
+
+    if a_signature is None:
+        return False
+
+    try:
+        an_expiry = int(a_signature.partition('.')[0])
+    except ValueError:
+        return False
+
+    if an_expiry < time.time():
+        return False
+
+    return hmac.compare_digest(a_signature, signature(profiling_key, a_flask_request.path, an_expiry))
+
+
+def top_functions(a_profile, a_count):
+    """The functions with the most time in them
+
+    Args:
+        a_profile (cProfile.Profile): a finished profile
+        a_count (int): how many
+
+    Returns: list of dict of function, calls, tottime and cumtime seconds
+    """
+
+    stats = pstats.Stats(a_profile).stats
+
+    hot = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:a_count]
+
+    return [{'function': '{}:{}({})'.format(os.path.basename(filename), line, name),
+             'calls': calls,
+             'tottime': round(tottime, 6),
+             'cumtime': round(cumtime, 6)}
+            for (filename, line, name), (primitive_calls, calls, tottime, cumtime, callers) in hot]
+
+
+def start():
+    """before_request: profile the request if it is signed"""
+
+    if not is_requested(flask.request):
+        return None
+
+    if not one_at_a_time.acquire(False):
+        return None # another request in this process is being profiled
+
+    flask.g.aai_profile = cProfile.Profile()
+
+    try:
+        flask.g.aai_profile.enable()
+    except ValueError: # another profiler is active
+        flask.g.pop('aai_profile')
+        one_at_a_time.release()
+
+    return None
+
+
+def finish(a_response):
+    """after_request: report the profile"""
+
+    a_profile = flask.g.pop('aai_profile', None)
+
+    if a_profile is None:
+        return a_response
+
+    a_profile.disable()
+    one_at_a_time.release()
+
+    if profiling_dir is not None:
+
+        a_flnm = '{}-{}-{}.prof'.format(time.strftime('%Y%m%dT%H%M%S'), os.getpid(), flask.request.endpoint)
+        a_profile.dump_stats(os.path.join(profiling_dir, a_flnm))
+        a_response.headers[header] = a_flnm
+
+    if a_response.mimetype == 'application/json':
+
+        result = json.loads(a_response.get_data())
+
+        if isinstance(result, dict):
+            result['profile'] = top_functions(a_profile, profiling_top)
+            a_response.set_data(json.dumps(result))
+
+    return a_response
+
+
+def is_active():
+    """True if this request is being profiled"""
+
+    return flask.has_request_context() and 'aai_profile' in flask.g
+
+
+def init_app(an_app):
+    """Register the profiling hooks if AAI_PROFILE_KEY is set
+
+    Args:
+        an_app (flask.Flask): the AAI app
+    """
+
+    global profiling_key, profiling_top, profiling_dir
+
+    profiling_key = an_app.config.get('AAI_PROFILE_KEY')
+
+    if not profiling_key:
+        return
+
+    profiling_top = an_app.config.get('AAI_PROFILE_TOP', 20)
+    profiling_dir = an_app.config.get('AAI_PROFILE_DIR')
+
+    if profiling_dir is not None:
+        os.makedirs(profiling_dir, exist_ok=True)
+
+    an_app.before_request(start)
+    an_app.after_request(finish)
+
+    return
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Limits concurrent API requests by cost class
+
+The API endpoints have very different costs. dms2dec takes
+microseconds while lunar_daily_altitude evaluates the sun and moon
+hundreds of times. Each endpoint is put in a cost class and each class
+has its own concurrency limit so a flood of charts cannot take the
+threads the conversions need.
+
+A request that cannot get a slot in its class within the class wait
+time is answered at once with 503 Service Unavailable and a
+Retry-After header.
+
+The limits are per gunicorn worker process and only matter with
+threaded workers (config/aai-gunicorn-threaded-config.py). Override
+them in the flask config, for example:
+
+    AAI_COST_CLASSES = {'heavy': {'limit': 2, 'wait': 0, 'retry_after': 10}}
+
+"""
+
+import threading
+
+import flask
+
+import compute
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+# limit: concurrent requests, wait: seconds to wait for a slot,
+# retry_after: seconds for the 503 Retry-After header
+
+default_cost_classes = {'light':    {'limit': 64, 'wait': 5.0, 'retry_after': 1},
+                        'standard': {'limit': 16, 'wait': 1.0, 'retry_after': 2},
+                        'heavy':    {'limit': 4,  'wait': 0,   'retry_after': 5}}
+
+# endpoints not listed are standard
+
+route_costs = {'api.dms2dec': 'light',
+               'api.dec2dms': 'light',
+               'api.datetime2juliandate': 'light',
+               'api.juliandatec2datetime': 'light',
+               'api.standardize': 'light',
+               'api.standardize_log': 'heavy',
+               'api.solar_daily_altitude': 'heavy',
+               'api.lunar_daily_altitude': 'heavy',
+               'api.lunar_daily_altitudes': 'heavy'}
+
+cost_classes = dict()
+slots = dict()
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def cost_class(an_endpoint):
+    """The cost class of a flask endpoint name, e.g. api.dms2dec"""
+
+    return route_costs.get(an_endpoint, 'standard')
+
+
+def service_unavailable(a_message, a_retry_after):
+    """503 response in the API's JSON format
+
+    Args:
+        a_message (str): reason for the errors list
+        a_retry_after (int): seconds for the Retry-After header
+
+    Returns: flask.Response
+    """
+
+    response = flask.jsonify(errors=[a_message])
+    response.status_code = 503
+    response.headers['Retry-After'] = str(a_retry_after)
+
+    return response
+
+
+def acquire():
+    """before_request: take a slot in the request's cost class"""
+
+    endpoint = flask.request.endpoint
+
+    if endpoint is None or not endpoint.startswith('api.'):
+        return None
+
+    a_class = cost_class(endpoint)
+
+    if cost_classes[a_class]['wait'] > 0:
+        acquired = slots[a_class].acquire(True, cost_classes[a_class]['wait'])
+    else:
+        acquired = slots[a_class].acquire(False)
+
+    if not acquired:
+        return service_unavailable('{} busy: too many {} requests'.format(endpoint, a_class),
+                                   cost_classes[a_class]['retry_after'])
+
+    flask.g.cost_class = a_class
+
+    return None
+
+
+def release(an_exception=None):
+    """teardown_request: give back the request's slot"""
+
+    a_class = flask.g.pop('cost_class', None)
+
+    if a_class is not None:
+        slots[a_class].release()
+
+    return
+
+
+def compute_busy(an_error):
+    """Error handler for a full compute queue"""
+
+    return service_unavailable(str(an_error), cost_classes['heavy']['retry_after'])
+
+
+def init_app(an_app):
+    """Create the cost class slots from the flask config
+
+    Args:
+        an_app (flask.Flask): the AAI app
+    """
+
+    cost_classes.clear()
+    slots.clear()
+
+    for a_class, defaults in default_cost_classes.items():
+        cost_classes[a_class] = dict(defaults)
+        cost_classes[a_class].update(an_app.config.get('AAI_COST_CLASSES', dict()).get(a_class, dict()))
+        slots[a_class] = threading.BoundedSemaphore(cost_classes[a_class]['limit'])
+
+    an_app.before_request(acquire)
+    an_app.teardown_request(release)
+    an_app.register_error_handler(compute.Busy, compute_busy)
+
+    return
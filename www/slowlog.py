@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Logs slow API requests so they can be replayed
+
+The access log has the time of each request but only its raw URL and
+no POST body, too little to reproduce a slow case like a high latitude
+observer where the rise and set raise. Set a file and a threshold in
+the flask config:
+
+    AAI_SLOW_LOG = '/opt/starbug.com/logs/aai-slow.jsonl'
+    AAI_SLOW_SECONDS = 1.0  # default
+
+and every API request that takes longer is appended as a JSON line:
+
+    {"method": "GET",
+     "path": "/api/v1/lunar_daily_altitude?date=...&latitude=78&...",
+     "body": null,
+     "route": "/api/v1/lunar_daily_altitude",
+     "params": {"date": "2017-12-11", "latitude": "78", ...},
+     "status": 200,
+     "seconds": 1.42,
+     "stages": {"parse": 0.0001, "ephemeris": 1.1, ...},
+     "errors": ["..."],
+     "pid": 1234,
+     "time": "2018-01-11T10:14:56"}
+
+path has the parameters in a canonical order, so the same request
+always logs the same path. stages are the metrics.py stages of this
+request; a chart calculated in the compute pool shows as compute.
+errors are those the API answered with. The file replays as it is:
+
+    ./bin/pylaunch.sh loadtest.py --replay /opt/starbug.com/logs/aai-slow.jsonl
+
+Without AAI_SLOW_LOG nothing is registered with the app.
+
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import urllib.parse
+
+import flask
+
+import metrics
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+slow_log = None
+slow_seconds = 1.0
+
+prefix = '/api/' # only API requests are logged
+
+write_lock = threading.Lock()
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def canonical_path(a_flask_request):
+    """The request path with its parameters sorted
+
+    Args:
+        a_flask_request (werkzeug.local.LocalProxy): reference to the flask request object
+
+    Returns: str
+    """
+
+    params = sorted(a_flask_request.args.items(multi=True))
+
+    if not params:
+        return a_flask_request.path
+
+    return '{}?{}'.format(a_flask_request.path, urllib.parse.urlencode(params))
+
+
+def request_body(a_flask_request):
+    """The request body, parsed if it is JSON, None if empty"""
+
+    body = a_flask_request.get_data(as_text=True)
+
+    if not body:
+        return None
+
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body
+
+
+def response_errors(a_response):
+    """The errors list of a JSON API response, if any"""
+
+    if a_response.mimetype != 'application/json':
+        return list()
+
+    try:
+        result = json.loads(a_response.get_data())
+    except ValueError:
+        return list()
+
+    if not isinstance(result, dict):
+        return list()
+
+    return result.get('errors', list())
+
+
+def entry(a_flask_request, a_response, seconds):
+    """The log entry of a slow request
+
+    Args:
+        a_flask_request (werkzeug.local.LocalProxy): reference to the flask request object
+        a_response (flask.Response): its response
+        seconds (float): how long it took
+
+    Returns: dict, see the module doc
+    """
+
+    return {'method': a_flask_request.method,
+            'path': canonical_path(a_flask_request),
+            'body': request_body(a_flask_request) if not a_response.is_streamed else None, # still being read
+            'route': a_flask_request.url_rule.rule if a_flask_request.url_rule is not None else None,
+            'params': a_flask_request.args.to_dict(flat=True),
+            'status': a_response.status_code,
+            'seconds': round(seconds, 6),
+            'stages': dict((a_stage, round(s, 6)) for a_stage, s in metrics.request_stage_seconds().items()),
+            'errors': response_errors(a_response),
+            'pid': os.getpid(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def write(an_entry):
+    """Append an entry to the slow log"""
+
+    try:
+        with write_lock:
+            with open(slow_log, 'a') as a_file:
+                a_file.write(json.dumps(an_entry, sort_keys=True) + '\n')
+
+    except (IOError, OSError) as err:
+        logging.warning('AAI slow request not logged to %s: %s', slow_log, err)
+
+    return
+
+
+# ----------------------------
+# ----- request handlers -----
+# ----------------------------
+
+
+def start_timer():
+    """before_request: note the start time"""
+
+    flask.g.slowlog_start = time.perf_counter()
+
+    return None
+
+
+def capture(a_response):
+    """after_request: log the request if it was slow"""
+
+    start = flask.g.pop('slowlog_start', None)
+
+    if start is None or not flask.request.path.startswith(prefix):
+        return a_response
+
+    seconds = time.perf_counter() - start
+
+    if seconds >= slow_seconds:
+        write(entry(flask.request, a_response, seconds))
+
+    return a_response
+
+
+def init_app(an_app):
+    """Register the slow request hooks if AAI_SLOW_LOG is set
+
+    Args:
+        an_app (flask.Flask): the AAI app
+    """
+
+    global slow_log, slow_seconds
+
+    slow_log = an_app.config.get('AAI_SLOW_LOG')
+
+    if slow_log is None:
+        return
+
+    slow_seconds = an_app.config.get('AAI_SLOW_SECONDS', 1.0)
+
+    if os.path.dirname(slow_log):
+        os.makedirs(os.path.dirname(slow_log), exist_ok=True)
+
+    an_app.before_request(start_timer)
+    an_app.after_request(capture)
+
+    return
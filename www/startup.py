@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Import and start up time of the AAI app with budgets
+
+A worker that imports the app should not load charts.py, the Bodies
+or the Transforms it does not need to parse a request. They are
+imported by the first request that uses them, or by compute.preload
+in the compute pool. The targets fail if any of them is imported at
+start up. Uses the runner in Transforms/startup.py.
+
+To run (in the www directory):
+
+    ./bin/pylaunch.sh startup.py
+    ./bin/pylaunch.sh startup.py -k factory --top 30
+
+"""
+
+import os
+import sys
+
+import Transforms.startup
+
+
+# ===================
+# ===== targets =====
+# ===================
+
+www_dir = os.path.dirname(os.path.abspath(__file__))
+
+deferred = ('bulk',
+            'charts',
+            'Bodies.MoonPosition',
+            'Bodies.SunPosition',
+            'Transforms.EclipticEquatorial',
+            'Transforms.EquatorialHorizon',
+            'Transforms.SiderealTime',
+            'numpy')
+
+# see Transforms.startup.targets
+
+targets = {
+    'aai': {'statement': 'import aai',
+            'budget_ms': 500,
+            'deferred': deferred,
+            'cwd': www_dir},
+
+    'aai.factory': {'statement': "import aai; aai.factory('config/aai-flask-testing-config.py')",
+                    'budget_ms': 600,
+                    'deferred': deferred,
+                    'cwd': www_dir},
+}
+
+
+# ================
+# ===== main =====
+# ================
+
+if __name__ == '__main__':
+    sys.exit(Transforms.startup.main(targets, a_description='AAI app start up time'))
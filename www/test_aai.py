@@ -16,10 +16,34 @@ http://flask.pocoo.org/docs/0.12/api/#test-client
 
 """
 
+import csv
 import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
 
 import aai
+import charts
+import compute
+import formats
+import loadtest
+import metrics
+import preload
+import profiling
+import scheduler
+import slowlog
+import startup
+import tracing
+import utils
+
+import Transforms.Refraction
+import Transforms.startup
 
 aai_instance = aai.factory('config/aai-flask-testing-config.py')
 
@@ -109,6 +133,43 @@ class AAITests(unittest.TestCase):
         return
 
 
+    def test_standardize_range(self):
+        """Test standardize latitude and minutes out of range"""
+
+        response = self.app.get('/api/v1/standardize?latitude=91&longitude=-122:60')
+
+        self.assertEqual(200, response.status_code)
+
+        jresp = json.loads(response.data)
+
+        self.assertEqual(2, len(jresp['errors']))
+        self.assertEqual(u'latitude out of range [-90.0, 90.0]: 91', jresp['errors'][0])
+        self.assertEqual(u'longitude minutes out of range [0, 60): -122:60', jresp['errors'][1])
+
+        return
+
+
+    def test_standardize_longitude_dec_range(self):
+        """Longitude 0 to 360 east and a declination within 90 degrees"""
+
+        response = self.app.get('/api/v1/standardize?longitude=237:54&dec=-91')
+
+        jresp = json.loads(response.data)
+
+        self.assertEqual([u'dec out of range [-90.0, 90.0]: -91'], jresp['errors'])
+        self.assertAlmostEqual(237.9, float(jresp['params']['longitude']))
+
+        response = self.app.get('/api/v1/standardize?longitude=-181')
+
+        self.assertEqual([u'longitude out of range [-180.0, 360.0]: -181'], json.loads(response.data)['errors'])
+
+        response = self.app.get('/api/v1/dec2dms?dec=123.5') # any angle
+
+        self.assertEqual([], json.loads(response.data)['errors'])
+
+        return
+
+
 
     # ----- dec2dms -----
 
@@ -287,6 +348,150 @@ class AAITests(unittest.TestCase):
 
         return
 
+
+    def test_standardize_log_csv(self):
+        """Test standardize a CSV log with a bad row, a chunk at a time"""
+
+        log = '\n'.join(['latitude,longitude,date,time,timezone,ra,dec,foo',
+                         '37:30:45,-122:45:30,2018-01-11,10:14:56,-8,6:30:30,10:30:45,bar',
+                         '91,-122:45:30,,,,,,',
+                         '37:30,-122:45:30.1,2018-08-21,13:45,-8,6:30,10,']) + '\n'
+
+        aai_instance.config['AAI_BULK_CHUNK_ROWS'] = 2
+
+        try:
+            response = self.app.post('/api/v1/standardize', data=log, content_type='text/csv')
+        finally:
+            del aai_instance.config['AAI_BULK_CHUNK_ROWS']
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('text/csv', response.mimetype)
+
+        rows = list(csv.reader(response.get_data(as_text=True).splitlines()))
+
+        self.assertEqual(['row', 'iso8601', 'alt', 'az', 'dec', 'latitude', 'longitude', 'ra', 'errors', 'warnings'], rows[0])
+        self.assertEqual(4, len(rows))
+
+        self.assertEqual('1', rows[1][0])
+        self.assertEqual('2018-01-11T10:14:56.0-0800', rows[1][1])
+        self.assertAlmostEqual(37.5125, float(rows[1][5]))
+        self.assertAlmostEqual(-122.758333333, float(rows[1][6]))
+        self.assertEqual('', rows[1][8])
+        self.assertEqual('Unsupported standard type foo: bar', rows[1][9])
+
+        self.assertEqual('2', rows[2][0])
+        self.assertEqual('latitude out of range [-90.0, 90.0]: 91', rows[2][8])
+        self.assertEqual('Incomplete datetime key set; Unsupported standard type foo: ', rows[2][9])
+
+        self.assertEqual('3', rows[3][0])
+        self.assertAlmostEqual(6.5, float(rows[3][7]))
+
+        return
+
+
+    def test_standardize_log_azalt(self):
+        """Test standardize a JSON lines log with az/alt as the GET"""
+
+        query = 'latitude=37:30:45&longitude=-122:45:30&date=2018-01-11&time=10%3A14%3A56&timezone=-8&az=12:15:30&alt=-6:15'
+
+        expected = json.loads(self.app.get('/api/v1/standardize?azalt=true&' + query).data)
+
+        log = '\n'.join([json.dumps({'latitude': '37:30:45', 'longitude': '-122:45:30', 'date': '2018-01-11',
+                                     'time': '10:14:56', 'timezone': '-8', 'az': '12:15:30', 'alt': '-6:15'}),
+                         '',
+                         '[1, 2]',
+                         json.dumps({'latitude': 37.5, 'longitude': -122, 'az': '12:60', 'alt': 10})])
+
+        response = self.app.post('/api/v1/standardize?azalt=true', data=log, content_type='application/x-ndjson')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/x-ndjson', response.mimetype)
+
+        rows = [json.loads(a_line) for a_line in response.get_data(as_text=True).splitlines()]
+
+        self.assertEqual([1, 2, 3], [a_row['row'] for a_row in rows])
+
+        self.assertEqual([], rows[0]['errors'])
+        self.assertAlmostEqual(float(expected['params']['ra']), rows[0]['params']['ra'], places=6)
+        self.assertAlmostEqual(float(expected['params']['dec']), rows[0]['params']['dec'], places=5)
+        self.assertEqual(expected['params']['iso8601'], rows[0]['params']['iso8601'])
+
+        self.assertEqual(['not a JSON object: [1, 2]'], rows[1]['errors'])
+
+        self.assertEqual(['az minutes out of range [0, 60): 12:60', 'Incomplete az alt key set'], rows[2]['errors'])
+        self.assertEqual(37.5, rows[2]['params']['latitude'])
+
+        return
+
+
+    def test_standardize_log_content_type(self):
+        """Test standardize a log that is not CSV or JSON lines"""
+
+        response = self.app.post('/api/v1/standardize', data='latitude=37', content_type='text/plain')
+
+        self.assertEqual(415, response.status_code)
+        self.assertIn('unsupported content type text/plain', json.loads(response.data)['errors'][0])
+
+        return
+
+
+    # ----------------------
+    # ----- date times -----
+    # ----------------------
+
+
+    def test_parse_timezone(self):
+        """Test time zone offsets, fractional and out of range"""
+
+        self.assertEqual(-8.0, utils.parse_timezone('-8'))
+        self.assertEqual(-8.0, utils.parse_timezone('-08:00'))
+        self.assertEqual(5.5, utils.parse_timezone('+05:30'))
+        self.assertEqual(5.75, utils.parse_timezone(' 0545')) # an unescaped + in a query string
+        self.assertEqual(-9.5, utils.parse_timezone('-0930'))
+        self.assertEqual(0.0, utils.parse_timezone('Z'))
+
+        for a_timezone in ('+15', '-13', '-08:60', 'PST', '-8abc'):
+            with self.assertRaises(utils.Error):
+                utils.parse_timezone(a_timezone)
+
+        self.assertEqual('-08:00', utils.offset2timezone(-8))
+        self.assertEqual('+05:30', utils.offset2timezone(5.5))
+        self.assertEqual('-00:30', utils.offset2timezone(-0.5))
+
+        return
+
+
+    def test_parse_iso8601_fields(self):
+        """Test ISO 8601 datetimes"""
+
+        self.assertEqual((2018, 1, 11, 10, 14, 56.125, -8.0), utils.parse_iso8601_fields('2018-01-11T10:14:56.125-08:00'))
+        self.assertEqual((2018, 1, 11, 18, 14, 0.0, 0.0), utils.parse_iso8601_fields('2018-01-11 18:14Z'))
+        self.assertEqual((2019, 12, 26, 12, 0, 0.0, 5.5), utils.parse_iso8601_fields('2019-12-26T12:00:00+0530'))
+
+        self.assertEqual(utils.parse_datetime_fields('2018-01-11', '10:14:56.125', '-8'),
+                         utils.parse_iso8601_fields('2018-01-11T10:14:56.125-08'))
+
+        for a_datetime in ('2018-01-11T10:14:56', '2018-13-11T10:14Z', '2019-02-29T10:14Z', '2018-01-11T24:00Z', '2018-01-11'):
+            with self.assertRaises(utils.Error):
+                utils.parse_iso8601_fields(a_datetime)
+
+        return
+
+
+    def test_datetime_param(self):
+        """Test datetime= is the same as date, time and timezone"""
+
+        fields = json.loads(self.app.get('/api/v1/datetime2juliandate?date=2019-12-26&time=12%3A00&timezone=%2B05%3A30').data)
+        iso8601 = json.loads(self.app.get('/api/v1/datetime2juliandate?datetime=2019-12-26T12%3A00%2B05%3A30').data)
+
+        self.assertEqual([], iso8601['errors'])
+        self.assertEqual(fields['iso8601'], iso8601['iso8601'])
+        self.assertEqual('+05:30', iso8601['timezone'])
+        self.assertAlmostEqual(2458843.77083333, iso8601['juliandate'])
+
+        return
+
+
     # ----- radec2azalt -----
 
 
@@ -305,6 +510,27 @@ class AAITests(unittest.TestCase):
 
         return
 
+
+    def test_radec2azalt_refraction(self):
+        """radec2azalt apparent altitude for a temperature and pressure"""
+        a_query = '/api/v1/radec2azalt?latitude=37&longitude=-122&date=2018-01-11&time=10%3A14%3A56&timezone=-8&ra=6&dec=20'
+
+        geometric = json.loads(self.app.get(a_query).data)
+        standard = json.loads(self.app.get(a_query + '&temperature=10').data)
+        cold = json.loads(self.app.get(a_query + '&temperature=-20&pressure=1030').data)
+
+        self.assertEqual([], standard[u'errors'])
+        self.assertAlmostEqual(geometric[u'azimuth'], standard[u'azimuth'])
+        self.assertAlmostEqual(Transforms.Refraction.toApparent(geometric[u'altitude']), standard[u'altitude'])
+        self.assertGreater(cold[u'altitude'], standard[u'altitude'])
+
+        out_of_bounds = json.loads(self.app.get(a_query + '&pressure=2000').data)
+
+        self.assertEqual(u'pressure out of range [0, 1100]: 2000', out_of_bounds[u'errors'][0])
+        self.assertNotIn(u'altitude', out_of_bounds)
+
+        return
+
     # ----- azalt2radec -----
 
     def test_azalt2radec_2018_01_11(self):
@@ -429,5 +655,716 @@ class AAITests(unittest.TestCase):
         return
 
 
+    def test_solar_daily_altitude_f32(self):
+        """sun daily solar altitude as packed float32"""
+        json_response = self.app.get('/api/v1/solar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08')
+        response = self.app.get('/api/v1/solar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08&format=f32')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/x-aai-f32', response.mimetype)
+        self.assertLess(len(response.data), len(json_response.data))
+
+        json_data = json.loads(json_response.data)
+        position_data = formats.unpack(response.data)
+
+        self.assertEqual(json_data[u'sun_marker_azimuth'], position_data[u'sun_marker_azimuth'])
+        self.assertEqual(len(json_data[u'altitude_data_24h']), len(position_data[u'altitude_data_24h']))
+
+        for json_row, f32_row in zip(json_data[u'altitude_data_24h'], position_data[u'altitude_data_24h']):
+            for json_value, f32_value in zip(json_row, f32_row):
+                self.assertAlmostEqual(json_value, f32_value, places=4)
+
+        return
+
+
+    def test_solar_daily_altitude_bad_format(self):
+        """sun daily solar altitude unsupported format"""
+        response = self.app.get('/api/v1/solar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08&format=xml')
+
+        self.assertEqual(200, response.status_code)
+
+        position_data = json.loads(response.data)
+
+        self.assertEqual(u'unsupported format xml', position_data[u'errors'][0])
+
+        return
+
+
+    def test_solar_daily_altitude_resolution(self):
+        """sun daily solar altitude an hour apart"""
+        response = self.app.get('/api/v1/solar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08&resolution=60')
+
+        self.assertEqual(200, response.status_code)
+
+        position_data = json.loads(response.data)
+
+        self.assertEqual([], position_data[u'errors'])
+        self.assertEqual(60, position_data[u'resolution'])
+        self.assertEqual(25, len(position_data[u'altitude_data_24h']))
+        self.assertAlmostEqual(24, position_data[u'altitude_data_24h'][-1][0])
+
+        return
+
+
+    def test_solar_daily_altitude_resolution_bounds(self):
+        """sun daily solar altitude resolution out of bounds"""
+        response = self.app.get('/api/v1/solar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08&resolution=0.1')
+
+        self.assertEqual(200, response.status_code)
+
+        position_data = json.loads(response.data)
+
+        self.assertEqual(u'resolution out of range [1, 60]: 0.1', position_data[u'errors'][0])
+        self.assertNotIn(u'altitude_data_24h', position_data)
+
+        return
+
+
+    def test_solar_daily_altitude_adaptive(self):
+        """sun daily solar altitude adaptive within tolerance of the minute chart"""
+        minutes = json.loads(self.app.get('/api/v1/solar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08&resolution=1').data)
+        adaptive = json.loads(self.app.get('/api/v1/solar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08&resolution=adaptive&tolerance=0.1').data)
+
+        self.assertEqual([], adaptive[u'errors'])
+        self.assertEqual(u'adaptive', adaptive[u'resolution'])
+        self.assertEqual(0.1, adaptive[u'tolerance'])
+        self.assertLess(len(adaptive[u'altitude_data_24h']), len(minutes[u'altitude_data_24h'])/4)
+
+        times = [row[0] for row in adaptive[u'altitude_data_24h']]
+
+        self.assertEqual(sorted(times), times)
+
+        for row in minutes[u'altitude_data_24h']:
+
+            i = max(1, next(i for i, t in enumerate(times) if t >= row[0]))
+            a, b = adaptive[u'altitude_data_24h'][i - 1], adaptive[u'altitude_data_24h'][i]
+            fraction = (row[0] - a[0])/(b[0] - a[0])
+
+            for c in range(1, len(row)):
+                self.assertLess(abs(a[c] + fraction*(b[c] - a[c]) - row[c]), 0.11) # checked at midpoints
+
+        return
+
+
+    def test_adaptive_samples(self):
+        """adaptive samples are dense where the curve bends"""
+        samples = charts.adaptive_samples(lambda days: [math.hypot(1, 100*(days - 0.5))], 0.05) # bends at noon
+
+        self.assertEqual(0, samples[0][0])
+        self.assertEqual(1, samples[-1][0])
+
+        steps = [b[0] - a[0] for a, b in zip(samples[:-1], samples[1:])]
+
+        # finest at the turning points, coarsest where the curve is straight
+        self.assertLess(min(steps), 10/1440.0)
+        self.assertAlmostEqual(60/1440.0, max(steps))
+
+        return
+
+
+    # --------------------------------
+    # ----- lunar daily altitude -----
+    # --------------------------------
+
+    def test_lunar_daily_altitude_eclipse_2017_08_21(self):
+        """lunar daily altitude for the 2017 aug 21 eclipse"""
+        response = self.app.get('/api/v1/lunar_daily_altitude?latitude=37:24:01&longitude=-122:04:56&date=2017-08-21&time=09%3A00&timezone=-08:00')
+
+        self.assertEqual('200 OK', response.status)
+        self.assertEqual(200, response.status_code)
+
+        position_data = json.loads(response.data)
+
+        self.assertEqual(0, len(position_data['errors']))
+        self.assertEqual(24*4, len(position_data['daily_sun_altitude']))
+        self.assertEqual(24*4, len(position_data['daily_moon_altitude']))
+        self.assertEqual([i/4.0 for i in range(1, 24*4 + 1)], position_data['daily_time'])
+
+        return
+
+
+    def test_lunar_daily_altitude_adaptive(self):
+        """lunar daily altitude adaptive within tolerance of the minute chart, with the time of each point"""
+        query = '/api/v1/lunar_daily_altitude?latitude=37:24:01&longitude=-122:04:56&date=2017-08-21&time=09%3A00&timezone=-08:00'
+
+        minutes = json.loads(self.app.get(query + '&resolution=1').data)
+        adaptive = json.loads(self.app.get(query + '&resolution=adaptive&tolerance=0.1').data)
+
+        self.assertEqual([], adaptive[u'errors'])
+        self.assertEqual(u'adaptive', adaptive[u'resolution'])
+        self.assertEqual(0.1, adaptive[u'tolerance'])
+        self.assertLess(len(adaptive[u'daily_moon_altitude']), len(minutes[u'daily_moon_altitude'])/4)
+
+        times = adaptive[u'daily_time']
+
+        self.assertEqual(len(adaptive[u'daily_moon_altitude']), len(times))
+        self.assertEqual(len(adaptive[u'daily_sun_altitude']), len(times))
+        self.assertEqual(sorted(set(times)), times)
+        self.assertLess(0, times[0]) # a step after 0, as at a fixed resolution
+        self.assertEqual(24.0, times[-1])
+
+        for t, moon_altitude in zip(minutes[u'daily_time'], minutes[u'daily_moon_altitude']):
+
+            if t < times[0]:
+                continue
+
+            i = max(1, next(i for i, a_time in enumerate(times) if a_time >= t))
+            a, b = adaptive[u'daily_moon_altitude'][i - 1], adaptive[u'daily_moon_altitude'][i]
+            fraction = (t - times[i - 1])/(times[i] - times[i - 1])
+
+            self.assertLess(abs(a + fraction*(b - a) - moon_altitude), 0.11) # checked at midpoints
+
+        return
+
+
+    def test_lunar_daily_altitudes_scenarios(self):
+        """lunar daily altitudes for several scenarios in one request"""
+
+        scenarios = [{'latitude': '37:24:01', 'longitude': '-122:04:56',
+                      'date': '2017-08-21', 'time': '09:00', 'timezone': '-08:00'},
+                     {'latitude': '24', 'longitude': '102',
+                      'date': '2019-12-26', 'time': '12:00', 'timezone': '+07:00'},
+                     {'latitude': 'bad', 'longitude': '102',
+                      'date': '2019-12-26', 'time': '12:00', 'timezone': '+07:00'}]
+
+        response = self.app.post('/api/v1/lunar_daily_altitudes', data=json.dumps({'scenarios': scenarios}),
+                                 content_type='application/json')
+
+        self.assertEqual('200 OK', response.status)
+        self.assertEqual(200, response.status_code)
+
+        charts = json.loads(response.data)
+
+        self.assertEqual(0, len(charts['errors']))
+        self.assertEqual(3, len(charts['scenarios']))
+
+        single = json.loads(self.app.get('/api/v1/lunar_daily_altitude?latitude=24&longitude=102&date=2019-12-26&time=12%3A00&timezone=%2B07:00').data)
+
+        self.assertEqual(0, len(charts['scenarios'][1]['errors']))
+        self.assertEqual(single['daily_moon_altitude'], charts['scenarios'][1]['daily_moon_altitude'])
+        self.assertEqual(single['moon_rising'], charts['scenarios'][1]['moon_rising'])
+
+        self.assertEqual([u'unsupported format for latitude: bad'], charts['scenarios'][2]['errors'])
+
+        return
+
+
+    def test_lunar_daily_altitudes_not_json(self):
+        """lunar daily altitudes without a scenarios list"""
+
+        response = self.app.post('/api/v1/lunar_daily_altitudes', data='latitude=37')
+
+        self.assertEqual(200, response.status_code)
+
+        charts = json.loads(response.data)
+
+        self.assertEqual([u'expected JSON object with a scenarios list'], charts['errors'])
+
+        return
+
+
+    # ------------------------
+    # ----- cost classes -----
+    # ------------------------
+
+    def test_cost_classes(self):
+        """Test charts and conversions are in separate cost classes"""
+
+        self.assertEqual('light', scheduler.cost_class('api.dms2dec'))
+        self.assertEqual('standard', scheduler.cost_class('api.radec2azalt'))
+        self.assertEqual('heavy', scheduler.cost_class('api.lunar_daily_altitude'))
+
+        return
+
+
+    def test_heavy_class_full(self):
+        """Test a full heavy class answers 503 with Retry-After"""
+
+        limit = scheduler.cost_classes['heavy']['limit']
+
+        for i in range(limit):
+            scheduler.slots['heavy'].acquire()
+
+        try:
+            response = self.app.get('/api/v1/solar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08')
+            light_response = self.app.get('/api/v1/dms2dec?dms=45')
+        finally:
+            for i in range(limit):
+                scheduler.slots['heavy'].release()
+
+        self.assertEqual(503, response.status_code)
+        self.assertEqual(str(scheduler.cost_classes['heavy']['retry_after']), response.headers['Retry-After'])
+        self.assertEqual(1, len(json.loads(response.data)['errors']))
+
+        self.assertEqual(200, light_response.status_code)
+
+        return
+
+
+
+    # -------------------
+    # ----- metrics -----
+    # -------------------
+
+    def test_metrics(self):
+        """request counts and stage timers"""
+        self.app.get('/api/v1/solar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08&resolution=60')
+
+        response = self.app.get('/metrics')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('text/plain', response.mimetype)
+
+        lines = response.data.decode('utf-8').splitlines()
+
+        self.assertIn('# TYPE aai_request_seconds histogram', lines)
+        self.assertTrue(any(line.startswith('aai_requests_total{endpoint="api.solar_daily_altitude",status="200"} ') for line in lines))
+        self.assertTrue(any(line.startswith('aai_request_seconds_bucket{endpoint="api.solar_daily_altitude",le="+Inf"} ') for line in lines))
+
+        for a_stage in ('parse', 'ephemeris', 'transform', 'serialize'):
+            self.assertTrue(any(line.startswith('aai_stage_seconds_count{{stage="{}"}} '.format(a_stage)) for line in lines))
+
+        return
+
+
+    def test_metrics_workers(self):
+        """metrics add up over the processes' files"""
+        metrics_dir = tempfile.mkdtemp()
+
+        with open(os.path.join(metrics_dir, 'metrics-1-1.json'), 'w') as a_file:
+            json.dump({'counters': [['aai_requests_total', [['endpoint', 'api.worker'], ['status', '200']], 3]],
+                       'histograms': []}, a_file)
+
+        metrics.metrics_dir = metrics_dir
+
+        try:
+            self.app.get('/api/v1/dms2dec?dms=45')
+            total_counters, total_histograms = metrics.collect()
+        finally:
+            metrics.metrics_dir = None
+            shutil.rmtree(metrics_dir)
+
+        self.assertEqual(3, total_counters[('aai_requests_total', (('endpoint', 'api.worker'), ('status', '200')))])
+        self.assertLessEqual(1, total_counters[('aai_requests_total', (('endpoint', 'api.dms2dec'), ('status', '200')))])
+
+        return
+
+
+    def test_metrics_dead_process(self):
+        """a process writes its metrics when it exits and its file is adopted after"""
+        metrics_dir = tempfile.mkdtemp()
+
+        a_child = ('import metrics\n'
+                   'metrics.metrics_dir = {!r}\n'
+                   'metrics.reset()\n'
+                   'metrics.flush_at_exit()\n'
+                   'metrics.flush(force=True)\n'
+                   'metrics.increment("aai_requests_total", (("endpoint", "api.exited"), ("status", "200")), 2)\n').format(metrics_dir)
+
+        metrics.metrics_dir = metrics_dir
+
+        try:
+            subprocess.check_call([sys.executable, '-c', a_child], cwd=os.path.dirname(os.path.abspath(__file__)))
+
+            (a_flnm,) = os.listdir(metrics_dir)
+
+            with open(os.path.join(metrics_dir, a_flnm)) as a_file:
+                self.assertEqual(2, json.load(a_file)['counters'][0][2]) # not the 0 of the first flush
+
+            total_counters, total_histograms = metrics.collect()
+
+            self.assertEqual([metrics.owner['name']], os.listdir(metrics_dir))
+            self.assertEqual(2, total_counters[('aai_requests_total', (('endpoint', 'api.exited'), ('status', '200')))])
+
+            total_counters, total_histograms = metrics.collect() # counted once
+
+            self.assertEqual(2, total_counters[('aai_requests_total', (('endpoint', 'api.exited'), ('status', '200')))])
+
+        finally:
+            metrics.metrics_dir = None
+            metrics.reset()
+            shutil.rmtree(metrics_dir)
+
+        return
+
+
+    def test_metrics_flush_threads(self):
+        """flushes from several threads, as a scrape and the requests of a gthread worker, write whole files"""
+        metrics_dir = tempfile.mkdtemp()
+
+        metrics.metrics_dir = metrics_dir
+
+        def flusher():
+            for i in range(50):
+                metrics.increment('aai_requests_total', (('endpoint', 'api.threads'), ('status', '200')))
+                metrics.flush(force=True)
+
+        try:
+            metrics.reset()
+
+            threads = [threading.Thread(target=flusher) for i in range(8)]
+
+            for a_thread in threads:
+                a_thread.start()
+
+            for a_thread in threads:
+                a_thread.join()
+
+            self.assertEqual([metrics.owner['name']], os.listdir(metrics_dir))
+
+            with open(os.path.join(metrics_dir, metrics.owner['name'])) as a_file:
+                self.assertEqual(400, json.load(a_file)['counters'][0][2])
+
+        finally:
+            metrics.metrics_dir = None
+            metrics.reset()
+            shutil.rmtree(metrics_dir)
+
+        return
+
+
+
+    # ---------------------
+    # ----- profiling -----
+    # ---------------------
+
+    def profiled_client(self):
+        """A test client of an app with AAI_PROFILE_KEY set"""
+
+        config_dir = tempfile.mkdtemp()
+        config_flnm = os.path.join(config_dir, 'aai-flask-profiling-config.py')
+
+        with open('config/aai-flask-testing-config.py') as a_file:
+            config = a_file.read()
+
+        with open(config_flnm, 'w') as a_file:
+            a_file.write(config + '\nAAI_PROFILE_KEY = {!r}\n'.format('a profiling test key'))
+
+        try:
+            an_app = aai.factory(config_flnm)
+        finally:
+            shutil.rmtree(config_dir)
+
+        self.addCleanup(setattr, profiling, 'profiling_key', None)
+
+        return an_app.test_client(), an_app.config['AAI_PROFILE_KEY']
+
+
+    def test_profile_signed(self):
+        """profile a signed request"""
+        a_client, a_key = self.profiled_client()
+
+        a_signature = profiling.signature(a_key, '/api/v1/solar_daily_altitude')
+
+        response = a_client.get('/api/v1/solar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08&resolution=60',
+                                headers={profiling.header: a_signature})
+
+        self.assertEqual(200, response.status_code)
+
+        position_data = json.loads(response.data)
+
+        self.assertEqual([], position_data[u'errors'])
+        self.assertEqual(aai_instance.config['AAI_PROFILE_TOP'], len(position_data[u'profile']))
+        self.assertEqual(sorted([f[u'tottime'] for f in position_data[u'profile']], reverse=True),
+                         [f[u'tottime'] for f in position_data[u'profile']])
+
+        return
+
+
+    def test_profile_bad_signature(self):
+        """no profile without a valid signature"""
+        a_client, a_key = self.profiled_client()
+
+        a_signature = profiling.signature(a_key, '/api/v1/dec2dms')
+
+        response = a_client.get('/api/v1/dms2dec?dms=45&profile={}'.format(a_signature))
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn(u'profile', json.loads(response.data))
+
+        return
+
+
+    def test_profile_expired_signature(self):
+        """no profile once the signature has expired, nor with its expiry changed"""
+        a_client, a_key = self.profiled_client()
+
+        an_expired = profiling.signature(a_key, '/api/v1/dms2dec', int(time.time()) - 1)
+
+        response = a_client.get('/api/v1/dms2dec?dms=45&profile={}'.format(an_expired))
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn(u'profile', json.loads(response.data))
+
+        a_forged = '{}.{}'.format(int(time.time()) + 3600, an_expired.partition('.')[2])
+
+        response = a_client.get('/api/v1/dms2dec?dms=45&profile={}'.format(a_forged))
+
+        self.assertNotIn(u'profile', json.loads(response.data))
+
+        response = a_client.get('/api/v1/dms2dec?dms=45&profile={}'.format(profiling.signature(a_key, '/api/v1/dms2dec')))
+
+        self.assertIn(u'profile', json.loads(response.data))
+
+        return
+
+
+    def test_profile_no_key(self):
+        """nothing is profiled without AAI_PROFILE_KEY"""
+        self.assertIsNone(aai_instance.config['AAI_PROFILE_KEY'])
+
+        response = self.app.get('/api/v1/dms2dec?dms=45&profile={}'.format(profiling.signature('changeme', '/api/v1/dms2dec')))
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn(u'profile', json.loads(response.data))
+
+        return
+
+
+
+    # --------------------
+    # ----- loadtest -----
+    # --------------------
+
+    def test_loadtest_read_requests(self):
+        """replay access log lines, JSON lines and paths"""
+        a_flnm = os.path.join(tempfile.mkdtemp(), 'aai-access.log')
+
+        with open(a_flnm, 'w') as a_file:
+            a_file.write('127.0.0.1 - - [11/Jan/2018:10:14:56 -0800] "GET /api/v1/dms2dec?dms=45 HTTP/1.1" 200 20 "-" "curl/7.54.0"\n')
+            a_file.write('127.0.0.1 - - [11/Jan/2018:10:14:57 -0800] "GET /static/aai.js HTTP/1.1" 304 - "-" "curl/7.54.0"\n')
+            a_file.write('{"method": "POST", "path": "/api/v1/lunar_daily_altitudes", "body": {"scenarios": []}}\n')
+            a_file.write('/api/v1/dec2dms?dec=45.5\n')
+
+        try:
+            requests = loadtest.read_requests(a_flnm)
+        finally:
+            shutil.rmtree(os.path.dirname(a_flnm))
+
+        self.assertEqual([('GET', '/api/v1/dms2dec?dms=45', None),
+                          ('POST', '/api/v1/lunar_daily_altitudes', '{"scenarios": []}'),
+                          ('GET', '/api/v1/dec2dms?dec=45.5', None)], requests)
+
+        return
+
+
+    def test_loadtest_run(self):
+        """synthetic load through the test client"""
+        report = loadtest.run(loadtest.ClientTarget('config/aai-flask-testing-config.py'),
+                              loadtest.synthetic_requests(20, a_seed=1), a_concurrency=2)
+
+        self.assertEqual(20, report['requests'])
+        self.assertEqual(20, sum(a_route['count'] for a_route in report['routes'].values()))
+        self.assertLessEqual(report['latency']['p50_ms'], report['latency']['p99_ms'])
+
+        table, regressions = loadtest.compare(report, report)
+
+        self.assertEqual([], regressions)
+
+        return
+
+
+    def test_loadtest_errors(self):
+        """A 200 with errors in its JSON is an error, and an empty run formats"""
+
+        a_target = loadtest.ClientTarget('config/aai-flask-testing-config.py')
+
+        self.assertEqual(200, a_target.request('GET', '/api/v1/dms2dec?dms=37:24:01'))
+        self.assertEqual('errors', a_target.request('GET', '/api/v1/dms2dec?dms=37:60'))
+
+        report = loadtest.run(a_target, [('GET', '/api/v1/dms2dec?dms=37:60', None)])
+
+        self.assertEqual(1, report['errors'])
+        self.assertEqual(1, report['routes']['/api/v1/dms2dec']['errors'])
+
+        report['throughput_rps'] = None
+
+        self.assertIn('0.0 requests/s', loadtest.format_report(report))
+        self.assertIn('0 requests', loadtest.format_report(loadtest.run(a_target, [])))
+
+        return
+
+
+    def test_loadtest_compare_empty(self):
+        """An empty run compares with a full one"""
+
+        a_target = loadtest.ClientTarget('config/aai-flask-testing-config.py')
+
+        empty = loadtest.run(a_target, [])
+        full = loadtest.run(a_target, [('GET', '/api/v1/dms2dec?dms=37:24:01', None)])
+
+        table, regressions = loadtest.compare(empty, full)
+
+        self.assertIn('p50_ms', table)
+        self.assertEqual([], regressions)
+
+        table, regressions = loadtest.compare(full, empty)
+
+        self.assertIn('p50_ms', table)
+        self.assertEqual(['all req/s -100.0%'], regressions)
+
+        return
+
+
+    # --------------------
+    # ----- slow log -----
+    # --------------------
+
+    def test_slowlog_replay(self):
+        """slow requests are logged with their stages and replay"""
+        log_dir = tempfile.mkdtemp()
+        config_flnm = os.path.join(log_dir, 'aai-flask-slowlog-config.py')
+        log_flnm = os.path.join(log_dir, 'aai-slow.jsonl')
+
+        with open('config/aai-flask-testing-config.py') as a_file:
+            config = a_file.read()
+
+        with open(config_flnm, 'w') as a_file:
+            a_file.write(config + '\nAAI_SLOW_LOG = {!r}\nAAI_SLOW_SECONDS = 0\n'.format(log_flnm))
+
+        try:
+            a_client = aai.factory(config_flnm).test_client()
+
+            a_client.get('/api/v1/solar_daily_altitude?timezone=-08&longitude=-122&latitude=37&date=2017-12-11&time=14%3A37%3A54&resolution=60')
+            a_client.post('/api/v1/lunar_daily_altitudes',
+                          data=json.dumps({'scenarios': [{'latitude': '89', 'longitude': '0', 'date': '2017-06-21',
+                                                          'time': '12:00', 'timezone': '0'}]}))
+            a_client.get('/')
+
+            with open(log_flnm) as a_file:
+                entries = [json.loads(line) for line in a_file]
+
+            requests = loadtest.read_requests(log_flnm)
+
+        finally:
+            slowlog.slow_log = None
+            shutil.rmtree(log_dir)
+
+        self.assertEqual(2, len(entries)) # not the home page
+
+        self.assertEqual('/api/v1/solar_daily_altitude?date=2017-12-11&latitude=37&longitude=-122&resolution=60&time=14%3A37%3A54&timezone=-08',
+                         entries[0]['path'])
+        self.assertEqual('/api/v1/solar_daily_altitude', entries[0]['route'])
+        self.assertEqual('37', entries[0]['params']['latitude'])
+        self.assertEqual(os.getpid(), entries[0]['pid'])
+        self.assertIn('parse', entries[0]['stages'])
+        self.assertIn('ephemeris', entries[0]['stages'])
+
+        self.assertEqual('POST', entries[1]['method'])
+        self.assertEqual('89', entries[1]['body']['scenarios'][0]['latitude'])
+
+        self.assertEqual([('GET', entries[0]['path'], None), ('POST', entries[1]['path'], json.dumps(entries[1]['body']))],
+                         requests)
+
+        return
+
+
+    # -------------------
+    # ----- tracing -----
+    # -------------------
+
+    def test_tracing(self):
+        """a chart request is one span tree through the bodies and transforms"""
+        trace_dir = tempfile.mkdtemp()
+        config_flnm = os.path.join(trace_dir, 'aai-flask-tracing-config.py')
+
+        with open('config/aai-flask-testing-config.py') as a_file:
+            config = a_file.read()
+
+        with open(config_flnm, 'w') as a_file:
+            a_file.write(config + '\nAAI_TRACE_DIR = {!r}\n'.format(trace_dir))
+
+        try:
+            a_client = aai.factory(config_flnm).test_client()
+
+            response = a_client.get('/api/v1/solar_daily_altitude?latitude=37&longitude=-122&date=2017-12-11&time=14%3A37%3A54&timezone=-08&resolution=60')
+            self.assertEqual(200, response.status_code)
+
+            spans = tracing.read_spans([os.path.join(trace_dir, 'traces-*.jsonl')])
+
+        finally:
+            tracing.trace_dir = None
+            shutil.rmtree(trace_dir)
+
+        roots = [a_span for a_span in spans if not a_span['parent_span_id']]
+
+        self.assertEqual(1, len(roots))
+        self.assertEqual('GET /api/v1/solar_daily_altitude', roots[0]['name'])
+        self.assertEqual(200, roots[0]['attributes']['http.status_code'])
+
+        span_ids = set(a_span['span_id'] for a_span in spans)
+
+        self.assertTrue(all(a_span['parent_span_id'] in span_ids for a_span in spans if a_span is not roots[0]))
+        self.assertEqual(1, len(set(a_span['trace_id'] for a_span in spans)))
+
+        summary = tracing.summarize(spans)
+
+        for a_name in ('utils.parse_angle', 'charts.solar_daily_altitude', 'charts.sun_equatorial',
+                       'Bodies.SunPosition.EquatorialCoords', 'Transforms.EquatorialHorizon.toHorizon', 'formats.respond'):
+            self.assertIn(a_name, summary)
+
+        self.assertEqual(5*25, summary['charts.sun_equatorial']['calls']) # four seasons and the current day, 0 to 24h hourly
+
+        return
+
+
+    # -------------------
+    # ----- preload -----
+    # -------------------
+
+    def test_preload_warm_up(self):
+        """the common requests answer in this process without a pool"""
+        compute.processes = 2
+
+        try:
+            failed = preload.warm_up(aai_instance, preload.default_paths)
+            self.assertEqual(2, compute.processes)
+        finally:
+            compute.processes = 0
+
+        self.assertEqual([], failed)
+        self.assertIsNone(compute.executor)
+
+        return
+
+
+    def test_preload_discard_metrics(self):
+        """the warm up requests are not counted"""
+        metrics_dir = tempfile.mkdtemp()
+        metrics.metrics_dir = metrics_dir
+
+        try:
+            self.app.get('/api/v1/dms2dec?dms=37:24:01')
+            metrics.flush(force=True)
+            self.assertEqual(1, len(os.listdir(metrics_dir)))
+
+            metrics.discard()
+
+            self.assertEqual([], os.listdir(metrics_dir))
+            self.assertEqual(dict(), metrics.counters)
+
+        finally:
+            metrics.metrics_dir = None
+            shutil.rmtree(metrics_dir)
+
+        return
+
+
+    # -------------------
+    # ----- startup -----
+    # -------------------
+
+    def test_startup_deferred(self):
+        """the app starts without the charts and bodies"""
+        for a_name, a_target in startup.targets.items():
+
+            result = Transforms.startup.evaluate(a_target, a_repeat=1)
+
+            self.assertEqual([], result['loaded'], a_name)
+            self.assertIn('api', [a_record['module'] for a_record in result['imports']], a_name)
+
+        return
+
+
 if __name__ == '__main__':
     unittest.main()
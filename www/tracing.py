@@ -0,0 +1,459 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Traces API requests as span trees in a local JSON lines file
+
+Set a directory in the flask config to turn it on:
+
+    AAI_TRACE_DIR = '/tmp/aai-traces'
+    AAI_TRACE_SAMPLE = 0.1       # fraction of requests to trace, default 1
+    AAI_TRACE_MAX_SPANS = 10000  # per trace, the rest are counted, not kept
+
+Each traced request is a root span with a child span for every call
+to the functions in instrumented below: parsing, the charts, each body
+evaluation, each coordinate transform and serializing. The Bodies and
+Transforms functions are wrapped where they are looked up, as module
+and class attributes, so those packages stay free of the web app and
+calls between them, like MoonPosition to EclipticEquatorial, nest.
+
+The spans have the OpenTelemetry field names (trace_id, span_id,
+parent_span_id, name, kind, start_time_unix_nano, end_time_unix_nano,
+attributes, status, resource) and each process appends them, one a
+line, to traces-<pid>.jsonl in the directory. No collector is needed.
+To see which calls take the time:
+
+    ./bin/pylaunch.sh tracing.py /tmp/aai-traces/traces-*.jsonl
+
+Traced charts are calculated in the request thread, not the compute
+pool, like profiled ones. Turning tracing on imports the Bodies and
+Transforms when the app starts, to wrap them.
+
+Without AAI_TRACE_DIR none of this is registered with the app.
+
+"""
+
+import argparse
+import contextlib
+import functools
+import glob
+import importlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import flask
+
+
+# ===================
+# ===== globals =====
+# ===================
+
+# module, attribute path, stage
+
+instrumented = (('utils', 'parse_angle', 'parse'),
+                ('utils', 'parse_datetime', 'parse'),
+                ('utils', 'parse_iso8601', 'parse'),
+                ('formats', 'respond', 'serialize'),
+
+                ('charts', 'solar_daily_altitude', 'chart'),
+                ('charts', 'lunar_daily_altitude', 'chart'),
+                ('charts', 'lunar_daily_altitudes', 'chart'),
+                ('charts', 'get_sun_rise_transit_set', 'chart'),
+                ('charts', 'get_moon_rise_transit_set', 'chart'),
+                ('charts', 'get_sun_azalt', 'chart'),
+                ('charts', 'sun_equatorial', 'ephemeris'),
+                ('charts', 'sun_moon_equatorial', 'ephemeris'),
+                ('charts', 'to_horizon', 'transform'),
+
+                ('Bodies.SunPosition', 'SolarLongitudeRange', 'ephemeris'),
+                ('Bodies.SunPosition', 'EclipticCoords', 'ephemeris'),
+                ('Bodies.SunPosition', 'EquatorialCoords', 'ephemeris'),
+                ('Bodies.SunPosition', 'HorizontalCoords', 'ephemeris'),
+                ('Bodies.SunPosition', 'EquationOfTime', 'ephemeris'),
+                ('Bodies.SunPosition', 'SunRiseAndSet', 'ephemeris'),
+                ('Bodies.SunPosition', 'RiseAndSet', 'ephemeris'),
+                ('Bodies.MoonPosition', 'LunarLongLatRange', 'ephemeris'),
+                ('Bodies.MoonPosition', 'EclipticCoords', 'ephemeris'),
+                ('Bodies.MoonPosition', 'EquatorialCoords', 'ephemeris'),
+                ('Bodies.MoonPosition', 'HorizontalCoords', 'ephemeris'),
+
+                ('Transforms.EclipticEquatorial', 'obliquity', 'transform'),
+                ('Transforms.EclipticEquatorial', 'toEcliptic', 'transform'),
+                ('Transforms.EclipticEquatorial', 'toEquatorial', 'transform'),
+                ('Transforms.EquatorialHorizon', 'toHorizon', 'transform'),
+                ('Transforms.EquatorialHorizon', 'toEquatorial', 'transform'),
+                ('Transforms.SiderealTime', 'USNO_C163.GMST', 'transform'),
+                ('Transforms.SiderealTime', 'USNO_C163.GAST', 'transform'),
+                ('Transforms.SiderealTime', 'USNO_C163.LSTA', 'transform'))
+
+trace_dir = None
+trace_sample = 1.0
+trace_max_spans = 10000
+
+current = threading.local() # the request thread's trace
+
+export_lock = threading.Lock()
+
+
+# =====================
+# ===== functions =====
+# =====================
+
+
+def new_id(bits):
+    """A random trace or span id in hex"""
+
+    return '{:0{}x}'.format(random.getrandbits(bits), bits//4)
+
+
+def is_active():
+    """True if this thread's request is being traced"""
+
+    return getattr(current, 'trace', None) is not None
+
+
+def start_span(a_name, attributes=None, a_kind='SPAN_KIND_INTERNAL'):
+    """Start a child of the current span
+
+    Args:
+        a_name (str): e.g. Bodies.MoonPosition.EclipticCoords
+        attributes (dict): span attributes
+        a_kind (str): OpenTelemetry span kind
+
+    Returns: the span dict
+    """
+
+    a_trace = current.trace
+
+    a_span = {'trace_id': a_trace['trace_id'],
+              'span_id': new_id(64),
+              'parent_span_id': a_trace['stack'][-1]['span_id'] if a_trace['stack'] else '',
+              'name': a_name,
+              'kind': a_kind,
+              'start_time_unix_nano': time.time_ns(),
+              'attributes': dict(attributes or ()),
+              'status': {'code': 'STATUS_CODE_UNSET'}}
+
+    a_trace['stack'].append(a_span)
+
+    return a_span
+
+
+def end_span(a_span, an_error=None):
+    """End the current span
+
+    Args:
+        a_span (dict): from start_span
+        an_error (Exception): if the call raised it
+    """
+
+    a_span['end_time_unix_nano'] = time.time_ns()
+
+    if an_error is not None:
+        a_span['status'] = {'code': 'STATUS_CODE_ERROR', 'message': '{}: {}'.format(type(an_error).__name__, an_error)}
+
+    a_trace = current.trace
+    a_trace['stack'].pop()
+
+    if len(a_trace['spans']) < trace_max_spans:
+        a_trace['spans'].append(a_span)
+    else:
+        a_trace['dropped'] += 1
+
+    return
+
+
+@contextlib.contextmanager
+def span(a_name, **attributes):
+    """A span around a block if this request is traced
+
+        with tracing.span('charts.season', season='summer'):
+            ...
+    """
+
+    if not is_active():
+        yield None
+        return
+
+    a_span = start_span(a_name, attributes)
+
+    try:
+        yield a_span
+    except Exception as err:
+        end_span(a_span, err)
+        raise
+    else:
+        end_span(a_span)
+
+
+def traced(a_name, a_stage, a_function):
+    """Wrap a function in a span, only when its request is traced
+
+    Args:
+        a_name (str): span name
+        a_stage (str): aai.stage attribute, as in metrics.py
+        a_function: to wrap
+
+    Returns: the wrapper
+    """
+
+    attributes = {'aai.stage': a_stage}
+
+    @functools.wraps(a_function)
+    def wrapper(*args, **kwargs):
+
+        if getattr(current, 'trace', None) is None:
+            return a_function(*args, **kwargs)
+
+        a_span = start_span(a_name, attributes)
+
+        try:
+            result = a_function(*args, **kwargs)
+        except Exception as err:
+            end_span(a_span, err)
+            raise
+
+        end_span(a_span)
+
+        return result
+
+    wrapper.aai_traced = True
+
+    return wrapper
+
+
+def instrument(some_instrumented=instrumented):
+    """Wrap the instrumented functions where they are looked up
+
+    Args:
+        some_instrumented (tuple): of (module, attribute path, stage)
+    """
+
+    for a_module_name, a_path, a_stage in some_instrumented:
+
+        an_owner = importlib.import_module(a_module_name)
+
+        *owner_names, an_attribute = a_path.split('.')
+
+        for a_name in owner_names:
+            an_owner = getattr(an_owner, a_name)
+
+        a_name = '{}.{}'.format(a_module_name, a_path)
+
+        a_value = vars(an_owner)[an_attribute] # the staticmethod or classmethod itself, not what it binds to
+
+        if isinstance(a_value, (staticmethod, classmethod)):
+
+            if getattr(a_value.__func__, 'aai_traced', False):
+                continue
+
+            setattr(an_owner, an_attribute, type(a_value)(traced(a_name, a_stage, a_value.__func__)))
+
+        elif not getattr(a_value, 'aai_traced', False):
+            setattr(an_owner, an_attribute, traced(a_name, a_stage, a_value))
+
+    return
+
+
+def export(a_trace):
+    """Append a finished trace's spans to this process's file"""
+
+    resource = {'service.name': 'aai', 'process.pid': os.getpid()}
+
+    lines = list()
+
+    for a_span in a_trace['spans']:
+        a_span['resource'] = resource
+        lines.append(json.dumps(a_span, sort_keys=True))
+
+    a_flnm = os.path.join(trace_dir, 'traces-{}.jsonl'.format(os.getpid()))
+
+    with export_lock:
+        with open(a_flnm, 'a') as a_file:
+            a_file.write('\n'.join(lines) + '\n')
+
+    return
+
+
+# ----------------------------
+# ----- request handlers -----
+# ----------------------------
+
+
+def start_trace():
+    """before_request: start a trace for a sample of the requests"""
+
+    current.trace = None
+
+    if flask.request.endpoint in (None, 'static', 'metrics') or random.random() >= trace_sample:
+        return None
+
+    current.trace = {'trace_id': new_id(128), 'stack': list(), 'spans': list(), 'dropped': 0}
+
+    start_span('{} {}'.format(flask.request.method, flask.request.url_rule.rule),
+               {'http.method': flask.request.method,
+                'http.route': flask.request.url_rule.rule,
+                'http.target': flask.request.full_path},
+               'SPAN_KIND_SERVER')
+
+    return None
+
+
+def note_status(a_response):
+    """after_request: the status code on the root span"""
+
+    if is_active():
+        current.trace['stack'][0]['attributes']['http.status_code'] = a_response.status_code
+
+    return a_response
+
+
+def finish_trace(an_error=None):
+    """teardown_request: end the root span and export the trace"""
+
+    a_trace = getattr(current, 'trace', None)
+
+    if a_trace is None:
+        return
+
+    while len(a_trace['stack']) > 1: # spans left open by an exception
+        end_span(a_trace['stack'][-1])
+
+    a_root = a_trace['stack'][0]
+
+    if a_trace['dropped']:
+        a_root['attributes']['aai.dropped_spans'] = a_trace['dropped']
+
+    end_span(a_root, an_error)
+
+    current.trace = None
+
+    export(a_trace)
+
+    return
+
+
+def init_app(an_app):
+    """Register the tracing hooks and wrap the functions if AAI_TRACE_DIR is set
+
+    Args:
+        an_app (flask.Flask): the AAI app
+    """
+
+    global trace_dir, trace_sample, trace_max_spans
+
+    trace_dir = an_app.config.get('AAI_TRACE_DIR')
+
+    if trace_dir is None:
+        return
+
+    trace_sample = an_app.config.get('AAI_TRACE_SAMPLE', 1.0)
+    trace_max_spans = an_app.config.get('AAI_TRACE_MAX_SPANS', 10000)
+
+    os.makedirs(trace_dir, exist_ok=True)
+
+    instrument()
+
+    an_app.before_request(start_trace)
+    an_app.after_request(note_status)
+    an_app.teardown_request(finish_trace)
+
+    return
+
+
+# ===================
+# ===== summary =====
+# ===================
+
+
+def read_spans(paths):
+    """Spans from trace files
+
+    Args:
+        paths (list): file names or glob patterns
+
+    Returns: list of span dicts
+    """
+
+    spans = list()
+
+    for a_pattern in paths:
+        for a_flnm in sorted(glob.glob(a_pattern)):
+            with open(a_flnm) as a_file:
+                spans.extend(json.loads(a_line) for a_line in a_file if a_line.strip())
+
+    return spans
+
+
+def summarize(spans):
+    """Calls, total and self time by span name
+
+    Self time is a span's time less its children's, so repeated cheap
+    calls add up where they are spent.
+
+    Args:
+        spans (list): span dicts, from read_spans
+
+    Returns: dict of span name to dict of calls, total_ms and self_ms
+    """
+
+    children_ns = dict()
+
+    for a_span in spans:
+        key = (a_span['trace_id'], a_span['parent_span_id'])
+        children_ns[key] = children_ns.get(key, 0) + a_span['end_time_unix_nano'] - a_span['start_time_unix_nano']
+
+    summary = dict()
+
+    for a_span in spans:
+
+        duration = a_span['end_time_unix_nano'] - a_span['start_time_unix_nano']
+        own = duration - children_ns.get((a_span['trace_id'], a_span['span_id']), 0)
+
+        a_summary = summary.setdefault(a_span['name'], {'calls': 0, 'total_ms': 0.0, 'self_ms': 0.0})
+        a_summary['calls'] += 1
+        a_summary['total_ms'] += duration/1e6
+        a_summary['self_ms'] += own/1e6
+
+    return summary
+
+
+def format_summary(a_summary, a_top=30):
+    """The span names with the most self time as a table"""
+
+    row = '{:<50} {:>10} {:>12} {:>12}'
+
+    lines = [row.format('span', 'calls', 'total ms', 'self ms')]
+
+    for a_name, a_result in sorted(a_summary.items(), key=lambda item: item[1]['self_ms'], reverse=True)[:a_top]:
+        lines.append(row.format(a_name, a_result['calls'],
+                                '{:.2f}'.format(a_result['total_ms']), '{:.2f}'.format(a_result['self_ms'])))
+
+    return '\n'.join(lines)
+
+
+# ================
+# ===== main =====
+# ================
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Summarize AAI traces')
+
+    parser.add_argument('paths', nargs='+', help='trace files or glob patterns')
+
+    parser.add_argument('--top', type=int, dest='top', default=30,
+                        help='span names to list')
+
+    args = parser.parse_args()
+
+    spans = read_spans(args.paths)
+
+    if not spans:
+        sys.exit('no spans in {}'.format(' '.join(args.paths)))
+
+    print('{} traces, {} spans'.format(len(set(a_span['trace_id'] for a_span in spans)), len(spans)))
+    print(format_summary(summarize(spans), args.top))
@@ -4,19 +4,34 @@ TODO: This is identical to what is used in mongodb. make into a common
 libary but too small for now.
 """
 
+import calendar
 import flask
+import functools
 import math
 import re
 
 import coords
 
+import metrics
+
+import Transforms.utils
+
 # ===================
 # ===== globals =====
 # ===================
 
-dms_re = re.compile(r'(?P<degrees>[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?)'
-                      '((:(?P<minutes>[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?))?)'
-                       '(:(?P<seconds>[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?))?')
+# angle limits by request key, Transforms.utils.angle_limits for the others
+# longitude is east positive, -180 to 180 or 0 to 360
+# dec is a declination except in dec2dms, which passes its own limits
+
+longitude_limits = (Transforms.utils.longitude_limits[0], 360.0)
+
+angle_limits = {'alt': Transforms.utils.latitude_limits,
+                'altitude': Transforms.utils.latitude_limits,
+                'dec': Transforms.utils.latitude_limits,
+                'eclatitude': Transforms.utils.latitude_limits,
+                'latitude': Transforms.utils.latitude_limits,
+                'longitude': longitude_limits}
 
 
 # year-month-day
@@ -25,8 +40,13 @@ ymd_re = re.compile(r'(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})')
 # hour:minute:seconds
 hms_re = re.compile(r'(?P<hour>\d{1,2}):(?P<minute>\d{1,2})(:(?P<seconds>\d{0,2}\.*\d+)){0,1}')
 
-# time zone +hhmm
-tz_re = re.compile(r'(?P<sign>[+-]){0,1}(?P<hrs>\d{1,2})(:){0,1}(?P<mins>\d\d){0,1}')
+# time zone +hhmm, a leading space is the + of a query string that was not escaped
+tz_re = re.compile(r'\s*(?P<sign>[+-])?(?P<hrs>\d{1,2})(:?(?P<mins>\d\d))?\s*\Z')
+
+# ISO 8601 year-month-dayThour:minute[:seconds] and a time zone, Z or +hh[[:]mm]
+iso_re = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})[T ](\d{1,2}):(\d{1,2})(?::(\d{1,2}(?:\.\d*)?))?(Z|[-+ ]\d{1,2}(?::?\d\d)?)\Z')
+
+timezone_limits = (-12, 14) # hours, the Date Line to Kiribati
 
 
 # ===================
@@ -58,13 +78,11 @@ def dd2dms(a_degree):
 
 
 def offset2timezone(an_offset):
-    """Convert float offset to timezone string"""
+    """Convert float offset to timezone string, like -08:00 or +05:30"""
 
-    hrs = int(an_offset)
-    m = math.fabs(60.0 * (an_offset - hrs))
-    minutes = int(m)
+    minutes = int(round(math.fabs(an_offset)*60))
 
-    return '{:02}:{:02}'.format(hrs, minutes)
+    return '{}{:02}:{:02}'.format('-' if an_offset < 0 else '+', minutes//60, minutes % 60)
 
 
 def request_float(a_float_str, a_flask_request):
@@ -87,116 +105,271 @@ def request_float(a_float_str, a_flask_request):
     return a_float
 
 
-def safe_get_float(a_match, a_key):
-    """Safe get float
-
-    Args:
-        a_match (re.match result dictonary): regex with named groups
-        a_float_key (str): value to get
-
-    Returns 0 if not found
-    Raises: Error if not found
-    """
-
-    a_val = a_match.groupdict()[a_key]
-
-    if a_val is None:
-        return 0
-    else:
-        return float(a_val)
-
-
-def request_angle(an_angle_key, a_flask_request):
+def request_angle(an_angle_key, a_flask_request, a_limits=None):
     """Gets the degree minute second values from the request args
 
     Arg:
         an_angle_key (str): one of deg, deg:min, deg:min:sec
         a_flask_request (werkzeug.local.LocalProxy): reference to the flask request object
+        a_limits (tuple): minimum and maximum degrees, from angle_limits if None
     Returns: coords.angle
     Raises: Error if not found
     """
 
-    an_angle_value = a_flask_request.args.get(an_angle_key)
+    return parse_angle(an_angle_key, a_flask_request.args.get(an_angle_key), a_limits)
 
-    found_dms = dms_re.match(an_angle_value)
 
-    if not found_dms:
-        raise Error('unsupported format for {an_angle_key}: {an_angle_value}'.format(**locals()))
+@metrics.timed('parse')
+def parse_angle(an_angle_key, an_angle_value, a_limits=None):
+    """Parses a deg[:min[:sec]] string
 
-    degrees = safe_get_float(found_dms, 'degrees')
-    minutes = safe_get_float(found_dms, 'minutes')
-    seconds = safe_get_float(found_dms, 'seconds')
+    Arg:
+        an_angle_key (str): name of the value for error messages and its limits in angle_limits
+        an_angle_value (str): one of deg, deg:min, deg:min:sec
+        a_limits (tuple): minimum and maximum degrees, from angle_limits if None
+    Returns: coords.angle
+    Raises: Error if unsupported format or out of range
+    """
 
-    return coords.angle(degrees, minutes, seconds)
+    if a_limits is None:
+        a_limits = angle_limits.get(an_angle_key, Transforms.utils.angle_limits)
 
+    try:
+        degrees = Transforms.utils.dms2degrees(an_angle_value, a_limits, an_angle_key)
+    except Transforms.utils.Error as err:
+        raise Error(str(err))
 
-def request_datetime(a_date_key, a_time_key, a_timezone_key, a_flask_request):
-    """Gets the degree minute second values from the request args
+    return coords.angle(degrees)
 
-    Assumes daylight saving time has already been accounted for
+
+def request_datetime(a_date_key, a_time_key, a_timezone_key, a_flask_request, a_datetime_key='datetime'):
+    """Gets the date and time from the request args
+
+    An ISO 8601 datetime arg is used if there is one, otherwise the
+    date, time and timezone args. Assumes daylight saving time has
+    already been accounted for
 
     Arg:
         a_date_key (str): date key
         a_time_key (str): time key
         a_timezone_key (str): timezone key
         a_flask_request (werkzeug.local.LocalProxy): reference to the flask request object
+        a_datetime_key (str): ISO 8601 datetime key
 
     Returns: coords.datetime
-    Raises: Error if not found
+    Raises: Error if unsupported format, KeyError if not found
     """
 
-    ymd_match = ymd_re.match(a_flask_request.args[a_date_key])
+    args = a_flask_request.args
 
-    if ymd_match is None:
-        raise Error('unsupported date format {}'.format(flask.request.args[a_date_key]))
+    if a_datetime_key in args:
+        return parse_iso8601(args[a_datetime_key])
 
-    ymd = ymd_match.groupdict()
+    return parse_datetime(args[a_date_key], args[a_time_key], args[a_timezone_key])
 
-    year = int(ymd['year'])
-    month = int(ymd['month'])
-    day = int(ymd['day'])
 
-    hms_match = hms_re.match(a_flask_request.args[a_time_key])
+@functools.lru_cache(maxsize=1024)
+def parse_timezone(a_timezone):
+    """Parses a time zone into its offset from UTC
 
-    if hms_match is None:
-        raise Error('unsupported date format {}'.format(flask.request.args[a_date_key]))
+    There are few time zones and every request has one, so the offsets
+    are cached by string.
 
-    # TODO unneeded
-    hms = hms_match.groupdict()
+    Arg:
+        a_timezone (str): Z or [+-]hr[[:]min], like -8, -08:00 or +0530
 
-    hour = int(hms['hour'])
-    minute = int(hms['minute'])
+    Returns: float hours east of UTC
+    Raises: Error if unsupported format or out of range
+    """
 
-    if hms['seconds'] is not None:
-        seconds = float(hms['seconds'])
-    else:
-        seconds = 0
+    if a_timezone == 'Z':
+        return 0.0
 
-    tz_match = tz_re.match(flask.request.args[a_timezone_key])
+    tz_match = tz_re.match(a_timezone)
 
     if tz_match is None:
-        raise Error('unsupported timezone format {}'.format(flask.request.args[a_timezone_key]))
+        raise Error('unsupported timezone format {}'.format(a_timezone))
+
+    sign, hours, minutes = tz_match.group('sign', 'hrs', 'mins')
 
-    # TODO unused
-    tz_elements = tz_match.groupdict()
+    timezone = float(hours)
 
-    timezone = float(tz_elements['hrs'])
+    if minutes is not None:
 
-    if tz_elements['mins'] is not None:
-        tzmins = float(tz_elements['mins'])/60.0
-        if tzmins > 1:
-            raise Error('time zone minutes exceeded {}'.format(flask.request.args[a_timezone_key]))
-        else:
-            timezone += tzmins
+        if int(minutes) >= 60:
+            raise Error('time zone minutes exceeded {}'.format(a_timezone))
 
-    if timezone > 12:
-        raise Error('time zone range exceeded {}'.format(flask.request.args[a_timezone_key]))
+        timezone += int(minutes)/60.0
 
-    if tz_elements['sign'] == '-':
+    if sign == '-':
         timezone *= -1
 
+    if not timezone_limits[0] <= timezone <= timezone_limits[1]:
+        raise Error('time zone range exceeded {}'.format(a_timezone))
+
+    return timezone
+
+
+def check_fields(fields, a_text):
+    """Checks the ranges of date and time fields
+
+    Args:
+        fields (tuple): year, month, day, hour, minute, seconds and offset
+        a_text (str): what they were parsed from, for error messages
+
+    Returns: fields
+    Raises: Error if a field is out of range
+    """
+
+    year, month, day, hour, minute, seconds, offset = fields
+
+    if not 1 <= month <= 12 or not 1 <= day <= calendar.monthrange(year, month)[1]:
+        raise Error('date out of range {}'.format(a_text))
+
+    if hour > 23 or minute > 59 or seconds > 60: # 60 for a leap second or rounding up
+        raise Error('time out of range {}'.format(a_text))
+
+    return fields
+
+
+def parse_datetime_fields(a_date, a_time, a_timezone):
+    """Parses date, time and timezone strings into their fields
+
+    Arg:
+        a_date (str): year-mm-dd
+        a_time (str): hr:min[:sec]
+        a_timezone (str): [+-]hr[[:]min], see parse_timezone
+
+    Returns: tuple of year, month, day, hour, minute, seconds and offset in hours
+    Raises: Error if unsupported format or out of range
+    """
+
+    ymd_match = ymd_re.match(a_date)
+
+    if ymd_match is None:
+        raise Error('unsupported date format {}'.format(a_date))
+
+    hms_match = hms_re.match(a_time)
+
+    if hms_match is None:
+        raise Error('unsupported time format {}'.format(a_time))
+
+    year, month, day = ymd_match.group('year', 'month', 'day')
+    hour, minute, seconds = hms_match.group('hour', 'minute', 'seconds')
+
+    return check_fields((int(year), int(month), int(day), int(hour), int(minute),
+                         float(seconds) if seconds is not None else 0.0,
+                         parse_timezone(a_timezone)),
+                        '{} {}'.format(a_date, a_time))
+
+
+def parse_iso8601_fields(a_datetime):
+    """Parses an ISO 8601 datetime string into its fields
+
+    Arg:
+        a_datetime (str): year-mm-ddThr:min[:sec] and a time zone, like
+            2018-01-11T10:14:56-08:00 or 2018-01-11T18:14:56Z
+
+    Returns: tuple of year, month, day, hour, minute, seconds and offset in hours
+    Raises: Error if unsupported format or out of range
+    """
+
+    iso_match = iso_re.match(a_datetime)
+
+    if iso_match is None:
+        raise Error('unsupported datetime format {}'.format(a_datetime))
+
+    year, month, day, hour, minute, seconds, timezone = iso_match.groups()
+
+    return check_fields((int(year), int(month), int(day), int(hour), int(minute),
+                         float(seconds) if seconds is not None else 0.0,
+                         parse_timezone(timezone)),
+                        a_datetime)
+
+
+def fields2datetime(fields):
+    """coords.datetime of the fields from parse_datetime_fields or parse_iso8601_fields"""
+
+    year, month, day, hour, minute, seconds, offset = fields
+
+    return coords.datetime(year, month, day, hour, minute, seconds, offset2timezone(offset))
+
+
+@metrics.timed('parse')
+def parse_datetime(a_date, a_time, a_timezone):
+    """Parses date, time and timezone strings
+
+    Assumes daylight saving time has already been accounted for
+
+    Arg:
+        a_date (str): year-mm-dd
+        a_time (str): hr:min[:sec]
+        a_timezone (str): [+-]hr[[:]min], see parse_timezone
+
+    Returns: coords.datetime
+    Raises: Error if unsupported format or out of range
+    """
+
+    return fields2datetime(parse_datetime_fields(a_date, a_time, a_timezone))
+
+
+@metrics.timed('parse')
+def parse_iso8601(a_datetime):
+    """Parses an ISO 8601 datetime string
+
+    Assumes daylight saving time has already been accounted for
+
+    Arg:
+        a_datetime (str): see parse_iso8601_fields
+
+    Returns: coords.datetime
+    Raises: Error if unsupported format or out of range
+    """
+
+    return fields2datetime(parse_iso8601_fields(a_datetime))
+
+
+def request_bounded_float(a_float_key, a_flask_request, a_bounds):
+    """Gets an optional float from the request args within bounds
+
+    Args:
+        a_float_key (str): float key
+        a_flask_request (werkzeug.local.LocalProxy): reference to the flask request object
+        a_bounds (tuple): minimum and maximum
+
+    Returns: the float or None if not in the request
+    Raises: Error if not a float or out of bounds
+    """
+
+    a_value = a_flask_request.args.get(a_float_key)
+
+    if a_value is None:
+        return None
+
+    try:
+        a_float = float(a_value)
+    except ValueError:
+        raise Error('{a_float_key} is not a float: {a_value}'.format(**locals()))
+
+    if not a_bounds[0] <= a_float <= a_bounds[1]:
+        raise Error('{} out of range [{}, {}]: {}'.format(a_float_key, a_bounds[0], a_bounds[1], a_value))
+
+    return a_float
+
+
+def request_resolution(a_resolution_key, a_flask_request, a_bounds):
+    """Gets the optional chart resolution from the request args
+
+    Args:
+        a_resolution_key (str): resolution key
+        a_flask_request (werkzeug.local.LocalProxy): reference to the flask request object
+        a_bounds (tuple): minimum and maximum minutes between chart points
+
+    Returns: minutes between chart points, 'adaptive' or None if not in the request
+    Raises: Error if not adaptive, a float or out of bounds
+    """
 
-    # TODO construct from float? construct from strings?
-    a_datetime = coords.datetime(year, month, day, hour, minute, seconds, str(flask.request.args[a_timezone_key]))
+    if a_flask_request.args.get(a_resolution_key) == 'adaptive':
+        return 'adaptive'
 
-    return a_datetime
+    return request_bounded_float(a_resolution_key, a_flask_request, a_bounds)